@@ -0,0 +1,135 @@
+import datetime
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from .singleflight import SingleFlight, EMPTY
+
+_flight = None
+_flight_lock = threading.Lock()
+
+
+def flight() -> SingleFlight:
+    """
+    The process-wide SingleFlight running ad-hoc area computations.
+    """
+    global _flight
+    with _flight_lock:
+        if _flight is None:
+            _flight = SingleFlight(max_workers=getattr(settings, 'SILVAGUARD_ADHOC_WORKERS', 4))
+    return _flight
+
+
+class AreaStatsService:
+    """
+    Current forest cover of a circle drawn on the map, without an AOI or a pulse.
+
+    Requests are rounded (SILVAGUARD_ADHOC_ROUND_DECIMALS for the center, 0.1 km for the
+    radius) and cached under the rounded geometry for SILVAGUARD_ADHOC_CACHE_SECONDS, or for
+    SILVAGUARD_ADHOC_EMPTY_CACHE_SECONDS when no scene answered. Misses go through the
+    SingleFlight, so identical requests in flight share one Earth Engine computation. The
+    computation itself is answered from the grid-cell cache (GridCellCache) on the newest
+    scene date with a Dynamic World image, so overlapping circles reuse each other's cells.
+
+    A request waits at most SILVAGUARD_ADHOC_BUDGET_SECONDS; past that it is told the result
+    is pending, while the computation finishes in the background and fills the cache.
+    """
+
+    def __init__(self):
+        self.decimals = getattr(settings, 'SILVAGUARD_ADHOC_ROUND_DECIMALS', 3)
+        self.budget = getattr(settings, 'SILVAGUARD_ADHOC_BUDGET_SECONDS', 10)
+        self.ttl = getattr(settings, 'SILVAGUARD_ADHOC_CACHE_SECONDS', 3600)
+        self.empty_ttl = getattr(settings, 'SILVAGUARD_ADHOC_EMPTY_CACHE_SECONDS', 300)
+        self.max_radius_km = getattr(settings, 'SILVAGUARD_ADHOC_MAX_RADIUS_KM', 25)
+        self.window_days = getattr(settings, 'SILVAGUARD_ADHOC_WINDOW_DAYS', 30)
+
+    def normalize(self, lat: float, lon: float, radius_km: float) -> tuple:
+        """
+        Validates and rounds a circle. Raises ValueError.
+        """
+        if not -90 <= lat <= 90 or not -180 <= lon <= 180:
+            raise ValueError("lat must be within [-90, 90] and lon within [-180, 180]")
+        if not 0 < radius_km <= self.max_radius_km:
+            raise ValueError(f"radius_km must be within (0, {self.max_radius_km}]")
+        return round(lat, self.decimals), round(lon, self.decimals), max(0.1, round(radius_km, 1))
+
+    def key(self, lat: float, lon: float, radius_km: float) -> str:
+        return f"adhoc:{lat:.{self.decimals}f}:{lon:.{self.decimals}f}:{radius_km:.1f}"
+
+    def stats(self, lat: float, lon: float, radius_km: float) -> dict:
+        """
+        Returns:
+            dict: 'state' ('ready', 'pending' or 'failed'), 'result' when ready, and how it was served
+            ('cached', 'coalesced', 'seconds').
+        """
+        started = time.perf_counter()
+        lat, lon, radius_km = self.normalize(lat, lon, radius_km)
+        key = self.key(lat, lon, radius_km)
+
+        result = cache.get(key)
+        if result == EMPTY:
+            return {'state': 'failed', 'result': None, 'cached': True, 'coalesced': False,
+                    'seconds': time.perf_counter() - started}
+        if result is not None:
+            return {'state': 'ready', 'result': result, 'cached': True, 'coalesced': False,
+                    'seconds': time.perf_counter() - started}
+
+        future, leader = flight().submit(key, lambda: self.compute(lat, lon, radius_km), result_key=key,
+                                         ttl=self.ttl, empty_ttl=self.empty_ttl)
+        try:
+            result = future.result(timeout=self.budget)
+        except FutureTimeout:
+            return {'state': 'pending', 'cached': False, 'coalesced': not leader,
+                    'seconds': time.perf_counter() - started}
+        return {'state': 'ready' if result is not None else 'failed', 'result': result, 'cached': False,
+                'coalesced': not leader, 'seconds': time.perf_counter() - started}
+
+    def compute(self, lat: float, lon: float, radius_km: float) -> dict:
+        """
+        Forest statistics of the circle on the newest scene date that has a Dynamic World image
+        covering it, or None when no scene of the window answered.
+        """
+        from django.db import connection
+
+        try:
+            return self._compute(lat, lon, radius_km)
+        finally:
+            # Runs on a SingleFlight pool thread, which keeps no connection between requests
+            connection.close()
+
+    def _compute(self, lat: float, lon: float, radius_km: float) -> dict:
+        from .gridcache import GridCellCache
+
+        grid = GridCellCache()
+        cells = grid.cover_circle(lat, lon, radius_km)
+        now = timezone.now()
+        date = grid.latest_date(cells, (now - datetime.timedelta(days=self.window_days)).date())
+        if date is not None:
+            dates = [date]
+        else:
+            dates = grid.scene_dates(lat, lon, now - datetime.timedelta(days=self.window_days), now)
+
+        # Dynamic World lags Sentinel-2 by a few days: fall back to older dates when the newest has none yet
+        for date in dates:
+            stats = grid.query(cells, date)
+            if stats['forest_percentage'] is not None:
+                break
+        else:
+            return None
+        return {
+            'latitude': lat,
+            'longitude': lon,
+            'radius_km': radius_km,
+            'date': date.isoformat(),
+            'forest_percentage': stats['forest_percentage'],
+            'mean_tree_probability': stats['mean_tree_probability'],
+            'p10': stats['summary']['p10'],
+            'p50': stats['summary']['p50'],
+            'p90': stats['summary']['p90'],
+            'threshold': stats['threshold'],
+            'cells': stats['cells'],
+            'cells_missing': stats['cells_missing'],
+            'computed_at': now.isoformat(),
+        }
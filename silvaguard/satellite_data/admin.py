@@ -1,26 +1,76 @@
 from django.contrib import admin
-from .models import AreaOfInterest, SatelliteImage, ProcessedImage, VegetationAnalysis, DeforestationAlert
+from .models import AreaOfInterest, SatelliteImage, ProcessedImage, VegetationAnalysis, DeforestationAlert, ExportTask, AOILease, SpectralIndexStat, LossMask, Notification, MonthlyForestAggregate, GridCellStat, BackfillJob, BackfillChunk
 
 @admin.register(AreaOfInterest)
 class AreaOfInterestAdmin(admin.ModelAdmin):
-    list_display = ('name', 'latitude', 'longitude', 'radius_km', 'created_at')
+    list_display = ('name', 'latitude', 'longitude', 'radius_km', 'precision', 'next_pulse_at', 'created_at')
     search_fields = ('name',)
 
 @admin.register(SatelliteImage)
 class SatelliteImageAdmin(admin.ModelAdmin):
-    list_display = ('image_id', 'aoi', 'acquisition_date', 'cloud_coverage', 'satellite_name')
-    list_filter = ('satellite_name', 'aoi', 'acquisition_date')
+    list_display = ('image_id', 'aoi', 'acquisition_date', 'cloud_coverage', 'satellite_name', 'pipeline_state')
+    list_filter = ('satellite_name', 'pipeline_state', 'aoi', 'acquisition_date')
     search_fields = ('image_id', 'aoi__name')
 
 @admin.register(ProcessedImage)
 class ProcessedImageAdmin(admin.ModelAdmin):
     list_display = ('satellite_image', 'processed_date', 'ndvi_mean')
 
+class SpectralIndexStatInline(admin.TabularInline):
+    model = SpectralIndexStat
+    extra = 0
+
 @admin.register(VegetationAnalysis)
 class VegetationAnalysisAdmin(admin.ModelAdmin):
-    list_display = ('processed_image', 'mean_ndvi', 'forest_cover_percentage', 'analysis_date')
+    inlines = [SpectralIndexStatInline]
+    list_display = ('processed_image', 'mean_ndvi', 'forest_cover_percentage', 'forest_threshold', 'reduction_scale', 'analysis_date')
 
 @admin.register(DeforestationAlert)
 class DeforestationAlertAdmin(admin.ModelAdmin):
     list_display = ('aoi', 'forest_loss_hectares', 'loss_percentage', 'detected_at')
     list_filter = ('aoi', 'detected_at')
+
+@admin.register(ExportTask)
+class ExportTaskAdmin(admin.ModelAdmin):
+    list_display = ('task_id', 'kind', 'aoi', 'state', 'reduction_scale', 'submitted_at', 'updated_at')
+    list_filter = ('kind', 'state', 'aoi')
+    search_fields = ('task_id', 'asset_id')
+
+@admin.register(AOILease)
+class AOILeaseAdmin(admin.ModelAdmin):
+    list_display = ('aoi', 'owner', 'claimed_at', 'heartbeat_at', 'expires_at', 'completed_at')
+    search_fields = ('aoi__name', 'owner')
+
+@admin.register(LossMask)
+class LossMaskAdmin(admin.ModelAdmin):
+    list_display = ('alert', 'width', 'height', 'pixel_count', 'created_at')
+    exclude = ('data',)
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('recipient', 'alert', 'channel', 'state', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('state', 'channel')
+    search_fields = ('recipient',)
+
+@admin.register(MonthlyForestAggregate)
+class MonthlyForestAggregateAdmin(admin.ModelAdmin):
+    list_display = ('aoi', 'month', 'scene_count', 'mean_forest_cover', 'min_forest_cover', 'max_forest_cover')
+    list_filter = ('aoi',)
+
+@admin.register(GridCellStat)
+class GridCellStatAdmin(admin.ModelAdmin):
+    list_display = ('cell', 'date', 'mean_tree_probability', 'reduction_scale', 'computed_at')
+    list_filter = ('date',)
+    search_fields = ('cell',)
+
+class BackfillChunkInline(admin.TabularInline):
+    model = BackfillChunk
+    extra = 0
+    readonly_fields = ('start_date', 'end_date', 'state', 'attempts', 'scenes_found', 'scenes_analyzed',
+                       'pairs_checked', 'alerts_created', 'analysis_seconds', 'loss_seconds', 'last_error')
+
+@admin.register(BackfillJob)
+class BackfillJobAdmin(admin.ModelAdmin):
+    list_display = ('aoi', 'start_date', 'end_date', 'chunk_days', 'state', 'updated_at')
+    list_filter = ('state',)
+    inlines = [BackfillChunkInline]
@@ -1,93 +1,176 @@
 import ee
 import datetime
+from django.conf import settings
 from .gee_utils import initialize_gee
+from .reduction import ReductionPolicy
+from .indices import SpectralIndexEngine
+from . import histograms
 
 class VegetationAnalyzer:
     """
     Performs vegetation analysis on satellite data using Google Earth Engine.
     """
     
-    def __init__(self):
+    def __init__(self, policy: ReductionPolicy = None, threshold: float = None):
         initialize_gee()
+        self.policy = policy or ReductionPolicy()
+        self.indices = SpectralIndexEngine()
+        # Tree probability above which a pixel counts as forest
+        self.threshold = threshold if threshold is not None else getattr(settings, 'SILVAGUARD_FOREST_THRESHOLD', 0.5)
 
-    def analyze_gee_image(self, gee_asset_id: str, aoi_geometry=None) -> dict:
+    def analyze_gee_image(self, gee_asset_id: str, aoi_geometry=None, reduction: dict = None) -> dict:
         """
         Analyzes a GEE image using Dynamic World (GOOGLE/DYNAMICWORLD/V1).
         
         Args:
             gee_asset_id: The Sentinel-2 Asset ID (e.g., COPERNICUS/S2_SR_HARMONIZED/...)
             aoi_geometry: ee.Geometry object defining the area to reduce over.
+            reduction: reduceRegion parameters from ReductionPolicy. Defaults to the
+                policy for a full scene.
             
         Returns:
-            dict: Statistics including forest percentage (based on Dynamic World 'trees' class).
+            dict: Statistics including forest percentage (based on Dynamic World 'trees' class)
+            and the 'scale' the reduction ran at. On failure the statistics are zeros and
+            'error' says why.
         """
+        reduction = reduction or self.policy.params_for_scene()
         try:
-            # 1. Get the S2 Image (for geometry/time)
-            s2_image = ee.Image(gee_asset_id)
-            region = aoi_geometry if aoi_geometry else s2_image.geometry()
-            
-            # 2. Find matching Dynamic World Image
-            # Dynamic World images match S2 by time and bounds
-            # We filter the DW collection 
-            dw_col = ee.ImageCollection("GOOGLE/DYNAMICWORLD/V1") \
-                .filterBounds(region) \
-                .filterDate(s2_image.date(), s2_image.date().advance(1, 'day')) \
-                .filter(ee.Filter.eq('system:index', s2_image.get('system:index')))
-            
-            # 3. Get the DW Image (Mosaic if multiple, but usually 1-to-1)
-            # Use query to ensure we get the best match or closest in time
-            dw_image = ee.Image(dw_col.first())
-            
-            if not dw_image:
-                 # Fallback: Try simpler time filter if system:index doesn't align perfectly
-                 dw_col = ee.ImageCollection("GOOGLE/DYNAMICWORLD/V1") \
-                    .filterBounds(region) \
-                    .filterDate(s2_image.date().advance(-2, 'hour'), s2_image.date().advance(2, 'hour'))
-                 dw_image = ee.Image(dw_col.first())
-
-            if not dw_image:
+            stats = self.analysis_statistics(gee_asset_id, aoi_geometry, reduction)
+            if stats is None:
                  print(f"No Dynamic World image found for {gee_asset_id}")
-                 return {'mean_ndvi': 0.0, 'forest_percentage': 0.0}
+                 return {'mean_ndvi': 0.0, 'forest_percentage': 0.0, 'histogram': [], 'threshold': self.threshold,
+                         'scale': reduction['scale'], 'error': 'No Dynamic World image'}
 
-            # 4. Extract 'trees' probability (Band 'trees')
-            # Dynamic World bands: water, trees, grass, flooded_vegetation, crops, shrub_and_scrub, built, bare, snow_and_ice
-            trees_prob = dw_image.select('trees')
-            
-            # 5. Define Forest Mask (Probability > 0.5)
-            forest_mask = trees_prob.gt(0.5).rename('FOREST')
-            
-            # 6. Statistics
-            stats = forest_mask.reduceRegion(
-                reducer=ee.Reducer.mean(),
-                geometry=region,
-                scale=20,
-                maxPixels=1e12
-            )
-            
-            forest_fraction = stats.get('FOREST').getInfo()
-            
-            # For 'mean_ndvi' field (legacy name), we can store mean tree probability
-            mean_prob_stats = trees_prob.reduceRegion(
-                reducer=ee.Reducer.mean(),
-                geometry=region,
-                scale=20,
-                maxPixels=1e12
-            )
-            mean_tree_prob = mean_prob_stats.get('trees').getInfo()
-
-            return {
-                'mean_ndvi': mean_tree_prob if mean_tree_prob else 0.0, # Reuse field for Tree Prob
-                'min_ndvi': 0.0,
-                'max_ndvi': 1.0,
-                'forest_percentage': forest_fraction * 100 if forest_fraction else 0.0
-            }
+            return self.format_analysis(stats.getInfo(), reduction['scale'])
 
         except Exception as e:
             print(f"GEE Analysis Failed for {gee_asset_id}: {e}")
             return {
-                'mean_ndvi': 0.0, 'min_ndvi': 0.0, 'max_ndvi': 0.0, 'forest_percentage': 0.0
+                'mean_ndvi': 0.0, 'min_ndvi': 0.0, 'max_ndvi': 0.0, 'forest_percentage': 0.0,
+                'histogram': [], 'threshold': self.threshold, 'scale': reduction['scale'], 'error': str(e)
             }
 
+    def analysis_statistics(self, gee_asset_id: str, aoi_geometry=None, reduction: dict = None):
+        """
+        Builds the server-side statistics for a scene without evaluating them.
+
+        Mean tree probability and a fixed-bin tree probability histogram come out
+        of a single combined reduction, so the result can be fetched with one
+        getInfo() or exported as a table task. Forest cover at any threshold is
+        derived from the histogram.
+
+        Returns:
+            ee.Dictionary with 'trees_mean' and 'trees_histogram' keys, or None if no Dynamic World image matches.
+        """
+        reduction = reduction or self.policy.params_for_scene()
+
+        # 1. Get the S2 Image (for geometry/time)
+        s2_image = ee.Image(gee_asset_id)
+        region = aoi_geometry if aoi_geometry else s2_image.geometry()
+
+        # 2. Find matching Dynamic World Image
+        dw_image = self._get_dynamic_world(s2_image, region)
+        if not dw_image:
+            return None
+
+        # 3. Extract 'trees' probability (Band 'trees')
+        # Dynamic World bands: water, trees, grass, flooded_vegetation, crops, shrub_and_scrub, built, bare, snow_and_ice
+        trees_prob = dw_image.select('trees')
+
+        # 4. Statistics: mean probability (stored in the legacy 'mean_ndvi' field)
+        # and the histogram the forest fraction is read from
+        reducer = ee.Reducer.mean().combine(
+            ee.Reducer.fixedHistogram(0, 1, histograms.HISTOGRAM_BINS), sharedInputs=True
+        )
+        return trees_prob.reduceRegion(
+            reducer=reducer,
+            geometry=region,
+            **reduction
+        )
+
+    def format_analysis(self, stats: dict, scale: float) -> dict:
+        """
+        Converts evaluated analysis statistics into the dict returned by analyze_gee_image.
+        The tree probability histogram is returned as 'histogram' (list of bin counts).
+        """
+        counts = histograms.counts_from_ee(stats.get('trees_histogram'))
+        if counts:
+            mean_tree_prob = stats.get('trees_mean')
+            summary = histograms.summarize(counts, self.threshold)
+        else:
+            # Export tasks submitted before histograms were added carry 'FOREST'/'trees' only
+            mean_tree_prob = stats.get('trees')
+            forest_fraction = stats.get('FOREST')
+            summary = {'forest_percentage': forest_fraction * 100 if forest_fraction else 0.0, 'min': 0.0, 'max': 1.0}
+        return {
+            'mean_ndvi': mean_tree_prob if mean_tree_prob else 0.0, # Reuse field for Tree Prob
+            'min_ndvi': summary['min'] or 0.0,
+            'max_ndvi': summary['max'] or 0.0,
+            'forest_percentage': summary['forest_percentage'],
+            'histogram': counts,
+            'threshold': self.threshold,
+            'scale': scale
+        }
+
+    def compute_indices(self, gee_asset_id: str, aoi_geometry=None, reduction: dict = None) -> dict:
+        """
+        Computes NDVI, EVI, SAVI and NBR statistics for a scene in one combined reduction.
+
+        Returns:
+            dict: {'NDVI': {'mean', 'min', 'max', 'stddev'}, ...}, or {} on failure.
+        """
+        reduction = reduction or self.policy.params_for_scene()
+        try:
+            stats = self.indices.ee_statistics(gee_asset_id, aoi_geometry, reduction)
+            return self.indices.format_statistics(stats.getInfo())
+        except Exception as e:
+            print(f"Spectral index computation failed for {gee_asset_id}: {e}")
+            return {}
+
+    def save_indices(self, analysis, index_stats: dict, scale: float = None):
+        """
+        Stores computed index statistics for an analysis, replacing previous values.
+        """
+        from .db import write_transaction
+        from .models import SpectralIndexStat
+
+        # update_or_create reads before it writes; scenes are saved from several threads
+        with write_transaction():
+            for index, values in index_stats.items():
+                SpectralIndexStat.objects.update_or_create(
+                    analysis=analysis,
+                    index=index,
+                    defaults=dict(values, reduction_scale=scale)
+                )
+
+    def tree_probability(self, gee_asset_id: str):
+        """
+        Returns the Dynamic World 'trees' probability image matching a Sentinel-2 scene.
+        """
+        return self._get_dynamic_world(ee.Image(gee_asset_id)).select('trees')
+
+    def _get_dynamic_world(self, s2_image, region=None):
+        """
+        Finds the Dynamic World image matching a Sentinel-2 image.
+        Dynamic World images match S2 by time and bounds, with a +/-2h window as fallback.
+        """
+        region = region if region else s2_image.geometry()
+        dw_col = ee.ImageCollection("GOOGLE/DYNAMICWORLD/V1") \
+            .filterBounds(region) \
+            .filterDate(s2_image.date(), s2_image.date().advance(1, 'day')) \
+            .filter(ee.Filter.eq('system:index', s2_image.get('system:index')))
+
+        dw_image = ee.Image(dw_col.first())
+
+        if not dw_image:
+            # Fallback: Try simpler time filter if system:index doesn't align perfectly
+            dw_col = ee.ImageCollection("GOOGLE/DYNAMICWORLD/V1") \
+                .filterBounds(region) \
+                .filterDate(s2_image.date().advance(-2, 'hour'), s2_image.date().advance(2, 'hour'))
+            dw_image = ee.Image(dw_col.first())
+
+        return dw_image
+
     def get_gee_tile_url(self, gee_asset_id: str) -> str:
         """
         Generates a temporary Tile URL from GEE for the 'trees' probability.
@@ -159,9 +242,9 @@ class VegetationAnalyzer:
             if not dw_before or not dw_after:
                 return ""
                 
-            # Forest Mask (Prob > 0.5)
-            forest_before = dw_before.select('trees').gt(0.5)
-            forest_after = dw_after.select('trees').gt(0.5)
+            # Forest Mask (Prob > threshold)
+            forest_before = dw_before.select('trees').gt(self.threshold)
+            forest_after = dw_after.select('trees').gt(self.threshold)
             
             # Loss = Was Forest AND Is Now NOT Forest
             loss = forest_before.And(forest_after.Not()).rename('loss')
@@ -183,84 +266,111 @@ class VegetationAnalyzer:
             print(f"Failed to generate loss tile: {e}")
             return ""
 
-    def calculate_forest_loss(self, gee_asset_before: str, gee_asset_after: str, region=None) -> dict:
+    def calculate_forest_loss(self, gee_asset_before: str, gee_asset_after: str, region=None, reduction: dict = None) -> dict:
         """
         Calculates forest loss in hectares between two dates using GEE.
+        Loss and initial forest area come from one pixelArea reduction and a single getInfo().
+        The returned dict carries the 'scale' the reduction ran at, and 'error' on failure.
         """
+        reduction = reduction or self.policy.params_for_scene()
         try:
-            img_before = ee.Image(gee_asset_before)
-            img_after = ee.Image(gee_asset_after)
-            
-            if not region:
-                region = img_after.geometry()
+            stats = self.loss_statistics(gee_asset_before, gee_asset_after, region=region, reduction=reduction)
+            return self.format_loss(stats.getInfo(), reduction['scale'])
 
-            # Get Dynamic World
-            def get_dw(img):
-                dw_col = ee.ImageCollection("GOOGLE/DYNAMICWORLD/V1") \
-                    .filterBounds(img.geometry()) \
-                    .filterDate(img.date(), img.date().advance(1, 'day')) \
-                    .filter(ee.Filter.eq('system:index', img.get('system:index')))
-                dw = ee.Image(dw_col.first())
-                if not dw:
-                    dw_col = ee.ImageCollection("GOOGLE/DYNAMICWORLD/V1") \
-                        .filterBounds(img.geometry()) \
-                        .filterDate(img.date().advance(-2, 'hour'), img.date().advance(2, 'hour'))
-                    dw = ee.Image(dw_col.first())
-                return dw
+        except Exception as e:
+            print(f"Failed to calculate forest loss: {e}")
+            return {'loss_ha': 0.0, 'loss_percentage': 0.0, 'scale': reduction['scale'], 'error': str(e)}
 
-            dw_before = get_dw(img_before)
-            dw_after = get_dw(img_after)
-            
-            if not dw_before or not dw_after:
-                return {'loss_ha': 0.0, 'loss_percentage': 0.0}
+    def calculate_loss_series(self, gee_asset_ids: list, region=None, reduction: dict = None) -> list:
+        """
+        Calculates forest loss for every consecutive pair of an ordered scene list in one round-trip.
 
-            # Forest Mask (Prob > 0.5)
-            forest_before = dw_before.select('trees').gt(0.5)
-            forest_after = dw_after.select('trees').gt(0.5)
-            
-            # Loss = Was Forest (1) AND Is Now NOT Forest (1)
-            loss = forest_before.And(forest_after.Not()).rename('loss')
-            
-            # Calculate Area using pixelArea()
-            area_image = loss.multiply(ee.Image.pixelArea())
-            
-            stats = area_image.reduceRegion(
-                reducer=ee.Reducer.sum(),
-                geometry=region,
-                scale=10,
-                maxPixels=1e12
-            )
-            
-            loss_sq_m = stats.get('loss').getInfo()
-            loss_ha = (loss_sq_m / 10000.0) if loss_sq_m else 0.0
-            
-            # Initial Forest Area for percentage
-            initial_area_image = forest_before.multiply(ee.Image.pixelArea())
-            initial_stats = initial_area_image.reduceRegion(
-                reducer=ee.Reducer.sum(),
-                geometry=region,
-                scale=10,
-                maxPixels=1e12
-            )
-            initial_forest_sq_m = initial_stats.get('trees').getInfo() if 'trees' in initial_stats.getInfo() else initial_stats.get('constant').getInfo()
-            # Dynamic World select('trees').gt(0.5) might return 'trees' or 'constant' in stats
-            
-            # Fallback for key name
-            if not initial_forest_sq_m:
-                 # Try finding any non-zero value in stats
-                 val_list = list(initial_stats.getInfo().values())
-                 initial_forest_sq_m = val_list[0] if val_list else 0.0
+        Args:
+            gee_asset_ids: Sentinel-2 Asset IDs ordered by acquisition date (oldest first).
+            region: ee.Geometry to reduce over. Defaults to the footprint of the latest scene.
+            reduction: reduceRegion parameters from ReductionPolicy.
 
-            loss_pct = (loss_ha / (initial_forest_sq_m/10000.0) * 100) if initial_forest_sq_m and initial_forest_sq_m > 0 else 0.0
+        Returns:
+            list: One dict per pair with 'before', 'after', 'loss_ha', 'loss_percentage' and 'scale'.
+        """
+        reduction = reduction or self.policy.params_for_scene()
+        if len(gee_asset_ids) < 2:
+            return []
+
+        try:
+            region = region if region else ee.Image(gee_asset_ids[-1]).geometry()
+
+            # Each scene's forest mask is built once and shared by the two pairs it belongs to
+            forests = [self._forest_mask(ee.Image(gee_id)) for gee_id in gee_asset_ids]
+            pair_stats = [
+                self._loss_areas(forests[i], forests[i + 1]).reduceRegion(
+                    reducer=ee.Reducer.sum(),
+                    geometry=region,
+                    **reduction
+                )
+                for i in range(len(forests) - 1)
+            ]
+
+            series = ee.List(pair_stats).getInfo()
+
+            results = []
+            for i, stats in enumerate(series):
+                result = self.format_loss(stats or {}, reduction['scale'])
+                result['before'] = gee_asset_ids[i]
+                result['after'] = gee_asset_ids[i + 1]
+                results.append(result)
+            return results
 
-            return {
-                'loss_ha': loss_ha,
-                'loss_percentage': loss_pct
-            }
-            
         except Exception as e:
-            print(f"Failed to calculate forest loss: {e}")
-            return {'loss_ha': 0.0, 'loss_percentage': 0.0}
+            print(f"Failed to calculate loss series: {e}")
+            return []
+
+    def loss_statistics(self, gee_asset_before: str, gee_asset_after: str, region=None, reduction: dict = None):
+        """
+        Builds the server-side loss statistics for a before/after pair without evaluating them.
+
+        Returns:
+            ee.Dictionary with 'loss' and 'forest' areas in square meters (forest = initial forest area).
+        """
+        reduction = reduction or self.policy.params_for_scene()
+        img_before = ee.Image(gee_asset_before)
+        img_after = ee.Image(gee_asset_after)
+        region = region if region else img_after.geometry()
+
+        areas = self._loss_areas(self._forest_mask(img_before), self._forest_mask(img_after))
+        return areas.reduceRegion(
+            reducer=ee.Reducer.sum(),
+            geometry=region,
+            **reduction
+        )
+
+    def _forest_mask(self, s2_image):
+        """
+        Forest Mask (Dynamic World tree probability > threshold) for a Sentinel-2 image.
+        """
+        return self._get_dynamic_world(s2_image).select('trees').gt(self.threshold)
+
+    def _loss_areas(self, forest_before, forest_after):
+        """
+        Two-band area image: 'loss' (was forest, is now not) and 'forest' (initial forest), in m2 per pixel.
+        Summing it gives both areas in one pixelArea reduction.
+        """
+        loss = forest_before.And(forest_after.Not())
+        return ee.Image.cat([loss.rename('loss'), forest_before.rename('forest')]).multiply(ee.Image.pixelArea())
+
+    def format_loss(self, stats: dict, scale: float) -> dict:
+        """
+        Converts evaluated loss statistics into the dict returned by calculate_forest_loss.
+        """
+        loss_sq_m = stats.get('loss') or 0.0
+        initial_forest_sq_m = stats.get('forest') or 0.0
+        loss_ha = loss_sq_m / 10000.0
+        loss_pct = (loss_ha / (initial_forest_sq_m / 10000.0) * 100) if initial_forest_sq_m > 0 else 0.0
+        return {
+            'loss_ha': loss_ha,
+            'loss_percentage': loss_pct,
+            'scale': scale
+        }
 
     def get_global_stats(self) -> dict:
         """
@@ -278,8 +388,8 @@ class VegetationAnalyzer:
             # Mean composite
             mosaic = dw_col.select('trees').mean()
             
-            # Binary mask (>0.5 prob)
-            forest_mask = mosaic.gt(0.5)
+            # Binary mask (> threshold prob)
+            forest_mask = mosaic.gt(self.threshold)
             
             # Reduce over global bounds at very coarse scale (10km) for speed
             stats = forest_mask.reduceRegion(
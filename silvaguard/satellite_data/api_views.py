@@ -1,34 +1,141 @@
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
+from django.utils.dateparse import parse_date
 from .models import AreaOfInterest, DeforestationAlert
+from .pagination import KeysetPaginator, page_size, parse_bbox, bbox_filter, date_range_filter
+from .versioning import versioned
+
+def _date_param(request, name):
+    """
+    Optional YYYY-MM-DD query parameter.
+    """
+    value = request.GET.get(name)
+    if not value:
+        return None
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(f"'{name}' must be a date (YYYY-MM-DD)")
+    return parsed
 
 @login_required
+@versioned('aois')
 def get_aois(request):
     """
-    Returns a list of all Areas of Interest as JSON.
+    Returns Areas of Interest as JSON, newest first, one page at a time.
+    Query parameters: bbox (west,south,east,north), start, end (created, YYYY-MM-DD),
+    limit and cursor (the 'next_cursor' of the previous page).
     """
-    aois = AreaOfInterest.objects.all()
+    try:
+        aois = AreaOfInterest.objects.all()
+        if request.GET.get('bbox'):
+            aois = aois.filter(bbox_filter('', parse_bbox(request.GET['bbox'])))
+        start, end = _date_param(request, 'start'), _date_param(request, 'end')
+        aois = aois.filter(date_range_filter('created_at', start, end))
+        page, next_cursor = KeysetPaginator(aois, 'created_at').page(
+            request.GET.get('cursor'), page_size(request.GET.get('limit'))
+        )
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
     data = []
-    for aoi in aois:
+    for aoi in page:
         data.append({
             'id': aoi.id,
             'name': aoi.name,
             'latitude': aoi.latitude,
             'longitude': aoi.longitude,
             'radius_km': aoi.radius_km,
+            'created_at': aoi.created_at.isoformat(),
         })
-    return JsonResponse({'status': 'success', 'data': data})
+    return JsonResponse({'status': 'success', 'data': data, 'next_cursor': next_cursor})
 
 @login_required
+@require_POST
+def import_aois(request):
+    """
+    Imports AOIs from an uploaded file ('file' field): GeoJSON, GeoJSON-seq or CSV.
+    Query parameters: format (default: from the file name), radius_km, duplicate_meters,
+    on_duplicate (skip or keep) and dry_run. Returns the import report.
+    """
+    from .imports import AOIImporter, detect_format, iter_records, text_stream
+
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'status': 'error', 'message': "Upload the file in a 'file' field"}, status=400)
+    try:
+        fmt = request.GET.get('format') or detect_format(upload.name)
+        importer = AOIImporter(
+            radius_km=float(request.GET['radius_km']) if request.GET.get('radius_km') else None,
+            duplicate_meters=float(request.GET['duplicate_meters']) if request.GET.get('duplicate_meters') else None,
+            on_duplicate=request.GET.get('on_duplicate', 'skip'),
+            dry_run=request.GET.get('dry_run') in ('1', 'true'),
+        )
+        report = importer.run(iter_records(text_stream(upload.file), fmt))
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse({'status': 'success', 'data': report})
+
+@login_required
+def area_stats(request):
+    """
+    Current forest cover of a circle (lat, lon, radius_km query parameters) without creating an AOI.
+    Answers 200 with the statistics, or 202 with status 'pending' when they take longer than the
+    latency budget; the computation continues and a retry is served from the cache.
+    """
+    from .adhoc import AreaStatsService
+
+    try:
+        lat = float(request.GET['lat'])
+        lon = float(request.GET['lon'])
+        radius_km = float(request.GET.get('radius_km', 1.0))
+    except (KeyError, ValueError):
+        return JsonResponse({'status': 'error', 'message': "lat and lon (and optionally radius_km) must be numbers"}, status=400)
+
+    service = AreaStatsService()
+    try:
+        answer = service.stats(lat, lon, radius_km)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
+    served = {'cached': answer['cached'], 'coalesced': answer['coalesced'], 'seconds': round(answer['seconds'], 3)}
+    if answer['state'] == 'pending':
+        response = JsonResponse(dict(served, status='pending', message="Still computing, retry shortly"), status=202)
+        response['Retry-After'] = str(max(1, int(service.budget // 2)))
+        return response
+    if answer['state'] == 'failed':
+        return JsonResponse(dict(served, status='error', message="No recent scene or no clear pixels for this area"), status=404)
+    return JsonResponse(dict(served, status='success', data=answer['result']))
+
+@login_required
+@versioned('alerts')
 def get_alerts(request):
     """
-    Returns a list of all active Deforestation Alerts as JSON.
+    Returns Deforestation Alerts as JSON, newest first, one page at a time.
+    Query parameters: aoi, bbox (west,south,east,north of the AOI center), start, end
+    (detected, YYYY-MM-DD), min_loss_ha, limit and cursor (the 'next_cursor' of the previous page).
     """
-    alerts = DeforestationAlert.objects.all().select_related('aoi')
+    try:
+        alerts = DeforestationAlert.objects.select_related('aoi')
+        if request.GET.get('aoi'):
+            alerts = alerts.filter(aoi_id=int(request.GET['aoi']))
+        if request.GET.get('bbox'):
+            alerts = alerts.filter(bbox_filter('aoi__', parse_bbox(request.GET['bbox'])))
+        start, end = _date_param(request, 'start'), _date_param(request, 'end')
+        alerts = alerts.filter(date_range_filter('detected_at', start, end))
+        if request.GET.get('min_loss_ha'):
+            alerts = alerts.filter(forest_loss_hectares__gte=float(request.GET['min_loss_ha']))
+        page, next_cursor = KeysetPaginator(alerts, 'detected_at').page(
+            request.GET.get('cursor'), page_size(request.GET.get('limit'))
+        )
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
     data = []
-    for alert in alerts:
+    for alert in page:
         data.append({
             'id': alert.id,
+            'aoi_id': alert.aoi_id,
             'aoi_name': alert.aoi.name,
             'lat': alert.aoi.latitude, # Simplifying: using AOI center for alert marker
             'lon': alert.aoi.longitude,
@@ -36,4 +143,53 @@ def get_alerts(request):
             'loss_pct': alert.loss_percentage,
             'date': alert.detected_at.strftime('%Y-%m-%d'),
         })
-    return JsonResponse({'status': 'success', 'data': data})
+    return JsonResponse({'status': 'success', 'data': data, 'next_cursor': next_cursor})
+
+@login_required
+def export_data(request, dataset, fmt):
+    """
+    Streams alerts, analyses or images as CSV, GeoJSON-seq or Parquet.
+    Query parameters: aoi, start, end (YYYY-MM-DD) and min_loss (hectares, alerts only).
+    """
+    from .exports import DataExporter, FORMATS
+
+    try:
+        start = _date_param(request, 'start')
+        end = _date_param(request, 'end')
+        exporter = DataExporter(
+            dataset,
+            aoi_id=int(request.GET['aoi']) if request.GET.get('aoi') else None,
+            start=start,
+            end=end,
+            min_loss=float(request.GET['min_loss']) if request.GET.get('min_loss') else None,
+        )
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format '{fmt}' (choose from {', '.join(FORMATS)})")
+        chunks = exporter.stream(fmt)
+    except (ValueError, RuntimeError) as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
+    content_type, extension = FORMATS[fmt]
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="silvaguard-{dataset}.{extension}"'
+    return response
+
+@login_required
+async def alert_stream(request):
+    """
+    Server-Sent Events stream of new alerts ('alert') and pulse progress ('pulse').
+    Reconnecting clients send Last-Event-ID and receive the events they missed.
+    Serve through ASGI (silvaguard.asgi) so idle connections do not hold a worker thread.
+    """
+    from .events import event_stream
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    response = StreamingHttpResponse(event_stream(last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no' # Disable proxy buffering (nginx)
+    return response
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SatelliteDataConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'satellite_data'
+
+    def ready(self):
+        from . import signals
+        signals.connect()
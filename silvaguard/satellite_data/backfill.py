@@ -0,0 +1,263 @@
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+
+def plan_job(aoi, start_date, end_date, chunk_days: int, max_cloud: float):
+    """
+    Returns the backfill job for an AOI and range, creating it and its chunks on first use.
+    An existing job (same AOI, range and chunk size) is returned as it is, to be resumed.
+    """
+    from .models import BackfillJob, BackfillChunk
+
+    with transaction.atomic():
+        job, created = BackfillJob.objects.get_or_create(
+            aoi=aoi, start_date=start_date, end_date=end_date, chunk_days=chunk_days,
+            defaults={'max_cloud': max_cloud}
+        )
+        if created:
+            chunks = []
+            cursor = start_date
+            while cursor < end_date:
+                chunk_end = min(cursor + datetime.timedelta(days=chunk_days), end_date)
+                chunks.append(BackfillChunk(job=job, start_date=cursor, end_date=chunk_end))
+                cursor = chunk_end
+            BackfillChunk.objects.bulk_create(chunks)
+    return job, created
+
+
+class BackfillRunner:
+    """
+    Runs a BackfillJob: scene discovery and analysis per chunk, then pairwise loss per chunk.
+
+    Both stages run chunks in parallel on `workers` threads; Earth Engine load is bounded by
+    the RequestQuota the caller installs around run(). Every finished stage is checkpointed on
+    its chunk, so a job interrupted at any point resumes where it stopped, and a failed chunk
+    is retried on the next run up to SILVAGUARD_BACKFILL_MAX_ATTEMPTS times.
+
+    The loss stage starts once every chunk is analyzed, since the first pair of a chunk
+    reaches back to the last scene of the previous one.
+    """
+
+    def __init__(self, job, orchestrator, workers: int = 4, progress=None):
+        from .leases import LeaseManager, default_worker_id
+        from .pipeline import PulsePipeline
+
+        self.job = job
+        self.orchestrator = orchestrator
+        self.workers = workers
+        self.progress = progress or print
+        self.max_attempts = getattr(settings, 'SILVAGUARD_BACKFILL_MAX_ATTEMPTS', 3)
+        self.scenes_per_chunk = getattr(settings, 'SILVAGUARD_BACKFILL_SCENES_PER_CHUNK', 100)
+        self.started = None
+        self.finished_this_run = {}
+        self.stage_started = {}
+        self.stage_seconds = {}
+        # Scenes are analyzed by the pulse's stages; backfill never uses export tasks
+        self.pipeline = PulsePipeline(
+            orchestrator, LeaseManager(owner=f"{default_worker_id()}:backfill-{job.pk}"),
+            days=None, max_cloud=job.max_cloud, use_batch=False
+        )
+
+    def run(self) -> dict:
+        from .models import BackfillJob, BackfillChunk
+
+        self.started = time.perf_counter()
+        self.finished_this_run = {'analysis': [], 'loss': []}
+
+        # Failed chunks get another try at the stage they failed in
+        retry = BackfillChunk.objects.filter(job=self.job, state=BackfillChunk.STATE_FAILED, attempts__lt=self.max_attempts)
+        retry.filter(analysis_seconds__isnull=True).update(state=BackfillChunk.STATE_PENDING)
+        retry.filter(analysis_seconds__isnull=False).update(state=BackfillChunk.STATE_ANALYZED)
+
+        self._run_stage('analysis', BackfillChunk.STATE_PENDING, self.analyze_chunk)
+        chunks = BackfillChunk.objects.filter(job=self.job)
+        if not chunks.exclude(state__in=[BackfillChunk.STATE_ANALYZED, BackfillChunk.STATE_DONE]).exists():
+            self._run_stage('loss', BackfillChunk.STATE_ANALYZED, self.loss_chunk)
+
+        totals = self.totals()
+        if totals['chunks_done'] == totals['chunks']:
+            self.job.state = BackfillJob.STATE_DONE
+            self.job.finished_at = timezone.now()
+        elif totals['chunks_failed']:
+            self.job.state = BackfillJob.STATE_FAILED
+        self.job.save(update_fields=['state', 'finished_at', 'updated_at'])
+        totals['seconds'] = time.perf_counter() - self.started
+        return totals
+
+    def _run_stage(self, stage: str, state: str, work):
+        from .models import BackfillChunk
+
+        todo = list(BackfillChunk.objects.filter(job=self.job, state=state).order_by('start_date'))
+        if not todo:
+            return
+        self.progress(f"{stage.capitalize()}: {len(todo)} chunks on {self.workers} workers")
+
+        self.stage_started[stage] = time.perf_counter()
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='backfill')
+        try:
+            futures = [pool.submit(self._guarded, work, chunk) for chunk in todo]
+            for future in as_completed(futures):
+                chunk = future.result()
+                self.finished_this_run[stage].append(chunk)
+                self.report(stage, chunk)
+        except KeyboardInterrupt:
+            # Let running chunks checkpoint, drop the queued ones; the next run resumes them
+            self.progress("Interrupted: finishing running chunks, run the command again to resume")
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
+        finally:
+            pool.shutdown(wait=True)
+        self.stage_seconds[stage] = time.perf_counter() - self.stage_started[stage]
+
+    def _guarded(self, work, chunk):
+        from .models import BackfillChunk
+        from .profiling import trace_thread
+
+        try:
+            with trace_thread():
+                work(chunk)
+            chunk.attempts = 0
+            chunk.last_error = ''
+        except Exception as e:
+            chunk.state = BackfillChunk.STATE_FAILED
+            chunk.attempts += 1
+            chunk.last_error = str(e)
+        finally:
+            chunk.save()
+            connection.close() # Pool threads keep no connection between chunks
+        return chunk
+
+    # --- Stages ---
+
+    def analyze_chunk(self, chunk):
+        """
+        Discovers the chunk's scenes and analyzes those not analyzed yet (the pulse's analyze and
+        tile stages). Scenes are left 'tiled'; the loss stage checks their pairs.
+        """
+        from .models import BackfillChunk, SatelliteImage
+
+        aoi = self.job.aoi
+        started = time.perf_counter()
+        start = _midnight(chunk.start_date)
+        end = _midnight(chunk.end_date)
+        metadata = self.orchestrator.s2_service.fetch_metadata(
+            aoi.latitude, aoi.longitude, start, end, self.job.max_cloud, limit=self.scenes_per_chunk, raise_errors=True
+        )
+        results = {'new_images': 0, 'exports_submitted': 0, 'alerts_created': 0}
+        image_ids = []
+        pending = 0
+        for meta in metadata:
+            sat_img, analysis = self.orchestrator.register_scene(aoi, meta, results)
+            self.pipeline.queue(sat_img, analysis)
+            image_ids.append(sat_img.pk)
+            if analysis.heatmap_file_path == 'GEE_PENDING':
+                pending += 1
+        self.pipeline.run_scenes(results, pk__in=image_ids)
+
+        unfinished = SatelliteImage.objects.filter(pk__in=image_ids, pipeline_state__in=[
+            SatelliteImage.PIPELINE_REGISTERED, SatelliteImage.PIPELINE_ANALYZED, SatelliteImage.PIPELINE_FAILED
+        ])
+        first = unfinished.order_by('acquisition_date').first()
+        if first is not None:
+            raise RuntimeError(f"{unfinished.count()} scenes not analyzed, first {first.image_id}: {first.pipeline_error}")
+
+        chunk.scenes_found = len(metadata)
+        chunk.scenes_analyzed = pending
+        chunk.analysis_seconds = time.perf_counter() - started
+        chunk.state = BackfillChunk.STATE_ANALYZED
+
+    def loss_chunk(self, chunk):
+        """
+        Checks the pairs whose later scene falls in the chunk and creates the missing alerts.
+        """
+        from .models import BackfillChunk
+
+        started = time.perf_counter()
+        results = self.orchestrator.backfill_alerts(
+            self.job.aoi, start=_midnight(chunk.start_date), end=_midnight(chunk.end_date)
+        )
+        if results['pairs_failed']:
+            raise RuntimeError(f"Loss series failed for {results['pairs_failed']} pairs")
+        chunk.pairs_checked = results['pairs_checked']
+        chunk.alerts_created = results['alerts_created']
+        chunk.loss_seconds = time.perf_counter() - started
+        chunk.state = BackfillChunk.STATE_DONE
+
+    # --- Progress ---
+
+    def totals(self) -> dict:
+        from django.db.models import Count, Q, Sum
+        from .models import BackfillChunk
+
+        return BackfillChunk.objects.filter(job=self.job).aggregate(
+            chunks=Count('id'),
+            chunks_analyzed=Count('id', filter=Q(state__in=[BackfillChunk.STATE_ANALYZED, BackfillChunk.STATE_DONE])),
+            chunks_done=Count('id', filter=Q(state=BackfillChunk.STATE_DONE)),
+            chunks_failed=Count('id', filter=Q(state=BackfillChunk.STATE_FAILED)),
+            scenes_found=Sum('scenes_found', default=0),
+            scenes_analyzed=Sum('scenes_analyzed', default=0),
+            pairs_checked=Sum('pairs_checked', default=0),
+            alerts_created=Sum('alerts_created', default=0),
+        )
+
+    def eta_seconds(self) -> float:
+        """
+        Estimated time left from this run's measured throughput: chunks finished per second of
+        each stage's wall time. The loss stage borrows the analysis throughput until it has its own.
+        """
+        from .models import BackfillChunk
+
+        rates = {}
+        for stage in ('analysis', 'loss'):
+            finished = [c for c in self.finished_this_run.get(stage, []) if c.state != BackfillChunk.STATE_FAILED]
+            if stage not in self.stage_started or not finished:
+                continue
+            wall = self.stage_seconds.get(stage, time.perf_counter() - self.stage_started[stage])
+            rates[stage] = len(finished) / max(wall, 1e-6)
+        if not rates:
+            return None
+        rates.setdefault('loss', rates.get('analysis'))
+        rates.setdefault('analysis', rates['loss'])
+
+        chunks = BackfillChunk.objects.filter(job=self.job)
+        analysis_left = chunks.filter(state__in=[BackfillChunk.STATE_PENDING, BackfillChunk.STATE_FAILED]).count()
+        loss_left = chunks.exclude(state=BackfillChunk.STATE_DONE).count()
+        return analysis_left / rates['analysis'] + loss_left / rates['loss']
+
+    def report(self, stage: str, chunk):
+        from .models import BackfillChunk
+
+        totals = self.totals()
+        eta = self.eta_seconds()
+        if chunk.state == BackfillChunk.STATE_FAILED:
+            detail = f"FAILED (attempt {chunk.attempts}): {chunk.last_error}"
+        elif stage == 'analysis':
+            detail = f"{chunk.scenes_found} scenes, {chunk.scenes_analyzed} analyzed in {chunk.analysis_seconds:.1f}s"
+        else:
+            detail = f"{chunk.pairs_checked} pairs, {chunk.alerts_created} alerts in {chunk.loss_seconds:.1f}s"
+        done = totals['chunks_analyzed'] if stage == 'analysis' else totals['chunks_done']
+        self.progress(
+            f"  [{stage} {done}/{totals['chunks']}] {chunk.start_date} - {chunk.end_date}: {detail}"
+            f" | ETA {format_duration(eta)}"
+        )
+
+
+def format_duration(seconds) -> str:
+    if seconds is None:
+        return "unknown"
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m"
+    if minutes:
+        return f"{minutes}m{seconds:02d}s"
+    return f"{seconds}s"
+
+
+def _midnight(date) -> datetime.datetime:
+    return datetime.datetime.combine(date, datetime.time.min, tzinfo=datetime.timezone.utc)
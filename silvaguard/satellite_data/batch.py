@@ -0,0 +1,314 @@
+import ee
+import math
+import uuid
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+# Earth Engine task states mapped onto ExportTask states
+EE_STATE_MAP = {
+    'UNSUBMITTED': 'SUBMITTED',
+    'READY': 'SUBMITTED',
+    'RUNNING': 'RUNNING',
+    'COMPLETED': 'COMPLETED',
+    'SUCCEEDED': 'COMPLETED',
+    'FAILED': 'FAILED',
+    'CANCEL_REQUESTED': 'FAILED',
+    'CANCELLED': 'FAILED',
+}
+
+
+class EarthEngineTaskClient:
+    """
+    Submits and tracks table exports through ee.batch.
+    Results are exported to an Earth Engine table asset and read back once finished.
+    """
+
+    def submit(self, collection, description: str, asset_id: str) -> str:
+        task = ee.batch.Export.table.toAsset(collection=collection, description=description, assetId=asset_id)
+        task.start()
+        return task.id
+
+    def status(self, task_id: str) -> dict:
+        statuses = ee.data.getTaskStatus(task_id)
+        status = statuses[0] if statuses else {}
+        return {'state': status.get('state', 'UNKNOWN'), 'error': status.get('error_message', '')}
+
+    def fetch(self, asset_id: str) -> list:
+        info = ee.FeatureCollection(asset_id).getInfo()
+        return [feature.get('properties', {}) for feature in info.get('features', [])]
+
+    def delete(self, asset_id: str):
+        ee.data.deleteAsset(asset_id)
+
+
+class LocalTaskClient:
+    """
+    In-process stand-in for EarthEngineTaskClient, used in tests and offline runs.
+    Tasks complete on their first poll and return the rows registered with set_result().
+    """
+
+    def __init__(self):
+        self.tasks = {}
+        self.results = {}
+        self.errors = {}
+
+    def submit(self, collection, description: str, asset_id: str) -> str:
+        task_id = f"LOCAL_{uuid.uuid4().hex[:16].upper()}"
+        self.tasks[task_id] = {'description': description, 'asset_id': asset_id, 'collection': collection}
+        return task_id
+
+    def set_result(self, asset_id: str, rows: list = None, error: str = None):
+        if error:
+            self.errors[asset_id] = error
+        else:
+            self.results[asset_id] = rows or []
+
+    def status(self, task_id: str) -> dict:
+        task = self.tasks.get(task_id)
+        if task is None:
+            return {'state': 'FAILED', 'error': f"Unknown task {task_id}"}
+        if task['asset_id'] in self.errors:
+            return {'state': 'FAILED', 'error': self.errors[task['asset_id']]}
+        return {'state': 'COMPLETED', 'error': ''}
+
+    def fetch(self, asset_id: str) -> list:
+        return self.results.get(asset_id, [])
+
+    def delete(self, asset_id: str):
+        self.results.pop(asset_id, None)
+
+
+_task_clients = {}
+
+def get_task_client():
+    """
+    Returns the task client configured by SILVAGUARD_TASK_CLIENT (one shared instance per class).
+    """
+    path = getattr(settings, 'SILVAGUARD_TASK_CLIENT', 'satellite_data.batch.EarthEngineTaskClient')
+    if path not in _task_clients:
+        _task_clients[path] = import_string(path)()
+    return _task_clients[path]
+
+
+class BatchExportService:
+    """
+    Runs AOI analyses and loss comparisons as Earth Engine export tasks instead of
+    interactive getInfo() calls, and ingests the finished tables.
+    """
+
+    def __init__(self, analyzer, client=None):
+        self.analyzer = analyzer
+        self.client = client or get_task_client()
+        self.asset_root = getattr(settings, 'SILVAGUARD_EXPORT_ASSET_ROOT', '')
+        self.area_threshold_km2 = getattr(settings, 'SILVAGUARD_BATCH_AREA_KM2', 2500.0)
+        self.max_attempts = getattr(settings, 'SILVAGUARD_EXPORT_MAX_ATTEMPTS', 3)
+
+    def is_enabled_for(self, aoi) -> bool:
+        """
+        Batch mode is used for AOIs larger than SILVAGUARD_BATCH_AREA_KM2 when an export asset root is configured.
+        """
+        if not self.asset_root:
+            return False
+        return math.pi * aoi.radius_km ** 2 >= self.area_threshold_km2
+
+    def _may_submit(self, tasks, label: str) -> bool:
+        """
+        False while an export of the same work is pending, or once max_attempts of them failed.
+        """
+        from .models import ExportTask
+
+        if tasks.exclude(state=ExportTask.STATE_FAILED).exists():
+            return False
+        if tasks.count() >= self.max_attempts:
+            print(f"  [Export Abandoned] {label}: {self.max_attempts} export tasks failed")
+            return False
+        return True
+
+    def _asset_id(self, kind: str, key: str) -> str:
+        stamp = timezone.now().strftime('%Y%m%d%H%M%S')
+        return f"{self.asset_root.rstrip('/')}/silvaguard_{kind}_{key}_{stamp}"
+
+    def submit_analysis(self, aoi, analysis, gee_asset_id: str, region, reduction: dict):
+        """
+        Submits an export for a single scene analysis unless one is already pending
+        or SILVAGUARD_EXPORT_MAX_ATTEMPTS of them failed.
+
+        Returns:
+            ExportTask or None if nothing was submitted.
+        """
+        from .models import ExportTask
+
+        if not self._may_submit(ExportTask.objects.filter(analysis=analysis), f"Analysis {analysis.pk}"):
+            return None
+
+        stats = self.analyzer.analysis_statistics(gee_asset_id, region, reduction)
+        if stats is None:
+            return None
+
+        collection = ee.FeatureCollection([ee.Feature(None, stats)])
+        asset_id = self._asset_id(ExportTask.KIND_ANALYSIS, str(analysis.pk))
+        task_id = self.client.submit(collection, f"silvaguard_analysis_{analysis.pk}", asset_id)
+
+        return ExportTask.objects.create(
+            task_id=task_id,
+            kind=ExportTask.KIND_ANALYSIS,
+            aoi=aoi,
+            analysis=analysis,
+            asset_id=asset_id,
+            reduction_scale=reduction['scale']
+        )
+
+    def submit_loss(self, aoi, analysis_before, analysis_after, region, reduction: dict):
+        """
+        Submits an export for a before/after loss comparison unless one is already pending
+        or SILVAGUARD_EXPORT_MAX_ATTEMPTS of them failed.
+
+        Returns:
+            ExportTask or None if nothing was submitted.
+        """
+        from .models import ExportTask
+
+        tasks = ExportTask.objects.filter(analysis_before=analysis_before, analysis_after=analysis_after)
+        if not self._may_submit(tasks, f"Loss {analysis_before.pk} vs {analysis_after.pk}"):
+            return None
+
+        stats = self.analyzer.loss_statistics(
+            analysis_before.processed_image.satellite_image.gee_id,
+            analysis_after.processed_image.satellite_image.gee_id,
+            region=region,
+            reduction=reduction
+        )
+        collection = ee.FeatureCollection([ee.Feature(None, stats)])
+        key = f"{analysis_before.pk}_{analysis_after.pk}"
+        asset_id = self._asset_id(ExportTask.KIND_LOSS, key)
+        task_id = self.client.submit(collection, f"silvaguard_loss_{key}", asset_id)
+
+        return ExportTask.objects.create(
+            task_id=task_id,
+            kind=ExportTask.KIND_LOSS,
+            aoi=aoi,
+            analysis_before=analysis_before,
+            analysis_after=analysis_after,
+            asset_id=asset_id,
+            reduction_scale=reduction['scale']
+        )
+
+    def poll(self) -> dict:
+        """
+        Refreshes every unfinished task and ingests the completed ones.
+        """
+        from .models import ExportTask
+
+        results = {'polled': 0, 'ingested': 0, 'failed': 0, 'pending': 0, 'alerts_created': 0}
+        open_states = [ExportTask.STATE_SUBMITTED, ExportTask.STATE_RUNNING, ExportTask.STATE_COMPLETED]
+
+        for task in ExportTask.objects.filter(state__in=open_states).order_by('submitted_at'):
+            results['polled'] += 1
+
+            if task.state != ExportTask.STATE_COMPLETED:
+                status = self.client.status(task.task_id)
+                task.state = EE_STATE_MAP.get(status['state'], task.state)
+                task.error = status.get('error') or ''
+                task.save(update_fields=['state', 'error', 'updated_at'])
+
+            if task.state == ExportTask.STATE_FAILED:
+                results['failed'] += 1
+                print(f"  [Export Failed] {task.task_id}: {task.error}")
+            elif task.state == ExportTask.STATE_COMPLETED:
+                try:
+                    alert_created = self.ingest(task)
+                except Exception as e:
+                    print(f"  [Ingest Failed] {task.task_id}: {e}")
+                    task.error = str(e)
+                    task.save(update_fields=['error', 'updated_at'])
+                    results['pending'] += 1
+                    continue
+                if task.state == ExportTask.STATE_FAILED:
+                    results['failed'] += 1
+                else:
+                    results['ingested'] += 1
+                    results['alerts_created'] += int(alert_created)
+            else:
+                results['pending'] += 1
+
+        return results
+
+    def ingest(self, task) -> bool:
+        """
+        Writes a completed export back into the database. The rows and the task state are
+        written in one transaction, so a crash never leaves an ingested result on an open task.
+        An empty table marks the task failed (it is submitted again by the next pulse, up to
+        SILVAGUARD_EXPORT_MAX_ATTEMPTS tasks) rather than storing it as a 0% analysis.
+
+        Returns:
+            bool: True if a DeforestationAlert was created.
+        """
+        from .models import ExportTask, DeforestationAlert
+        from .reports import AlertReportBuilder
+
+        rows = self.client.fetch(task.asset_id)
+        alert = None
+        alert_created = False
+
+        if not rows:
+            task.state = ExportTask.STATE_FAILED
+            task.error = "Export table is empty"
+            task.save(update_fields=['state', 'error', 'updated_at'])
+            print(f"  [Export Failed] {task.task_id}: {task.error}")
+
+        elif task.kind == ExportTask.KIND_ANALYSIS:
+            result = self.analyzer.format_analysis(rows[0], task.reduction_scale)
+            gee_id = task.analysis.processed_image.satellite_image.gee_id
+            heatmap = self.analyzer.generate_heatmap(gee_id)
+            analysis = task.analysis
+            analysis.mean_ndvi = result['mean_ndvi']
+            analysis.forest_cover_percentage = result['forest_percentage']
+            analysis.tree_histogram = result['histogram'] or None
+            analysis.forest_threshold = result['threshold']
+            analysis.reduction_scale = result['scale']
+            analysis.heatmap_file_path = heatmap
+            with transaction.atomic():
+                analysis.save()
+                self._mark_ingested(task)
+            print(f"  [Ingested] {gee_id} Forest Cover: {analysis.forest_cover_percentage:.1f}%")
+
+        elif task.kind == ExportTask.KIND_LOSS:
+            comparison = self.analyzer.format_loss(rows[0], task.reduction_scale)
+            loss_tile = None
+            if comparison['loss_ha'] > 0.1: # Threshold for alert
+                gee_before = task.analysis_before.processed_image.satellite_image.gee_id
+                gee_after = task.analysis_after.processed_image.satellite_image.gee_id
+                loss_tile = self.analyzer.get_loss_tile_url(gee_before, gee_after)
+            with transaction.atomic():
+                if loss_tile is not None:
+                    alert, alert_created = DeforestationAlert.objects.get_or_create(
+                        analysis_before=task.analysis_before,
+                        analysis_after=task.analysis_after,
+                        defaults={
+                            'aoi': task.aoi,
+                            'forest_loss_hectares': comparison['loss_ha'],
+                            'loss_percentage': comparison['loss_percentage'],
+                            'reduction_scale': comparison['scale'],
+                            'loss_map_path': loss_tile
+                        }
+                    )
+                self._mark_ingested(task)
+            if alert_created:
+                AlertReportBuilder().build(alert)
+                print(f"  [ALERT] {alert.forest_loss_hectares:.2f} ha lost!")
+
+        try:
+            self.client.delete(task.asset_id)
+        except Exception as e:
+            print(f"  [Cleanup] Could not delete {task.asset_id}: {e}")
+
+        return alert_created
+
+    def _mark_ingested(self, task):
+        from .models import ExportTask
+
+        task.state = ExportTask.STATE_INGESTED
+        task.error = ''
+        task.save(update_fields=['state', 'error', 'updated_at'])
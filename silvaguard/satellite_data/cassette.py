@@ -0,0 +1,341 @@
+import base64
+import datetime
+import gzip
+import hashlib
+import io
+import json
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+import ee
+import numpy as np
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+CASSETTE_VERSION = 2
+
+# ee.data functions through which the pulse reaches Earth Engine (getInfo() goes through computeValue,
+# Export tasks through exportTable/exportImage)
+INTERCEPTED = (
+    'computeValue',
+    'computePixels',
+    'getMapId',
+    'getTaskStatus',
+    'exportTable',
+    'exportImage',
+    'deleteAsset',
+)
+
+# Task ids are random per run and never part of the request identity; replay maps the ids
+# of this run to the recorded ones, so later status calls find their recorded responses
+_VOLATILE_ARGS = {'exportTable': 0, 'exportImage': 0}
+
+# Date strings in a request (the pulse's date window follows the wall clock), replaced in the date-free fingerprint
+_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?(Z|[+-]\d{2}:?\d{2})?$')
+
+_active = None
+
+
+def active_cassette():
+    """
+    The cassette currently installed in this process, or None.
+    """
+    return _active
+
+
+class EECassette:
+    """
+    Records Earth Engine requests and responses to a file, or replays them offline.
+
+    While installed, the ee.data functions in INTERCEPTED are wrapped. In record mode each
+    call goes to Earth Engine and its request fingerprint, response (or error) and latency
+    are appended to the cassette; the algorithm catalogue fetched by ee.Initialize() is
+    saved too. In replay mode no network is used at all: Earth Engine is initialized from
+    the saved catalogue and every call is answered from the cassette after sleeping for its
+    recorded latency times latency_scale (0 answers immediately).
+
+    Replay first looks for an unused response with the same fingerprint, then falls back to
+    an unused response with the same fingerprint once date strings are blanked out, which
+    covers requests that embed the wall clock (the pulse's date window). Both are keyed on
+    the request, so concurrent workers get their own responses whatever order they call in.
+    The number of fallbacks is reported so a changed call pattern is visible; strict replay
+    allows exact matches only.
+
+    Usage:
+        with EECassette('pulse.json.gz', RECORD) as cassette:
+            results = SilvaGuardOrchestrator().run_pulse()
+            cassette.meta['results'] = results
+    """
+
+    def __init__(self, path: str, mode: str, latency_scale: float = 1.0, strict: bool = False):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode '{mode}'")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.strict = strict
+        self.meta = {}
+        self.recorded_meta = {}
+        self.algorithms = None
+        self.interactions = []
+        self.lock = threading.Lock()
+        self.originals = {}
+        self.stats = {'calls': Counter(), 'errors': Counter(), 'fallbacks': 0, 'misses': 0,
+                      'recorded_seconds': 0.0, 'waited_seconds': 0.0}
+        self.by_key = defaultdict(deque)
+        self.by_dateless_key = defaultdict(deque)
+        self.used = set()
+        self.task_ids = {}
+
+    # --- Installation ---
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.uninstall()
+        if self.mode == RECORD:
+            self.save()
+        return False
+
+    def install(self):
+        global _active
+        if _active is not None:
+            raise RuntimeError("An Earth Engine cassette is already installed")
+        if self.mode == REPLAY:
+            self.load()
+
+        for name in INTERCEPTED:
+            self.originals[name] = getattr(ee.data, name)
+            setattr(ee.data, name, self._wrap(name))
+        self.originals['getAlgorithms'] = ee.data.getAlgorithms
+        setattr(ee.data, 'getAlgorithms', self._get_algorithms)
+        _active = self
+
+        if self.mode == REPLAY:
+            self._initialize_offline()
+
+    def uninstall(self):
+        global _active
+        for name, function in self.originals.items():
+            setattr(ee.data, name, function)
+        self.originals = {}
+        _active = None
+
+    def _initialize_offline(self):
+        """
+        Initializes the ee client library without credentials or network: the API
+        discovery document is skipped (every call is answered locally) and the
+        algorithm catalogue comes from the cassette.
+        """
+        from unittest import mock
+        from google.auth.credentials import AnonymousCredentials
+
+        with mock.patch.object(ee.data, '_install_cloud_api_resource', lambda: None):
+            ee.Initialize(credentials=AnonymousCredentials(), project='silvaguard-replay')
+
+    def _get_algorithms(self):
+        if self.mode == REPLAY:
+            return self.algorithms
+        algorithms = self.originals['getAlgorithms']()
+        if self.algorithms is None:
+            self.algorithms = algorithms
+        return algorithms
+
+    # --- Calls ---
+
+    def _wrap(self, name):
+        def call(*args, **kwargs):
+            if self.mode == RECORD:
+                return self._record(name, args, kwargs)
+            return self._replay(name, args, kwargs)
+        call.__name__ = name
+        return call
+
+    def _record(self, name, args, kwargs):
+        key = fingerprint(name, args, kwargs)
+        dateless_key = fingerprint(name, args, kwargs, dates=False)
+        started = time.perf_counter()
+        try:
+            response = self.originals[name](*args, **kwargs)
+            error = None
+        except Exception as e:
+            response, error = None, e
+        seconds = time.perf_counter() - started
+
+        interaction = {'function': name, 'key': key, 'dateless_key': dateless_key, 'seconds': round(seconds, 4)}
+        if name in _VOLATILE_ARGS and len(args) > _VOLATILE_ARGS[name]:
+            interaction['task_id'] = args[_VOLATILE_ARGS[name]]
+        if error is None:
+            interaction['response'] = encode_response(name, response)
+        else:
+            interaction['error'] = {'type': type(error).__name__, 'message': str(error)}
+        with self.lock:
+            self.interactions.append(interaction)
+            self._count(name, seconds, error is not None)
+
+        if error is not None:
+            raise error
+        return response
+
+    def _replay(self, name, args, kwargs):
+        with self.lock:
+            recorded_args = _replace_strings(args, self.task_ids) if self.task_ids else args
+        key = fingerprint(name, recorded_args, kwargs)
+        dateless_key = None if self.strict else fingerprint(name, recorded_args, kwargs, dates=False)
+        with self.lock:
+            index = self._take(self.by_key[key])
+            if index is None:
+                index = self._take(self.by_dateless_key[dateless_key]) if dateless_key else None
+                if index is None:
+                    self.stats['misses'] += 1
+                    raise ee.EEException(f"Cassette {self.path} has no recorded {name} response left")
+                self.stats['fallbacks'] += 1
+            self.used.add(index)
+            interaction = self.interactions[index]
+            if 'task_id' in interaction:
+                self.task_ids[args[_VOLATILE_ARGS[name]]] = interaction['task_id']
+            self._count(name, interaction['seconds'], 'error' in interaction)
+
+        delay = interaction['seconds'] * self.latency_scale
+        if delay > 0:
+            time.sleep(delay)
+            with self.lock:
+                self.stats['waited_seconds'] += delay
+
+        if 'error' in interaction:
+            raise ee.EEException(interaction['error']['message'])
+        return decode_response(name, interaction['response'])
+
+    def _take(self, queue):
+        while queue:
+            index = queue.popleft()
+            if index not in self.used:
+                return index
+        return None
+
+    def _count(self, name, seconds, failed):
+        self.stats['calls'][name] += 1
+        self.stats['recorded_seconds'] += seconds
+        if failed:
+            self.stats['errors'][name] += 1
+
+    # --- Persistence ---
+
+    def save(self):
+        document = {
+            'version': CASSETTE_VERSION,
+            'recorded_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'meta': self.meta,
+            'algorithms': self.algorithms,
+            'interactions': self.interactions,
+        }
+        opener = gzip.open if self.path.endswith('.gz') else open
+        with opener(self.path, 'wt', encoding='utf-8') as f:
+            json.dump(document, f, default=str)
+
+    def load(self):
+        opener = gzip.open if self.path.endswith('.gz') else open
+        with opener(self.path, 'rt', encoding='utf-8') as f:
+            document = json.load(f)
+        if document.get('version') != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette version {document.get('version')}, record it again")
+        if not document.get('algorithms'):
+            raise ValueError("Cassette has no Earth Engine algorithm catalogue (was Earth Engine initialized while recording?)")
+
+        self.recorded_meta = document.get('meta') or {}
+        self.algorithms = document['algorithms']
+        self.interactions = document['interactions']
+        for index, interaction in enumerate(self.interactions):
+            self.by_key[interaction['key']].append(index)
+            self.by_dateless_key[interaction['dateless_key']].append(index)
+
+    def summary(self) -> dict:
+        """
+        Call counts and latency totals of this run, plus what is left unused when replaying.
+        """
+        summary = {
+            'mode': self.mode,
+            'calls': dict(self.stats['calls']),
+            'errors': dict(self.stats['errors']),
+            'recorded_seconds': round(self.stats['recorded_seconds'], 3),
+        }
+        if self.mode == REPLAY:
+            summary.update({
+                'waited_seconds': round(self.stats['waited_seconds'], 3),
+                'fallbacks': self.stats['fallbacks'],
+                'misses': self.stats['misses'],
+                'unused': len(self.interactions) - len(self.used),
+            })
+        return summary
+
+
+def fingerprint(name: str, args, kwargs, dates: bool = True) -> str:
+    """
+    Stable hash of a request: ee objects are reduced to their serialized expression graph.
+    With dates=False every date string in it is replaced by a placeholder.
+    """
+    args = list(args)
+    if name in _VOLATILE_ARGS and len(args) > _VOLATILE_ARGS[name]:
+        args.pop(_VOLATILE_ARGS[name])
+    kwargs = {k: v for k, v in kwargs.items() if k != 'request_id'}
+    request = [name, _canonical(args), _canonical(kwargs)]
+    if not dates:
+        request = _without_dates(request)
+    payload = json.dumps(request, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _canonical(value):
+    if isinstance(value, ee.ComputedObject):
+        return ee.serializer.encode(value, for_cloud_api=True)
+    if isinstance(value, dict):
+        return {k: _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def _without_dates(value):
+    if isinstance(value, str):
+        return '<date>' if _DATE.match(value) else value
+    if isinstance(value, dict):
+        return {k: _without_dates(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_without_dates(v) for v in value]
+    return value
+
+
+def _replace_strings(value, replacements: dict):
+    if isinstance(value, str):
+        return replacements.get(value, value)
+    if isinstance(value, (list, tuple)):
+        return [_replace_strings(v, replacements) for v in value]
+    return value
+
+
+def encode_response(name: str, response):
+    """
+    JSON-safe form of a response: NumPy arrays (computePixels) as .npy bytes,
+    map ids without their live TileFetcher/ee objects.
+    """
+    if name == 'getMapId':
+        return {'mapid': response['mapid'], 'token': response.get('token', ''),
+                'url_format': response['tile_fetcher'].url_format}
+    if isinstance(response, np.ndarray):
+        buffer = io.BytesIO()
+        np.save(buffer, response, allow_pickle=False)
+        return {'__ndarray__': base64.b64encode(buffer.getvalue()).decode('ascii')}
+    return response
+
+
+def decode_response(name: str, response):
+    if name == 'getMapId':
+        return {'mapid': response['mapid'], 'token': response['token'],
+                'tile_fetcher': ee.data.TileFetcher(response['url_format'], map_name=response['mapid'])}
+    if isinstance(response, dict) and '__ndarray__' in response:
+        return np.load(io.BytesIO(base64.b64decode(response['__ndarray__'])), allow_pickle=False)
+    return response
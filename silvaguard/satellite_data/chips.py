@@ -0,0 +1,358 @@
+import json
+import math
+import os
+import threading
+import time
+import ee
+import numpy as np
+from django.conf import settings
+from .detection import DeforestationDetector
+from . import histograms
+
+# Tree probability is stored as uint8: 0..254 maps to 0.0..1.0, 255 marks no data
+QUANT_MAX = 254
+NODATA = 255
+
+METERS_PER_DEGREE = 111320.0
+
+
+class ChipStore:
+    """
+    On-disk store of Dynamic World 'trees' probability chips, one per SatelliteImage.
+
+    Each chip covers its AOI footprint on a fixed per-AOI grid (so chips of the same
+    AOI align pixel for pixel), is quantized to uint8 and saved as a .npy file that is
+    opened memory-mapped. A JSON sidecar keeps the georeference. The least recently
+    used chips are evicted once the store exceeds SILVAGUARD_CHIP_STORE_MAX_BYTES.
+
+    With SILVAGUARD_CHIP_STORE_BANDS, the Sentinel-2 bands the spectral indices need are
+    stored next to the chip (<pk>.bands.npz, raw uint16 reflectance, 0 where clouded), so
+    index statistics are computed locally (index_statistics) instead of by a reduction.
+
+    Reads do not write to disk: they are recorded per process and applied to the chips'
+    mtimes (their LRU position) by the next eviction scan.
+    """
+
+    # Chip paths read since the last eviction scan in this process -> time of the last read
+    _used = {}
+    _used_lock = threading.Lock()
+
+    def __init__(self, root=None, max_bytes: int = None, max_dimension: int = None):
+        self.root = str(root or getattr(settings, 'SILVAGUARD_CHIP_STORE_DIR', os.path.join(settings.BASE_DIR, 'chips')))
+        self.max_bytes = max_bytes or getattr(settings, 'SILVAGUARD_CHIP_STORE_MAX_BYTES', 2 * 1024 ** 3)
+        self.max_dimension = max_dimension or getattr(settings, 'SILVAGUARD_CHIP_MAX_DIMENSION', 4096)
+        self.store_bands = getattr(settings, 'SILVAGUARD_CHIP_STORE_BANDS', False)
+        self.detector = DeforestationDetector()
+        self.threshold = getattr(settings, 'SILVAGUARD_FOREST_THRESHOLD', 0.5)
+
+    # --- Grid & paths ---
+
+    def grid_for_aoi(self, aoi) -> dict:
+        """
+        Returns the EPSG:4326 pixel grid covering an AOI's bounding box.
+        The pixel size is 10 m, coarsened if the chip would exceed max_dimension pixels per side.
+        """
+        diameter_m = 2 * aoi.radius_km * 1000.0
+        scale_m = 10.0
+        while diameter_m / scale_m > self.max_dimension:
+            scale_m += 10.0
+
+        size = int(math.ceil(diameter_m / scale_m))
+        cos_lat = max(math.cos(math.radians(aoi.latitude)), 1e-6)
+        dy = scale_m / METERS_PER_DEGREE
+        dx = scale_m / (METERS_PER_DEGREE * cos_lat)
+
+        return {
+            'crs': 'EPSG:4326',
+            'width': size,
+            'height': size,
+            'scale_m': scale_m,
+            # [west, pixel width, north, pixel height] in degrees
+            'transform': [aoi.longitude - dx * size / 2.0, dx, aoi.latitude + dy * size / 2.0, dy],
+            'center': [aoi.latitude, aoi.longitude],
+            'radius_km': aoi.radius_km,
+        }
+
+    def _paths(self, satellite_image):
+        base = os.path.join(self.root, str(satellite_image.pk))
+        return base + '.npy', base + '.json'
+
+    def _bands_path(self, satellite_image) -> str:
+        return os.path.join(self.root, f"{satellite_image.pk}.bands.npz")
+
+    def has(self, satellite_image) -> bool:
+        data_path, meta_path = self._paths(satellite_image)
+        return os.path.exists(data_path) and os.path.exists(meta_path)
+
+    def has_bands(self, satellite_image) -> bool:
+        return self.has(satellite_image) and os.path.exists(self._bands_path(satellite_image))
+
+    # --- Download & storage ---
+
+    def fetch(self, satellite_image, analyzer) -> bool:
+        """
+        Downloads the chip for a scene once (no-op if already stored).
+
+        Returns:
+            bool: True if the chip is available locally afterwards.
+        """
+        if self.has(satellite_image) and (not self.store_bands or self.has_bands(satellite_image)):
+            return True
+        if not satellite_image.gee_id:
+            return False
+
+        try:
+            grid = self.grid_for_aoi(satellite_image.aoi)
+            if not self.has(satellite_image):
+                trees = analyzer.tree_probability(satellite_image.gee_id)
+                # Quantize server-side so only one byte per pixel crosses the network
+                quantized = trees.multiply(QUANT_MAX).round().unmask(NODATA).toUint8().rename('trees')
+                pixels = self._compute_pixels(quantized, grid)
+                self.store(satellite_image, np.asarray(pixels['trees'], dtype=np.uint8), grid)
+            if self.store_bands:
+                self.fetch_bands(satellite_image, analyzer.indices, grid)
+            return True
+
+        except Exception as e:
+            print(f"Failed to download chip for {satellite_image.gee_id}: {e}")
+            return False
+
+    def fetch_bands(self, satellite_image, engine, grid: dict):
+        """
+        Downloads the Sentinel-2 bands the index engine needs on the chip's grid.
+        """
+        from .indices import SENTINEL2_BANDS, SCL_MASKED_CLASSES
+
+        s2_image = ee.Image(satellite_image.gee_id)
+        clear = s2_image.select('SCL').remap(SCL_MASKED_CLASSES, [0] * len(SCL_MASKED_CLASSES), 1)
+        variables = engine.variables()
+        bands = s2_image.select([SENTINEL2_BANDS[v] for v in variables], variables) \
+            .updateMask(clear).unmask(0).toUint16()
+        pixels = self._compute_pixels(bands, grid)
+        self.store_bands_of(satellite_image, {v: np.asarray(pixels[v], dtype=np.uint16) for v in variables})
+
+    def _compute_pixels(self, expression, grid: dict):
+        west, dx, north, dy = grid['transform']
+        return ee.data.computePixels({
+            'expression': expression,
+            'fileFormat': 'NUMPY_NDARRAY',
+            'grid': {
+                'dimensions': {'width': grid['width'], 'height': grid['height']},
+                'affineTransform': {
+                    'scaleX': dx, 'shearX': 0, 'translateX': west,
+                    'shearY': 0, 'scaleY': -dy, 'translateY': north,
+                },
+                'crsCode': grid['crs'],
+            },
+        })
+
+    def store(self, satellite_image, data: np.ndarray, grid: dict):
+        """
+        Writes a quantized chip and its georeference, then enforces the size limit.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        data_path, meta_path = self._paths(satellite_image)
+
+        tmp_path = data_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(data, dtype=np.uint8))
+        os.replace(tmp_path, data_path)
+
+        with open(meta_path, 'w') as f:
+            json.dump(dict(grid, gee_id=satellite_image.gee_id), f)
+
+        # The map switches this scene's heatmap to local tiles
+        from .versioning import bump
+        bump('map-data')
+        self.evict()
+
+    def store_bands_of(self, satellite_image, bands: dict):
+        """
+        Writes the raw uint16 reflectance bands of a stored chip, keyed by index variable ('RED', 'NIR', ...).
+        """
+        path = self._bands_path(satellite_image)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **{name: np.ascontiguousarray(data, dtype=np.uint16) for name, data in bands.items()})
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def load(self, satellite_image):
+        """
+        Opens a stored chip memory-mapped.
+
+        Returns:
+            tuple: (uint8 array, grid dict), or (None, None) if the chip is not stored.
+        """
+        if not self.has(satellite_image):
+            return None, None
+        data_path, meta_path = self._paths(satellite_image)
+        with self._used_lock:
+            self._used[data_path] = time.time()
+        with open(meta_path) as f:
+            grid = json.load(f)
+        return np.load(data_path, mmap_mode='r'), grid
+
+    def discard(self, satellite_image_id: int):
+        """
+        Deletes the chip of a scene (e.g. once its history was compacted).
+        """
+        base = os.path.join(self.root, str(satellite_image_id))
+        for path in (base + '.npy', base + '.json', base + '.bands.npz'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def evict(self):
+        """
+        Deletes least recently used chips until the store fits in max_bytes.
+        """
+        if not os.path.isdir(self.root):
+            return
+
+        with self._used_lock:
+            used = dict(self._used)
+            self._used.clear()
+        for path, read_at in used.items():
+            try:
+                if os.stat(path).st_mtime < read_at:
+                    os.utime(path, (read_at, read_at)) # Mark as recently used
+            except FileNotFoundError:
+                pass
+
+        chips = []
+        total = 0
+        for name in os.listdir(self.root):
+            if not name.endswith('.npy'):
+                continue
+            path = os.path.join(self.root, name)
+            stat = os.stat(path)
+            size = stat.st_size
+            bands_path = path[:-len('.npy')] + '.bands.npz'
+            if os.path.exists(bands_path):
+                size += os.path.getsize(bands_path)
+            chips.append((stat.st_mtime, size, path))
+            total += size
+
+        from .tiles import TileCache
+
+        tiles = TileCache()
+        for _, size, path in sorted(chips):
+            if total <= self.max_bytes:
+                break
+            for victim in (path, path[:-len('.npy')] + '.json', path[:-len('.npy')] + '.bands.npz'):
+                if os.path.exists(victim):
+                    os.remove(victim)
+            total -= size
+            # Its heatmap tiles would otherwise outlive it; the map falls back to Earth Engine
+            tiles.invalidate('heatmap', os.path.basename(path)[:-len('.npy')])
+
+    # --- Local analysis ---
+
+    def aoi_mask(self, grid: dict) -> np.ndarray:
+        """
+        Boolean mask of the pixels inside the AOI circle.
+        """
+        west, dx, north, dy = grid['transform']
+        lat0, lon0 = grid['center']
+        lats = north - (np.arange(grid['height']) + 0.5) * dy
+        lons = west + (np.arange(grid['width']) + 0.5) * dx
+        y = (lats[:, None] - lat0) * METERS_PER_DEGREE
+        x = (lons[None, :] - lon0) * METERS_PER_DEGREE * np.cos(np.radians(lats))[:, None]
+        return (x * x + y * y) <= (grid['radius_km'] * 1000.0) ** 2
+
+    def pixel_area_m2(self, grid: dict) -> np.ndarray:
+        """
+        Area of one pixel per row (square meters), which shrinks with latitude on a degree grid.
+        """
+        west, dx, north, dy = grid['transform']
+        lats = north - (np.arange(grid['height']) + 0.5) * dy
+        return (dx * METERS_PER_DEGREE) * (dy * METERS_PER_DEGREE) * np.cos(np.radians(lats))
+
+    def analyze(self, satellite_image, threshold: float = None) -> dict:
+        """
+        Computes forest statistics from a stored chip, in the format of analyze_gee_image.
+        Threshold defaults to SILVAGUARD_FOREST_THRESHOLD.
+
+        Returns:
+            dict or None if the chip is not stored.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        data, grid = self.load(satellite_image)
+        if data is None:
+            return None
+
+        valid = (data != NODATA) & self.aoi_mask(grid)
+        count = int(valid.sum())
+        if count == 0:
+            return {'mean_ndvi': 0.0, 'min_ndvi': 0.0, 'max_ndvi': 0.0, 'forest_percentage': 0.0,
+                    'histogram': [], 'threshold': threshold, 'scale': grid['scale_m']}
+
+        values = data[valid]
+        forest = int((values > threshold * QUANT_MAX).sum())
+        return {
+            'mean_ndvi': float(values.mean()) / QUANT_MAX, # Tree probability, as stored by analyze_gee_image
+            'min_ndvi': float(values.min()) / QUANT_MAX,
+            'max_ndvi': float(values.max()) / QUANT_MAX,
+            'forest_percentage': forest * 100.0 / count,
+            'histogram': histograms.counts_from_quantized(values, QUANT_MAX),
+            'threshold': threshold,
+            'scale': grid['scale_m']
+        }
+
+    def index_statistics(self, satellite_image, engine) -> dict:
+        """
+        Spectral index statistics over the AOI from stored bands, in the format of compute_indices.
+
+        Returns:
+            dict or None if the bands are not stored.
+        """
+        from .indices import REFLECTANCE_SCALE
+
+        if not self.has_bands(satellite_image):
+            return None
+        try:
+            _, grid = self.load(satellite_image)
+            with np.load(self._bands_path(satellite_image)) as stored:
+                raw = {name: stored[name] for name in stored.files}
+        except (OSError, ValueError, TypeError) as e:
+            # Evicted between the check and the read
+            print(f"Stored bands of scene {satellite_image.pk} unreadable: {e}")
+            return None
+        valid = self.aoi_mask(grid)
+        for data in raw.values():
+            valid &= data != 0
+        bands = {name: data.astype(np.float64) * REFLECTANCE_SCALE for name, data in raw.items()}
+        return engine.local_statistics(bands, valid)
+
+    def loss(self, image_before, image_after, threshold: float = None) -> dict:
+        """
+        Computes forest loss between two stored chips of the same AOI, in the format of
+        calculate_forest_loss. The boolean loss mask is returned as 'change_mask'.
+
+        Returns:
+            dict or None if either chip is missing or the grids differ.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        before, grid = self.load(image_before)
+        after, grid_after = self.load(image_after)
+        if before is None or after is None or grid['transform'] != grid_after['transform']:
+            return None
+
+        valid = (before != NODATA) & (after != NODATA) & self.aoi_mask(grid)
+        # Pixels without data on either date can neither be initial forest nor loss
+        before_q = np.where(valid, before, 0)
+        after_q = np.where(valid, after, QUANT_MAX)
+        result = self.detector.detect_loss(before_q, after_q, threshold=threshold * QUANT_MAX)
+
+        row_area = self.pixel_area_m2(grid)
+        loss_m2 = float((result['change_mask'].sum(axis=1) * row_area).sum())
+        forest_m2 = float(((before_q > threshold * QUANT_MAX).sum(axis=1) * row_area).sum())
+        loss_ha = loss_m2 / 10000.0
+
+        return {
+            'loss_ha': loss_ha,
+            'loss_percentage': (loss_m2 / forest_m2 * 100) if forest_m2 > 0 else 0.0,
+            'scale': grid['scale_m'],
+            'change_mask': result['change_mask'],
+            'grid': grid,
+        }
@@ -0,0 +1,29 @@
+from contextlib import contextmanager
+from django.db import connection, transaction
+
+
+@contextmanager
+def write_transaction():
+    """
+    transaction.atomic() for transactions that read and then write while other threads write.
+
+    SQLite returns "database is locked" at once (without waiting out the busy timeout) when a
+    transaction holding a read lock asks for the write lock another connection holds, and it
+    ignores select_for_update(). On SQLite this transaction therefore begins with BEGIN IMMEDIATE,
+    taking the write lock up front, so concurrent callers wait for each other. Other databases
+    get a plain atomic block and rely on their row locks.
+    """
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        with transaction.atomic():
+            yield
+        return
+
+    connection.ensure_connection()
+    previous = connection.transaction_mode
+    connection.transaction_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic():
+            connection.transaction_mode = previous
+            yield
+    finally:
+        connection.transaction_mode = previous
@@ -0,0 +1,181 @@
+import asyncio
+import json
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+KIND_ALERT = 'alert'
+KIND_PULSE = 'pulse'
+
+# Events replayed to a reconnecting client (Last-Event-ID) at most
+MAX_REPLAY = 500
+# Per-connection backlog; a client that falls this far behind loses its oldest events
+QUEUE_SIZE = 1000
+# Reconnection delay suggested to EventSource clients
+RECONNECT_MS = 3000
+# Ids below the newest delivered one that every poll reads again. Ids are assigned at insert,
+# not at commit (Postgres), so an event whose transaction commits late appears below ids
+# already delivered; it is picked up as long as fewer than this many events were published since.
+LATE_WINDOW = 200
+
+
+def publish(kind: str, payload: dict, aoi=None):
+    """
+    Records an event for SSE clients. Safe to call from any process or thread:
+    the row is picked up by the broadcaster of every server process, and a
+    broadcaster running in this process is woken up immediately.
+    """
+    from .models import PulseEvent
+
+    try:
+        event = PulseEvent.objects.create(kind=kind, aoi=aoi, payload=payload)
+        broadcaster.notify()
+        return event
+    except Exception as e:
+        print(f"Failed to publish {kind} event: {e}")
+        return None
+
+
+def prune(hours: int = None) -> int:
+    """
+    Deletes events older than SILVAGUARD_EVENT_RETENTION_HOURS.
+    """
+    from .models import PulseEvent
+
+    hours = hours or getattr(settings, 'SILVAGUARD_EVENT_RETENTION_HOURS', 24)
+    deleted, _ = PulseEvent.objects.filter(created_at__lt=timezone.now() - timedelta(hours=hours)).delete()
+    return deleted
+
+
+def _latest_id() -> int:
+    from .models import PulseEvent
+    return PulseEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def _events_after(last_id: int, limit: int = MAX_REPLAY) -> list:
+    from .models import PulseEvent
+    return list(PulseEvent.objects.filter(id__gt=last_id).order_by('id').values('id', 'kind', 'payload')[:limit])
+
+
+def format_sse(event: dict) -> str:
+    return f"id: {event['id']}\nevent: {event['kind']}\ndata: {json.dumps(event['payload'])}\n\n"
+
+
+class EventBroadcaster:
+    """
+    Fans PulseEvent rows out to every SSE connection of this server process.
+
+    A single polling task reads new rows (one small query per interval, however many
+    clients are connected) and puts them on one asyncio.Queue per connection, so an
+    idle connection costs a suspended coroutine and an empty queue. Events written by
+    other processes (pulse workers, the scheduler) arrive through the poll; events
+    published in this process wake the poller right away. Each poll re-reads the last
+    LATE_WINDOW ids, so events committed after higher ids were delivered still go out.
+    """
+
+    def __init__(self, poll_seconds: float = None):
+        self.poll_seconds = poll_seconds
+        self.subscribers = set()
+        self.last_id = None
+        # Ids delivered within LATE_WINDOW of last_id, so re-read rows are not sent twice
+        self.delivered = set()
+        self.task = None
+        self.loop = None
+        self.wakeup = None
+
+    def subscribe(self) -> asyncio.Queue:
+        """
+        Registers a connection; must be called from the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            # First use, or the previous loop is gone (e.g. a test client)
+            self.loop, self.task, self.wakeup, self.last_id = loop, None, asyncio.Event(), None
+            self.delivered = set()
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.subscribers.add(queue)
+        if self.task is None or self.task.done():
+            self.task = loop.create_task(self._poll())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+
+    def notify(self):
+        """
+        Wakes the poller (thread-safe no-op when nothing is listening in this process).
+        """
+        loop, wakeup = self.loop, self.wakeup
+        if loop is not None and wakeup is not None and self.subscribers and not loop.is_closed():
+            loop.call_soon_threadsafe(wakeup.set)
+
+    async def _poll(self):
+        interval = self.poll_seconds or getattr(settings, 'SILVAGUARD_SSE_POLL_SECONDS', 2)
+        if self.last_id is None:
+            self.last_id = await sync_to_async(_latest_id)()
+            # Rows already in the window were committed before we started listening
+            recent = await sync_to_async(_events_after)(max(0, self.last_id - LATE_WINDOW))
+            self.delivered = {event['id'] for event in recent}
+
+        while self.subscribers:
+            try:
+                events = await sync_to_async(_events_after)(max(0, self.last_id - LATE_WINDOW))
+            except Exception as e:
+                print(f"Event poll failed: {e}")
+                events = []
+
+            for event in events:
+                if event['id'] in self.delivered or event['id'] <= self.last_id - LATE_WINDOW:
+                    continue
+                self.delivered.add(event['id'])
+                self.last_id = max(self.last_id, event['id'])
+                for queue in list(self.subscribers):
+                    if queue.full():
+                        queue.get_nowait()
+                    queue.put_nowait(event)
+            self.delivered = {pk for pk in self.delivered if pk > self.last_id - LATE_WINDOW}
+
+            if len(events) == MAX_REPLAY:
+                continue # Backlog left, read on without waiting
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+
+
+broadcaster = EventBroadcaster()
+
+
+async def event_stream(last_event_id: int = None, keepalive_seconds: float = None):
+    """
+    Async generator of SSE messages for one connection: missed events after
+    last_event_id first, then live events, with keep-alive comments in between.
+
+    Live events may arrive out of id order (late commits, see LATE_WINDOW). The replay
+    after a reconnect is by id, so an event that committed late while the client was
+    disconnected and below its Last-Event-ID is not replayed; the alert itself stays
+    available through the alert API.
+    """
+    keepalive = keepalive_seconds or getattr(settings, 'SILVAGUARD_SSE_KEEPALIVE_SECONDS', 15)
+    queue = broadcaster.subscribe()
+    try:
+        yield f"retry: {RECONNECT_MS}\n\n"
+
+        replayed = set()
+        if last_event_id is not None:
+            for event in await sync_to_async(_events_after)(last_event_id):
+                replayed.add(event['id'])
+                yield format_sse(event)
+
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), keepalive)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event['id'] not in replayed:
+                yield format_sse(event)
+    finally:
+        broadcaster.unsubscribe(queue)
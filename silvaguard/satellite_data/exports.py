@@ -0,0 +1,252 @@
+import csv
+import json
+
+# Rows are read with QuerySet.iterator(), which uses a server-side cursor on PostgreSQL,
+# and written out chunk by chunk, so memory stays flat regardless of the row count.
+CHUNK_ROWS = 2000
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'geojsonseq': ('application/geo+json-seq', 'geojsons'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+_SCENE = 'processed_image__satellite_image'
+
+# Dataset -> model name, columns as (name, ORM lookup, type), date filter, AOI lookup prefix.
+# 'latitude'/'longitude' are the AOI center and become the GeoJSON point.
+DATASETS = {
+    'alerts': {
+        'model': 'DeforestationAlert',
+        'columns': [
+            ('id', 'id', 'int'),
+            ('aoi_id', 'aoi_id', 'int'),
+            ('aoi_name', 'aoi__name', 'str'),
+            ('latitude', 'aoi__latitude', 'float'),
+            ('longitude', 'aoi__longitude', 'float'),
+            ('detected_at', 'detected_at', 'datetime'),
+            ('before_date', f'analysis_before__{_SCENE}__acquisition_date', 'datetime'),
+            ('after_date', f'analysis_after__{_SCENE}__acquisition_date', 'datetime'),
+            ('forest_loss_hectares', 'forest_loss_hectares', 'float'),
+            ('loss_percentage', 'loss_percentage', 'float'),
+            ('reduction_scale', 'reduction_scale', 'float'),
+        ],
+        'date_field': 'detected_at',
+        'aoi_field': 'aoi',
+    },
+    'analyses': {
+        'model': 'VegetationAnalysis',
+        'columns': [
+            ('id', 'id', 'int'),
+            ('aoi_id', f'{_SCENE}__aoi_id', 'int'),
+            ('aoi_name', f'{_SCENE}__aoi__name', 'str'),
+            ('latitude', f'{_SCENE}__aoi__latitude', 'float'),
+            ('longitude', f'{_SCENE}__aoi__longitude', 'float'),
+            ('image_id', f'{_SCENE}__image_id', 'str'),
+            ('acquisition_date', f'{_SCENE}__acquisition_date', 'datetime'),
+            ('analysis_date', 'analysis_date', 'datetime'),
+            ('mean_tree_probability', 'mean_ndvi', 'float'),
+            ('forest_cover_percentage', 'forest_cover_percentage', 'float'),
+            ('forest_threshold', 'forest_threshold', 'float'),
+            ('reduction_scale', 'reduction_scale', 'float'),
+        ],
+        'date_field': f'{_SCENE}__acquisition_date',
+        'aoi_field': f'{_SCENE}__aoi',
+    },
+    'images': {
+        'model': 'SatelliteImage',
+        'columns': [
+            ('id', 'id', 'int'),
+            ('aoi_id', 'aoi_id', 'int'),
+            ('aoi_name', 'aoi__name', 'str'),
+            ('latitude', 'aoi__latitude', 'float'),
+            ('longitude', 'aoi__longitude', 'float'),
+            ('image_id', 'image_id', 'str'),
+            ('gee_id', 'gee_id', 'str'),
+            ('satellite_name', 'satellite_name', 'str'),
+            ('acquisition_date', 'acquisition_date', 'datetime'),
+            ('cloud_coverage', 'cloud_coverage', 'float'),
+        ],
+        'date_field': 'acquisition_date',
+        'aoi_field': 'aoi',
+    },
+}
+
+
+class DataExporter:
+    """
+    Streams one dataset (alerts, analyses or images) as CSV, GeoJSON text sequences
+    (RFC 8142) or Parquet, filtered by AOI, date range and minimum loss (alerts only).
+    Every writer is a generator of bytes chunks usable by StreamingHttpResponse or a file.
+    """
+
+    def __init__(self, dataset: str, aoi_id: int = None, start=None, end=None, min_loss: float = None):
+        if dataset not in DATASETS:
+            raise ValueError(f"Unknown dataset '{dataset}' (choose from {', '.join(DATASETS)})")
+        if min_loss is not None and dataset != 'alerts':
+            raise ValueError("min_loss only applies to the alerts dataset")
+        self.dataset = dataset
+        self.spec = DATASETS[dataset]
+        self.aoi_id = aoi_id
+        self.start = start
+        self.end = end
+        self.min_loss = min_loss
+
+    @property
+    def columns(self) -> list:
+        return [name for name, _, _ in self.spec['columns']]
+
+    def queryset(self):
+        from django.apps import apps
+        from .pagination import date_range_filter
+
+        model = apps.get_model('satellite_data', self.spec['model'])
+        qs = model.objects.all()
+        if self.aoi_id:
+            qs = qs.filter(**{f"{self.spec['aoi_field']}_id": self.aoi_id})
+        qs = qs.filter(date_range_filter(self.spec['date_field'], self.start, self.end))
+        if self.min_loss is not None:
+            qs = qs.filter(forest_loss_hectares__gte=self.min_loss)
+        return qs.order_by('id').values_list(*[lookup for _, lookup, _ in self.spec['columns']])
+
+    def rows(self):
+        """
+        Yields value tuples in column order.
+        """
+        return self.queryset().iterator(chunk_size=CHUNK_ROWS)
+
+    def stream(self, fmt: str):
+        """
+        Returns the chunk generator of a format. Errors (unknown format, missing pyarrow)
+        are raised here, before the first chunk, so a response can still report them.
+        """
+        if fmt == 'csv':
+            return self.csv_chunks()
+        if fmt == 'geojsonseq':
+            return self.geojsonseq_chunks()
+        if fmt == 'parquet':
+            try:
+                import pyarrow.parquet # noqa: F401
+            except ImportError:
+                raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+            return self.parquet_chunks()
+        raise ValueError(f"Unknown format '{fmt}' (choose from {', '.join(FORMATS)})")
+
+    # --- Writers ---
+
+    def csv_chunks(self):
+        buffer = _LineBuffer()
+        writer = csv.writer(buffer)
+        writer.writerow(self.columns)
+        for i, row in enumerate(self.rows(), start=1):
+            writer.writerow([value.isoformat() if hasattr(value, 'isoformat') else value for value in row])
+            if i % CHUNK_ROWS == 0:
+                yield buffer.drain()
+        yield buffer.drain()
+
+    def geojsonseq_chunks(self):
+        columns = self.columns
+        lat, lon = columns.index('latitude'), columns.index('longitude')
+        lines = []
+        for row in self.rows():
+            properties = {
+                name: value.isoformat() if hasattr(value, 'isoformat') else value
+                for name, value in zip(columns, row) if name not in ('latitude', 'longitude')
+            }
+            feature = {
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [row[lon], row[lat]]},
+                'properties': properties,
+            }
+            lines.append('\x1e' + json.dumps(feature) + '\n')
+            if len(lines) >= CHUNK_ROWS:
+                yield ''.join(lines).encode('utf-8')
+                lines = []
+        yield ''.join(lines).encode('utf-8')
+
+    def parquet_chunks(self):
+        """
+        One Parquet row group per CHUNK_ROWS rows. Requires the optional pyarrow package.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        types = {'int': pa.int64(), 'float': pa.float64(), 'str': pa.string(), 'datetime': pa.timestamp('us', tz='UTC')}
+        schema = pa.schema([(name, types[kind]) for name, _, kind in self.spec['columns']])
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema)
+
+        def write(batch):
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(zip(*batch), schema)], schema=schema
+            ))
+
+        batch = []
+        for row in self.rows():
+            batch.append(row)
+            if len(batch) >= CHUNK_ROWS:
+                write(batch)
+                batch = []
+                yield sink.drain()
+        if batch:
+            write(batch)
+        writer.close()
+        yield sink.drain()
+
+
+class _LineBuffer:
+    """
+    Write-only text buffer for csv.writer that hands out what was written so far.
+    """
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, value):
+        self.parts.append(value)
+
+    def drain(self) -> bytes:
+        data = ''.join(self.parts).encode('utf-8')
+        self.parts = []
+        return data
+
+
+class _ChunkSink:
+    """
+    Append-only binary file object for pyarrow that hands out what was written so far.
+    tell() keeps counting across drains so Parquet footer offsets stay correct.
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def readable(self) -> bool:
+        return False
+
+    def drain(self) -> bytes:
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
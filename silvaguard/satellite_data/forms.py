@@ -4,7 +4,7 @@ from .models import AreaOfInterest
 class AreaOfInterestForm(forms.ModelForm):
     class Meta:
         model = AreaOfInterest
-        fields = ['name', 'latitude', 'longitude', 'radius_km']
+        fields = ['name', 'latitude', 'longitude', 'radius_km', 'precision']
         widgets = {
             'name': forms.TextInput(attrs={
                 'class': 'form-input',
@@ -25,4 +25,7 @@ class AreaOfInterestForm(forms.ModelForm):
                 'placeholder': 'e.g. 10.0',
                 'step': '0.1'
             }),
+            'precision': forms.Select(attrs={
+                'class': 'form-input'
+            }),
         }
@@ -1,14 +1,23 @@
 import ee
 import os
 import json
+import math
 import traceback
 from google.oauth2 import service_account
 
+EARTH_RADIUS_M = 6371008.8
+
 def initialize_gee():
     """
     Initializes Google Earth Engine using the Service Account credentials
     specified in GOOGLE_APPLICATION_CREDENTIALS.
     """
+    from .cassette import active_cassette, REPLAY
+
+    cassette = active_cassette()
+    if cassette is not None and cassette.mode == REPLAY:
+        return True # Already initialized offline from the cassette
+
     key_path = None
     try:
         # Proceed with initialization
@@ -41,3 +50,18 @@ def initialize_gee():
             pass
             
         return False
+
+def aoi_region(lat: float, lon: float, radius_km: float):
+    """
+    Returns the circular ee.Geometry monitored for an AOI (center point buffered by its radius).
+    """
+    return ee.Geometry.Point([lon, lat]).buffer(radius_km * 1000)
+
+def haversine_m(lat1, lon1, lat2, lon2) -> float:
+    """
+    Great-circle distance in meters between two points given in degrees.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi, dlmb = phi2 - phi1, math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
@@ -0,0 +1,128 @@
+import math
+
+# Geohash cells are the fixed grid of the result cache: a cell's statistics can be reused by any
+# query shape that covers it. Precision 6 cells are about 1.2 x 0.6 km at the equator.
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_DECODE = {c: i for i, c in enumerate(BASE32)}
+
+
+def encode(lat: float, lon: float, precision: int) -> str:
+    lat_lo, lat_hi, lon_lo, lon_hi = -90.0, 90.0, -180.0, 180.0
+    lon = (lon + 180.0) % 360.0 - 180.0
+    cell = []
+    bits, value, even = 0, 0, True
+    while len(cell) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            value = value * 2 + (lon >= mid)
+            lon_lo, lon_hi = (mid, lon_hi) if lon >= mid else (lon_lo, mid)
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            value = value * 2 + (lat >= mid)
+            lat_lo, lat_hi = (mid, lat_hi) if lat >= mid else (lat_lo, mid)
+        even = not even
+        bits += 1
+        if bits == 5:
+            cell.append(BASE32[value])
+            bits, value = 0, 0
+    return ''.join(cell)
+
+
+def bounds(cell: str) -> tuple:
+    """
+    Returns (south, west, north, east) of a cell in degrees.
+    """
+    lat_lo, lat_hi, lon_lo, lon_hi = -90.0, 90.0, -180.0, 180.0
+    even = True
+    for c in cell:
+        value = _DECODE[c]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lon_lo + lon_hi) / 2
+                lon_lo, lon_hi = (mid, lon_hi) if bit else (lon_lo, mid)
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                lat_lo, lat_hi = (mid, lat_hi) if bit else (lat_lo, mid)
+            even = not even
+    return lat_lo, lon_lo, lat_hi, lon_hi
+
+
+def cell_size(precision: int) -> tuple:
+    """
+    Returns (height, width) of cells at a precision, in degrees.
+    """
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def cells_in_bounds(south: float, west: float, north: float, east: float, precision: int, inside, max_cells: int = None) -> list:
+    """
+    Cells overlapping a lon/lat box whose center satisfies inside(lat, lon).
+    East may exceed 180 for boxes crossing the antimeridian.
+    """
+    height, width = cell_size(precision)
+    first_row = math.floor((max(south, -90.0) + 90.0) / height)
+    last_row = math.floor((min(north, 90.0) + 90.0) / height - 1e-9)
+    first_col = math.floor((west + 180.0) / width)
+    last_col = math.floor((east + 180.0) / width - 1e-9)
+    if max_cells and (last_row - first_row + 1) * (last_col - first_col + 1) > max_cells * 2:
+        raise ValueError(f"Area covers too many precision {precision} cells (limit {max_cells})")
+
+    cells = []
+    for row in range(first_row, last_row + 1):
+        lat = -90.0 + (row + 0.5) * height
+        for col in range(first_col, last_col + 1):
+            lon = -180.0 + (col + 0.5) * width
+            if inside(lat, lon):
+                cells.append(encode(lat, lon, precision))
+                if max_cells and len(cells) > max_cells:
+                    raise ValueError(f"Area covers too many precision {precision} cells (limit {max_cells})")
+    return cells
+
+
+def cover_circle(lat: float, lon: float, radius_km: float, precision: int, max_cells: int = None) -> list:
+    """
+    Cells whose center lies within radius_km of (lat, lon); at least the cell holding the center.
+    """
+    from .gee_utils import haversine_m
+
+    radius_m = radius_km * 1000.0
+    dlat = radius_km / 111.2
+    # Near the poles the box spans every longitude
+    cos_lat = math.cos(math.radians(min(89.9, abs(lat) + dlat)))
+    dlon = min(180.0, radius_km / (111.2 * cos_lat))
+    cells = cells_in_bounds(
+        lat - dlat, lon - dlon, lat + dlat, lon + dlon, precision,
+        lambda y, x: haversine_m(lat, lon, y, x) <= radius_m, max_cells
+    )
+    return cells or [encode(lat, lon, precision)]
+
+
+def cover_polygon(ring: list, precision: int, max_cells: int = None) -> list:
+    """
+    Cells whose center lies inside a polygon ring of [lon, lat] positions; at least the cell holding its first vertex.
+    """
+    lons = [p[0] for p in ring]
+    lats = [p[1] for p in ring]
+    cells = cells_in_bounds(
+        min(lats), min(lons), max(lats), max(lons), precision,
+        lambda y, x: point_in_ring(x, y, ring), max_cells
+    )
+    return cells or [encode(lats[0], lons[0], precision)]
+
+
+def point_in_ring(lon: float, lat: float, ring: list) -> bool:
+    """
+    Even-odd rule on planar lon/lat coordinates.
+    """
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i][0], ring[i][1]
+        xj, yj = ring[j][0], ring[j][1]
+        if (yi > lat) != (yj > lat) and lon < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
@@ -0,0 +1,215 @@
+import datetime
+import ee
+from django.conf import settings
+from . import geohash, histograms
+
+
+class GridCellCache:
+    """
+    Answers forest statistics for arbitrary circles and polygons from per-cell results.
+
+    Areas are covered with geohash cells of a fixed precision (SILVAGUARD_GRID_PRECISION).
+    Each cell is reduced at most once per scene date and scale: its tree probability histogram
+    and mean are stored as a GridCellStat row, looked up through the (cell, date, scale) index,
+    and any later query touching the cell on that date reuses it. Only missing cells go to Earth
+    Engine, as one reduceRegions over a FeatureCollection of cell rectangles per chunk of cells.
+    The pulse warms the cells of the AOIs it analyzes (warm(), up to SILVAGUARD_GRID_WARM_MAX_CELLS
+    cells each), so ad-hoc queries over monitored areas are mostly answered from the database.
+
+    Answers are at cell granularity: a cell counts when its center lies inside the shape.
+    """
+
+    def __init__(self, precision: int = None, scale: float = None, threshold: float = None):
+        self.precision = precision or getattr(settings, 'SILVAGUARD_GRID_PRECISION', 6)
+        self.scale = scale or getattr(settings, 'SILVAGUARD_GRID_SCALE', 20)
+        self.max_cells = getattr(settings, 'SILVAGUARD_GRID_MAX_CELLS', 20000)
+        self.chunk_size = getattr(settings, 'SILVAGUARD_GRID_CHUNK_CELLS', 500)
+        self.threshold = threshold if threshold is not None else getattr(settings, 'SILVAGUARD_FOREST_THRESHOLD', 0.5)
+
+    # --- Covering ---
+
+    def cover_circle(self, lat: float, lon: float, radius_km: float) -> list:
+        return geohash.cover_circle(lat, lon, radius_km, self.precision, self.max_cells)
+
+    def cover_polygon(self, ring: list) -> list:
+        return geohash.cover_polygon(ring, self.precision, self.max_cells)
+
+    # --- Lookup ---
+
+    def cached(self, cells: list, date) -> dict:
+        """
+        Cached rows of the cells on a date, keyed by cell.
+        """
+        from .models import GridCellStat
+
+        rows = {}
+        for start in range(0, len(cells), self.chunk_size):
+            chunk = cells[start:start + self.chunk_size]
+            for row in GridCellStat.objects.filter(cell__in=chunk, date=date, reduction_scale=self.scale):
+                rows[row.cell] = row
+        return rows
+
+    def latest_date(self, cells: list, since) -> datetime.date:
+        """
+        Newest date since a given date on which every cell is already cached, or None.
+        """
+        from django.db.models import Count
+        from .models import GridCellStat
+
+        if len(cells) > self.chunk_size:
+            return None # Too many cells for one IN clause; ask Earth Engine for scene dates instead
+        dates = GridCellStat.objects.filter(cell__in=cells, date__gte=since, reduction_scale=self.scale).values('date') \
+            .annotate(cells=Count('id')).filter(cells=len(cells)).order_by('-date')
+        return dates[0]['date'] if dates else None
+
+    def scene_dates(self, lat: float, lon: float, start_date, end_date, max_cloud: float = 20.0) -> list:
+        """
+        UTC dates with Sentinel-2 scenes under the cloud limit around a point, newest first.
+        """
+        from .services import Sentinel2Service
+
+        metadata = Sentinel2Service().fetch_metadata(lat, lon, start_date, end_date, max_cloud)
+        dates = {meta['acquisition_date'].date() for meta in metadata if meta['acquisition_date']}
+        return sorted(dates, reverse=True)
+
+    # --- Query ---
+
+    def query(self, cells: list, date, compute: bool = True) -> dict:
+        """
+        Aggregated statistics of the cells on a scene date, reducing missing cells in Earth Engine.
+
+        Returns:
+            dict: forest_percentage, mean_tree_probability, histogram summary, and cell counts
+            ('cells', 'cells_cached', 'cells_computed', 'cells_missing', 'cells_empty').
+        """
+        rows = self.cached(cells, date)
+        cached = len(rows)
+        missing = [cell for cell in cells if cell not in rows]
+
+        computed = 0
+        if missing and compute:
+            fresh = self.compute(missing, date)
+            computed = len(fresh)
+            rows.update(fresh)
+
+        result = self.aggregate(rows.values())
+        result.update({
+            'date': date,
+            'precision': self.precision,
+            'scale': self.scale,
+            'cells': len(cells),
+            'cells_cached': cached,
+            'cells_computed': computed,
+            'cells_missing': len(cells) - len(rows),
+            'cells_empty': sum(1 for row in rows.values() if not row.tree_histogram),
+        })
+        return result
+
+    def warm(self, lat: float, lon: float, radius_km: float, date, max_cells: int = None) -> int:
+        """
+        Reduces the cells of a circle on a scene date that are not cached yet.
+        Returns the number of cells computed; circles covering more than max_cells cells are skipped.
+        """
+        try:
+            cells = geohash.cover_circle(lat, lon, radius_km, self.precision, max_cells or self.max_cells)
+        except ValueError:
+            return 0
+        missing = [cell for cell in cells if cell not in self.cached(cells, date)]
+        return len(self.compute(missing, date)) if missing else 0
+
+    def compute(self, cells: list, date) -> dict:
+        """
+        Reduces cells in Earth Engine and stores them. Nothing is stored when no Dynamic World
+        image of the date covers the cells yet (it may still be processing).
+        """
+        from .gee_utils import initialize_gee
+        from .models import GridCellStat
+
+        initialize_gee()
+        rows = {}
+        for start in range(0, len(cells), self.chunk_size):
+            chunk = cells[start:start + self.chunk_size]
+            try:
+                evaluated = self.cell_statistics(chunk, date).getInfo()
+            except Exception as e:
+                print(f"Grid cell reduction failed for {len(chunk)} cells on {date}: {e}")
+                continue
+            if not evaluated['scenes']:
+                print(f"No Dynamic World image on {date} for {len(chunk)} cells")
+                break
+
+            batch = []
+            for feature in evaluated['cells']['features']:
+                props = feature['properties']
+                # A single-band image names combined outputs without the band prefix in reduceRegions
+                counts = histograms.counts_from_ee(props.get('histogram', props.get('trees_histogram')))
+                batch.append(GridCellStat(
+                    cell=props['cell'], date=date,
+                    tree_histogram=counts,
+                    mean_tree_probability=props.get('mean', props.get('trees_mean')) if counts else None,
+                    reduction_scale=self.scale,
+                ))
+            # A concurrent query may have stored the same cells; either copy is valid
+            GridCellStat.objects.bulk_create(batch, ignore_conflicts=True)
+            rows.update((row.cell, row) for row in batch)
+        return rows
+
+    def cell_statistics(self, cells: list, date):
+        """
+        Builds (without evaluating) the per-cell tree statistics for one date: an ee.Dictionary
+        with the number of Dynamic World images found ('scenes') and one feature per cell ('cells').
+        """
+        south, west, north, east = _union_bounds(cells)
+        day = date.strftime('%Y-%m-%d')
+        next_day = (date + datetime.timedelta(days=1)).strftime('%Y-%m-%d')
+        regions = ee.FeatureCollection([
+            ee.Feature(ee.Geometry.Rectangle(list(_rectangle(cell)), None, False), {'cell': cell}) for cell in cells
+        ])
+        dw = ee.ImageCollection("GOOGLE/DYNAMICWORLD/V1") \
+            .filterBounds(ee.Geometry.Rectangle([west, south, east, north], None, False)) \
+            .filterDate(day, next_day)
+        reducer = ee.Reducer.mean().combine(
+            ee.Reducer.fixedHistogram(0, 1, histograms.HISTOGRAM_BINS), sharedInputs=True
+        )
+        stats = dw.select('trees').mosaic().reduceRegions(
+            collection=regions, reducer=reducer, scale=self.scale
+        ).map(lambda f: ee.Feature(f).select(['.*'], None, False))
+        return ee.Dictionary({'scenes': dw.size(), 'cells': stats})
+
+    def aggregate(self, rows) -> dict:
+        """
+        Combines cell rows into area statistics: histograms are summed, means weighted by pixel count.
+        """
+        total_counts = None
+        weighted_mean, pixels = 0.0, 0.0
+        for row in rows:
+            counts = row.tree_histogram
+            if not counts:
+                continue
+            n = histograms.total(counts)
+            total_counts = list(counts) if total_counts is None else [a + b for a, b in zip(total_counts, counts)]
+            if row.mean_tree_probability is not None:
+                weighted_mean += row.mean_tree_probability * n
+                pixels += n
+
+        if not total_counts:
+            return {'forest_percentage': None, 'mean_tree_probability': None, 'summary': None, 'pixels': 0}
+        summary = histograms.summarize(total_counts, self.threshold)
+        return {
+            'forest_percentage': summary['forest_percentage'],
+            'mean_tree_probability': weighted_mean / pixels if pixels else None,
+            'summary': summary,
+            'threshold': self.threshold,
+            'pixels': histograms.total(total_counts),
+        }
+
+
+def _rectangle(cell: str) -> tuple:
+    south, west, north, east = geohash.bounds(cell)
+    return west, south, east, north
+
+
+def _union_bounds(cells: list) -> tuple:
+    boxes = [geohash.bounds(cell) for cell in cells]
+    return (min(b[0] for b in boxes), min(b[1] for b in boxes),
+            max(b[2] for b in boxes), max(b[3] for b in boxes))
@@ -0,0 +1,96 @@
+# Every analysis stores a histogram of Dynamic World tree probability with
+# HISTOGRAM_BINS equal-width bins over [0, 1], so forest cover, min/max and
+# percentiles can be derived for any threshold without going back to Earth Engine.
+HISTOGRAM_BINS = 100
+BIN_WIDTH = 1.0 / HISTOGRAM_BINS
+
+
+def counts_from_ee(histogram) -> list:
+    """
+    Converts ee.Reducer.fixedHistogram output ([[bucket_min, count], ...]) into a list of counts.
+    """
+    if not histogram:
+        return []
+    return [float(row[1]) for row in histogram]
+
+
+def counts_from_quantized(values, quant_max: int) -> list:
+    """
+    Bins quantized probabilities (0..quant_max) into HISTOGRAM_BINS counts.
+    """
+    import numpy as np
+
+    bins = np.minimum((np.asarray(values, dtype=np.float64) / quant_max * HISTOGRAM_BINS).astype(int), HISTOGRAM_BINS - 1)
+    return np.bincount(bins.ravel(), minlength=HISTOGRAM_BINS).astype(float).tolist()
+
+
+def total(counts: list) -> float:
+    return float(sum(counts)) if counts else 0.0
+
+
+def forest_fraction(counts: list, threshold: float) -> float:
+    """
+    Fraction of pixels with probability above the threshold. The bin containing the
+    threshold contributes proportionally, assuming values are uniform within a bin.
+    """
+    n = total(counts)
+    if n == 0:
+        return 0.0
+
+    position = threshold / BIN_WIDTH
+    first_full = int(position)
+    above = sum(counts[first_full + 1:]) if first_full + 1 < len(counts) else 0.0
+    if first_full < len(counts):
+        above += counts[first_full] * (first_full + 1 - position)
+    return above / n
+
+
+def percentile(counts: list, q: float) -> float:
+    """
+    Value below which q percent (0-100) of the pixels fall, interpolated within a bin.
+    """
+    n = total(counts)
+    if n == 0:
+        return None
+
+    target = n * q / 100.0
+    cumulative = 0.0
+    for i, count in enumerate(counts):
+        if count and cumulative + count >= target:
+            return (i + (target - cumulative) / count) * BIN_WIDTH
+        cumulative += count
+    return 1.0
+
+
+def min_value(counts: list) -> float:
+    """
+    Lower edge of the first non-empty bin.
+    """
+    for i, count in enumerate(counts):
+        if count:
+            return i * BIN_WIDTH
+    return None
+
+
+def max_value(counts: list) -> float:
+    """
+    Upper edge of the last non-empty bin.
+    """
+    for i in range(len(counts) - 1, -1, -1):
+        if counts[i]:
+            return (i + 1) * BIN_WIDTH
+    return None
+
+
+def summarize(counts: list, threshold: float) -> dict:
+    """
+    Forest percentage and distribution summary at a given threshold.
+    """
+    return {
+        'forest_percentage': forest_fraction(counts, threshold) * 100,
+        'min': min_value(counts),
+        'max': max_value(counts),
+        'p10': percentile(counts, 10),
+        'p50': percentile(counts, 50),
+        'p90': percentile(counts, 90),
+    }
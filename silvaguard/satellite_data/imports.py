@@ -0,0 +1,369 @@
+import csv
+import io
+import json
+import math
+import time
+from django.conf import settings
+from django.db import transaction
+from .gee_utils import EARTH_RADIUS_M, haversine_m
+from .reduction import PRECISION_CHOICES
+
+READ_CHUNK = 64 * 1024
+MAX_REPORTED = 50
+
+FORMATS = ('csv', 'geojson', 'geojsonseq')
+
+# Accepted CSV header spellings
+_CSV_COLUMNS = {
+    'name': ('name', 'title', 'label'),
+    'latitude': ('latitude', 'lat', 'y'),
+    'longitude': ('longitude', 'lon', 'lng', 'long', 'x'),
+    'radius_km': ('radius_km', 'radius'),
+    'precision': ('precision',),
+}
+
+_PRECISIONS = {key for key, _ in PRECISION_CHOICES}
+
+
+def detect_format(filename: str) -> str:
+    name = filename.lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.geojsons', '.geojsonl', '.geojsonseq', '.ndjson')):
+        return 'geojsonseq'
+    if name.endswith(('.geojson', '.json')):
+        return 'geojson'
+    raise ValueError(f"Cannot tell the format of '{filename}' (choose from {', '.join(FORMATS)})")
+
+
+def text_stream(binary):
+    """
+    Wraps a binary file (an upload or an open file) as UTF-8 text; a BOM is ignored.
+    """
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
+
+
+# --- Parsers: each yields (record number, dict or exception) without loading the whole file ---
+
+def iter_csv(stream):
+    # csv.Error (e.g. a NUL byte or an oversized field) is raised as ValueError like every parse error
+    try:
+        reader = csv.DictReader(stream)
+        header = {(field or '').strip().lower(): field for field in reader.fieldnames or []}
+    except csv.Error as e:
+        raise ValueError(f"Malformed CSV header: {e}")
+    columns = {}
+    for key, spellings in _CSV_COLUMNS.items():
+        columns[key] = next((header[s] for s in spellings if s in header), None)
+    if columns['latitude'] is None or columns['longitude'] is None:
+        raise ValueError("CSV needs latitude and longitude columns")
+
+    rows = enumerate(reader, start=2)
+    while True:
+        try:
+            number, row = next(rows)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            raise ValueError(f"Malformed CSV after line {reader.line_num}: {e}")
+        yield number, {key: row.get(column) if column else None for key, column in columns.items()}
+
+
+def iter_geojson(stream):
+    """
+    Streams the features of a FeatureCollection one at a time; a bare Feature is accepted too.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = None # Index just inside the features array once found
+    eof = False
+    number = 0
+
+    while True:
+        if position is None:
+            start = buffer.find('"features"')
+            bracket = buffer.find('[', start) if start >= 0 else -1
+            if bracket >= 0:
+                buffer, position = buffer[bracket + 1:], 0
+                continue
+            if eof:
+                break
+        else:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer):
+                if buffer[position] == ']':
+                    return
+                try:
+                    feature, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError as e:
+                    if eof:
+                        raise ValueError(f"Malformed GeoJSON after feature {number}: {e}")
+                    feature = None
+                if feature is not None:
+                    number += 1
+                    yield number, _safe_record(feature)
+                    buffer, position = buffer[end:], 0
+                    continue
+            elif eof:
+                raise ValueError("GeoJSON features array is not closed")
+
+        chunk = stream.read(READ_CHUNK)
+        if not chunk:
+            eof = True
+        buffer += chunk
+
+    # No "features" array: a single Feature (or geometry) document
+    try:
+        document = json.loads(buffer)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Malformed GeoJSON: {e}")
+    yield 1, _safe_record(document)
+
+
+def iter_geojsonseq(stream):
+    """
+    One Feature per line (newline-delimited or RFC 8142 text sequences, as written by export_data).
+    """
+    for number, line in enumerate(stream, start=1):
+        line = line.strip().lstrip('\x1e')
+        if not line:
+            continue
+        try:
+            feature = json.loads(line)
+        except ValueError as e:
+            yield number, ValueError(f"Malformed JSON: {e}")
+            continue
+        yield number, _safe_record(feature)
+
+
+def iter_records(stream, fmt: str):
+    if fmt == 'csv':
+        return iter_csv(stream)
+    if fmt == 'geojson':
+        return iter_geojson(stream)
+    if fmt == 'geojsonseq':
+        return iter_geojsonseq(stream)
+    raise ValueError(f"Unknown format '{fmt}' (choose from {', '.join(FORMATS)})")
+
+
+def _safe_record(feature):
+    # An invalid feature is reported by the importer without stopping the stream
+    try:
+        return _feature_record(feature)
+    except (ValueError, TypeError, IndexError) as e:
+        return ValueError(str(e) or "Invalid geometry")
+
+
+def _feature_record(feature) -> dict:
+    """
+    Center and radius of the circle enclosing a feature's geometry (the AOI model is a circle).
+    Points keep their 'radius_km' property, or get the importer's default radius.
+    """
+    if not isinstance(feature, dict):
+        raise ValueError("Feature is not an object")
+    geometry = feature.get('geometry') if feature.get('type') == 'Feature' else feature
+    properties = (feature.get('properties') or {}) if feature.get('type') == 'Feature' else {}
+    if not isinstance(geometry, dict) or 'coordinates' not in geometry:
+        raise ValueError("Feature has no geometry coordinates")
+
+    points = list(_positions(geometry['coordinates']))
+    if not points:
+        raise ValueError("Geometry has no positions")
+
+    record = {
+        'name': properties.get('name') or properties.get('NAME') or feature.get('id'),
+        'radius_km': properties.get('radius_km'),
+        'precision': properties.get('precision'),
+    }
+    if len(points) == 1:
+        record['longitude'], record['latitude'] = points[0]
+        return record
+
+    lons = [lon for lon, _ in points]
+    if max(lons) - min(lons) > 180: # Crosses the antimeridian
+        lons = [lon + 360 if lon < 0 else lon for lon in lons]
+    lats = [lat for _, lat in points]
+    center_lat = (min(lats) + max(lats)) / 2.0
+    center_lon = (min(lons) + max(lons)) / 2.0
+    radius_m = max(haversine_m(center_lat, center_lon, lat, lon) for lon, lat in zip(lons, lats))
+    record.update({
+        'latitude': center_lat,
+        'longitude': center_lon - 360 if center_lon > 180 else center_lon,
+        'radius_km': max(radius_m / 1000.0, 0.1),
+    })
+    return record
+
+
+def _positions(coordinates):
+    if isinstance(coordinates, (list, tuple)) and coordinates and isinstance(coordinates[0], (int, float)):
+        yield float(coordinates[0]), float(coordinates[1])
+        return
+    for part in coordinates or []:
+        yield from _positions(part)
+
+
+class SpatialHash:
+    """
+    Finds AOIs whose centers lie within a distance of a point.
+
+    Centers are bucketed on a grid over their 3D unit vectors (cell edge = the distance),
+    so a query only looks at the 27 neighbouring cells. Working in 3D avoids the longitude
+    distortion of a lat/lon grid near the poles and across the antimeridian.
+    """
+
+    def __init__(self, meters: float):
+        self.meters = meters
+        self.cell = meters / EARTH_RADIUS_M
+        self.cells = {}
+
+    def _vector(self, lat, lon):
+        phi, lmb = math.radians(lat), math.radians(lon)
+        return math.cos(phi) * math.cos(lmb), math.cos(phi) * math.sin(lmb), math.sin(phi)
+
+    def _key(self, vector):
+        return tuple(int(math.floor(c / self.cell)) for c in vector)
+
+    def add(self, lat, lon, label):
+        self.cells.setdefault(self._key(self._vector(lat, lon)), []).append((lat, lon, label))
+
+    def nearest(self, lat, lon):
+        """
+        Returns (distance in meters, label) of the closest center within the distance, or None.
+        """
+        kx, ky, kz = self._key(self._vector(lat, lon))
+        best = None
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for dz in (-1, 0, 1):
+                    for other_lat, other_lon, label in self.cells.get((kx + dx, ky + dy, kz + dz), ()):
+                        distance = haversine_m(lat, lon, other_lat, other_lon)
+                        if distance <= self.meters and (best is None or distance < best[0]):
+                            best = (distance, label)
+        return best
+
+
+class AOIImporter:
+    """
+    Validates parsed records and creates AreaOfInterest rows in batches.
+
+    Each batch of batch_size valid records is written with one bulk_create inside its own
+    transaction, so a failure keeps the batches already imported. Records whose center is
+    within duplicate_meters of an existing AOI or of an earlier record of the same file are
+    reported as duplicates and skipped (or imported anyway with on_duplicate='keep').
+    """
+
+    def __init__(self, radius_km: float = None, duplicate_meters: float = None, on_duplicate: str = 'skip',
+                 batch_size: int = None, dry_run: bool = False, max_radius_km: float = None):
+        if on_duplicate not in ('skip', 'keep'):
+            raise ValueError("on_duplicate must be 'skip' or 'keep'")
+        self.radius_km = radius_km or 10.0
+        self.duplicate_meters = duplicate_meters if duplicate_meters is not None else getattr(settings, 'SILVAGUARD_IMPORT_DUPLICATE_METERS', 100.0)
+        self.max_radius_km = max_radius_km or getattr(settings, 'SILVAGUARD_IMPORT_MAX_RADIUS_KM', 200.0)
+        self.on_duplicate = on_duplicate
+        self.batch_size = batch_size or getattr(settings, 'SILVAGUARD_IMPORT_BATCH_SIZE', 1000)
+        self.dry_run = dry_run
+
+    def validate(self, number: int, record: dict):
+        """
+        Returns a dict of model field values; raises ValueError with a readable message.
+        """
+        try:
+            latitude = float(record.get('latitude'))
+            longitude = float(record.get('longitude'))
+        except (TypeError, ValueError):
+            raise ValueError("latitude and longitude must be numbers")
+        if not (math.isfinite(latitude) and math.isfinite(longitude)):
+            raise ValueError("latitude and longitude must be finite")
+        if not -90.0 <= latitude <= 90.0:
+            raise ValueError(f"latitude {latitude} is outside [-90, 90]")
+        if not -180.0 <= longitude <= 180.0:
+            raise ValueError(f"longitude {longitude} is outside [-180, 180]")
+
+        radius = record.get('radius_km')
+        try:
+            radius_km = float(radius) if radius not in (None, '') else self.radius_km
+        except (TypeError, ValueError):
+            raise ValueError("radius_km must be a number")
+        if not 0.0 < radius_km <= self.max_radius_km:
+            raise ValueError(f"radius_km {radius_km} is outside (0, {self.max_radius_km}]")
+
+        precision = str(record.get('precision') or '').strip() # GeoJSON properties need not be strings
+        if precision and precision not in _PRECISIONS:
+            raise ValueError(f"precision '{precision}' is not one of {', '.join(sorted(_PRECISIONS))}")
+
+        name = str(record.get('name') or '').strip() or f"Imported AOI {number}"
+        return {'name': name[:100], 'latitude': latitude, 'longitude': longitude,
+                'radius_km': radius_km, 'precision': precision}
+
+    def run(self, records) -> dict:
+        """
+        Consumes (number, record or exception) pairs from one of the parsers.
+
+        Returns:
+            dict: counts (read, created, invalid, duplicates), the first errors and duplicates,
+            elapsed seconds and records per second.
+        """
+        from .models import AreaOfInterest
+
+        started = time.perf_counter()
+        report = {'read': 0, 'created': 0, 'invalid': 0, 'duplicates': 0, 'errors': [], 'duplicate_samples': []}
+
+        index = SpatialHash(self.duplicate_meters) if self.duplicate_meters > 0 else None
+        if index is not None:
+            for pk, name, lat, lon in AreaOfInterest.objects.values_list('id', 'name', 'latitude', 'longitude').iterator(chunk_size=5000):
+                index.add(lat, lon, f"AOI {pk} '{name}'")
+
+        batch = []
+        try:
+            for number, record in records:
+                report['read'] += 1
+                try:
+                    if isinstance(record, Exception):
+                        raise record
+                    fields = self.validate(number, record)
+                except ValueError as e:
+                    report['invalid'] += 1
+                    if len(report['errors']) < MAX_REPORTED:
+                        report['errors'].append({'record': number, 'error': str(e)})
+                    continue
+
+                match = index.nearest(fields['latitude'], fields['longitude']) if index is not None else None
+                if match is not None:
+                    report['duplicates'] += 1
+                    if len(report['duplicate_samples']) < MAX_REPORTED:
+                        report['duplicate_samples'].append({
+                            'record': number, 'name': fields['name'],
+                            'near': match[1], 'distance_m': round(match[0], 1),
+                        })
+                    if self.on_duplicate == 'skip':
+                        continue
+                if index is not None:
+                    index.add(fields['latitude'], fields['longitude'], f"record {number} '{fields['name']}'")
+
+                batch.append(AreaOfInterest(**fields))
+                if len(batch) >= self.batch_size:
+                    report['created'] += self._write(batch)
+                    batch = []
+        except ValueError as e:
+            # The file itself is unreadable past this point; keep what was imported
+            report['errors'].append({'record': None, 'error': str(e)})
+            report['aborted'] = True
+
+        if batch:
+            report['created'] += self._write(batch)
+        if report['created'] and not self.dry_run:
+            from .versioning import bump
+            bump('map-data', 'aois') # bulk_create skips the post_save version signals
+
+        report['seconds'] = round(time.perf_counter() - started, 3)
+        report['records_per_second'] = round(report['read'] / report['seconds'], 1) if report['seconds'] else None
+        return report
+
+    def _write(self, batch: list) -> int:
+        if self.dry_run:
+            return len(batch)
+        from .models import AreaOfInterest
+        with transaction.atomic():
+            AreaOfInterest.objects.bulk_create(batch, batch_size=self.batch_size)
+        return len(batch)
@@ -0,0 +1,172 @@
+import ast
+import ee
+import numpy as np
+
+# Sentinel-2 L2A bands behind each expression variable
+SENTINEL2_BANDS = {
+    'BLUE': 'B2',
+    'GREEN': 'B3',
+    'RED': 'B4',
+    'NIR': 'B8',
+    'SWIR1': 'B11',
+    'SWIR2': 'B12',
+}
+
+# S2_SR_HARMONIZED stores surface reflectance scaled by 10000
+REFLECTANCE_SCALE = 0.0001
+
+# Scene Classification (SCL) classes excluded from statistics: cloud shadow, clouds, cirrus
+SCL_MASKED_CLASSES = [3, 8, 9, 10]
+
+INDEX_EXPRESSIONS = {
+    'NDVI': '(NIR - RED) / (NIR + RED)',
+    'EVI': '2.5 * (NIR - RED) / (NIR + 6 * RED - 7.5 * BLUE + 1)',
+    'SAVI': '1.5 * (NIR - RED) / (NIR + RED + 0.5)',
+    'NBR': '(NIR - SWIR2) / (NIR + SWIR2)',
+}
+
+STATISTICS = ['mean', 'min', 'max', 'stddev']
+
+# Binary operators of the expressions, on NumPy arrays and on ee.Image
+NUMPY_OPERATORS = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.divide}
+EE_OPERATORS = {
+    ast.Add: lambda a, b: a.add(b),
+    ast.Sub: lambda a, b: a.subtract(b),
+    ast.Mult: lambda a, b: a.multiply(b),
+    ast.Div: lambda a, b: a.divide(b),
+}
+
+
+class SpectralIndexEngine:
+    """
+    Evaluates spectral index expressions from Sentinel-2 bands.
+
+    Expressions are parsed once into a small arithmetic AST, which is then walked twice:
+    into ee.Image operations server-side and into vectorized NumPy operations on local
+    band rasters (chips stored with SILVAGUARD_CHIP_STORE_BANDS). Both paths come from the
+    same tree, so they always agree on the index definitions.
+    """
+
+    def __init__(self, indices: list = None):
+        self.indices = list(indices or INDEX_EXPRESSIONS.keys())
+        self.trees = {name: self._parse(INDEX_EXPRESSIONS[name]) for name in self.indices}
+
+    def _parse(self, expression: str):
+        tree = ast.parse(expression, mode='eval')
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name) and node.id not in SENTINEL2_BANDS:
+                raise ValueError(f"Unknown band variable '{node.id}' in '{expression}'")
+            if not isinstance(node, (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Name, ast.Load,
+                                     ast.Add, ast.Sub, ast.Mult, ast.Div, ast.USub, ast.UAdd)):
+                raise ValueError(f"Unsupported syntax {type(node).__name__} in '{expression}'")
+        return tree
+
+    def variables(self) -> list:
+        """
+        Band variables needed by the configured indices.
+        """
+        names = set()
+        for tree in self.trees.values():
+            names.update(node.id for node in ast.walk(tree) if isinstance(node, ast.Name))
+        return sorted(names)
+
+    # --- Earth Engine ---
+
+    def ee_image(self, s2_image):
+        """
+        Returns a multi-band ee.Image with one band per index, clouds masked through SCL.
+        """
+        scl = s2_image.select('SCL')
+        clear = scl.remap(SCL_MASKED_CLASSES, [0] * len(SCL_MASKED_CLASSES), 1)
+        reflectance = s2_image.multiply(REFLECTANCE_SCALE).updateMask(clear)
+        bands = {name: reflectance.select(SENTINEL2_BANDS[name]) for name in self.variables()}
+
+        return ee.Image.cat([
+            self._walk(tree.body, bands, ee.Image.constant, EE_OPERATORS).rename(name)
+            for name, tree in self.trees.items()
+        ])
+
+    def ee_statistics(self, gee_asset_id: str, region=None, reduction: dict = None):
+        """
+        Builds the per-index statistics of a scene as a single combined reduction (not evaluated).
+        """
+        s2_image = ee.Image(gee_asset_id)
+        region = region if region else s2_image.geometry()
+        reducer = ee.Reducer.mean() \
+            .combine(ee.Reducer.minMax(), sharedInputs=True) \
+            .combine(ee.Reducer.stdDev(), sharedInputs=True)
+
+        return self.ee_image(s2_image).reduceRegion(
+            reducer=reducer,
+            geometry=region,
+            **(reduction or {'scale': 10, 'maxPixels': 1e12})
+        )
+
+    def format_statistics(self, stats: dict) -> dict:
+        """
+        Converts evaluated reduceRegion output ('NDVI_mean', 'NDVI_stdDev', ...) into
+        {'NDVI': {'mean': ..., 'min': ..., 'max': ..., 'stddev': ...}, ...}.
+        """
+        keys = {'mean': 'mean', 'min': 'min', 'max': 'max', 'stddev': 'stdDev'}
+        return {
+            name: {stat: stats.get(f"{name}_{suffix}") for stat, suffix in keys.items()}
+            for name in self.indices
+        }
+
+    # --- Local (NumPy) ---
+
+    def evaluate_local(self, bands: dict) -> dict:
+        """
+        Evaluates every index on local rasters.
+
+        Args:
+            bands: Reflectance arrays (0-1) keyed by variable name ('RED', 'NIR', ...).
+
+        Returns:
+            dict: Index name -> float array (NaN where undefined).
+        """
+        missing = set(self.variables()) - set(bands)
+        if missing:
+            raise ValueError(f"Missing bands: {', '.join(sorted(missing))}")
+
+        arrays = {name: np.asarray(value, dtype=np.float64) for name, value in bands.items()}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            results = {name: self._walk(tree.body, arrays, float, NUMPY_OPERATORS) for name, tree in self.trees.items()}
+        return {name: np.where(np.isfinite(value), value, np.nan) for name, value in results.items()}
+
+    def local_statistics(self, bands: dict, mask: np.ndarray = None) -> dict:
+        """
+        Same output as format_statistics, computed from local rasters.
+        """
+        results = {}
+        for name, values in self.evaluate_local(bands).items():
+            if mask is not None:
+                values = values[mask]
+            values = values[~np.isnan(values)]
+            if values.size == 0:
+                results[name] = {stat: None for stat in STATISTICS}
+                continue
+            results[name] = {
+                'mean': float(values.mean()),
+                'min': float(values.min()),
+                'max': float(values.max()),
+                'stddev': float(values.std()),
+            }
+        return results
+
+    def _walk(self, node, variables: dict, constant, operators: dict):
+        """
+        Evaluates a parsed expression node: names come from variables, numbers go through constant().
+        """
+        if isinstance(node, ast.Constant):
+            return constant(float(node.value))
+        if isinstance(node, ast.Name):
+            return variables[node.id]
+        if isinstance(node, ast.UnaryOp):
+            operand = self._walk(node.operand, variables, constant, operators)
+            if isinstance(node.op, ast.USub):
+                return operators[ast.Mult](constant(-1.0), operand)
+            return operand
+        left = self._walk(node.left, variables, constant, operators)
+        right = self._walk(node.right, variables, constant, operators)
+        return operators[type(node.op)](left, right)
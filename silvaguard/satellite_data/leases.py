@@ -0,0 +1,103 @@
+import os
+import socket
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from .db import write_transaction
+
+
+def default_worker_id() -> str:
+    """
+    Identifies this worker process as host:pid.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaseManager:
+    """
+    Claims, heartbeats and releases per-AOI leases stored in the database.
+
+    Claims use select_for_update(skip_locked=True), so concurrent workers never
+    block on (or both obtain) the same AOI. On SQLite, which has no row locks, claims
+    take the database write lock instead (write_transaction).
+    """
+
+    def __init__(self, owner: str = None, ttl_seconds: int = None):
+        self.owner = owner or default_worker_id()
+        self.ttl = timedelta(seconds=ttl_seconds or getattr(settings, 'SILVAGUARD_LEASE_SECONDS', 600))
+        self.min_interval = timedelta(minutes=getattr(settings, 'SILVAGUARD_PULSE_MIN_INTERVAL_MINUTES', 60))
+
+    def ensure_leases(self):
+        """
+        Creates a free lease row for every AOI that does not have one yet.
+        """
+        from .models import AreaOfInterest, AOILease
+
+        missing = AreaOfInterest.objects.filter(lease__isnull=True).values_list('id', flat=True)
+        AOILease.objects.bulk_create([AOILease(aoi_id=aoi_id) for aoi_id in missing], ignore_conflicts=True)
+
+    def claim_next(self, completed_before=None, aoi_ids=None):
+        """
+        Claims the next free or expired AOI lease.
+
+        Args:
+            completed_before: Skip AOIs completed at or after this time (i.e. already done in this pulse),
+                and AOIs any worker completed within SILVAGUARD_PULSE_MIN_INTERVAL_MINUTES: workers
+                start their pulses at different times, so their own start alone would pulse an AOI
+                twice per cycle.
+            aoi_ids: Optionally restrict the claim to these AOIs.
+
+        Returns:
+            AreaOfInterest or None when there is nothing left to claim.
+        """
+        from .models import AOILease
+
+        now = timezone.now()
+        with write_transaction():
+            leases = AOILease.objects.select_for_update(skip_locked=True).filter(
+                Q(owner='') | Q(expires_at__isnull=True) | Q(expires_at__lt=now)
+            )
+            if completed_before is not None:
+                cutoff = min(completed_before, now - self.min_interval)
+                leases = leases.filter(Q(completed_at__isnull=True) | Q(completed_at__lt=cutoff))
+            if aoi_ids is not None:
+                leases = leases.filter(aoi_id__in=aoi_ids)
+
+            lease = leases.order_by('completed_at', 'aoi_id').first()
+            if lease is None:
+                return None
+
+            lease.owner = self.owner
+            lease.claimed_at = now
+            lease.heartbeat_at = now
+            lease.expires_at = now + self.ttl
+            lease.save(update_fields=['owner', 'claimed_at', 'heartbeat_at', 'expires_at'])
+
+        return lease.aoi
+
+    def heartbeat(self, aoi) -> bool:
+        """
+        Extends our lease on an AOI.
+
+        Returns:
+            bool: False if the lease is no longer ours (it expired and was claimed elsewhere).
+        """
+        from .models import AOILease
+
+        now = timezone.now()
+        updated = AOILease.objects.filter(aoi=aoi, owner=self.owner).update(
+            heartbeat_at=now, expires_at=now + self.ttl
+        )
+        return updated == 1
+
+    def release(self, aoi, completed: bool = True):
+        """
+        Frees our lease on an AOI, recording completion time if the pulse finished.
+        """
+        from .models import AOILease
+
+        fields = {'owner': '', 'expires_at': None}
+        if completed:
+            fields['completed_at'] = timezone.now()
+        AOILease.objects.filter(aoi=aoi, owner=self.owner).update(**fields)
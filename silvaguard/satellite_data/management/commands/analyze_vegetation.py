@@ -1,12 +1,17 @@
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from satellite_data.models import ProcessedImage, VegetationAnalysis
 from satellite_data.analysis import VegetationAnalyzer
+from satellite_data.chips import ChipStore
+from satellite_data.gee_utils import aoi_region
+from satellite_data.profiling import ProfilingMixin, span
 
-class Command(BaseCommand):
+class Command(ProfilingMixin, BaseCommand):
     help = 'Performs vegetation analysis on GEE images'
 
     def handle(self, *args, **options):
         analyzer = VegetationAnalyzer()
+        chips = ChipStore() if getattr(settings, 'SILVAGUARD_CHIP_STORE_ENABLED', True) else None
         
         # Get processed images that don't have analysis yet or have the placeholder
         items = ProcessedImage.objects.filter(
@@ -25,33 +30,50 @@ class Command(BaseCommand):
 
             self.stdout.write(f"Analyzing GEE Asset: {img.gee_id}")
             
-            try:
-                # Perform GEE Analysis
-                result = analyzer.analyze_gee_image(img.gee_id)
-                tile_url = analyzer.generate_heatmap(img.gee_id)
-                
-                # Get or create to handle updates
-                analysis, created = VegetationAnalysis.objects.get_or_create(
-                    processed_image=item,
-                    defaults={
-                        'mean_ndvi': result['mean_ndvi'] if result['mean_ndvi'] else 0.0,
-                        'forest_cover_percentage': result['forest_percentage'],
-                        'heatmap_file_path': tile_url
-                    }
-                )
-                
-                if not created:
-                    analysis.mean_ndvi = result['mean_ndvi'] if result['mean_ndvi'] else 0.0
-                    analysis.forest_cover_percentage = result['forest_percentage']
-                    analysis.heatmap_file_path = tile_url
-                    analysis.save()
-
-                self.stdout.write(f"  - Analysis complete. Forest Cover: {result['forest_percentage']:.2f}%")
-                if tile_url:
-                    self.stdout.write(f"  - Tile URL generated.")
-
-                
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"  - Error: {e}"))
+            with span('scene', aoi_id=img.aoi_id, image_id=img.image_id):
+                try:
+                    # Perform GEE Analysis over the AOI footprint
+                    region = aoi_region(img.aoi.latitude, img.aoi.longitude, img.aoi.radius_km)
+                    reduction = analyzer.policy.params_for_aoi(img.aoi)
+                    # A stored chip of the scene answers without a reduction
+                    result = chips.analyze(img) if chips else None
+                    if not (result and result['histogram']):
+                        result = analyzer.analyze_gee_image(img.gee_id, region, reduction=reduction)
+                    tile_url = analyzer.generate_heatmap(img.gee_id)
+
+                    # Get or create to handle updates
+                    analysis, created = VegetationAnalysis.objects.get_or_create(
+                        processed_image=item,
+                        defaults={
+                            'mean_ndvi': result['mean_ndvi'] if result['mean_ndvi'] else 0.0,
+                            'forest_cover_percentage': result['forest_percentage'],
+                            'tree_histogram': result['histogram'] or None,
+                            'forest_threshold': result['threshold'],
+                            'reduction_scale': result['scale'],
+                            'heatmap_file_path': tile_url
+                        }
+                    )
+
+                    if not created:
+                        analysis.mean_ndvi = result['mean_ndvi'] if result['mean_ndvi'] else 0.0
+                        analysis.forest_cover_percentage = result['forest_percentage']
+                        analysis.tree_histogram = result['histogram'] or None
+                        analysis.forest_threshold = result['threshold']
+                        analysis.reduction_scale = result['scale']
+                        analysis.heatmap_file_path = tile_url
+                        analysis.save()
+
+                    index_stats = analyzer.compute_indices(img.gee_id, region, reduction=reduction)
+                    analyzer.save_indices(analysis, index_stats, reduction['scale'])
+                    if index_stats.get('NDVI', {}).get('mean') is not None:
+                        self.stdout.write(f"  - NDVI: {index_stats['NDVI']['mean']:.3f}  EVI: {index_stats['EVI']['mean'] or 0:.3f}")
+
+                    self.stdout.write(f"  - Analysis complete. Forest Cover: {result['forest_percentage']:.2f}% @ {result['scale']}m")
+                    if tile_url:
+                        self.stdout.write(f"  - Tile URL generated.")
+
+
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f"  - Error: {e}"))
 
         self.stdout.write(self.style.SUCCESS("GGE Analysis complete."))
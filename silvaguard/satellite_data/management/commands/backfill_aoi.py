@@ -0,0 +1,88 @@
+import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from satellite_data.models import AreaOfInterest, BackfillChunk
+from satellite_data.backfill import BackfillRunner, plan_job, format_duration
+from satellite_data.profiling import ProfilingMixin
+
+class Command(ProfilingMixin, BaseCommand):
+    help = 'Builds the multi-year forest history of an AOI in resumable date chunks (discovery, analysis, pairwise loss)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('aoi', type=int, help='AOI id')
+        parser.add_argument('--start', type=str, default=None, help='First day YYYY-MM-DD (default: --years before --end)')
+        parser.add_argument('--end', type=str, default=None, help='Day after the last one YYYY-MM-DD (default: today)')
+        parser.add_argument('--years', type=int, default=3, help='Range length when --start is not given (default: 3)')
+        parser.add_argument('--chunk-days', type=int, default=30, help='Days per chunk (default: 30)')
+        parser.add_argument('--max-cloud', type=float, default=20.0, help='Maximum cloud cover percentage allowed (default: 20.0)')
+        parser.add_argument('--workers', type=int, default=4, help='Chunks processed in parallel (default: 4)')
+        parser.add_argument(
+            '--qps',
+            type=float,
+            default=None,
+            help='Earth Engine requests started per second, 0 for no limit (default: SILVAGUARD_EE_MAX_QPS)'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=None,
+            help='Earth Engine requests in flight at once (default: SILVAGUARD_EE_MAX_CONCURRENT)'
+        )
+        parser.add_argument('--retry-failed', action='store_true', help='Give chunks that used up their attempts another try')
+        parser.add_argument('--status', action='store_true', help='Show the job progress without running it')
+
+    def handle(self, *args, **options):
+        from satellite_data.quota import RequestQuota
+
+        try:
+            aoi = AreaOfInterest.objects.get(pk=options['aoi'])
+        except AreaOfInterest.DoesNotExist:
+            raise CommandError(f"AOI {options['aoi']} does not exist")
+
+        end = datetime.date.fromisoformat(options['end']) if options['end'] else timezone.now().date()
+        if options['start']:
+            start = datetime.date.fromisoformat(options['start'])
+        else:
+            start = end - datetime.timedelta(days=round(365.25 * options['years']))
+        if start >= end or options['chunk_days'] < 1:
+            raise CommandError("The range must be non-empty and --chunk-days at least 1")
+
+        job, created = plan_job(aoi, start, end, options['chunk_days'], options['max_cloud'])
+        verb = "Planned" if created else "Resuming"
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"🕰️ {verb} backfill of {aoi.name}: {start} - {end} in {job.chunks.count()} chunks of {job.chunk_days} days"
+        ))
+        if not created and job.max_cloud != options['max_cloud']:
+            self.stdout.write(self.style.WARNING(f"  - Keeping the job's cloud limit of {job.max_cloud}%"))
+
+        if options['retry_failed']:
+            reset = job.chunks.filter(state=BackfillChunk.STATE_FAILED).update(attempts=0)
+            self.stdout.write(f"  - {reset} failed chunks get new attempts")
+
+        if options['status']:
+            for state, label in BackfillChunk.STATE_CHOICES:
+                self.stdout.write(f"  - {label}: {job.chunks.filter(state=state).count()}")
+            for chunk in job.chunks.filter(state=BackfillChunk.STATE_FAILED):
+                self.stdout.write(self.style.ERROR(f"  - {chunk}: {chunk.last_error} ({chunk.attempts} attempts)"))
+            return
+
+        from satellite_data.services import SilvaGuardOrchestrator
+
+        qps = options['qps'] if options['qps'] is not None else getattr(settings, 'SILVAGUARD_EE_MAX_QPS', 10)
+        concurrency = options['concurrency'] or getattr(settings, 'SILVAGUARD_EE_MAX_CONCURRENT', 8)
+        runner = BackfillRunner(job, SilvaGuardOrchestrator(), workers=options['workers'], progress=self.stdout.write)
+        with RequestQuota(rate=qps, concurrency=concurrency) as quota:
+            totals = runner.run()
+
+        job.refresh_from_db()
+        style = self.style.SUCCESS if job.state == job.STATE_DONE else self.style.WARNING
+        self.stdout.write(style(
+            f"\n✅ Backfill {job.state}: {totals['chunks_done']}/{totals['chunks']} chunks done, "
+            f"{totals['chunks_failed']} failed, in {format_duration(totals['seconds'])}"
+        ))
+        self.stdout.write(f"  - Scenes found: {totals['scenes_found']}, analyzed: {totals['scenes_analyzed']}")
+        self.stdout.write(f"  - Pairs checked: {totals['pairs_checked']}, alerts created: {totals['alerts_created']}")
+        self.stdout.write(f"  - Earth Engine requests: {quota.requests} ({quota.waited_seconds:.1f}s waiting for quota)")
+        if job.state != job.STATE_DONE:
+            self.stdout.write("  - Run the same command again to resume")
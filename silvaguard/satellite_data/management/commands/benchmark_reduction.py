@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from satellite_data.models import AreaOfInterest, SatelliteImage
+from satellite_data.analysis import VegetationAnalyzer
+from satellite_data.reduction import PRECISION_PROFILES, benchmark_policy
+
+class Command(BaseCommand):
+    help = 'Benchmarks the adaptive reduction policy against native-resolution analysis for sample AOIs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--aoi',
+            type=int,
+            action='append',
+            dest='aoi_ids',
+            help='AOI id to benchmark (repeatable). Defaults to the first --samples AOIs.'
+        )
+        parser.add_argument(
+            '--samples',
+            type=int,
+            default=3,
+            help='Number of AOIs to sample when --aoi is not given (default: 3)'
+        )
+        parser.add_argument(
+            '--precision',
+            choices=list(PRECISION_PROFILES.keys()),
+            default=None,
+            help='Precision target to benchmark (default: per-AOI / global setting)'
+        )
+
+    def handle(self, *args, **options):
+        analyzer = VegetationAnalyzer()
+
+        aois = AreaOfInterest.objects.all().order_by('id')
+        if options['aoi_ids']:
+            aois = aois.filter(id__in=options['aoi_ids'])
+        else:
+            aois = aois[:options['samples']]
+
+        results = []
+        for aoi in aois:
+            image = SatelliteImage.objects.filter(aoi=aoi, gee_id__isnull=False).order_by('-acquisition_date').first()
+            if not image:
+                self.stdout.write(self.style.WARNING(f"Skipping {aoi.name}: no GEE scene registered."))
+                continue
+
+            self.stdout.write(f"Benchmarking {aoi.name} ({aoi.radius_km} km) on {image.gee_id}...")
+            row = benchmark_policy(analyzer, aoi, image.gee_id, precision=options['precision'])
+            results.append(row)
+
+            speedup = row['reference_seconds'] / row['candidate_seconds'] if row['candidate_seconds'] else 0.0
+            self.stdout.write(
+                f"  - scale={row['scale']}m tileScale={row['tile_scale']} bestEffort={row['best_effort']}"
+            )
+            self.stdout.write(
+                f"  - Forest Cover: {row['forest_pct_candidate']:.2f}% vs {row['forest_pct_reference']:.2f}% native "
+                f"(error {row['forest_pct_error']:.2f} pts, tree prob error {row['mean_prob_error']:.4f})"
+            )
+            self.stdout.write(
+                f"  - Latency: {row['candidate_seconds']:.2f}s vs {row['reference_seconds']:.2f}s native ({speedup:.1f}x)"
+            )
+
+        if results:
+            worst = max(r['forest_pct_error'] for r in results)
+            mean = sum(r['forest_pct_error'] for r in results) / len(results)
+            self.stdout.write(self.style.SUCCESS(
+                f"\nBenchmarked {len(results)} AOIs. Forest cover error: mean {mean:.2f} pts, worst {worst:.2f} pts."
+            ))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from satellite_data.models import DeforestationAlert
+from satellite_data.reports import AlertReportBuilder
+
+class Command(BaseCommand):
+    help = 'Builds the precomputed report bundles of deforestation alerts from local rasters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--alert',
+            type=int,
+            default=None,
+            help='Only build the report of this alert id'
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Rebuild reports that already exist'
+        )
+
+    def handle(self, *args, **options):
+        alerts = DeforestationAlert.objects.all().order_by('id')
+        if options['alert']:
+            alerts = alerts.filter(id=options['alert'])
+        elif not options['rebuild']:
+            alerts = alerts.filter(report_bundle__isnull=True)
+
+        builder = AlertReportBuilder()
+        built = failed = 0
+        for alert in alerts.only('id').iterator():
+            if builder.build(alert) is None:
+                failed += 1
+            else:
+                built += 1
+                self.stdout.write(f"  - Report built for alert {alert.id}")
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {built} reports built, {failed} failed."))
@@ -2,9 +2,10 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 from satellite_data.models import AreaOfInterest, SatelliteImage
 from satellite_data.services import Sentinel2Service
+from satellite_data.profiling import ProfilingMixin, span
 from datetime import timedelta
 
-class Command(BaseCommand):
+class Command(ProfilingMixin, BaseCommand):
     help = 'Collects satellite image metadata for all defined Areas of Interest'
 
     def add_arguments(self, parser):
@@ -42,43 +43,44 @@ class Command(BaseCommand):
         for aoi in aois:
             self.stdout.write(f"Processing AOI: {aoi.name}...")
             
-            try:
-                images_metadata = service.fetch_metadata(
-                    aoi_lat=aoi.latitude,
-                    aoi_lon=aoi.longitude,
-                    start_date=start_date,
-                    end_date=end_date,
-                    max_cloud_cover=max_cloud
-                )
-
-                new_images_count = 0
-                for meta in images_metadata:
-                    # detailed metadata can be stored in the JSONField
-                    extra_data = {
-                        'platform': meta.get('platform'),
-                        'processing_level': meta.get('processing_level')
-                    }
+            with span('aoi', aoi_id=aoi.id, aoi=aoi.name):
+                try:
+                    images_metadata = service.fetch_metadata(
+                        aoi_lat=aoi.latitude,
+                        aoi_lon=aoi.longitude,
+                        start_date=start_date,
+                        end_date=end_date,
+                        max_cloud_cover=max_cloud
+                    )
 
-                    # Create record if it doesn't exist
-                    obj, created = SatelliteImage.objects.get_or_create(
-                        image_id=meta['image_id'],
-                        defaults={
-                            'aoi': aoi,
-                            'acquisition_date': meta['acquisition_date'],
-                            'cloud_coverage': meta['cloud_coverage'],
-                            'satellite_name': meta['satellite_name'],
-                            'gee_id': meta.get('gee_id'), # Save GEE Asset ID
-                            'metadata_json': extra_data
+                    new_images_count = 0
+                    for meta in images_metadata:
+                        # detailed metadata can be stored in the JSONField
+                        extra_data = {
+                            'platform': meta.get('platform'),
+                            'processing_level': meta.get('processing_level')
                         }
-                    )
-                    
-                    if created:
-                        new_images_count += 1
 
-                self.stdout.write(self.style.SUCCESS(f"  - Found {len(images_metadata)} images, {new_images_count} new."))
-                total_new_images += new_images_count
+                        # Create record if it doesn't exist
+                        obj, created = SatelliteImage.objects.get_or_create(
+                            aoi=aoi,
+                            image_id=meta['image_id'],
+                            defaults={
+                                'acquisition_date': meta['acquisition_date'],
+                                'cloud_coverage': meta['cloud_coverage'],
+                                'satellite_name': meta['satellite_name'],
+                                'gee_id': meta.get('gee_id'), # Save GEE Asset ID
+                                'metadata_json': extra_data
+                            }
+                        )
+
+                        if created:
+                            new_images_count += 1
+
+                    self.stdout.write(self.style.SUCCESS(f"  - Found {len(images_metadata)} images, {new_images_count} new."))
+                    total_new_images += new_images_count
 
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"  - Error processing {aoi.name}: {str(e)}"))
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f"  - Error processing {aoi.name}: {str(e)}"))
 
         self.stdout.write(self.style.SUCCESS(f"\nCollection complete. Total new images saved: {total_new_images}"))
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from satellite_data.models import AreaOfInterest
+from satellite_data.retention import HistoryCompactor
+
+class Command(BaseCommand):
+    help = 'Rolls old per-scene analyses into monthly per-AOI aggregates and prunes old scenes (alert evidence is kept)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Compact scenes acquired more than this many days ago (default: SILVAGUARD_RETENTION_DAYS)'
+        )
+        parser.add_argument(
+            '--keep-latest',
+            type=int,
+            default=None,
+            help='Analyses kept per AOI regardless of age (default: SILVAGUARD_RETENTION_KEEP_LATEST)'
+        )
+        parser.add_argument(
+            '--aoi',
+            type=int,
+            default=None,
+            help='Only compact this AOI id'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be compacted without changing anything'
+        )
+
+    def handle(self, *args, **options):
+        compactor = HistoryCompactor(days=options['days'], keep_latest=options['keep_latest'], dry_run=options['dry_run'])
+        aois = AreaOfInterest.objects.all()
+        if options['aoi']:
+            aois = aois.filter(pk=options['aoi'])
+
+        mode = " (dry run)" if options['dry_run'] else ""
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"🗜️ Compacting history older than {compactor.cutoff.date()}{mode}..."
+        ))
+
+        totals = {'rolled_up': 0, 'pruned': 0, 'kept': 0, 'months': 0}
+        for aoi in aois:
+            results = compactor.compact_aoi(aoi)
+            if not any(results.values()):
+                continue
+            self.stdout.write(
+                f"  - {aoi.name}: {results['rolled_up']} scenes rolled into {results['months']} months, "
+                f"{results['pruned']} unanalyzed scenes pruned, {results['kept']} kept as evidence"
+            )
+            for key in totals:
+                totals[key] += results[key]
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Compaction complete{mode}: {totals['rolled_up']} rolled up, {totals['pruned']} pruned, {totals['kept']} kept."
+        ))
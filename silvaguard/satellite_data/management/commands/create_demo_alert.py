@@ -19,8 +19,9 @@ class Command(BaseCommand):
         
         # 1. Create Analysis "Before"
         img1, _ = SatelliteImage.objects.get_or_create(
+             aoi=aoi,
              image_id="DEMO_IMG_BEFORE",
-             defaults={'aoi': aoi, 'acquisition_date': timezone.now() - timezone.timedelta(days=30), 'cloud_coverage': 0.0}
+             defaults={'acquisition_date': timezone.now() - timezone.timedelta(days=30), 'cloud_coverage': 0.0}
         )
         proc1, _ = ProcessedImage.objects.get_or_create(satellite_image=img1, defaults={'processed_file_path': 'demo'})
         ana1, _ = VegetationAnalysis.objects.get_or_create(
@@ -30,8 +31,9 @@ class Command(BaseCommand):
         
         # 2. Create Analysis "After" (Loss)
         img2, _ = SatelliteImage.objects.get_or_create(
+             aoi=aoi,
              image_id="DEMO_IMG_AFTER",
-             defaults={'aoi': aoi, 'acquisition_date': timezone.now(), 'cloud_coverage': 0.0}
+             defaults={'acquisition_date': timezone.now(), 'cloud_coverage': 0.0}
         )
         proc2, _ = ProcessedImage.objects.get_or_create(satellite_image=img2, defaults={'processed_file_path': 'demo'})
         ana2, _ = VegetationAnalysis.objects.get_or_create(
@@ -40,12 +42,10 @@ class Command(BaseCommand):
         )
 
         # 3. Create Alert
-        Alert = DeforestationAlert.objects.create(
-            aoi=aoi,
+        Alert, _ = DeforestationAlert.objects.get_or_create(
             analysis_before=ana1,
             analysis_after=ana2,
-            forest_loss_hectares=150.5,
-            loss_percentage=37.5
+            defaults={'aoi': aoi, 'forest_loss_hectares': 150.5, 'loss_percentage': 37.5}
         )
         
         self.stdout.write(self.style.SUCCESS(f"Created Alert: {Alert}"))
@@ -2,11 +2,21 @@ from django.core.management.base import BaseCommand
 from satellite_data.models import AreaOfInterest, VegetationAnalysis, DeforestationAlert
 from satellite_data.detection import DeforestationDetector
 from satellite_data.analysis import VegetationAnalyzer
+from satellite_data.gee_utils import aoi_region
+from satellite_data.reports import AlertReportBuilder
+from satellite_data.profiling import ProfilingMixin, span
 import numpy as np
 
-class Command(BaseCommand):
+class Command(ProfilingMixin, BaseCommand):
     help = 'Detects deforestation by comparing vegetation analysis results over time'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all-pairs',
+            action='store_true',
+            help='Backfill alerts for every consecutive scene pair in one Earth Engine call per AOI'
+        )
+
     def handle(self, *args, **options):
         detector = DeforestationDetector()
         analyzer = VegetationAnalyzer()
@@ -17,49 +27,77 @@ class Command(BaseCommand):
             self.stdout.write(self.style.WARNING("No AOIs found."))
             return
 
+        if options['all_pairs']:
+            from satellite_data.services import SilvaGuardOrchestrator
+            orchestrator = SilvaGuardOrchestrator()
+            for aoi in aois:
+                self.stdout.write(f"Backfilling AOI: {aoi.name}...")
+                with span('aoi', aoi_id=aoi.id, aoi=aoi.name):
+                    results = orchestrator.backfill_alerts(aoi)
+                self.stdout.write(self.style.SUCCESS(
+                    f"  - Checked {results['pairs_checked']} pairs, {results['alerts_created']} alerts created."
+                ))
+            return
+
         for aoi in aois:
             self.stdout.write(f"Checking AOI: {aoi.name}...")
+            with span('aoi', aoi_id=aoi.id, aoi=aoi.name):
+                self.check_aoi(aoi, analyzer)
+
+    def check_aoi(self, aoi, analyzer):
+        """
+        Compares the two latest analyses of an AOI and creates an alert on significant loss.
+        """
+        # Get all analysis results sorted by date
+        analyses = VegetationAnalysis.objects.filter(
+            processed_image__satellite_image__aoi=aoi
+        ).order_by('processed_image__satellite_image__acquisition_date')
+        
+        count = analyses.count()
+        if count < 2:
+            self.stdout.write(f"  - Not enough data points ({count}). Need at least 2.")
+            return
             
-            # Get all analysis results sorted by date
-            analyses = VegetationAnalysis.objects.filter(
-                processed_image__satellite_image__aoi=aoi
-            ).order_by('processed_image__satellite_image__acquisition_date')
-            
-            count = analyses.count()
-            if count < 2:
-                self.stdout.write(f"  - Not enough data points ({count}). Need at least 2.")
-                continue
-                
-            # Real GEE Logic: Compare latest with previous
-            latest = analyses.last()
-            previous = analyses[count - 2]
-            
-            img_before = previous.processed_image.satellite_image.gee_id
-            img_after = latest.processed_image.satellite_image.gee_id
+        # Real GEE Logic: Compare latest with previous
+        latest = analyses.last()
+        previous = analyses[count - 2]
+        
+        img_before = previous.processed_image.satellite_image.gee_id
+        img_after = latest.processed_image.satellite_image.gee_id
 
-            if not img_before or not img_after:
-                continue
+        if not img_before or not img_after:
+            return
 
-            self.stdout.write(f"  - Comparing {previous.analysis_date.date()} vs {latest.analysis_date.date()}")
-            
-            # Detect Loss and calculate area via GEE
-            result = analyzer.calculate_forest_loss(img_before, img_after)
-            loss_ha = result['loss_ha']
-            loss_pct = result['loss_percentage']
-            
-            # Get Loss Tile URL
-            loss_tile_url = analyzer.get_loss_tile_url(img_before, img_after)
-            
-            self.stdout.write(f"  - Detected Loss: {loss_ha:.2f} ha ({loss_pct:.2f}%)")
-            
-            # Create Alert if loss is significant (e.g. > 0.1 hectare)
-            if loss_ha > 0.1:
-                DeforestationAlert.objects.create(
-                    aoi=aoi,
-                    analysis_before=previous,
-                    analysis_after=latest,
-                    forest_loss_hectares=loss_ha,
-                    loss_percentage=loss_pct,
-                    loss_map_path=loss_tile_url
-                )
+        self.stdout.write(f"  - Comparing {previous.analysis_date.date()} vs {latest.analysis_date.date()}")
+        
+        # Detect Loss and calculate area via GEE
+        region = aoi_region(aoi.latitude, aoi.longitude, aoi.radius_km)
+        result = analyzer.calculate_forest_loss(
+            img_before, img_after, region=region, reduction=analyzer.policy.params_for_aoi(aoi)
+        )
+        loss_ha = result['loss_ha']
+        loss_pct = result['loss_percentage']
+        
+        # Get Loss Tile URL
+        loss_tile_url = analyzer.get_loss_tile_url(img_before, img_after)
+        
+        self.stdout.write(f"  - Detected Loss: {loss_ha:.2f} ha ({loss_pct:.2f}%)")
+        
+        # Create Alert if loss is significant (e.g. > 0.1 hectare)
+        if loss_ha > 0.1:
+            alert, created = DeforestationAlert.objects.get_or_create(
+                analysis_before=previous,
+                analysis_after=latest,
+                defaults={
+                    'aoi': aoi,
+                    'forest_loss_hectares': loss_ha,
+                    'loss_percentage': loss_pct,
+                    'reduction_scale': result['scale'],
+                    'loss_map_path': loss_tile_url
+                }
+            )
+            if created:
+                AlertReportBuilder().build(alert)
                 self.stdout.write(self.style.SUCCESS("  - Alert Created! Tile URL saved."))
+            else:
+                self.stdout.write("  - Alert already exists for this pair.")
@@ -0,0 +1,48 @@
+import time
+from django.core.management.base import BaseCommand
+from satellite_data.notifications import NotificationDispatcher
+
+class Command(BaseCommand):
+    help = 'Sends pending alert notifications as one digest email per recipient'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Outbox rows claimed per batch (default: SILVAGUARD_NOTIFICATION_BATCH_SIZE)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep draining the outbox every --interval seconds instead of exiting'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=60,
+            help='Seconds between drains with --loop (default: 60)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.MIGRATE_HEADING("✉️ Dispatching alert notifications..."))
+
+        while True:
+            try:
+                results = NotificationDispatcher(batch_size=options['batch_size']).drain()
+            except Exception as e:
+                # Mail server unreachable: nothing was claimed, rows stay pending for the next drain
+                self.stdout.write(self.style.ERROR(f"Dispatch failed: {e}"))
+                results = None
+
+            if results and results['batches']:
+                self.stdout.write(
+                    f"  - {results['digests']} digests covering {results['sent']} notifications sent, "
+                    f"{results['failed']} failed ({results['batches']} batches)"
+                )
+
+            if not options['loop']:
+                break
+            time.sleep(max(options['interval'], 1))
+
+        self.stdout.write(self.style.SUCCESS("Notification dispatch finished."))
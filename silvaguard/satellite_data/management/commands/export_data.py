@@ -0,0 +1,60 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from satellite_data.exports import DataExporter, DATASETS, FORMATS
+
+class Command(BaseCommand):
+    help = 'Streams alerts, analyses or satellite images to CSV, GeoJSON-seq or Parquet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(DATASETS), help='Dataset to export')
+        parser.add_argument(
+            '--format',
+            choices=list(FORMATS),
+            default='csv',
+            help='Output format (default: csv)'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=None,
+            help='Output file (default: stdout; required for parquet)'
+        )
+        parser.add_argument('--aoi', type=int, default=None, help='Only rows of this AOI id')
+        parser.add_argument('--start', type=date.fromisoformat, default=None, help='From this date (YYYY-MM-DD)')
+        parser.add_argument('--end', type=date.fromisoformat, default=None, help='Up to this date (YYYY-MM-DD)')
+        parser.add_argument(
+            '--min-loss',
+            type=float,
+            default=None,
+            help='Minimum forest loss in hectares (alerts only)'
+        )
+
+    def handle(self, *args, **options):
+        if options['format'] == 'parquet' and not options['output']:
+            raise CommandError("--output is required for parquet")
+
+        try:
+            exporter = DataExporter(
+                options['dataset'],
+                aoi_id=options['aoi'],
+                start=options['start'],
+                end=options['end'],
+                min_loss=options['min_loss'],
+            )
+            chunks = exporter.stream(options['format'])
+        except (ValueError, RuntimeError) as e:
+            raise CommandError(str(e))
+
+        if not options['output']:
+            # Only the text formats get here (parquet needs --output)
+            for chunk in chunks:
+                self.stdout.write(chunk.decode('utf-8'), ending='')
+            self.stdout.flush()
+            return
+
+        written = 0
+        with open(options['output'], 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                written += len(chunk)
+        self.stderr.write(self.style.SUCCESS(f"Exported {options['dataset']} to {options['output']} ({written} bytes)."))
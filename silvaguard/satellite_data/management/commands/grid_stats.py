@@ -0,0 +1,85 @@
+import datetime
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from satellite_data.gridcache import GridCellCache
+
+class Command(BaseCommand):
+    help = 'Forest statistics for a circle or polygon, answered from the grid-cell cache (missing cells go to Earth Engine)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lat', type=float, default=None, help='Circle center latitude')
+        parser.add_argument('--lon', type=float, default=None, help='Circle center longitude')
+        parser.add_argument('--radius-km', type=float, default=5.0, help='Circle radius in km (default: 5)')
+        parser.add_argument(
+            '--geojson',
+            type=str,
+            default=None,
+            help='GeoJSON file with a Polygon (geometry, Feature or first feature of a FeatureCollection) instead of a circle'
+        )
+        parser.add_argument(
+            '--date',
+            type=str,
+            default=None,
+            help='Scene date YYYY-MM-DD (default: newest fully cached date, else newest Sentinel-2 scene)'
+        )
+        parser.add_argument('--days', type=int, default=30, help='Window searched for the newest scene date (default: 30)')
+        parser.add_argument('--max-cloud', type=float, default=20.0, help='Maximum cloud cover for scene dates (default: 20.0)')
+        parser.add_argument('--precision', type=int, default=None, help='Geohash precision (default: SILVAGUARD_GRID_PRECISION)')
+        parser.add_argument('--cached-only', action='store_true', help='Never call Earth Engine; report missing cells')
+
+    def handle(self, *args, **options):
+        cache = GridCellCache(precision=options['precision'])
+        try:
+            if options['geojson']:
+                ring = self.polygon_ring(options['geojson'])
+                cells = cache.cover_polygon(ring)
+                lat = sum(p[1] for p in ring) / len(ring)
+                lon = sum(p[0] for p in ring) / len(ring)
+            elif options['lat'] is not None and options['lon'] is not None:
+                lat, lon = options['lat'], options['lon']
+                cells = cache.cover_circle(lat, lon, options['radius_km'])
+            else:
+                raise CommandError("Give --lat and --lon, or --geojson")
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"🧮 {len(cells)} grid cells at precision {cache.precision}"))
+
+        if options['date']:
+            date = datetime.date.fromisoformat(options['date'])
+        else:
+            since = (timezone.now() - datetime.timedelta(days=options['days'])).date()
+            date = cache.latest_date(cells, since)
+            if date is None and not options['cached_only']:
+                dates = cache.scene_dates(lat, lon, timezone.now() - datetime.timedelta(days=options['days']), timezone.now(), options['max_cloud'])
+                date = dates[0] if dates else None
+            if date is None:
+                raise CommandError(f"No scene date found in the last {options['days']} days")
+
+        result = cache.query(cells, date, compute=not options['cached_only'])
+
+        self.stdout.write(f"  - Date: {date}")
+        self.stdout.write(
+            f"  - Cells: {result['cells_cached']} cached, {result['cells_computed']} computed, "
+            f"{result['cells_missing']} missing, {result['cells_empty']} without clear pixels"
+        )
+        if result['forest_percentage'] is None:
+            self.stdout.write(self.style.WARNING("  - No data for this area and date"))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"  - Forest cover: {result['forest_percentage']:.1f}% "
+            f"(mean tree probability {result['mean_tree_probability']:.3f}, {int(result['pixels'])} pixels)"
+        ))
+
+    def polygon_ring(self, path: str) -> list:
+        with open(path, encoding='utf-8-sig') as f:
+            document = json.load(f)
+        if document.get('type') == 'FeatureCollection':
+            document = (document.get('features') or [{}])[0]
+        geometry = document.get('geometry', document)
+        if geometry.get('type') == 'Polygon':
+            return geometry['coordinates'][0]
+        if geometry.get('type') == 'MultiPolygon':
+            return geometry['coordinates'][0][0]
+        raise CommandError(f"Expected a Polygon, got {geometry.get('type')}")
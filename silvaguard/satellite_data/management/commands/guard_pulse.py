@@ -1,7 +1,9 @@
+import time
 from django.core.management.base import BaseCommand
 from satellite_data.services import SilvaGuardOrchestrator
+from satellite_data.profiling import ProfilingMixin
 
-class Command(BaseCommand):
+class Command(ProfilingMixin, BaseCommand):
     help = 'Triggers the SilvaGuard Monitoring Pulse (Collect -> Analyze -> Detect)'
 
     def add_arguments(self, parser):
@@ -17,17 +19,116 @@ class Command(BaseCommand):
             default=20.0,
             help='Maximum cloud cover percentage allowed (default: 20.0)'
         )
+        parser.add_argument(
+            '--worker-id',
+            type=str,
+            default=None,
+            help='Lease owner name for this worker (default: host:pid)'
+        )
+        parser.add_argument(
+            '--lease-seconds',
+            type=int,
+            default=None,
+            help='Seconds an AOI lease lasts without a heartbeat (default: SILVAGUARD_LEASE_SECONDS)'
+        )
+        cassette = parser.add_mutually_exclusive_group()
+        cassette.add_argument(
+            '--record',
+            type=str,
+            default=None,
+            metavar='CASSETTE',
+            help='Record every Earth Engine request and response of this pulse to a cassette file (.json or .json.gz)'
+        )
+        cassette.add_argument(
+            '--replay',
+            type=str,
+            default=None,
+            metavar='CASSETTE',
+            help='Run offline, answering Earth Engine calls from a recorded cassette. '
+                 'Use a copy of the database as it was when recording, or no new images are found'
+        )
+        parser.add_argument(
+            '--latency-scale',
+            type=float,
+            default=1.0,
+            help='With --replay, multiply recorded latencies by this factor (0 = no delay, default: 1.0)'
+        )
+        parser.add_argument(
+            '--strict-replay',
+            action='store_true',
+            help='With --replay, fail on any request not recorded exactly (no fallback for changed date windows)'
+        )
+
+    def execute(self, *args, **options):
+        # The cassette goes in below the profiler so traced Earth Engine spans show replayed calls too
+        self.cassette = None
+        if options.get('record') or options.get('replay'):
+            from satellite_data.cassette import EECassette, RECORD, REPLAY
+            if options['record']:
+                self.cassette = EECassette(options['record'], RECORD)
+            else:
+                self.cassette = EECassette(options['replay'], REPLAY, latency_scale=options['latency_scale'],
+                                           strict=options['strict_replay'])
+            self.cassette.install()
+        try:
+            return super().execute(*args, **options)
+        finally:
+            if self.cassette is not None:
+                self.cassette.uninstall()
 
     def handle(self, *args, **options):
         days = options['days']
         max_cloud = options['max_cloud']
-        
+        cassette = self.cassette
+        if cassette is not None:
+            self.stdout.write(f"📼 Earth Engine cassette: {cassette.mode} {cassette.path}")
+
         self.stdout.write(self.style.MIGRATE_HEADING(f"🚀 Starting SilvaGuard Pulse ({days} days window)..."))
-        
+
+        started = time.perf_counter()
         orchestrator = SilvaGuardOrchestrator()
-        results = orchestrator.run_pulse(days=days, max_cloud=max_cloud)
-        
+        results = orchestrator.run_pulse(
+            days=days,
+            max_cloud=max_cloud,
+            worker_id=options['worker_id'],
+            lease_seconds=options['lease_seconds']
+        )
+        wall_seconds = time.perf_counter() - started
+
         self.stdout.write(self.style.SUCCESS("\n✅ SilvaGuard Pulse Complete"))
         self.stdout.write(f"  - AOIs Processed: {results['aois_processed']}")
         self.stdout.write(f"  - New Images: {results['new_images']}")
         self.stdout.write(f"  - Alerts Created: {results['alerts_created']}")
+        if results['exports_submitted']:
+            self.stdout.write(f"  - Export Tasks Submitted: {results['exports_submitted']} (run poll_export_tasks to ingest)")
+        if results.get('ee_requests_saved'):
+            self.stdout.write(f"  - Earth Engine Requests Saved (overlapping AOIs): {results['ee_requests_saved']}")
+
+        if cassette is not None:
+            self.report_cassette(cassette, results, wall_seconds)
+
+    def report_cassette(self, cassette, results, wall_seconds):
+        from satellite_data.cassette import RECORD
+
+        summary = cassette.summary()
+        calls = ', '.join(f"{name}={count}" for name, count in sorted(summary['calls'].items())) or 'none'
+        self.stdout.write(f"\n📼 Cassette ({cassette.mode}): wall time {wall_seconds:.2f}s")
+        self.stdout.write(f"  - Earth Engine calls: {sum(summary['calls'].values())} ({calls})")
+        self.stdout.write(f"  - Earth Engine latency (recorded): {summary['recorded_seconds']:.2f}s")
+
+        if cassette.mode == RECORD:
+            cassette.meta.update({'results': results, 'wall_seconds': round(wall_seconds, 3), 'calls': summary['calls']})
+            cassette.save()
+            self.stdout.write(self.style.SUCCESS(f"  - Saved {len(cassette.interactions)} interactions to {cassette.path}"))
+            return
+
+        self.stdout.write(
+            f"  - Replay waited {summary['waited_seconds']:.2f}s, {summary['fallbacks']} fallback matches, "
+            f"{summary['misses']} misses, {summary['unused']} recorded responses unused"
+        )
+        recorded = cassette.recorded_meta
+        if recorded.get('wall_seconds') is not None:
+            self.stdout.write(f"  - Recorded run: wall time {recorded['wall_seconds']:.2f}s, {sum((recorded.get('calls') or {}).values())} calls")
+        for key, value in (recorded.get('results') or {}).items():
+            if results.get(key) != value:
+                self.stdout.write(self.style.WARNING(f"  - {key}: {results.get(key)} (recorded {value})"))
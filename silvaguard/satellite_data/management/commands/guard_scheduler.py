@@ -0,0 +1,80 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from satellite_data.services import SilvaGuardOrchestrator
+from satellite_data.leases import LeaseManager
+from satellite_data.scheduling import PulseScheduler
+
+class Command(BaseCommand):
+    help = 'Runs the adaptive SilvaGuard scheduler, pulsing each AOI when it is due'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-cloud',
+            type=float,
+            default=20.0,
+            help='Maximum cloud cover percentage allowed (default: 20.0)'
+        )
+        parser.add_argument(
+            '--spacing',
+            type=int,
+            default=60,
+            help='Seconds between first pulses of newly scheduled AOIs (default: 60)'
+        )
+        parser.add_argument(
+            '--max-per-tick',
+            type=int,
+            default=5,
+            help='Maximum AOIs pulsed before re-checking the queue (default: 5)'
+        )
+        parser.add_argument(
+            '--refresh',
+            type=int,
+            default=300,
+            help='Seconds between scans for new AOIs (default: 300)'
+        )
+        parser.add_argument(
+            '--worker-id',
+            type=str,
+            default=None,
+            help='Lease owner name for this worker (default: host:pid)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Pulse the AOIs that are currently due, then exit'
+        )
+
+    def handle(self, *args, **options):
+        scheduler = PulseScheduler(
+            SilvaGuardOrchestrator(),
+            LeaseManager(owner=options['worker_id']),
+            max_cloud=options['max_cloud'],
+            spacing=timedelta(seconds=options['spacing'])
+        )
+
+        self.stdout.write(self.style.MIGRATE_HEADING("🗓️ Starting SilvaGuard Scheduler..."))
+        last_refresh = 0.0
+
+        while True:
+            if time.monotonic() - last_refresh >= options['refresh']:
+                scheduler.refresh()
+                last_refresh = time.monotonic()
+
+            results = scheduler.run_due(limit=options['max_per_tick'])
+            if results['aois_processed']:
+                self.stdout.write(
+                    f"  - Pulsed {results['aois_processed']} AOIs: {results['new_images']} new images, "
+                    f"{results['alerts_created']} alerts"
+                )
+
+            if options['once']:
+                if scheduler.seconds_until_next() == 0:
+                    continue # Still AOIs due beyond this tick's limit
+                break
+
+            wait = scheduler.seconds_until_next()
+            wait = options['refresh'] if wait is None else min(wait, options['refresh'])
+            time.sleep(max(wait, 1))
+
+        self.stdout.write(self.style.SUCCESS("Scheduler stopped."))
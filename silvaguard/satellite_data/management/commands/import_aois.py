@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand, CommandError
+from satellite_data.imports import AOIImporter, FORMATS, detect_format, iter_records, text_stream
+
+class Command(BaseCommand):
+    help = 'Imports Areas of Interest in bulk from a GeoJSON, GeoJSON-seq or CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str, help='File to import')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            default=None,
+            help='File format (default: from the file extension)'
+        )
+        parser.add_argument(
+            '--radius-km',
+            type=float,
+            default=10.0,
+            help='Radius of point records without a radius_km value (default: 10.0)'
+        )
+        parser.add_argument(
+            '--duplicate-meters',
+            type=float,
+            default=None,
+            help='Centers closer than this to another AOI are duplicates; 0 disables the check (default: SILVAGUARD_IMPORT_DUPLICATE_METERS)'
+        )
+        parser.add_argument(
+            '--on-duplicate',
+            choices=['skip', 'keep'],
+            default='skip',
+            help='Skip duplicates or import them anyway; both are reported (default: skip)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='AOIs per bulk insert and transaction (default: SILVAGUARD_IMPORT_BATCH_SIZE)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate and check duplicates without creating anything'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            fmt = options['format'] or detect_format(options['path'])
+            importer = AOIImporter(
+                radius_km=options['radius_km'],
+                duplicate_meters=options['duplicate_meters'],
+                on_duplicate=options['on_duplicate'],
+                batch_size=options['batch_size'],
+                dry_run=options['dry_run'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        mode = " (dry run)" if options['dry_run'] else ""
+        self.stdout.write(self.style.MIGRATE_HEADING(f"📥 Importing AOIs from {options['path']} ({fmt}){mode}..."))
+
+        with open(options['path'], 'rb') as f:
+            try:
+                report = importer.run(iter_records(text_stream(f), fmt))
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        for error in report['errors']:
+            where = f"record {error['record']}" if error['record'] is not None else "file"
+            self.stdout.write(self.style.ERROR(f"  - Invalid {where}: {error['error']}"))
+        for duplicate in report['duplicate_samples']:
+            self.stdout.write(self.style.WARNING(
+                f"  - Duplicate record {duplicate['record']} '{duplicate['name']}': "
+                f"{duplicate['distance_m']} m from {duplicate['near']}"
+            ))
+
+        action = "would be created" if options['dry_run'] else "created"
+        self.stdout.write(self.style.SUCCESS(
+            f"Read {report['read']} records in {report['seconds']}s ({report['records_per_second'] or 0} records/s): "
+            f"{report['created']} AOIs {action}, {report['invalid']} invalid, {report['duplicates']} duplicates."
+        ))
@@ -0,0 +1,35 @@
+import time
+from django.core.management.base import BaseCommand
+from satellite_data.analysis import VegetationAnalyzer
+from satellite_data.batch import BatchExportService
+
+class Command(BaseCommand):
+    help = 'Polls Earth Engine export tasks and ingests finished results'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--wait',
+            action='store_true',
+            help='Keep polling until no task is pending'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=30,
+            help='Seconds between polls when --wait is set (default: 30)'
+        )
+
+    def handle(self, *args, **options):
+        service = BatchExportService(VegetationAnalyzer())
+
+        while True:
+            results = service.poll()
+            self.stdout.write(
+                f"Polled {results['polled']} tasks: {results['ingested']} ingested, "
+                f"{results['failed']} failed, {results['pending']} pending, {results['alerts_created']} alerts created."
+            )
+            if not options['wait'] or not results['pending']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS("Export polling complete."))
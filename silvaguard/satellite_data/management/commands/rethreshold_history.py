@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from satellite_data.chips import ChipStore
+from django.db.models import Q
+from satellite_data.models import DeforestationAlert, VegetationAnalysis
+from satellite_data import histograms
+from satellite_data.versioning import bump
+
+class Command(BaseCommand):
+    help = ('Recomputes forest cover of past analyses at a new threshold from their stored histograms, '
+            'or from their stored chips when they have no histogram (no Earth Engine calls). '
+            'Report bundles of the affected alerts are dropped and rebuilt on their next view')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=None,
+            help='Tree probability threshold (default: SILVAGUARD_FOREST_THRESHOLD)'
+        )
+        parser.add_argument(
+            '--aoi',
+            type=int,
+            default=None,
+            help='Only re-threshold analyses of this AOI id'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report the changes without saving them'
+        )
+
+    def handle(self, *args, **options):
+        threshold = options['threshold']
+        if threshold is None:
+            threshold = getattr(settings, 'SILVAGUARD_FOREST_THRESHOLD', 0.5)
+        if not 0.0 <= threshold <= 1.0:
+            self.stdout.write(self.style.ERROR("Threshold must be between 0 and 1."))
+            return
+
+        scope = VegetationAnalysis.objects.all()
+        if options['aoi']:
+            scope = scope.filter(processed_image__satellite_image__aoi_id=options['aoi'])
+        analyses = scope.filter(tree_histogram__isnull=False)
+        without_histogram = scope.filter(tree_histogram__isnull=True)
+        chips = ChipStore() if getattr(settings, 'SILVAGUARD_CHIP_STORE_ENABLED', True) else None
+        skipped = 0
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Re-thresholding forest cover at {threshold:.2f}..."))
+        batch = []
+        changed = 0
+        changed_ids = []
+        for analysis in analyses.only('id', 'forest_cover_percentage', 'forest_threshold', 'tree_histogram').iterator(chunk_size=500):
+            new_pct = histograms.forest_fraction(analysis.tree_histogram, threshold) * 100
+            if options['verbosity'] > 1:
+                self.stdout.write(f"  - Analysis {analysis.id}: {analysis.forest_cover_percentage:.1f}% -> {new_pct:.1f}%")
+            if new_pct != analysis.forest_cover_percentage or analysis.forest_threshold != threshold:
+                changed += 1
+                if not options['dry_run']:
+                    changed_ids.append(analysis.id)
+            if options['dry_run']:
+                continue # Keep no rows around when nothing will be saved
+            analysis.forest_cover_percentage = new_pct
+            analysis.forest_threshold = threshold
+            batch.append(analysis)
+
+            if len(batch) >= 500:
+                VegetationAnalysis.objects.bulk_update(batch, ['forest_cover_percentage', 'forest_threshold'])
+                batch = []
+
+        if batch:
+            VegetationAnalysis.objects.bulk_update(batch, ['forest_cover_percentage', 'forest_threshold'])
+            batch = []
+
+        # Older analyses have no histogram; their chip gives one (stored for next time)
+        for analysis in without_histogram.select_related('processed_image__satellite_image').iterator(chunk_size=500):
+            result = chips.analyze(analysis.processed_image.satellite_image, threshold) if chips else None
+            if result is None or not result['histogram']:
+                skipped += 1
+                continue
+            new_pct = result['forest_percentage']
+            if options['verbosity'] > 1:
+                self.stdout.write(f"  - Analysis {analysis.id} (chip): {analysis.forest_cover_percentage:.1f}% -> {new_pct:.1f}%")
+            if new_pct != analysis.forest_cover_percentage or analysis.forest_threshold != threshold:
+                changed += 1
+                if not options['dry_run']:
+                    changed_ids.append(analysis.id)
+            if options['dry_run']:
+                continue
+            analysis.forest_cover_percentage = new_pct
+            analysis.forest_threshold = threshold
+            analysis.tree_histogram = result['histogram']
+            batch.append(analysis)
+
+            if len(batch) >= 500:
+                VegetationAnalysis.objects.bulk_update(batch, ['forest_cover_percentage', 'forest_threshold', 'tree_histogram'])
+                batch = []
+
+        if batch:
+            VegetationAnalysis.objects.bulk_update(batch, ['forest_cover_percentage', 'forest_threshold', 'tree_histogram'])
+        if changed and not options['dry_run']:
+            bump('map-data') # bulk_update sends no signals
+        # Bundles store both scenes' forest cover; views and build_alert_reports rebuild them
+        invalidated = 0
+        for start in range(0, len(changed_ids), 500):
+            ids = changed_ids[start:start + 500]
+            invalidated += DeforestationAlert.objects.filter(
+                Q(analysis_before_id__in=ids) | Q(analysis_after_id__in=ids), report_bundle__isnull=False,
+            ).update(report_bundle=None)
+
+        if skipped:
+            self.stdout.write(self.style.WARNING(f"{skipped} analyses have no stored histogram or chip and were left unchanged."))
+        verb = 'would change' if options['dry_run'] else 'updated'
+        self.stdout.write(self.style.SUCCESS(f"Done: {changed} analyses {verb}, {invalidated} alert reports invalidated."))
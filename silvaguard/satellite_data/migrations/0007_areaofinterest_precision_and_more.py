@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('satellite_data', '0006_alter_deforestationalert_loss_map_path_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='areaofinterest',
+            name='precision',
+            field=models.CharField(blank=True, choices=[('high', 'High (native resolution where possible)'), ('balanced', 'Balanced'), ('fast', 'Fast (coarse, low latency)')], default='', help_text='Reduction precision target (blank uses the global default)', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='deforestationalert',
+            name='reduction_scale',
+            field=models.FloatField(blank=True, help_text='Scale in meters the loss area was reduced at', null=True),
+        ),
+        migrations.AddField(
+            model_name='vegetationanalysis',
+            name='reduction_scale',
+            field=models.FloatField(blank=True, help_text='Scale in meters the statistics were reduced at', null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('satellite_data', '0007_areaofinterest_precision_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.CharField(help_text='Earth Engine task identifier', max_length=100, unique=True)),
+                ('kind', models.CharField(choices=[('analysis', 'Vegetation Analysis'), ('loss', 'Loss Comparison')], max_length=20)),
+                ('asset_id', models.CharField(help_text='Destination table asset', max_length=255)),
+                ('reduction_scale', models.FloatField(blank=True, help_text='Scale in meters the export reduces at', null=True)),
+                ('state', models.CharField(choices=[('SUBMITTED', 'Submitted'), ('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed'), ('INGESTED', 'Ingested')], default='SUBMITTED', max_length=20)),
+                ('error', models.TextField(blank=True, default='')),
+                ('submitted_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('analysis', models.ForeignKey(blank=True, help_text="Analysis filled in by an 'analysis' task", null=True, on_delete=django.db.models.deletion.CASCADE, related_name='export_tasks', to='satellite_data.vegetationanalysis')),
+                ('analysis_after', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='satellite_data.vegetationanalysis')),
+                ('analysis_before', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='satellite_data.vegetationanalysis')),
+                ('aoi', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_tasks', to='satellite_data.areaofinterest')),
+            ],
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def remove_duplicate_alerts(apps, schema_editor):
+    """
+    Keeps the oldest alert of every (analysis_before, analysis_after) pair so the
+    unique constraint can be added to databases populated by racing pulses.
+    """
+    DeforestationAlert = apps.get_model('satellite_data', 'DeforestationAlert')
+    seen = set()
+    duplicates = []
+    for alert_id, before_id, after_id in DeforestationAlert.objects.order_by('id').values_list(
+        'id', 'analysis_before_id', 'analysis_after_id'
+    ):
+        if (before_id, after_id) in seen:
+            duplicates.append(alert_id)
+        else:
+            seen.add((before_id, after_id))
+    DeforestationAlert.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('satellite_data', '0008_exporttask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AOILease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('owner', models.CharField(blank=True, default='', help_text='Worker currently holding the lease', max_length=255)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, help_text='When the AOI was last pulsed to completion', null=True)),
+            ],
+        ),
+        migrations.RunPython(remove_duplicate_alerts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='deforestationalert',
+            constraint=models.UniqueConstraint(fields=('analysis_before', 'analysis_after'), name='unique_alert_analysis_pair'),
+        ),
+        migrations.AddField(
+            model_name='aoilease',
+            name='aoi',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='lease', to='satellite_data.areaofinterest'),
+        ),
+    ]
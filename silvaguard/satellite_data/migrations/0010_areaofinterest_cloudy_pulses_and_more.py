@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('satellite_data', '0009_aoilease_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='areaofinterest',
+            name='cloudy_pulses',
+            field=models.PositiveIntegerField(default=0, help_text='Consecutive pulses that found no scene under the cloud limit'),
+        ),
+        migrations.AddField(
+            model_name='areaofinterest',
+            name='last_pulsed_at',
+            field=models.DateTimeField(blank=True, help_text='When the scheduler last pulsed this AOI', null=True),
+        ),
+        migrations.AddField(
+            model_name='areaofinterest',
+            name='next_pulse_at',
+            field=models.DateTimeField(blank=True, help_text='When the scheduler will pulse this AOI next', null=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('satellite_data', '0010_areaofinterest_cloudy_pulses_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='vegetationanalysis',
+            name='mean_ndvi',
+            field=models.FloatField(help_text='Legacy name: mean Dynamic World tree probability. Spectral indices live in index_stats'),
+        ),
+        migrations.CreateModel(
+            name='SpectralIndexStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.CharField(help_text='Index name, e.g. NDVI', max_length=20)),
+                ('mean', models.FloatField(blank=True, null=True)),
+                ('min', models.FloatField(blank=True, null=True)),
+                ('max', models.FloatField(blank=True, null=True)),
+                ('stddev', models.FloatField(blank=True, null=True)),
+                ('reduction_scale', models.FloatField(blank=True, help_text='Scale in meters the statistics were reduced at', null=True)),
+                ('analysis', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='index_stats', to='satellite_data.vegetationanalysis')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('analysis', 'index'), name='unique_index_per_analysis')],
+            },
+        ),
+    ]
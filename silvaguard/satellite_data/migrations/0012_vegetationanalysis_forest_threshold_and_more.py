@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('satellite_data', '0011_alter_vegetationanalysis_mean_ndvi_spectralindexstat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vegetationanalysis',
+            name='forest_threshold',
+            field=models.FloatField(blank=True, help_text='Tree probability threshold forest_cover_percentage was computed at', null=True),
+        ),
+        migrations.AddField(
+            model_name='vegetationanalysis',
+            name='tree_histogram',
+            field=models.JSONField(blank=True, help_text='Pixel counts of tree probability in equal-width bins over [0, 1]', null=True),
+        ),
+        migrations.AlterField(
+            model_name='vegetationanalysis',
+            name='forest_cover_percentage',
+            field=models.FloatField(help_text='Percentage of pixels classified as forest (tree probability > forest_threshold)'),
+        ),
+    ]
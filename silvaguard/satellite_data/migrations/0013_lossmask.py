@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('satellite_data', '0012_vegetationanalysis_forest_threshold_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LossMask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('crs', models.CharField(default='EPSG:4326', max_length=50)),
+                ('transform', models.JSONField(blank=True, help_text='[west, pixel width, north, pixel height] in CRS units', null=True)),
+                ('pixel_count', models.PositiveIntegerField(default=0, help_text='Number of loss pixels')),
+                ('data', models.BinaryField(help_text='Packed bits, one byte-aligned row after another, most significant bit first')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('alert', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='loss_mask', to='satellite_data.deforestationalert')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('satellite_data', '0013_lossmask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deforestationalert',
+            name='report_bundle',
+            field=models.JSONField(blank=True, help_text='Precomputed report (statistics, thumbnails, loss patches) built by reports.AlertReportBuilder', null=True),
+        ),
+    ]
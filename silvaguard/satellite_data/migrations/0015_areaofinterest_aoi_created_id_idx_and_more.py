@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('satellite_data', '0014_deforestationalert_report_bundle'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='areaofinterest',
+            index=models.Index(fields=['-created_at', '-id'], name='aoi_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='areaofinterest',
+            index=models.Index(fields=['latitude', 'longitude'], name='aoi_lat_lon_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deforestationalert',
+            index=models.Index(fields=['-detected_at', '-id'], name='alert_detected_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deforestationalert',
+            index=models.Index(fields=['aoi', '-detected_at', '-id'], name='alert_aoi_detected_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deforestationalert',
+            index=models.Index(fields=['forest_loss_hectares'], name='alert_loss_ha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='satelliteimage',
+            index=models.Index(fields=['aoi', '-acquisition_date', '-id'], name='image_aoi_acquired_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('satellite_data', '0016_dataversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PulseEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('alert', 'Deforestation Alert'), ('pulse', 'Pulse Progress')], max_length=20)),
+                ('payload', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('aoi', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='events', to='satellite_data.areaofinterest')),
+            ],
+        ),
+    ]
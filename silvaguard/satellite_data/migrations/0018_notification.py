@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('satellite_data', '0017_pulseevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(choices=[('email', 'Email')], default='email', max_length=20)),
+                ('recipient', models.CharField(help_text='Email address', max_length=254)),
+                ('state', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('alert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='satellite_data.deforestationalert')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['state', 'id'], name='notification_state_idx')],
+                'constraints': [models.UniqueConstraint(fields=('alert', 'channel', 'recipient'), name='unique_notification_per_recipient')],
+            },
+        ),
+    ]
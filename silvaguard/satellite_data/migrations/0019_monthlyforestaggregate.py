@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('satellite_data', '0018_notification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyForestAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('scene_count', models.PositiveIntegerField(default=0, help_text='Analyzed scenes rolled into this month')),
+                ('mean_forest_cover', models.FloatField(help_text='Mean forest cover percentage over the scenes')),
+                ('min_forest_cover', models.FloatField()),
+                ('max_forest_cover', models.FloatField()),
+                ('mean_tree_probability', models.FloatField(blank=True, help_text="Mean of the scenes' mean tree probability", null=True)),
+                ('tree_histogram', models.JSONField(blank=True, help_text='Summed tree probability pixel counts of the scenes that had one', null=True)),
+                ('forest_threshold', models.FloatField(blank=True, help_text='Threshold of the scenes (blank if they differed)', null=True)),
+                ('index_means', models.JSONField(default=dict, help_text="Mean of each spectral index mean, e.g. {'NDVI': 0.61}")),
+                ('first_acquisition', models.DateTimeField()),
+                ('last_acquisition', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('aoi', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_aggregates', to='satellite_data.areaofinterest')),
+            ],
+            options={
+                'ordering': ['aoi', 'month'],
+                'constraints': [models.UniqueConstraint(fields=('aoi', 'month'), name='unique_aggregate_per_aoi_month')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('satellite_data', '0019_monthlyforestaggregate'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='satelliteimage',
+            name='image_id',
+            field=models.CharField(help_text='Identifier from the satellite provider (one row per AOI it covers)', max_length=255),
+        ),
+        migrations.AddConstraint(
+            model_name='satelliteimage',
+            constraint=models.UniqueConstraint(fields=('aoi', 'image_id'), name='unique_image_per_aoi'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('satellite_data', '0020_satelliteimage_unique_per_aoi'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GridCellStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cell', models.CharField(help_text='Geohash of the cell (its length is the grid precision)', max_length=12)),
+                ('date', models.DateField(help_text='UTC acquisition date of the scenes the cell was reduced over')),
+                ('tree_histogram', models.JSONField(blank=True, default=list, help_text='Tree probability pixel counts (empty if no clear pixel)')),
+                ('mean_tree_probability', models.FloatField(blank=True, null=True)),
+                ('reduction_scale', models.FloatField(help_text='Scale in meters the cell was reduced at')),
+                ('computed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('cell', 'date'), name='unique_grid_cell_date')],
+            },
+        ),
+    ]
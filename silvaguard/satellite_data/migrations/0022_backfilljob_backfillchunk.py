@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('satellite_data', '0021_gridcellstat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackfillJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(help_text='Exclusive end of the range')),
+                ('chunk_days', models.PositiveIntegerField()),
+                ('max_cloud', models.FloatField(default=20.0, help_text='Maximum cloud cover percentage of discovered scenes')),
+                ('state', models.CharField(choices=[('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='running', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('aoi', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='backfill_jobs', to='satellite_data.areaofinterest')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BackfillChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(help_text='Exclusive end of the window')),
+                ('state', models.CharField(choices=[('pending', 'Pending'), ('analyzed', 'Analyzed'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0, help_text='Failed attempts of the current stage')),
+                ('scenes_found', models.PositiveIntegerField(default=0)),
+                ('scenes_analyzed', models.PositiveIntegerField(default=0)),
+                ('pairs_checked', models.PositiveIntegerField(default=0)),
+                ('alerts_created', models.PositiveIntegerField(default=0)),
+                ('analysis_seconds', models.FloatField(blank=True, help_text='Wall time of the discovery and analysis stage', null=True)),
+                ('loss_seconds', models.FloatField(blank=True, help_text='Wall time of the loss stage', null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='satellite_data.backfilljob')),
+            ],
+            options={
+                'ordering': ['job', 'start_date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='backfilljob',
+            constraint=models.UniqueConstraint(fields=('aoi', 'start_date', 'end_date', 'chunk_days'), name='unique_backfill_per_range'),
+        ),
+        migrations.AddConstraint(
+            model_name='backfillchunk',
+            constraint=models.UniqueConstraint(fields=('job', 'start_date'), name='unique_backfill_chunk'),
+        ),
+    ]
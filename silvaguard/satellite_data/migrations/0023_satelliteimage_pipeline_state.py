@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('satellite_data', '0022_backfilljob_backfillchunk'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='satelliteimage',
+            name='pipeline_attempts',
+            field=models.PositiveIntegerField(default=0, help_text='Failed attempts at the current stage'),
+        ),
+        migrations.AddField(
+            model_name='satelliteimage',
+            name='pipeline_claimed_until',
+            field=models.DateTimeField(blank=True, help_text='When the claim lapses and other workers may run the stage', null=True),
+        ),
+        migrations.AddField(
+            model_name='satelliteimage',
+            name='pipeline_error',
+            field=models.TextField(blank=True, default='', help_text='Last error of the current stage'),
+        ),
+        migrations.AddField(
+            model_name='satelliteimage',
+            name='pipeline_owner',
+            field=models.CharField(blank=True, default='', help_text="Worker running the scene's current stage, empty when unclaimed", max_length=255),
+        ),
+        migrations.AddField(
+            model_name='satelliteimage',
+            name='pipeline_state',
+            field=models.CharField(choices=[('registered', 'Registered (waiting for analysis)'), ('analyzed', 'Analyzed (waiting for its tile)'), ('tiled', 'Tiled (waiting for detection)'), ('done', 'Done'), ('failed', 'Failed')], default='done', help_text='Next pulse pipeline stage of the scene (done once detection ran)', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='satelliteimage',
+            index=models.Index(fields=['pipeline_state', 'gee_id', 'id'], name='image_pipeline_state_idx'),
+        ),
+    ]
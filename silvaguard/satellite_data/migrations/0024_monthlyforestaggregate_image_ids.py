@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('satellite_data', '0023_satelliteimage_pipeline_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monthlyforestaggregate',
+            name='image_ids',
+            field=models.JSONField(blank=True, default=list, help_text='Provider ids of the scenes rolled into this month, so none is counted twice'),
+        ),
+    ]
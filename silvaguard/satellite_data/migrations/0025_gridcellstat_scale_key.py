@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('satellite_data', '0024_monthlyforestaggregate_image_ids'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='gridcellstat',
+            name='unique_grid_cell_date',
+        ),
+        migrations.AddConstraint(
+            model_name='gridcellstat',
+            constraint=models.UniqueConstraint(fields=('cell', 'date', 'reduction_scale'), name='unique_grid_cell_date_scale'),
+        ),
+    ]
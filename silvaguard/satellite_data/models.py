@@ -1,4 +1,5 @@
 from django.db import models
+from .reduction import PRECISION_CHOICES
 
 class AreaOfInterest(models.Model):
     """
@@ -9,8 +10,21 @@ class AreaOfInterest(models.Model):
     latitude = models.FloatField(help_text="Latitude of the center point")
     longitude = models.FloatField(help_text="Longitude of the center point")
     radius_km = models.FloatField(default=10.0, help_text="Radius of the area in kilometers")
+    precision = models.CharField(max_length=20, choices=PRECISION_CHOICES, blank=True, default='', help_text="Reduction precision target (blank uses the global default)")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Adaptive pulse cadence maintained by guard_scheduler
+    last_pulsed_at = models.DateTimeField(null=True, blank=True, help_text="When the scheduler last pulsed this AOI")
+    next_pulse_at = models.DateTimeField(null=True, blank=True, help_text="When the scheduler will pulse this AOI next")
+    cloudy_pulses = models.PositiveIntegerField(default=0, help_text="Consecutive pulses that found no scene under the cloud limit")
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the AOI API and bounding box filters
+            models.Index(fields=['-created_at', '-id'], name='aoi_created_id_idx'),
+            models.Index(fields=['latitude', 'longitude'], name='aoi_lat_lon_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -19,16 +33,45 @@ class SatelliteImage(models.Model):
     Metadata for a satellite image captured over an AOI.
     Stores reference to the external image (Sentinel-2) but not the raw data.
     """
+    # Stages of the pulse pipeline (satellite_data.pipeline) the scene still waits for
+    PIPELINE_REGISTERED = 'registered'
+    PIPELINE_ANALYZED = 'analyzed'
+    PIPELINE_TILED = 'tiled'
+    PIPELINE_DONE = 'done'
+    PIPELINE_FAILED = 'failed'
+    PIPELINE_CHOICES = [
+        (PIPELINE_REGISTERED, 'Registered (waiting for analysis)'),
+        (PIPELINE_ANALYZED, 'Analyzed (waiting for its tile)'),
+        (PIPELINE_TILED, 'Tiled (waiting for detection)'),
+        (PIPELINE_DONE, 'Done'),
+        (PIPELINE_FAILED, 'Failed'),
+    ]
+
     aoi = models.ForeignKey(AreaOfInterest, on_delete=models.CASCADE, related_name='images')
     acquisition_date = models.DateTimeField(help_text="Date and time when the image was captured")
     cloud_coverage = models.FloatField(help_text="Cloud coverage percentage (0-100)")
     satellite_name = models.CharField(max_length=50, default='Sentinel-2')
-    image_id = models.CharField(max_length=255, unique=True, help_text="Unique identifier from the satellite provider")
+    image_id = models.CharField(max_length=255, help_text="Identifier from the satellite provider (one row per AOI it covers)")
     gee_id = models.CharField(max_length=255, null=True, blank=True, help_text="Google Earth Engine Asset ID")
     metadata_json = models.JSONField(null=True, blank=True, help_text="Additional metadata from the provider")
+    pipeline_state = models.CharField(max_length=20, choices=PIPELINE_CHOICES, default=PIPELINE_DONE, help_text="Next pulse pipeline stage of the scene (done once detection ran)")
+    pipeline_owner = models.CharField(max_length=255, blank=True, default='', help_text="Worker running the scene's current stage, empty when unclaimed")
+    pipeline_claimed_until = models.DateTimeField(null=True, blank=True, help_text="When the claim lapses and other workers may run the stage")
+    pipeline_attempts = models.PositiveIntegerField(default=0, help_text="Failed attempts at the current stage")
+    pipeline_error = models.TextField(blank=True, default='', help_text="Last error of the current stage")
 
     class Meta:
         ordering = ['-acquisition_date']
+        indexes = [
+            # Per-AOI time series (pulse comparisons, exports filtered by AOI and date)
+            models.Index(fields=['aoi', '-acquisition_date', '-id'], name='image_aoi_acquired_idx'),
+            # Pipeline stages claiming their next batch
+            models.Index(fields=['pipeline_state', 'gee_id', 'id'], name='image_pipeline_state_idx'),
+        ]
+        constraints = [
+            # Overlapping AOIs see the same scenes, each keeps its own row and analysis
+            models.UniqueConstraint(fields=['aoi', 'image_id'], name='unique_image_per_aoi'),
+        ]
 
     def __str__(self):
         return f"{self.satellite_name} - {self.acquisition_date.strftime('%Y-%m-%d')} ({self.cloud_coverage}%)"
@@ -53,14 +96,83 @@ class VegetationAnalysis(models.Model):
     Results of vegetation analysis (NDVI) performed on a preprocessed image.
     """
     processed_image = models.OneToOneField(ProcessedImage, on_delete=models.CASCADE, related_name='vegetation_analysis')
-    mean_ndvi = models.FloatField(help_text="Average NDVI value for the area")
-    forest_cover_percentage = models.FloatField(help_text="Percentage of pixels classified as forest (NDVI > 0.5)")
+    mean_ndvi = models.FloatField(help_text="Legacy name: mean Dynamic World tree probability. Spectral indices live in index_stats")
+    forest_cover_percentage = models.FloatField(help_text="Percentage of pixels classified as forest (tree probability > forest_threshold)")
+    tree_histogram = models.JSONField(null=True, blank=True, help_text="Pixel counts of tree probability in equal-width bins over [0, 1]")
+    forest_threshold = models.FloatField(null=True, blank=True, help_text="Tree probability threshold forest_cover_percentage was computed at")
     heatmap_file_path = models.TextField(help_text="Path or URL to the visual NDVI heatmap")
+    reduction_scale = models.FloatField(null=True, blank=True, help_text="Scale in meters the statistics were reduced at")
     analysis_date = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return f"NDVI Analysis: {self.processed_image.satellite_image.image_id}"
 
+    def tree_summary(self, threshold: float = None) -> dict:
+        """
+        Forest percentage, min/max and p10/p50/p90 of tree probability derived from the stored
+        histogram, at the threshold forest_cover_percentage was computed at unless one is given.
+        None for analyses without a histogram.
+        """
+        from django.conf import settings
+        from . import histograms
+
+        if not self.tree_histogram:
+            return None
+        if threshold is None:
+            threshold = self.forest_threshold
+        if threshold is None:
+            threshold = getattr(settings, 'SILVAGUARD_FOREST_THRESHOLD', 0.5)
+        return histograms.summarize(self.tree_histogram, threshold)
+
+class SpectralIndexStat(models.Model):
+    """
+    Statistics of one spectral index (NDVI, EVI, SAVI, NBR) over the AOI for an analyzed scene.
+    """
+    analysis = models.ForeignKey(VegetationAnalysis, on_delete=models.CASCADE, related_name='index_stats')
+    index = models.CharField(max_length=20, help_text="Index name, e.g. NDVI")
+    mean = models.FloatField(null=True, blank=True)
+    min = models.FloatField(null=True, blank=True)
+    max = models.FloatField(null=True, blank=True)
+    stddev = models.FloatField(null=True, blank=True)
+    reduction_scale = models.FloatField(null=True, blank=True, help_text="Scale in meters the statistics were reduced at")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['analysis', 'index'], name='unique_index_per_analysis'),
+        ]
+
+    def __str__(self):
+        return f"{self.index}: {self.mean}"
+
+class MonthlyForestAggregate(models.Model):
+    """
+    Per-AOI monthly roll-up of per-scene analyses removed by `manage.py compact_history`.
+    Keeps the long-term forest cover series once individual scenes are pruned.
+    """
+    aoi = models.ForeignKey(AreaOfInterest, on_delete=models.CASCADE, related_name='monthly_aggregates')
+    month = models.DateField(help_text="First day of the month")
+    scene_count = models.PositiveIntegerField(default=0, help_text="Analyzed scenes rolled into this month")
+    mean_forest_cover = models.FloatField(help_text="Mean forest cover percentage over the scenes")
+    min_forest_cover = models.FloatField()
+    max_forest_cover = models.FloatField()
+    mean_tree_probability = models.FloatField(null=True, blank=True, help_text="Mean of the scenes' mean tree probability")
+    tree_histogram = models.JSONField(null=True, blank=True, help_text="Summed tree probability pixel counts of the scenes that had one")
+    forest_threshold = models.FloatField(null=True, blank=True, help_text="Threshold of the scenes (blank if they differed)")
+    index_means = models.JSONField(default=dict, help_text="Mean of each spectral index mean, e.g. {'NDVI': 0.61}")
+    first_acquisition = models.DateTimeField()
+    last_acquisition = models.DateTimeField()
+    image_ids = models.JSONField(default=list, blank=True, help_text="Provider ids of the scenes rolled into this month, so none is counted twice")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['aoi', 'month']
+        constraints = [
+            models.UniqueConstraint(fields=['aoi', 'month'], name='unique_aggregate_per_aoi_month'),
+        ]
+
+    def __str__(self):
+        return f"{self.aoi.name} {self.month.strftime('%Y-%m')}: {self.mean_forest_cover:.1f}% ({self.scene_count} scenes)"
+
 class DeforestationAlert(models.Model):
     """
     Represents a detected deforestation event between two time periods.
@@ -71,12 +183,262 @@ class DeforestationAlert(models.Model):
     
     forest_loss_hectares = models.FloatField(help_text="Estimated area of forest lost in hectares")
     loss_percentage = models.FloatField(help_text="Percentage of forest lost relative to previous state")
+    reduction_scale = models.FloatField(null=True, blank=True, help_text="Scale in meters the loss area was reduced at")
     detected_at = models.DateTimeField(auto_now_add=True)
     
     # In a real system, this would store a polygon or heatmap of the specific loss area
     loss_map_path = models.TextField(null=True, blank=True, help_text="Path or URL to the visual change map")
+    report_bundle = models.JSONField(null=True, blank=True, help_text="Precomputed report (statistics, thumbnails, loss patches) built by reports.AlertReportBuilder")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['analysis_before', 'analysis_after'], name='unique_alert_analysis_pair'),
+        ]
+        indexes = [
+            # Keyset pagination of the alerts API, globally and per AOI
+            models.Index(fields=['-detected_at', '-id'], name='alert_detected_id_idx'),
+            models.Index(fields=['aoi', '-detected_at', '-id'], name='alert_aoi_detected_idx'),
+            models.Index(fields=['forest_loss_hectares'], name='alert_loss_ha_idx'),
+        ]
     
     def __str__(self):
         return f"Alert: {self.aoi.name} - {self.forest_loss_hectares:.2f}ha lost"
 
+class LossMask(models.Model):
+    """
+    Pixel-level forest loss mask of an alert, bit-packed row by row (see masks.PackedMask).
+    """
+    alert = models.OneToOneField(DeforestationAlert, on_delete=models.CASCADE, related_name='loss_mask')
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    crs = models.CharField(max_length=50, default='EPSG:4326')
+    transform = models.JSONField(null=True, blank=True, help_text="[west, pixel width, north, pixel height] in CRS units")
+    pixel_count = models.PositiveIntegerField(default=0, help_text="Number of loss pixels")
+    data = models.BinaryField(help_text="Packed bits, one byte-aligned row after another, most significant bit first")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def packed(self):
+        from .masks import PackedMask
+        return PackedMask(self.data, self.width, self.height, self.transform, self.crs)
+
+    def __str__(self):
+        return f"Loss Mask: alert {self.alert_id} ({self.pixel_count} px)"
+
+
+
+class ExportTask(models.Model):
+    """
+    Tracks an asynchronous Earth Engine table export submitted for a large AOI.
+    The finished table is ingested back into VegetationAnalysis / DeforestationAlert.
+    """
+    KIND_ANALYSIS = 'analysis'
+    KIND_LOSS = 'loss'
+    KIND_CHOICES = [
+        (KIND_ANALYSIS, 'Vegetation Analysis'),
+        (KIND_LOSS, 'Loss Comparison'),
+    ]
+
+    STATE_SUBMITTED = 'SUBMITTED'
+    STATE_RUNNING = 'RUNNING'
+    STATE_COMPLETED = 'COMPLETED'
+    STATE_FAILED = 'FAILED'
+    STATE_INGESTED = 'INGESTED'
+    STATE_CHOICES = [
+        (STATE_SUBMITTED, 'Submitted'),
+        (STATE_RUNNING, 'Running'),
+        (STATE_COMPLETED, 'Completed'),
+        (STATE_FAILED, 'Failed'),
+        (STATE_INGESTED, 'Ingested'),
+    ]
+
+    task_id = models.CharField(max_length=100, unique=True, help_text="Earth Engine task identifier")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    aoi = models.ForeignKey(AreaOfInterest, on_delete=models.CASCADE, related_name='export_tasks')
+    analysis = models.ForeignKey(VegetationAnalysis, on_delete=models.CASCADE, null=True, blank=True, related_name='export_tasks', help_text="Analysis filled in by an 'analysis' task")
+    analysis_before = models.ForeignKey(VegetationAnalysis, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    analysis_after = models.ForeignKey(VegetationAnalysis, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    asset_id = models.CharField(max_length=255, help_text="Destination table asset")
+    reduction_scale = models.FloatField(null=True, blank=True, help_text="Scale in meters the export reduces at")
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default=STATE_SUBMITTED)
+    error = models.TextField(blank=True, default='')
+    submitted_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Export {self.kind} ({self.state}): {self.task_id}"
+
+class AOILease(models.Model):
+    """
+    Per-AOI work lease that lets several pulse workers split AOIs between them.
+    A lease is held by one worker until it expires, is released, or stops being heartbeated.
+    """
+    aoi = models.OneToOneField(AreaOfInterest, on_delete=models.CASCADE, related_name='lease')
+    owner = models.CharField(max_length=255, blank=True, default='', help_text="Worker currently holding the lease")
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True, help_text="When the AOI was last pulsed to completion")
+
+    def __str__(self):
+        return f"Lease: {self.aoi.name} ({self.owner or 'free'})"
+
+class DataVersion(models.Model):
+    """
+    Generation counter of a published dataset ('map-data', 'aois', 'alerts').
+    Bumped by signals whenever rows behind the dataset change; used as HTTP validator.
+    """
+    key = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.key} v{self.version}"
+
+class PulseEvent(models.Model):
+    """
+    Append-only log of alert and pulse-progress events, streamed to dashboards over SSE.
+    Rows are the cross-process channel: every server process polls for ids it has not seen.
+    """
+    KIND_CHOICES = [
+        ('alert', 'Deforestation Alert'),
+        ('pulse', 'Pulse Progress'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    aoi = models.ForeignKey(AreaOfInterest, on_delete=models.CASCADE, null=True, blank=True, related_name='events')
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.kind} event #{self.id}"
+
+class Notification(models.Model):
+    """
+    Outbox row for one alert and one recipient, written in the same transaction as the alert.
+    Drained by `manage.py dispatch_notifications`, which groups rows into per-recipient digests.
+    """
+    CHANNEL_EMAIL = 'email'
+    CHANNEL_CHOICES = [
+        (CHANNEL_EMAIL, 'Email'),
+    ]
+
+    STATE_PENDING = 'pending'
+    STATE_SENT = 'sent'
+    STATE_FAILED = 'failed'
+    STATE_CHOICES = [
+        (STATE_PENDING, 'Pending'),
+        (STATE_SENT, 'Sent'),
+        (STATE_FAILED, 'Failed'),
+    ]
 
+    alert = models.ForeignKey(DeforestationAlert, on_delete=models.CASCADE, related_name='notifications')
+    channel = models.CharField(max_length=20, choices=CHANNEL_CHOICES, default=CHANNEL_EMAIL)
+    recipient = models.CharField(max_length=254, help_text="Email address")
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default=STATE_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['state', 'id'], name='notification_state_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['alert', 'channel', 'recipient'], name='unique_notification_per_recipient'),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} to {self.recipient} ({self.state})"
+
+class GridCellStat(models.Model):
+    """
+    Dynamic World tree probability statistics of one geohash cell on one scene date.
+    Ad-hoc area queries are answered by aggregating cached cells (satellite_data.gridcache).
+    """
+    cell = models.CharField(max_length=12, help_text="Geohash of the cell (its length is the grid precision)")
+    date = models.DateField(help_text="UTC acquisition date of the scenes the cell was reduced over")
+    tree_histogram = models.JSONField(default=list, blank=True, help_text="Tree probability pixel counts (empty if no clear pixel)")
+    mean_tree_probability = models.FloatField(null=True, blank=True)
+    reduction_scale = models.FloatField(help_text="Scale in meters the cell was reduced at")
+    computed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # Also the (cell, date, scale) index every lookup goes through
+            models.UniqueConstraint(fields=['cell', 'date', 'reduction_scale'], name='unique_grid_cell_date_scale'),
+        ]
+
+    def __str__(self):
+        return f"{self.cell} {self.date}"
+
+class BackfillJob(models.Model):
+    """
+    Historical backfill of one AOI over a date range (`manage.py backfill_aoi`).
+    The range is split into BackfillChunk rows, which checkpoint progress so an interrupted job resumes.
+    """
+    STATE_RUNNING = 'running'
+    STATE_DONE = 'done'
+    STATE_FAILED = 'failed'
+    STATE_CHOICES = [
+        (STATE_RUNNING, 'Running'),
+        (STATE_DONE, 'Done'),
+        (STATE_FAILED, 'Failed'),
+    ]
+
+    aoi = models.ForeignKey(AreaOfInterest, on_delete=models.CASCADE, related_name='backfill_jobs')
+    start_date = models.DateField()
+    end_date = models.DateField(help_text="Exclusive end of the range")
+    chunk_days = models.PositiveIntegerField()
+    max_cloud = models.FloatField(default=20.0, help_text="Maximum cloud cover percentage of discovered scenes")
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default=STATE_RUNNING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['aoi', 'start_date', 'end_date', 'chunk_days'], name='unique_backfill_per_range'),
+        ]
+
+    def __str__(self):
+        return f"Backfill {self.aoi.name} {self.start_date} - {self.end_date} ({self.state})"
+
+class BackfillChunk(models.Model):
+    """
+    One date window of a backfill job. Moves pending -> analyzed (scenes discovered and analyzed)
+    -> done (pairwise loss checked); each stage is idempotent and re-run after an interruption.
+    """
+    STATE_PENDING = 'pending'
+    STATE_ANALYZED = 'analyzed'
+    STATE_DONE = 'done'
+    STATE_FAILED = 'failed'
+    STATE_CHOICES = [
+        (STATE_PENDING, 'Pending'),
+        (STATE_ANALYZED, 'Analyzed'),
+        (STATE_DONE, 'Done'),
+        (STATE_FAILED, 'Failed'),
+    ]
+
+    job = models.ForeignKey(BackfillJob, on_delete=models.CASCADE, related_name='chunks')
+    start_date = models.DateField()
+    end_date = models.DateField(help_text="Exclusive end of the window")
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default=STATE_PENDING)
+    attempts = models.PositiveIntegerField(default=0, help_text="Failed attempts of the current stage")
+    scenes_found = models.PositiveIntegerField(default=0)
+    scenes_analyzed = models.PositiveIntegerField(default=0)
+    pairs_checked = models.PositiveIntegerField(default=0)
+    alerts_created = models.PositiveIntegerField(default=0)
+    analysis_seconds = models.FloatField(null=True, blank=True, help_text="Wall time of the discovery and analysis stage")
+    loss_seconds = models.FloatField(null=True, blank=True, help_text="Wall time of the loss stage")
+    last_error = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['job', 'start_date']
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'start_date'], name='unique_backfill_chunk'),
+        ]
+
+    def __str__(self):
+        return f"{self.start_date} - {self.end_date} ({self.state})"
@@ -0,0 +1,172 @@
+from collections import defaultdict
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+
+def recipients() -> list:
+    """
+    Email addresses of active users who opted in to alert notifications, plus SILVAGUARD_ALERT_EMAILS.
+    """
+    from django.contrib.auth import get_user_model
+
+    emails = set(
+        get_user_model().objects.filter(is_active=True, notify_alerts=True)
+        .exclude(email='').values_list('email', flat=True)
+    )
+    emails.update(getattr(settings, 'SILVAGUARD_ALERT_EMAILS', []))
+    return sorted(emails)
+
+
+def enqueue_for_alert(alert) -> int:
+    """
+    Adds outbox rows for a new alert. Called from the alert's post_save signal, so the rows
+    commit or roll back together with the alert; nothing is sent here. The insert runs in a
+    savepoint: if it fails, the alert's transaction stays usable and only the rows are lost.
+    """
+    from .models import Notification
+
+    rows = [Notification(alert=alert, recipient=email) for email in recipients()]
+    with transaction.atomic():
+        Notification.objects.bulk_create(rows, ignore_conflicts=True)
+    return len(rows)
+
+
+class NotificationDispatcher:
+    """
+    Drains the notification outbox in batches.
+
+    Pending rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several
+    dispatchers can run side by side. Each batch becomes one digest per recipient,
+    and all digests go through a single SMTP connection that stays open across
+    batches. A failed recipient is retried on later runs up to max_attempts times.
+    """
+
+    def __init__(self, batch_size: int = None, max_attempts: int = None, connection=None):
+        self.batch_size = batch_size or getattr(settings, 'SILVAGUARD_NOTIFICATION_BATCH_SIZE', 200)
+        self.max_attempts = max_attempts or getattr(settings, 'SILVAGUARD_NOTIFICATION_MAX_ATTEMPTS', 5)
+        self.connection = connection
+        self.site_url = getattr(settings, 'SILVAGUARD_SITE_URL', 'http://localhost:8000').rstrip('/')
+
+    def open(self):
+        if self.connection is None:
+            self.connection = get_connection(fail_silently=False)
+        self.connection.open()
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception as e:
+                print(f"  [Notifications] Error closing mail connection: {e}")
+
+    def drain(self, max_batches: int = None) -> dict:
+        """
+        Sends batches until the outbox has no pending row (or max_batches is reached).
+        """
+        results = {'batches': 0, 'sent': 0, 'failed': 0, 'digests': 0}
+        # Walk the outbox by id so a row that fails is retried on the next run, not in a tight loop
+        last_id = 0
+        self.open()
+        try:
+            while max_batches is None or results['batches'] < max_batches:
+                batch = self.dispatch_batch(after_id=last_id)
+                if not batch['claimed']:
+                    break
+                last_id = batch['last_id']
+                results['batches'] += 1
+                for key in ('sent', 'failed', 'digests'):
+                    results[key] += batch[key]
+                if batch['stopped']:
+                    break
+        finally:
+            self.close()
+        return results
+
+    def dispatch_batch(self, after_id: int = 0) -> dict:
+        from .models import Notification
+
+        results = {'claimed': 0, 'last_id': after_id, 'sent': 0, 'failed': 0, 'digests': 0, 'stopped': False}
+        with transaction.atomic():
+            batch = list(
+                Notification.objects.select_for_update(skip_locked=True, of=('self',))
+                .filter(state=Notification.STATE_PENDING, id__gt=after_id)
+                .select_related('alert__aoi')
+                .order_by('id')[:self.batch_size]
+            )
+            results['claimed'] = len(batch)
+            if not batch:
+                return results
+            results['last_id'] = batch[-1].id
+
+            by_recipient = defaultdict(list)
+            for notification in batch:
+                by_recipient[notification.recipient].append(notification)
+
+            now = timezone.now()
+            attempted = []
+            for recipient, notifications in by_recipient.items():
+                try:
+                    self.connection.send_messages([self.digest(recipient, [n.alert for n in notifications])])
+                    error = None
+                except Exception as e:
+                    error = str(e)
+                    print(f"  [Notifications] Failed to send to {recipient}: {e}")
+
+                attempted.extend(notifications)
+                for notification in notifications:
+                    notification.attempts += 1
+                    if error is None:
+                        notification.state = Notification.STATE_SENT
+                        notification.sent_at = now
+                        notification.last_error = ''
+                    else:
+                        notification.last_error = error
+                        if notification.attempts >= self.max_attempts:
+                            notification.state = Notification.STATE_FAILED
+                if error is None:
+                    results['digests'] += 1
+                    results['sent'] += len(notifications)
+                else:
+                    results['failed'] += len(notifications)
+                    if not self._reconnect():
+                        # Mail server gone: leave the other recipients untouched for the next run
+                        results['stopped'] = True
+                        break
+
+            Notification.objects.bulk_update(attempted, ['state', 'attempts', 'last_error', 'sent_at'])
+        return results
+
+    def _reconnect(self) -> bool:
+        # A broken SMTP session fails every later message, so start a fresh one
+        self.close()
+        try:
+            self.connection.open()
+            return True
+        except Exception as e:
+            print(f"  [Notifications] Could not reopen mail connection: {e}")
+            return False
+
+    def digest(self, recipient: str, alerts: list) -> EmailMessage:
+        """
+        One message listing every alert pending for a recipient.
+        """
+        alerts = sorted(alerts, key=lambda a: a.forest_loss_hectares, reverse=True)
+        total_ha = sum(a.forest_loss_hectares for a in alerts)
+        if len(alerts) == 1:
+            subject = f"SilvaGuard alert: {alerts[0].forest_loss_hectares:.2f} ha lost in {alerts[0].aoi.name}"
+        else:
+            subject = f"SilvaGuard: {len(alerts)} new deforestation alerts ({total_ha:.2f} ha)"
+
+        lines = [f"{len(alerts)} new deforestation alert(s) detected:", ""]
+        for alert in alerts:
+            lines.append(
+                f"- {alert.aoi.name}: {alert.forest_loss_hectares:.2f} ha lost "
+                f"({alert.loss_percentage:.1f}% of forest), detected {alert.detected_at.strftime('%Y-%m-%d')}"
+            )
+            lines.append(f"  {self.site_url}{reverse('alert_detail', args=[alert.id])}")
+        lines += ["", "You receive this because alert notifications are enabled for your SilvaGuard account."]
+
+        return EmailMessage(subject=subject, body="\n".join(lines), to=[recipient], connection=self.connection)
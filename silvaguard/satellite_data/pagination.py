@@ -0,0 +1,107 @@
+import base64
+import json
+from datetime import datetime, time, timedelta
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+class KeysetPaginator:
+    """
+    Cursor (keyset) pagination on a (timestamp, id) pair, newest first.
+
+    Each page is a range scan starting right after the last row of the previous page,
+    so with an index on (timestamp, id) the cost of a page does not depend on how deep
+    into the table it is, unlike OFFSET pagination. Rows inserted while paging never
+    shift later pages.
+    """
+
+    def __init__(self, queryset, time_field: str):
+        self.queryset = queryset
+        self.time_field = time_field
+
+    def encode_cursor(self, obj) -> str:
+        payload = json.dumps([getattr(obj, self.time_field).isoformat(), obj.pk])
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor: str):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            timestamp, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            moment = parse_datetime(timestamp)
+            if moment is None:
+                raise ValueError
+            return moment, int(pk)
+        except (ValueError, TypeError):
+            raise ValueError("Invalid cursor")
+
+    def page(self, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE):
+        """
+        Returns:
+            tuple: (list of objects, cursor of the next page or None on the last page)
+        """
+        qs = self.queryset.order_by(f'-{self.time_field}', '-id')
+        if cursor:
+            moment, pk = self.decode_cursor(cursor)
+            qs = qs.filter(Q(**{f'{self.time_field}__lt': moment}) | Q(**{self.time_field: moment, 'id__lt': pk}))
+
+        # One extra row tells whether another page exists without a COUNT query
+        items = list(qs[:limit + 1])
+        if len(items) > limit:
+            items = items[:limit]
+            return items, self.encode_cursor(items[-1])
+        return items, None
+
+
+def page_size(value) -> int:
+    """
+    Parses the 'limit' query parameter, clamped to MAX_PAGE_SIZE.
+    """
+    if value in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    limit = int(value)
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def parse_bbox(value):
+    """
+    Parses 'west,south,east,north' (degrees) into a tuple of floats.
+    """
+    try:
+        west, south, east, north = (float(part) for part in value.split(','))
+    except ValueError:
+        raise ValueError("bbox must be 'west,south,east,north'")
+    if south > north:
+        raise ValueError("bbox south must not exceed north")
+    return west, south, east, north
+
+
+def bbox_filter(prefix: str, bbox) -> Q:
+    """
+    Q object keeping points (prefix + 'latitude'/'longitude') inside a bounding box.
+    A box with west > east crosses the antimeridian.
+    """
+    west, south, east, north = bbox
+    q = Q(**{f'{prefix}latitude__gte': south, f'{prefix}latitude__lte': north})
+    if west <= east:
+        return q & Q(**{f'{prefix}longitude__gte': west, f'{prefix}longitude__lte': east})
+    return q & (Q(**{f'{prefix}longitude__gte': west}) | Q(**{f'{prefix}longitude__lte': east}))
+
+
+def date_range_filter(field: str, start=None, end=None) -> Q:
+    """
+    Q object keeping rows whose datetime `field` falls on the dates start..end (inclusive).
+    Compares against aware datetimes (start 00:00, the day after end 00:00) rather than
+    casting with __date, so an index on the column can serve the range.
+    """
+    q = Q()
+    if start:
+        q &= Q(**{f'{field}__gte': timezone.make_aware(datetime.combine(start, time.min))})
+    if end:
+        q &= Q(**{f'{field}__lt': timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))})
+    return q
@@ -0,0 +1,402 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from .db import write_transaction
+from .gee_utils import aoi_region
+
+STAGES = ('collect', 'analyze', 'tile', 'detect')
+
+# Threads and batch size per stage. Collect and detect batches count AOIs, analyze and tile
+# batches count scenes. Overridden per stage by SILVAGUARD_PIPELINE_STAGES.
+DEFAULT_STAGES = {
+    'collect': {'workers': 2, 'batch_size': 1},
+    'analyze': {'workers': 4, 'batch_size': 4},
+    'tile': {'workers': 2, 'batch_size': 8},
+    'detect': {'workers': 2, 'batch_size': 1},
+}
+
+
+class PulsePipeline:
+    """
+    Runs a monitoring pulse as four stages connected by SatelliteImage.pipeline_state:
+
+        collect  claims AOIs through their leases, fetches scene metadata and registers new
+                 scenes as 'registered';
+        analyze  computes forest statistics, indices and chips ('analyzed'), or submits the
+                 export task of batch-mode AOIs (whose ingest creates the tile, so 'tiled');
+        tile     requests the heatmap tile ('tiled');
+        detect   compares the latest pair of an AOI once none of its scenes waits for analysis
+                 or tiling, then marks its scenes 'done'.
+
+    Each stage has its own thread pool and batch size, and claims its next batch from the
+    database (select_for_update(skip_locked=True) plus a claim expiry; on SQLite, which has
+    no row locks, the claim holds the database write lock instead), so stages overlap:
+    scenes of the first AOIs are analyzed while later AOIs are still being collected. Since
+    every step is recorded on the scene, an interrupted pulse resumes where it stopped: the
+    next pulse (on any worker) picks up scenes left in any state once their claim lapses.
+
+    A failing scene is retried SILVAGUARD_PIPELINE_MAX_ATTEMPTS times before it is marked
+    'failed'; it is queued again when a later pulse finds it, and continues from where it failed.
+
+    pulse_aoi and run_scenes run the same stages inline for a single AOI or set of scenes
+    (the scheduler and the backfill), so every path analyzes scenes the same way.
+    """
+
+    def __init__(self, orchestrator, leases, days: int, max_cloud: float, stages: dict = None, use_batch: bool = None):
+        self.orchestrator = orchestrator
+        self.leases = leases
+        self.owner = leases.owner
+        self.days = days
+        self.max_cloud = max_cloud
+        overrides = stages or getattr(settings, 'SILVAGUARD_PIPELINE_STAGES', {})
+        self.stages = {stage: dict(DEFAULT_STAGES[stage], **overrides.get(stage, {})) for stage in STAGES}
+        self.claim_ttl = timedelta(seconds=getattr(settings, 'SILVAGUARD_PIPELINE_CLAIM_SECONDS', 600))
+        self.max_attempts = getattr(settings, 'SILVAGUARD_PIPELINE_MAX_ATTEMPTS', 3)
+        self.collecting = set()
+        self.collection_done = False
+        self.contexts = {}
+        # None decides per AOI (BatchExportService.is_enabled_for)
+        self.use_batch = use_batch
+
+    def run(self, pulse_started) -> dict:
+        """
+        Runs every stage until collection is finished and no stage has work left for this worker.
+        """
+        self.release_claims()
+        results = _results()
+        pools = {
+            stage: ThreadPoolExecutor(max_workers=self.stages[stage]['workers'], thread_name_prefix=f'pulse-{stage}')
+            for stage in STAGES
+        }
+        inflight = {}
+        try:
+            while True:
+                # Downstream stages first, so finished work leaves the pipeline before new work enters
+                for stage in reversed(STAGES):
+                    running = sum(1 for s, _ in inflight.values() if s == stage)
+                    while running < self.stages[stage]['workers']:
+                        work = self.claim(stage, pulse_started)
+                        if not work:
+                            break
+                        inflight[pools[stage].submit(self._guarded, stage, work)] = (stage, work)
+                        running += 1
+                if not inflight:
+                    break
+
+                done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, work = inflight.pop(future)
+                    if stage == 'collect':
+                        self.collecting.difference_update(aoi.id for aoi in work)
+                    for key, value in future.result().items():
+                        results[key] += value
+        except KeyboardInterrupt:
+            # Let running batches record their progress, hand the queued ones back
+            print("Interrupted: finishing running batches, the next pulse resumes the rest")
+            for pool in pools.values():
+                pool.shutdown(wait=True, cancel_futures=True)
+            for stage, work in inflight.values():
+                if stage == 'collect':
+                    for aoi in work:
+                        self.leases.release(aoi, completed=False)
+            self.release_claims()
+            raise
+        finally:
+            for pool in pools.values():
+                pool.shutdown(wait=True)
+        return results
+
+    def pulse_aoi(self, aoi, results: dict):
+        """
+        Runs every stage inline for one AOI whose lease the caller holds.
+
+        Returns:
+            int: Number of scenes found, or None if the lease was lost.
+        """
+        from .models import SatelliteImage
+
+        scenes_found = self.collect_aoi(aoi, results)
+        if scenes_found is None:
+            return None
+        self.run_scenes(results, aoi=aoi)
+
+        waiting = SatelliteImage.objects.filter(
+            aoi=aoi, pipeline_state__in=[SatelliteImage.PIPELINE_REGISTERED, SatelliteImage.PIPELINE_ANALYZED]
+        )
+        if not waiting.exists():
+            images = self.claim_images(SatelliteImage.PIPELINE_TILED, aoi=aoi)
+            if images:
+                self.detect([(aoi, images)], results)
+        return scenes_found
+
+    def run_scenes(self, results: dict, **filters):
+        """
+        Runs the analyze and tile stages inline on the queued scenes matching filters.
+        Failures are recorded on the scenes as in run().
+        """
+        from .models import SatelliteImage
+
+        self.analyze(self.claim_images(SatelliteImage.PIPELINE_REGISTERED, **filters), results)
+        self.tile(self.claim_images(SatelliteImage.PIPELINE_ANALYZED, **filters), results)
+
+    # --- Claims ---
+
+    def claim(self, stage: str, pulse_started):
+        from .models import SatelliteImage
+
+        batch_size = self.stages[stage]['batch_size']
+        if stage == 'collect':
+            return self.claim_aois(batch_size, pulse_started)
+        if stage == 'detect':
+            return self.claim_detection(batch_size)
+        state = {'analyze': SatelliteImage.PIPELINE_REGISTERED, 'tile': SatelliteImage.PIPELINE_ANALYZED}[stage]
+        return self.claim_images(state, batch_size)
+
+    def claim_aois(self, limit: int, pulse_started) -> list:
+        if self.collection_done:
+            return []
+        aois = []
+        while len(aois) < limit:
+            aoi = self.leases.claim_next(completed_before=pulse_started)
+            if aoi is None:
+                self.collection_done = True
+                break
+            aois.append(aoi)
+        self.collecting.update(aoi.id for aoi in aois)
+        return aois
+
+    def claim_images(self, state: str, limit: int = None, **filters) -> list:
+        """
+        Claims unclaimed (or lapsed) scenes waiting in a state. Copies of a scene in overlapping
+        AOIs sort together, so they land in one batch and share the planner's grouped reduction.
+        """
+        from .models import SatelliteImage
+
+        now = timezone.now()
+        with write_transaction():
+            images = list(
+                SatelliteImage.objects.select_for_update(skip_locked=True, of=('self',))
+                .filter(Q(pipeline_claimed_until__isnull=True) | Q(pipeline_claimed_until__lt=now),
+                        pipeline_state=state, **filters)
+                .select_related('aoi')
+                .order_by('gee_id', 'id')[:limit]
+            )
+            SatelliteImage.objects.filter(pk__in=[image.pk for image in images]).update(
+                pipeline_owner=self.owner, pipeline_claimed_until=now + self.claim_ttl
+            )
+        return images
+
+    def claim_detection(self, limit: int) -> list:
+        """
+        Claims the tiled scenes of AOIs ready for detection: not being collected here and with
+        no scene still waiting for analysis or its tile (on any worker).
+
+        Returns:
+            list: (aoi, images) per AOI.
+        """
+        from .models import SatelliteImage
+
+        busy = SatelliteImage.objects.filter(
+            aoi=OuterRef('aoi'),
+            pipeline_state__in=[SatelliteImage.PIPELINE_REGISTERED, SatelliteImage.PIPELINE_ANALYZED]
+        )
+        aoi_ids = list(
+            SatelliteImage.objects.filter(
+                Q(pipeline_claimed_until__isnull=True) | Q(pipeline_claimed_until__lt=timezone.now()),
+                pipeline_state=SatelliteImage.PIPELINE_TILED
+            ).exclude(aoi_id__in=self.collecting).filter(~Exists(busy))
+            .values_list('aoi_id', flat=True).order_by('aoi_id').distinct()[:limit]
+        )
+        claimed = []
+        for aoi_id in aoi_ids:
+            images = self.claim_images(SatelliteImage.PIPELINE_TILED, aoi_id=aoi_id)
+            if images:
+                claimed.append((images[0].aoi, images))
+        return claimed
+
+    def advance(self, images, state: str):
+        from .models import SatelliteImage
+
+        SatelliteImage.objects.filter(pk__in=[image.pk for image in images], pipeline_owner=self.owner).update(
+            pipeline_state=state, pipeline_attempts=0, pipeline_error='', pipeline_owner='', pipeline_claimed_until=None
+        )
+
+    def fail(self, images, error: Exception):
+        from .models import SatelliteImage
+
+        for image in images:
+            attempts = image.pipeline_attempts + 1
+            state = SatelliteImage.PIPELINE_FAILED if attempts >= self.max_attempts else image.pipeline_state
+            print(f"  [Pipeline] {image.image_id} failed at '{image.pipeline_state}' (attempt {attempts}): {error}")
+            SatelliteImage.objects.filter(pk=image.pk, pipeline_owner=self.owner).update(
+                pipeline_state=state, pipeline_attempts=attempts, pipeline_error=str(error),
+                pipeline_owner='', pipeline_claimed_until=None
+            )
+
+    def release_claims(self):
+        """
+        Hands back scenes this worker still holds (e.g. from a run under the same worker id that was killed).
+        """
+        from .models import SatelliteImage
+
+        SatelliteImage.objects.filter(pipeline_owner=self.owner).update(pipeline_owner='', pipeline_claimed_until=None)
+
+    # --- Stages ---
+
+    def _guarded(self, stage: str, work) -> dict:
+        from .profiling import span, trace_thread
+
+        results = _results()
+        try:
+            with trace_thread(), span(stage, size=len(work)):
+                getattr(self, stage)(work, results)
+        finally:
+            connection.close() # Pool threads keep no connection between batches
+        return results
+
+    def collect(self, aois, results):
+        from .profiling import span
+
+        for aoi in aois:
+            completed = False
+            try:
+                with span('aoi', aoi_id=aoi.id, aoi=aoi.name):
+                    scenes_found = self.collect_aoi(aoi, results)
+                completed = scenes_found is not None
+            except Exception as e:
+                print(f"  [Pipeline] Collection of {aoi.name} failed: {e}")
+            finally:
+                self.leases.release(aoi, completed=completed)
+            if completed:
+                results['aois_processed'] += 1
+
+    def collect_aoi(self, aoi, results):
+        """
+        Registers the AOI's scenes and queues those not analyzed yet.
+
+        Returns:
+            int: Number of scenes found, or None if the lease was lost.
+        """
+        from .models import SatelliteImage
+        from .events import publish, KIND_PULSE
+        from .profiling import span
+
+        print(f"--- Pulsing AOI: {aoi.name} ---")
+        publish(KIND_PULSE, {'stage': 'aoi_started', 'aoi_id': aoi.id, 'aoi_name': aoi.name}, aoi=aoi)
+        with span('metadata'):
+            metadata_list = self.orchestrator.collect_metadata(aoi, self.days, self.max_cloud)
+
+        for meta in metadata_list:
+            # Extend our lease between scenes; stop if another worker took the AOI over
+            if not self.leases.heartbeat(aoi):
+                print(f"  [Lease Lost] Abandoning {aoi.name}")
+                publish(KIND_PULSE, {'stage': 'aoi_abandoned', 'aoi_id': aoi.id, 'aoi_name': aoi.name}, aoi=aoi)
+                return None
+
+            with span('register', image_id=meta['image_id']):
+                sat_img, analysis = self.orchestrator.register_scene(aoi, meta, results)
+            self.queue(sat_img, analysis)
+
+        queued = SatelliteImage.objects.filter(aoi=aoi).exclude(
+            pipeline_state__in=[SatelliteImage.PIPELINE_DONE, SatelliteImage.PIPELINE_FAILED]
+        ).count()
+        stage = 'aoi_collected' if queued else 'aoi_finished'
+        publish(KIND_PULSE, {
+            'stage': stage, 'aoi_id': aoi.id, 'aoi_name': aoi.name, 'scenes_found': len(metadata_list), 'queued': queued
+        }, aoi=aoi)
+        return len(metadata_list)
+
+    def queue(self, sat_img, analysis):
+        """
+        Queues a registered scene for the analyze stage: new (or still unanalyzed) scenes, and scenes
+        a previous pulse gave up on; scenes already queued keep their state. The analyze stage skips
+        work a requeued scene already has.
+        """
+        from .models import SatelliteImage
+
+        requeue = Q(pipeline_state=SatelliteImage.PIPELINE_FAILED)
+        if analysis.heatmap_file_path == 'GEE_PENDING':
+            requeue |= Q(pipeline_state=SatelliteImage.PIPELINE_DONE)
+        SatelliteImage.objects.filter(requeue, pk=sat_img.pk).update(
+            pipeline_state=SatelliteImage.PIPELINE_REGISTERED, pipeline_attempts=0, pipeline_error=''
+        )
+
+    def analyze(self, images, results):
+        for image in images:
+            self._scene(image, self._analyze_one, results)
+
+    def _analyze_one(self, image, results):
+        from .models import SatelliteImage, VegetationAnalysis
+
+        analysis = VegetationAnalysis.objects.get(processed_image__satellite_image=image)
+        region, reduction, use_batch = self.context(image.aoi)
+        if analysis.heatmap_file_path == 'GEE_PENDING':
+            self.orchestrator.analyze_scene(image.aoi, image, analysis, region, reduction, use_batch, results, tile=False)
+        elif not use_batch:
+            # Analyzed by an attempt that stopped before its indices or chip were stored
+            self.orchestrator.finish_scene(image, analysis, region, reduction)
+        # Batch-mode scenes get their tile when the export is ingested
+        tiled = use_batch or analysis.heatmap_file_path not in ('', 'GEE_PENDING')
+        self.advance([image], SatelliteImage.PIPELINE_TILED if tiled else SatelliteImage.PIPELINE_ANALYZED)
+
+    def tile(self, images, results):
+        for image in images:
+            self._scene(image, self._tile_one, results)
+
+    def _tile_one(self, image, results):
+        from .models import SatelliteImage, VegetationAnalysis
+
+        analysis = VegetationAnalysis.objects.get(processed_image__satellite_image=image)
+        if not analysis.heatmap_file_path:
+            tile_url = self.orchestrator.scene_tile(image.gee_id)
+            if not tile_url:
+                raise RuntimeError(f"No heatmap tile for {image.gee_id}")
+            analysis.heatmap_file_path = tile_url
+            analysis.save(update_fields=['heatmap_file_path'])
+        self.advance([image], SatelliteImage.PIPELINE_TILED)
+
+    def _scene(self, image, work, results):
+        from .profiling import span
+
+        try:
+            with span('scene', aoi_id=image.aoi_id, image_id=image.image_id):
+                work(image, results)
+        except Exception as e:
+            self.fail([image], e)
+
+    def detect(self, claimed, results):
+        from .models import SatelliteImage
+        from .events import publish, KIND_PULSE
+        from .profiling import span
+
+        for aoi, images in claimed:
+            try:
+                with span('aoi', aoi_id=aoi.id, aoi=aoi.name):
+                    region, reduction, use_batch = self.context(aoi)
+                    self.orchestrator.detect_aoi(aoi, region, reduction, use_batch, results)
+                self.advance(images, SatelliteImage.PIPELINE_DONE)
+            except Exception as e:
+                self.fail(images, e)
+                continue
+            publish(KIND_PULSE, {'stage': 'aoi_finished', 'aoi_id': aoi.id, 'aoi_name': aoi.name}, aoi=aoi)
+
+    def context(self, aoi) -> tuple:
+        """
+        (region, reduction parameters, batch mode) of an AOI, built once per pulse.
+        """
+        if aoi.id not in self.contexts:
+            self.contexts[aoi.id] = (
+                aoi_region(aoi.latitude, aoi.longitude, aoi.radius_km),
+                self.orchestrator.analyzer.policy.params_for_aoi(aoi),
+                # Large AOIs run as asynchronous export tasks, ingested by poll_export_tasks
+                self.orchestrator.batch.is_enabled_for(aoi) if self.use_batch is None else self.use_batch,
+            )
+        return self.contexts[aoi.id]
+
+
+def _results() -> dict:
+    return {'aois_processed': 0, 'new_images': 0, 'alerts_created': 0, 'exports_submitted': 0}
+
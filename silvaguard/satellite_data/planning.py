@@ -0,0 +1,347 @@
+import ee
+import threading
+from collections import Counter, defaultdict
+from .gee_utils import aoi_region, haversine_m
+from . import histograms
+
+# reduceRegions takes no bestEffort/maxPixels; the policy already caps the scale
+_REGIONS_PARAMS = ('scale', 'tileScale')
+
+
+def overlap_groups(aois) -> list:
+    """
+    Splits AOIs into groups of overlapping circles (two AOIs overlap when their centers are
+    closer than the sum of their radii, and overlap is followed transitively).
+
+    AOIs are swept by latitude, so each one is only compared with the AOIs whose latitude band
+    can still reach it.
+
+    Returns:
+        list: Lists of AOIs, one per group, singletons included.
+    """
+    aois = sorted(aois, key=lambda a: a.latitude)
+    parent = {aoi.id: aoi.id for aoi in aois}
+
+    def find(pk):
+        while parent[pk] != pk:
+            parent[pk] = parent[parent[pk]]
+            pk = parent[pk]
+        return pk
+
+    # One degree of latitude is ~111.2 km anywhere on the globe
+    max_radius_km = max((aoi.radius_km for aoi in aois), default=0.0)
+    for i, aoi in enumerate(aois):
+        for other in aois[i + 1:]:
+            if (other.latitude - aoi.latitude) * 111.2 > aoi.radius_km + max_radius_km:
+                break
+            reach_m = (aoi.radius_km + other.radius_km) * 1000.0
+            if haversine_m(aoi.latitude, aoi.longitude, other.latitude, other.longitude) < reach_m:
+                parent[find(other.id)] = find(aoi.id)
+
+    groups = defaultdict(list)
+    for aoi in aois:
+        groups[find(aoi.id)].append(aoi)
+    return list(groups.values())
+
+
+class ScenePlanner:
+    """
+    Plans the pulse's Earth Engine work per unique scene x region union.
+
+    Overlapping AOIs see the same Sentinel-2 scenes, so running the pulse AOI by AOI pays for
+    shared pixels many times over. The planner groups overlapping AOIs and memoizes work for
+    the whole group the first time one of its AOIs asks:
+
+    - scene metadata is fetched once per group, each scene tagged with the AOIs it covers;
+    - each scene is reduced once over the union of the AOIs that still need it, with a grouped
+      reduceRegions over a FeatureCollection of their circles (tree probability mean and
+      histogram plus the spectral indices, one round-trip), and per-AOI statistics are read
+      from the features of that single result;
+    - heatmap and loss tile URLs are requested once per scene / pair;
+    - a before/after pair is reduced once for every group AOI that owns both scenes.
+
+    AOIs alone in their group, AOIs in batch (export) mode, and any grouped request that fails
+    fall back to the per-AOI path, so results never depend on the planner being present.
+    The memo lives for one pulse in one worker: AOIs of a group leased by another worker may
+    be computed here too, which costs nothing extra as it happens in the same request.
+    Pipeline stages call the planner from several threads: the memo is guarded by a lock, and
+    a per-key lock makes a thread wait for work another thread is already doing for the same
+    group, scene or pair rather than repeat it.
+    """
+
+    def __init__(self, analyzer, s2_service, aois, batch=None):
+        self.analyzer = analyzer
+        self.s2_service = s2_service
+        self.batch = batch
+        self.groups = {}
+        for group in overlap_groups(aois):
+            for aoi in group:
+                self.groups[aoi.id] = group
+        self.metadata = {}
+        self.scene_aois = defaultdict(set)
+        self.analyses = {}
+        self.losses = {}
+        self.tiles = {}
+        self.stats = Counter()
+        self.lock = threading.Lock()
+        self.key_locks = {}
+
+    def group_of(self, aoi) -> list:
+        return self.groups.get(aoi.id) or [aoi]
+
+    def _shared(self, aoi) -> list:
+        """
+        Members of the AOI's group that can share grouped reductions (batch-mode AOIs export instead).
+        """
+        return [m for m in self.group_of(aoi) if not (self.batch and self.batch.is_enabled_for(m))]
+
+    # --- Metadata ---
+
+    def fetch_metadata(self, aoi, start_date, end_date, max_cloud_cover: float) -> list:
+        """
+        Scene metadata for an AOI, fetched once for its whole group.
+        """
+        group = self.group_of(aoi)
+        if len(group) == 1:
+            self._count('metadata_requests')
+            return self.s2_service.fetch_metadata(aoi.latitude, aoi.longitude, start_date, end_date, max_cloud_cover)
+
+        key = tuple(sorted(m.id for m in group))
+        with self._key_lock(('metadata', key)):
+            with self.lock:
+                metadata = self.metadata.get(key)
+            if metadata is not None:
+                self._count('metadata_requests_saved')
+            else:
+                self._count('metadata_requests')
+                metadata = self.s2_service.fetch_group_metadata(group, start_date, end_date, max_cloud_cover)
+                with self.lock:
+                    self.metadata[key] = metadata
+                    for meta in metadata:
+                        self.scene_aois[meta['gee_id']].update(meta['aoi_ids'])
+
+        results = []
+        for meta in metadata:
+            if aoi.id in meta['aoi_ids']:
+                meta = {k: v for k, v in meta.items() if k != 'aoi_ids'}
+                meta.update(center_latitude=aoi.latitude, center_longitude=aoi.longitude)
+                results.append(meta)
+        return results
+
+    # --- Scene analysis ---
+
+    def scene_analysis(self, aoi, gee_id: str, reduction: dict):
+        """
+        Tree statistics and spectral indices of a scene over an AOI, from the group's reduction.
+
+        Returns:
+            tuple: (analysis dict as from analyze_gee_image, index stats as from compute_indices),
+            or None when the AOI should run its own reduction.
+        """
+        key = (aoi.id, gee_id)
+        with self._key_lock(('scene', gee_id)):
+            with self.lock:
+                if key in self.analyses:
+                    self.stats['scene_reductions_saved'] += 1
+                    return self.analyses.pop(key)
+                scene_aois = set(self.scene_aois.get(gee_id, ()))
+
+            members = [m for m in self._shared(aoi) if m.id in scene_aois]
+            if len(members) < 2 or aoi not in members:
+                return None
+            members = self._pending(members, gee_id, aoi)
+            if len(members) < 2:
+                return None
+
+            reductions = {m.id: self._regions_params(self.analyzer.policy.params_for_aoi(m)) for m in members}
+            reductions[aoi.id] = self._regions_params(reduction)
+            try:
+                results = self._reduce_scene(gee_id, members, reductions)
+            except Exception as e:
+                print(f"  [Planner] Grouped analysis of {gee_id} failed, falling back per AOI: {e}")
+                return None
+
+            with self.lock:
+                self.stats['scene_reductions'] += 1
+                self.analyses.update({(pk, gee_id): result for pk, result in results.items()})
+                return self.analyses.pop(key, None)
+
+    def _pending(self, members, gee_id, aoi) -> list:
+        """
+        Drops members whose analysis of the scene is already stored.
+        """
+        from .models import VegetationAnalysis
+
+        done = set(
+            VegetationAnalysis.objects.filter(
+                processed_image__satellite_image__aoi__in=members,
+                processed_image__satellite_image__gee_id=gee_id
+            ).exclude(heatmap_file_path='GEE_PENDING').values_list('processed_image__satellite_image__aoi_id', flat=True)
+        )
+        return [m for m in members if m.id == aoi.id or m.id not in done]
+
+    def _reduce_scene(self, gee_id: str, members: list, reductions: dict) -> dict:
+        s2_image = ee.Image(gee_id)
+        regions = self._features(members)
+        trees = self.analyzer._get_dynamic_world(s2_image, regions.geometry()).select('trees')
+        indices = self.analyzer.indices.ee_image(s2_image)
+        tree_reducer = ee.Reducer.mean().combine(
+            ee.Reducer.fixedHistogram(0, 1, histograms.HISTOGRAM_BINS), sharedInputs=True
+        )
+        index_reducer = ee.Reducer.mean() \
+            .combine(ee.Reducer.minMax(), sharedInputs=True) \
+            .combine(ee.Reducer.stdDev(), sharedInputs=True)
+
+        # AOIs reduced at the same scale share one reduceRegions; all of them come back in one getInfo()
+        buckets = self._buckets(members, reductions)
+        parts = []
+        for params, pks in buckets:
+            subset = regions.filter(ee.Filter.inList('aoi_id', pks))
+            parts.append(_strip(trees.reduceRegions(collection=subset, reducer=tree_reducer, **params)))
+            parts.append(_strip(indices.reduceRegions(collection=subset, reducer=index_reducer, **params)))
+        evaluated = ee.List(parts).getInfo()
+
+        results = {}
+        for (params, pks), tree_fc, index_fc in zip(buckets, evaluated[0::2], evaluated[1::2]):
+            index_stats = {f['properties']['aoi_id']: f['properties'] for f in index_fc['features']}
+            for feature in tree_fc['features']:
+                props = feature['properties']
+                stats = {
+                    # A single-band image names combined outputs without the band prefix in reduceRegions
+                    'trees_mean': props.get('trees_mean', props.get('mean')),
+                    'trees_histogram': props.get('trees_histogram', props.get('histogram')),
+                }
+                pk = props['aoi_id']
+                results[pk] = (
+                    self.analyzer.format_analysis(stats, params['scale']),
+                    self.analyzer.indices.format_statistics(index_stats.get(pk, {})),
+                )
+        return results
+
+    # --- Forest loss ---
+
+    def forest_loss(self, aoi, gee_before: str, gee_after: str, reduction: dict):
+        """
+        Loss between two scenes over an AOI, reduced once for every group AOI owning both scenes.
+
+        Returns:
+            dict as from calculate_forest_loss, or None when the AOI should run its own reduction.
+        """
+        key = (aoi.id, gee_before, gee_after)
+        with self._key_lock(('loss', gee_before, gee_after)):
+            with self.lock:
+                if key in self.losses:
+                    self.stats['loss_reductions_saved'] += 1
+                    return self.losses.pop(key)
+            return self._forest_loss(aoi, key, gee_before, gee_after, reduction)
+
+    def _forest_loss(self, aoi, key, gee_before: str, gee_after: str, reduction: dict):
+        from .models import SatelliteImage
+
+        shared = self._shared(aoi)
+        if len(shared) < 2 or aoi not in shared:
+            return None
+        owners = Counter(
+            SatelliteImage.objects.filter(aoi__in=shared, gee_id__in=[gee_before, gee_after])
+            .values_list('aoi_id', flat=True)
+        )
+        members = [m for m in shared if owners[m.id] >= 2]
+        if len(members) < 2 or aoi not in members:
+            return None
+
+        reductions = {m.id: self._regions_params(self.analyzer.policy.params_for_aoi(m)) for m in members}
+        reductions[aoi.id] = self._regions_params(reduction)
+        try:
+            areas = self.analyzer._loss_areas(
+                self.analyzer._forest_mask(ee.Image(gee_before)),
+                self.analyzer._forest_mask(ee.Image(gee_after))
+            )
+            regions = self._features(members)
+            buckets = self._buckets(members, reductions)
+            parts = [
+                _strip(areas.reduceRegions(
+                    collection=regions.filter(ee.Filter.inList('aoi_id', pks)), reducer=ee.Reducer.sum(), **params
+                ))
+                for params, pks in buckets
+            ]
+            evaluated = ee.List(parts).getInfo()
+        except Exception as e:
+            print(f"  [Planner] Grouped loss {gee_before} -> {gee_after} failed, falling back per AOI: {e}")
+            return None
+
+        with self.lock:
+            self.stats['loss_reductions'] += 1
+            for (params, pks), fc in zip(buckets, evaluated):
+                for feature in fc['features']:
+                    props = feature['properties']
+                    self.losses[(props['aoi_id'], gee_before, gee_after)] = self.analyzer.format_loss(props, params['scale'])
+            return self.losses.pop(key, None)
+
+    # --- Tiles ---
+
+    def heatmap(self, gee_id: str) -> str:
+        return self._tile(('heatmap', gee_id), lambda: self.analyzer.generate_heatmap(gee_id))
+
+    def loss_tile(self, gee_before: str, gee_after: str) -> str:
+        return self._tile(('loss', gee_before, gee_after), lambda: self.analyzer.get_loss_tile_url(gee_before, gee_after))
+
+    def _tile(self, key, fetch) -> str:
+        # Tile URLs depend only on the scenes, never on the AOI
+        with self._key_lock(('tile',) + key):
+            with self.lock:
+                url = self.tiles.get(key)
+            if url:
+                self._count('tile_requests_saved')
+                return url
+            self._count('tile_requests')
+            url = fetch()
+            if url:
+                with self.lock:
+                    self.tiles[key] = url
+            return url
+
+    # --- Helpers ---
+
+    def _key_lock(self, key) -> threading.Lock:
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def _count(self, stat: str):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def _features(self, members: list):
+        return ee.FeatureCollection([
+            ee.Feature(aoi_region(m.latitude, m.longitude, m.radius_km), {'aoi_id': m.id}) for m in members
+        ])
+
+    def _regions_params(self, reduction: dict) -> dict:
+        return {k: reduction[k] for k in _REGIONS_PARAMS if k in reduction}
+
+    def _buckets(self, members: list, reductions: dict) -> list:
+        buckets = defaultdict(list)
+        for m in members:
+            buckets[tuple(sorted(reductions[m.id].items()))].append(m.id)
+        return [(dict(params), pks) for params, pks in buckets.items()]
+
+    def summary(self) -> dict:
+        """
+        Earth Engine requests made and requests avoided by sharing work between overlapping AOIs.
+        """
+        kinds = ('metadata_requests', 'scene_reductions', 'loss_reductions', 'tile_requests')
+        with self.lock:
+            stats = Counter(self.stats)
+        summary = {
+            'groups': len({id(group) for group in self.groups.values() if len(group) > 1}),
+            'grouped_aois': sum(1 for group in self.groups.values() if len(group) > 1),
+        }
+        for kind in kinds:
+            summary[kind] = stats[kind]
+            summary[f'{kind}_saved'] = stats[f'{kind}_saved']
+        summary['requests_saved'] = sum(stats[f'{kind}_saved'] for kind in kinds)
+        return summary
+
+
+def _strip(collection):
+    # Only the statistics are needed back, not the circles
+    return collection.map(lambda f: ee.Feature(f).select(['.*'], None, False))
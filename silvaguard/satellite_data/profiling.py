@@ -0,0 +1,290 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Consecutive queries closer together than this form one 'db' span
+DB_BLOCK_GAP_US = 2000
+# Span arguments inherited by nested Earth Engine and database spans
+CONTEXT_KEYS = ('aoi_id', 'image_id')
+
+_tracer = None
+_thread_profiles = None
+
+
+def active_tracer():
+    return _tracer
+
+
+def span(name: str, cat: str = 'pulse', **args):
+    """
+    Context manager timing a block as one span of the active trace (no-op without --trace).
+    AOI and scene ids passed here annotate every Earth Engine call and query block inside it.
+    """
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.span(name, cat, **args)
+
+
+def trace_thread():
+    """
+    Context manager around the work of a worker thread: traces its database queries (--trace)
+    and profiles it (--profile). Django connections and cProfile profilers are per thread, so
+    the hooks the command installs only see the main thread. No-op without either option.
+    """
+    if _tracer is None and _thread_profiles is None:
+        return nullcontext()
+    return _worker_thread()
+
+
+@contextmanager
+def _worker_thread():
+    profiles = _thread_profiles
+    profiler = profiles.start() if profiles is not None else None
+    try:
+        with _tracer.thread() if _tracer is not None else nullcontext():
+            yield
+    finally:
+        if profiler is not None:
+            profiles.stop(profiler)
+
+
+class ThreadProfiles:
+    """
+    cProfile profilers of worker threads, merged into the command's statistics by --profile.
+    """
+
+    def __init__(self):
+        self.profilers = []
+        self.lock = threading.Lock()
+
+    def start(self):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler, which then already sees every thread
+            return None
+        return profiler
+
+    def stop(self, profiler):
+        profiler.disable()
+        with self.lock:
+            self.profilers.append(profiler)
+
+
+class Tracer:
+    """
+    Collects a span timeline in the Chrome trace event format (chrome://tracing, Perfetto).
+
+    Spans come from three sources: span() blocks in the pulse and commands (AOIs, scenes),
+    a wrapper around the ee.data entry points (one span per Earth Engine call), and a
+    database execute wrapper that merges back-to-back queries into one span per block.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.events = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.threads = {}
+        self.originals = {}
+        self.db_wrappers = []
+
+    def now(self) -> float:
+        return (time.perf_counter() - self.origin) * 1e6
+
+    def _tid(self) -> int:
+        ident = threading.get_ident()
+        with self.lock:
+            return self.threads.setdefault(ident, len(self.threads) + 1)
+
+    def _stack(self) -> list:
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        return self.local.stack
+
+    def context(self) -> dict:
+        merged = {}
+        for args in self._stack():
+            merged.update({k: v for k, v in args.items() if k in CONTEXT_KEYS})
+        return merged
+
+    def add(self, name: str, cat: str, start: float, end: float, args: dict):
+        event = {'name': name, 'cat': cat, 'ph': 'X', 'ts': round(start, 1), 'dur': round(end - start, 1),
+                 'pid': self.pid, 'tid': self._tid(), 'args': args}
+        with self.lock:
+            self.events.append(event)
+
+    @contextmanager
+    def span(self, name: str, cat: str = 'pulse', **args):
+        self.flush_db()
+        args = dict(self.context(), **args)
+        stack = self._stack()
+        stack.append(args)
+        start = self.now()
+        try:
+            yield args
+        finally:
+            self.flush_db()
+            stack.pop()
+            self.add(name, cat, start, self.now(), args)
+
+    # --- Earth Engine calls ---
+
+    def _wrap_ee(self, name, function):
+        def call(*args, **kwargs):
+            with self.span(f"ee.{name}", 'earthengine'):
+                return function(*args, **kwargs)
+        call.__name__ = name
+        return call
+
+    # --- Database query blocks ---
+
+    def _db_wrapper(self, execute, sql, params, many, context):
+        start = self.now()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            end = self.now()
+            block = getattr(self.local, 'db_block', None)
+            if block is not None and start - block['end'] > DB_BLOCK_GAP_US:
+                self.flush_db()
+                block = None
+            if block is None:
+                self.local.db_block = {'start': start, 'end': end, 'queries': 1, 'first': sql[:200]}
+            else:
+                block['end'] = end
+                block['queries'] += 1
+
+    def flush_db(self):
+        block = getattr(self.local, 'db_block', None)
+        if block is None:
+            return
+        self.local.db_block = None
+        args = dict(self.context(), queries=block['queries'], sql=block['first'])
+        self.add(f"db ({block['queries']} queries)", 'db', block['start'], block['end'], args)
+
+    @contextmanager
+    def thread(self):
+        from django.db import connections
+
+        wrappers = [connection.execute_wrapper(self._db_wrapper) for connection in connections.all()]
+        for wrapper in wrappers:
+            wrapper.__enter__()
+        try:
+            yield
+        finally:
+            self.flush_db()
+            for wrapper in reversed(wrappers):
+                wrapper.__exit__(None, None, None)
+
+    # --- Lifecycle ---
+
+    def install(self):
+        global _tracer
+        import ee
+        from django.db import connections
+        from .cassette import INTERCEPTED
+
+        for name in INTERCEPTED:
+            self.originals[name] = getattr(ee.data, name)
+            setattr(ee.data, name, self._wrap_ee(name, self.originals[name]))
+        for connection in connections.all():
+            wrapper = connection.execute_wrapper(self._db_wrapper)
+            wrapper.__enter__()
+            self.db_wrappers.append(wrapper)
+        _tracer = self
+
+    def uninstall(self):
+        global _tracer
+        import ee
+
+        self.flush_db()
+        for name, function in self.originals.items():
+            setattr(ee.data, name, function)
+        self.originals = {}
+        for wrapper in reversed(self.db_wrappers):
+            wrapper.__exit__(None, None, None)
+        self.db_wrappers = []
+        _tracer = None
+
+    def save(self):
+        names = [{'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid, 'args': {'name': f"thread {tid}"}}
+                 for tid in self.threads.values()]
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': names + self.events, 'displayTimeUnit': 'ms'}, f, default=str)
+
+
+class ProfilingMixin:
+    """
+    Adds --profile (cProfile stats dump) and --trace (Chrome trace JSON) to a management command.
+    Worker threads that run their work under trace_thread() (pulse stages, backfill chunks)
+    are profiled too, and their statistics merged with the main thread's.
+
+    Usage:
+        class Command(ProfilingMixin, BaseCommand): ...
+    """
+
+    def create_parser(self, prog_name, subcommand, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)
+        parser.add_argument(
+            '--profile',
+            type=str,
+            default=None,
+            metavar='FILE',
+            help='Write cProfile statistics of the command and its worker threads to FILE '
+                 '(open with pstats or snakeviz) and print the top functions'
+        )
+        parser.add_argument(
+            '--trace',
+            type=str,
+            default=None,
+            metavar='FILE',
+            help='Write a span timeline (AOIs, scenes, Earth Engine calls, query blocks) to FILE in Chrome trace format'
+        )
+        return parser
+
+    def execute(self, *args, **options):
+        global _thread_profiles
+
+        profile_path, trace_path = options.get('profile'), options.get('trace')
+        if not profile_path and not trace_path:
+            return super().execute(*args, **options)
+
+        tracer = Tracer(trace_path) if trace_path else None
+        profiler = cProfile.Profile() if profile_path else None
+        if tracer:
+            tracer.install()
+        if profiler:
+            profiler.enable()
+            _thread_profiles = ThreadProfiles()
+        try:
+            with span('command', cat='command', command=self.__module__.rsplit('.', 1)[-1]):
+                return super().execute(*args, **options)
+        finally:
+            if profiler:
+                profiler.disable()
+                threads, _thread_profiles = _thread_profiles, None
+                stats = pstats.Stats(profiler)
+                for thread_profiler in threads.profilers:
+                    stats.add(thread_profiler)
+                stats.dump_stats(profile_path)
+                self.stdout.write(self.profile_summary(stats))
+                self.stdout.write(f"Profile written to {profile_path}")
+            if tracer:
+                tracer.uninstall()
+                tracer.save()
+                self.stdout.write(f"Trace written to {trace_path} ({len(tracer.events)} spans)")
+
+    def profile_summary(self, stats: pstats.Stats, limit: int = 25) -> str:
+        buffer = io.StringIO()
+        stats.stream = buffer
+        stats.sort_stats('cumulative').print_stats(limit)
+        return buffer.getvalue()
@@ -0,0 +1,80 @@
+import threading
+import time
+
+
+class RequestQuota:
+    """
+    Keeps a process under an Earth Engine request quota while several threads use it.
+
+    At most `rate` requests per second are started (token bucket, bursts up to `burst`) and at
+    most `concurrency` run at once. Installed like the tracer and the cassette, by wrapping the
+    ee.data entry points every getInfo(), export and map request goes through, so callers need
+    no changes.
+
+    Usage:
+        with RequestQuota(rate=10, concurrency=8):
+            ...threads calling Earth Engine...
+    """
+
+    def __init__(self, rate: float, concurrency: int, burst: int = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.tokens = float(self.burst)
+        self.refilled_at = time.monotonic()
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.originals = {}
+        self.requests = 0
+        self.waited_seconds = 0.0
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.uninstall()
+        return False
+
+    def acquire(self):
+        """
+        Blocks until a request may start.
+        """
+        if not self.rate:
+            return
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate)
+                self.refilled_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.requests += 1
+                    self.waited_seconds += waited
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def _wrap(self, name, function):
+        def call(*args, **kwargs):
+            self.acquire()
+            with self.slots:
+                return function(*args, **kwargs)
+        call.__name__ = name
+        return call
+
+    def install(self):
+        import ee
+        from .cassette import INTERCEPTED
+
+        for name in INTERCEPTED:
+            self.originals[name] = getattr(ee.data, name)
+            setattr(ee.data, name, self._wrap(name, self.originals[name]))
+
+    def uninstall(self):
+        import ee
+
+        for name, function in self.originals.items():
+            setattr(ee.data, name, function)
+        self.originals = {}
@@ -0,0 +1,132 @@
+import math
+import time
+from django.conf import settings
+
+# Dynamic World and the Sentinel-2 visible/NIR bands are delivered at 10 m.
+NATIVE_SCALE_M = 10
+
+# Footprint of a single Sentinel-2 granule (109.8 km x 109.8 km), used when
+# a reduction runs over the whole scene instead of an AOI.
+S2_TILE_AREA_M2 = 109800.0 * 109800.0
+
+# Each profile caps how many pixels a single reduceRegion may touch and how
+# coarse the scale may become before Earth Engine is allowed to degrade it
+# further on its own (bestEffort).
+PRECISION_PROFILES = {
+    'high': {'pixel_budget': 5e7, 'max_scale': 60},
+    'balanced': {'pixel_budget': 1e7, 'max_scale': 250},
+    'fast': {'pixel_budget': 2e6, 'max_scale': 1000},
+}
+
+PRECISION_CHOICES = [
+    ('high', 'High (native resolution where possible)'),
+    ('balanced', 'Balanced'),
+    ('fast', 'Fast (coarse, low latency)'),
+]
+
+
+class ReductionPolicy:
+    """
+    Picks reduceRegion parameters (scale, tileScale, bestEffort, maxPixels)
+    from the area being reduced and a precision target.
+    """
+
+    def __init__(self, precision: str = None):
+        self.default_precision = precision or getattr(settings, 'SILVAGUARD_REDUCTION_PRECISION', 'balanced')
+
+    def params_for_area(self, area_m2: float, precision: str = None) -> dict:
+        """
+        Returns keyword arguments for ee.Image.reduceRegion.
+
+        Args:
+            area_m2: Area of the reduction region in square meters.
+            precision: One of PRECISION_PROFILES. Falls back to the global default.
+        """
+        precision = precision or self.default_precision
+        profile = PRECISION_PROFILES.get(precision, PRECISION_PROFILES['balanced'])
+
+        # Smallest multiple of the native scale that keeps us inside the pixel budget
+        ideal_scale = math.sqrt(max(area_m2, 0.0) / profile['pixel_budget'])
+        scale = max(NATIVE_SCALE_M, math.ceil(ideal_scale / NATIVE_SCALE_M) * NATIVE_SCALE_M)
+
+        best_effort = scale > profile['max_scale']
+        if best_effort:
+            scale = profile['max_scale']
+
+        pixels = area_m2 / (scale * scale) if scale else 0.0
+        if pixels <= 1e7:
+            tile_scale = 1
+        elif pixels <= 4e7:
+            tile_scale = 2
+        elif pixels <= 1.6e8:
+            tile_scale = 4
+        elif pixels <= 6.4e8:
+            tile_scale = 8
+        else:
+            tile_scale = 16
+
+        return {
+            'scale': scale,
+            'tileScale': tile_scale,
+            'bestEffort': best_effort,
+            # With bestEffort, maxPixels is the cap Earth Engine coarsens towards
+            'maxPixels': 1e9 if best_effort else 1e12,
+        }
+
+    def params_for_aoi(self, aoi) -> dict:
+        """
+        Returns reduceRegion parameters for an AreaOfInterest, honouring its own precision target.
+        """
+        area_m2 = math.pi * (aoi.radius_km * 1000.0) ** 2
+        return self.params_for_area(area_m2, aoi.precision or None)
+
+    def params_for_scene(self, precision: str = None) -> dict:
+        """
+        Returns reduceRegion parameters for a reduction over a full Sentinel-2 scene.
+        """
+        return self.params_for_area(S2_TILE_AREA_M2, precision)
+
+
+def native_params() -> dict:
+    """
+    Reference parameters: native resolution, maximum tiling, no degradation.
+    """
+    return {'scale': NATIVE_SCALE_M, 'tileScale': 16, 'bestEffort': False, 'maxPixels': 1e13}
+
+
+def benchmark_policy(analyzer, aoi, gee_asset_id: str, policy: ReductionPolicy = None, precision: str = None) -> dict:
+    """
+    Compares a policy-driven analysis against a native-resolution reference for one scene.
+
+    Returns:
+        dict: Latencies, chosen scale and absolute errors of the policy result.
+    """
+    from .gee_utils import aoi_region
+
+    policy = policy or ReductionPolicy()
+    region = aoi_region(aoi.latitude, aoi.longitude, aoi.radius_km)
+    params = policy.params_for_aoi(aoi) if precision is None else policy.params_for_area(
+        math.pi * (aoi.radius_km * 1000.0) ** 2, precision
+    )
+
+    started = time.perf_counter()
+    reference = analyzer.analyze_gee_image(gee_asset_id, region, reduction=native_params())
+    reference_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    candidate = analyzer.analyze_gee_image(gee_asset_id, region, reduction=params)
+    candidate_seconds = time.perf_counter() - started
+
+    return {
+        'aoi': aoi.name,
+        'gee_id': gee_asset_id,
+        'scale': params['scale'],
+        'tile_scale': params['tileScale'],
+        'best_effort': params['bestEffort'],
+        'reference_seconds': reference_seconds,
+        'candidate_seconds': candidate_seconds,
+        'forest_pct_reference': reference['forest_percentage'],
+        'forest_pct_candidate': candidate['forest_percentage'],
+        'forest_pct_error': abs(candidate['forest_percentage'] - reference['forest_percentage']),
+        'mean_prob_error': abs((candidate['mean_ndvi'] or 0.0) - (reference['mean_ndvi'] or 0.0)),
+    }
@@ -0,0 +1,193 @@
+import math
+import os
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from .chips import ChipStore
+from .masks import label_patches
+from .tiles import encode_png, colorize_probability, CORAL
+
+REPORT_VERSION = 4
+THUMBNAIL_SIZE = 256
+MAX_PATCHES = 20
+
+
+class AlertReportBuilder:
+    """
+    Builds the report bundle of a DeforestationAlert: metadata and statistics of both
+    scenes, before/after/loss thumbnails and a table of loss patches.
+
+    The bundle is stored on the alert (report_bundle) and the thumbnails as PNG files
+    under MEDIA_ROOT/reports/<alert id>/, so the report page renders without walking
+    the analysis/image relations or calling Earth Engine. Everything is computed from
+    local rasters (chip store and loss mask); missing rasters only leave out the
+    thumbnails or patch table. Map tile URLs are not part of the bundle: whether a
+    local heatmap tile exists changes as chips are fetched and evicted, so the page
+    resolves them when it renders. Whether the loss mask is stored ('has_mask') is:
+    save_loss_mask drops the bundle when it stores a mask.
+    """
+
+    def __init__(self, chips: ChipStore = None, root=None):
+        self.chips = chips or ChipStore()
+        self.root = str(root or os.path.join(settings.MEDIA_ROOT, 'reports'))
+
+    def build(self, alert) -> dict:
+        """
+        Builds and saves the bundle of an alert.
+
+        Returns:
+            dict: The bundle, or None on failure.
+        """
+        from .models import LossMask
+
+        try:
+            alert = self._load(alert)
+            loss_mask = LossMask.objects.filter(alert=alert).first()
+            bundle = self._summary(alert, loss_mask)
+
+            before_data, _ = self.chips.load(alert.analysis_before.processed_image.satellite_image)
+            after_data, _ = self.chips.load(alert.analysis_after.processed_image.satellite_image)
+            mask = loss_mask.packed().to_array() if loss_mask else None
+
+            if before_data is not None:
+                bundle['thumbnails']['before'] = self._write(alert, 'before', colorize_probability(self._downsample(before_data)))
+            if after_data is not None:
+                bundle['thumbnails']['after'] = self._write(alert, 'after', colorize_probability(self._downsample(after_data)))
+            if mask is not None:
+                if after_data is not None:
+                    rgba = colorize_probability(self._downsample(after_data))
+                else:
+                    rgba = np.zeros(self._downsample(mask).shape + (4,), dtype=np.uint8)
+                rgba[self._downsample_any(mask)] = CORAL + (255,)
+                bundle['thumbnails']['loss'] = self._write(alert, 'loss', rgba)
+                bundle['patches'], bundle['patch_count'] = self._patches(mask, loss_mask.transform)
+
+            alert.report_bundle = bundle
+            alert.save(update_fields=['report_bundle'])
+            return bundle
+
+        except Exception as e:
+            print(f"Failed to build report for alert {alert.pk}: {e}")
+            return None
+
+    def summary(self, alert) -> dict:
+        """
+        The bundle without thumbnails or patch table, from the database alone (nothing is saved).
+        The report page falls back to it when a bundle cannot be built.
+        """
+        from .models import LossMask
+
+        alert = self._load(alert)
+        return self._summary(alert, LossMask.objects.filter(alert=alert).first())
+
+    def _summary(self, alert, loss_mask) -> dict:
+        return {
+            'version': REPORT_VERSION,
+            'generated_at': timezone.now().isoformat(),
+            'aoi': {
+                'id': alert.aoi.id,
+                'name': alert.aoi.name,
+                'latitude': alert.aoi.latitude,
+                'longitude': alert.aoi.longitude,
+                'radius_km': alert.aoi.radius_km,
+            },
+            'loss': {
+                'hectares': alert.forest_loss_hectares,
+                'percentage': alert.loss_percentage,
+                'scale': alert.reduction_scale,
+                'pixels': loss_mask.pixel_count if loss_mask else None,
+                'has_mask': loss_mask is not None,
+            },
+            'before': self._scene(alert.analysis_before),
+            'after': self._scene(alert.analysis_after),
+            'thumbnails': {},
+            'patches': [],
+            'patch_count': None,
+        }
+
+    def _load(self, alert):
+        from .models import DeforestationAlert
+
+        return DeforestationAlert.objects.select_related(
+            'aoi',
+            'analysis_before__processed_image__satellite_image',
+            'analysis_after__processed_image__satellite_image',
+        ).prefetch_related('analysis_before__index_stats', 'analysis_after__index_stats').get(pk=alert.pk)
+
+    def _scene(self, analysis) -> dict:
+        satellite_image = analysis.processed_image.satellite_image
+        return {
+            'image_id': satellite_image.image_id,
+            'gee_id': satellite_image.gee_id,
+            'satellite': satellite_image.satellite_name,
+            'acquisition_date': satellite_image.acquisition_date.isoformat(),
+            'cloud_coverage': satellite_image.cloud_coverage,
+            'analysis_date': analysis.analysis_date.isoformat(),
+            'forest_cover_percentage': analysis.forest_cover_percentage,
+            'forest_threshold': analysis.forest_threshold,
+            'mean_tree_probability': analysis.mean_ndvi,
+            'tree_probability': analysis.tree_summary(),
+            'indices': {stat.index: {'mean': stat.mean, 'min': stat.min, 'max': stat.max, 'stddev': stat.stddev}
+                        for stat in analysis.index_stats.all()},
+        }
+
+    # --- Thumbnails ---
+
+    def _stride(self, shape) -> int:
+        return max(1, int(math.ceil(max(shape) / THUMBNAIL_SIZE)))
+
+    def _downsample(self, data: np.ndarray) -> np.ndarray:
+        stride = self._stride(data.shape)
+        return np.asarray(data[::stride, ::stride])
+
+    def _downsample_any(self, mask: np.ndarray) -> np.ndarray:
+        """
+        Block-wise OR so small loss patches stay visible in the thumbnail.
+        """
+        stride = self._stride(mask.shape)
+        height = -(-mask.shape[0] // stride)
+        width = -(-mask.shape[1] // stride)
+        padded = np.zeros((height * stride, width * stride), dtype=bool)
+        padded[:mask.shape[0], :mask.shape[1]] = mask
+        return padded.reshape(height, stride, width, stride).any(axis=(1, 3))
+
+    def _write(self, alert, name: str, rgba: np.ndarray) -> str:
+        """
+        Writes a thumbnail and returns its media URL.
+        """
+        directory = os.path.join(self.root, str(alert.pk))
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{name}.png")
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(encode_png(rgba))
+        os.replace(tmp_path, path)
+        return f"{settings.MEDIA_URL}reports/{alert.pk}/{name}.png"
+
+    # --- Loss patches ---
+
+    def _patches(self, mask: np.ndarray, transform: list):
+        """
+        Largest connected loss patches with their area and centroid.
+
+        Returns:
+            tuple: (list of at most MAX_PATCHES patch dicts, total patch count)
+        """
+        grid = {'transform': transform, 'height': mask.shape[0]}
+        row_area = self.chips.pixel_area_m2(grid)
+        west, dx, north, dy = transform
+
+        table = []
+        for patch in label_patches(mask):
+            area_m2 = sum(row_area[r] * count for r, count in patch['rows'].items())
+            table.append({
+                'area_ha': float(area_m2) / 10000.0,
+                'pixels': patch['pixels'],
+                'latitude': north - patch['row_sum'] / patch['pixels'] * dy,
+                'longitude': west + patch['col_sum'] / patch['pixels'] * dx,
+            })
+
+        table.sort(key=lambda p: p['area_ha'], reverse=True)
+        for rank, patch in enumerate(table, start=1):
+            patch['rank'] = rank
+        return table[:MAX_PATCHES], len(table)
@@ -0,0 +1,206 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .versioning import batched_bumps
+
+# Scenes deleted per DELETE statement
+DELETE_BATCH = 500
+
+_ANALYSIS = 'processed_version__vegetation_analysis'
+
+
+class HistoryCompactor:
+    """
+    Applies the history retention policy to one AOI at a time.
+
+    Scenes acquired before the cutoff (SILVAGUARD_RETENTION_DAYS ago) are removed
+    together with their processed image, analysis, index statistics and chip:
+    analyzed scenes are first rolled into MonthlyForestAggregate rows, scenes that
+    never produced an analysis are dropped as they are.
+
+    Alert evidence is never touched: analyses referenced by an alert (and so their
+    scenes, loss masks and reports) are kept whatever their age, as are analyses
+    awaiting an export task and the newest SILVAGUARD_RETENTION_KEEP_LATEST analyses
+    of each AOI, which the next pulse compares against.
+    """
+
+    def __init__(self, days: int = None, keep_latest: int = None, dry_run: bool = False):
+        self.days = days if days is not None else getattr(settings, 'SILVAGUARD_RETENTION_DAYS', 365)
+        self.keep_latest = keep_latest if keep_latest is not None else getattr(settings, 'SILVAGUARD_RETENTION_KEEP_LATEST', 2)
+        self.dry_run = dry_run
+        self.cutoff = timezone.now() - timedelta(days=self.days)
+
+    def protected_analyses(self, aoi) -> set:
+        from .models import VegetationAnalysis, DeforestationAlert, ExportTask
+
+        protected = set()
+        for before_id, after_id in DeforestationAlert.objects.filter(aoi=aoi).values_list('analysis_before_id', 'analysis_after_id'):
+            protected.update((before_id, after_id))
+
+        pending = ExportTask.objects.filter(aoi=aoi).exclude(
+            state__in=[ExportTask.STATE_INGESTED, ExportTask.STATE_FAILED]
+        ).values_list('analysis_id', 'analysis_before_id', 'analysis_after_id')
+        for ids in pending:
+            protected.update(pk for pk in ids if pk)
+
+        latest = VegetationAnalysis.objects.filter(
+            processed_image__satellite_image__aoi=aoi
+        ).exclude(heatmap_file_path='GEE_PENDING').order_by(
+            '-processed_image__satellite_image__acquisition_date'
+        ).values_list('id', flat=True)[:self.keep_latest]
+        protected.update(latest)
+        return protected
+
+    def compact_aoi(self, aoi) -> dict:
+        """
+        Returns:
+            dict: scenes rolled up, scenes pruned without analysis, scenes kept as evidence, months touched.
+        """
+        from .models import SatelliteImage, SpectralIndexStat
+
+        results = {'rolled_up': 0, 'pruned': 0, 'kept': 0, 'months': 0}
+        protected = self.protected_analyses(aoi)
+
+        rows = SatelliteImage.objects.filter(aoi=aoi, acquisition_date__lt=self.cutoff).values(
+            'id', 'image_id', 'acquisition_date',
+            f'{_ANALYSIS}__id', f'{_ANALYSIS}__forest_cover_percentage', f'{_ANALYSIS}__mean_ndvi',
+            f'{_ANALYSIS}__tree_histogram', f'{_ANALYSIS}__forest_threshold', f'{_ANALYSIS}__heatmap_file_path',
+        )
+
+        doomed = []
+        analyzed = []
+        for row in rows.iterator(chunk_size=2000):
+            analysis_id = row[f'{_ANALYSIS}__id']
+            if analysis_id in protected:
+                results['kept'] += 1
+                continue
+            doomed.append(row['id'])
+            if analysis_id is None or row[f'{_ANALYSIS}__heatmap_file_path'] == 'GEE_PENDING':
+                results['pruned'] += 1
+            else:
+                analyzed.append(row)
+                results['rolled_up'] += 1
+
+        if not doomed:
+            return results
+
+        index_means = defaultdict(dict)
+        analysis_ids = [row[f'{_ANALYSIS}__id'] for row in analyzed]
+        for start in range(0, len(analysis_ids), DELETE_BATCH):
+            stats = SpectralIndexStat.objects.filter(
+                analysis_id__in=analysis_ids[start:start + DELETE_BATCH], mean__isnull=False
+            ).values_list('analysis_id', 'index', 'mean')
+            for analysis_id, index, mean in stats:
+                index_means[analysis_id][index] = mean
+
+        months = defaultdict(list)
+        for row in analyzed:
+            moment = timezone.localtime(row['acquisition_date'])
+            months[moment.date().replace(day=1)].append(row)
+        results['months'] = len(months)
+
+        if self.dry_run:
+            return results
+
+        # The cascade fires a delete signal per analysis; bump the dataset versions once instead
+        with transaction.atomic(), batched_bumps():
+            for month, month_rows in months.items():
+                self.merge_month(aoi, month, month_rows, index_means)
+            for start in range(0, len(doomed), DELETE_BATCH):
+                SatelliteImage.objects.filter(id__in=doomed[start:start + DELETE_BATCH]).delete()
+            transaction.on_commit(lambda: self.discard_files(doomed))
+
+        return results
+
+    def merge_month(self, aoi, month, rows: list, index_means: dict):
+        """
+        Folds scenes into the month's aggregate, weighting what is already there by its scene count.
+        Scenes whose provider id the aggregate already lists (e.g. re-registered by a backfill after
+        an earlier compaction) are skipped.
+        """
+        from .models import MonthlyForestAggregate
+
+        aggregate = MonthlyForestAggregate.objects.select_for_update().filter(aoi=aoi, month=month).first()
+        if aggregate is not None:
+            counted = set(aggregate.image_ids or [])
+            rows = [row for row in rows if row['image_id'] not in counted]
+            if not rows:
+                return
+
+        covers = [row[f'{_ANALYSIS}__forest_cover_percentage'] for row in rows]
+        probabilities = [row[f'{_ANALYSIS}__mean_ndvi'] for row in rows if row[f'{_ANALYSIS}__mean_ndvi'] is not None]
+        thresholds = {row[f'{_ANALYSIS}__forest_threshold'] for row in rows}
+        dates = [row['acquisition_date'] for row in rows]
+
+        histogram = None
+        for row in rows:
+            counts = row[f'{_ANALYSIS}__tree_histogram']
+            if counts:
+                histogram = _add_counts(histogram, counts)
+
+        indices = defaultdict(list)
+        for row in rows:
+            for index, mean in index_means.get(row[f'{_ANALYSIS}__id'], {}).items():
+                indices[index].append(mean)
+
+        if aggregate is None:
+            aggregate = MonthlyForestAggregate(
+                aoi=aoi, month=month, scene_count=0, mean_forest_cover=0.0,
+                min_forest_cover=min(covers), max_forest_cover=max(covers),
+                forest_threshold=thresholds.pop() if len(thresholds) == 1 else None,
+                first_acquisition=min(dates), last_acquisition=max(dates),
+            )
+            existing_probability_scenes = 0
+        else:
+            aggregate.min_forest_cover = min(aggregate.min_forest_cover, *covers)
+            aggregate.max_forest_cover = max(aggregate.max_forest_cover, *covers)
+            if len(thresholds) != 1 or thresholds.pop() != aggregate.forest_threshold:
+                aggregate.forest_threshold = None
+            aggregate.first_acquisition = min(aggregate.first_acquisition, *dates)
+            aggregate.last_acquisition = max(aggregate.last_acquisition, *dates)
+            existing_probability_scenes = aggregate.scene_count if aggregate.mean_tree_probability is not None else 0
+
+        n = aggregate.scene_count
+        aggregate.mean_forest_cover = (aggregate.mean_forest_cover * n + sum(covers)) / (n + len(covers))
+        if probabilities:
+            previous = (aggregate.mean_tree_probability or 0.0) * existing_probability_scenes
+            aggregate.mean_tree_probability = (previous + sum(probabilities)) / (existing_probability_scenes + len(probabilities))
+        if histogram:
+            aggregate.tree_histogram = _add_counts(aggregate.tree_histogram, histogram)
+
+        merged = dict(aggregate.index_means or {})
+        for index, means in indices.items():
+            # Index counts are not stored per month, so weight the existing mean by the scene count
+            if index in merged:
+                merged[index] = (merged[index] * n + sum(means)) / (n + len(means))
+            else:
+                merged[index] = sum(means) / len(means)
+        aggregate.index_means = merged
+        aggregate.scene_count = n + len(rows)
+        aggregate.image_ids = list(aggregate.image_ids or []) + [row['image_id'] for row in rows]
+        aggregate.save()
+
+    def discard_files(self, satellite_image_ids: list):
+        """
+        Removes local chips and cached heatmap tiles of deleted scenes.
+        """
+        from .chips import ChipStore
+        from .tiles import TileCache
+
+        chips, tiles = ChipStore(), TileCache()
+        for pk in satellite_image_ids:
+            try:
+                chips.discard(pk)
+            except OSError as e:
+                print(f"Could not remove chip {pk}: {e}")
+            tiles.invalidate('heatmap', pk)
+
+
+def _add_counts(total, counts):
+    if total is None:
+        return list(counts)
+    if len(total) != len(counts):
+        return total # Different binning, keep the first
+    return [a + b for a, b in zip(total, counts)]
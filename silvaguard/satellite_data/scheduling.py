@@ -0,0 +1,165 @@
+import heapq
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+# Sentinel-2A/2B combined revisit at the equator
+SENTINEL2_REVISIT_DAYS = 5
+
+
+class CadencePolicy:
+    """
+    Decides how long to wait before pulsing an AOI again.
+
+    The base interval follows the Sentinel-2 revisit. It shrinks for AOIs with
+    recent alerts or a high loss rate and backs off exponentially for AOIs that
+    keep coming back without a scene under the cloud limit.
+    """
+
+    def __init__(self):
+        self.base = timedelta(hours=getattr(settings, 'SILVAGUARD_SCHEDULER_BASE_HOURS', SENTINEL2_REVISIT_DAYS * 24))
+        self.min_interval = timedelta(hours=getattr(settings, 'SILVAGUARD_SCHEDULER_MIN_HOURS', 24))
+        self.max_interval = timedelta(hours=getattr(settings, 'SILVAGUARD_SCHEDULER_MAX_HOURS', 30 * 24))
+        self.alert_window = timedelta(days=getattr(settings, 'SILVAGUARD_SCHEDULER_ALERT_WINDOW_DAYS', 30))
+        if self.alert_window <= timedelta(0):
+            raise ValueError("SILVAGUARD_SCHEDULER_ALERT_WINDOW_DAYS must be positive")
+        # Loss (percent of forest per 30 days) above which an AOI counts as a hotspot
+        self.hot_loss_rate = getattr(settings, 'SILVAGUARD_SCHEDULER_HOT_LOSS_PCT', 1.0)
+
+    def next_interval(self, aoi) -> timedelta:
+        from .models import DeforestationAlert
+
+        since = timezone.now() - self.alert_window
+        recent = DeforestationAlert.objects.filter(aoi=aoi, detected_at__gte=since).aggregate(
+            loss_pct=Sum('loss_percentage')
+        )
+        loss_pct = recent['loss_pct'] or 0.0
+
+        factor = 1.0
+        if loss_pct > 0:
+            # Any recent alert doubles the cadence, a hotspot doubles it again
+            factor /= 2
+            if loss_pct * (timedelta(days=30) / self.alert_window) >= self.hot_loss_rate:
+                factor /= 2
+
+        if aoi.cloudy_pulses:
+            factor *= 2 ** min(aoi.cloudy_pulses, 3)
+
+        interval = self.base * factor
+        return max(self.min_interval, min(self.max_interval, interval))
+
+
+class PulseScheduler:
+    """
+    Priority queue of AOIs ordered by next-due time, pulsed one at a time.
+
+    AOIs without a schedule are staggered by `spacing` so a fresh deployment
+    ramps up steadily instead of pulsing everything at once. An AOI whose pulse
+    raises is retried after `retry_delay` without stopping the others.
+    """
+
+    def __init__(self, orchestrator, leases, policy: CadencePolicy = None, max_cloud: float = 20.0,
+                 spacing: timedelta = timedelta(seconds=60), retry_delay: timedelta = None):
+        self.orchestrator = orchestrator
+        self.leases = leases
+        self.policy = policy or CadencePolicy()
+        self.max_cloud = max_cloud
+        self.spacing = spacing
+        self.retry_delay = retry_delay or timedelta(minutes=getattr(settings, 'SILVAGUARD_SCHEDULER_RETRY_MINUTES', 30))
+        self.queue = []
+        self.queued_ids = set()
+
+    def refresh(self):
+        """
+        Adds AOIs that are not queued yet (new AOIs or a fresh start).
+        """
+        from .models import AreaOfInterest
+
+        now = timezone.now()
+        unscheduled = 0
+        for aoi in AreaOfInterest.objects.exclude(id__in=self.queued_ids).order_by('id'):
+            if aoi.next_pulse_at is None:
+                aoi.next_pulse_at = now + self.spacing * unscheduled
+                aoi.save(update_fields=['next_pulse_at'])
+                unscheduled += 1
+            heapq.heappush(self.queue, (aoi.next_pulse_at, aoi.id))
+            self.queued_ids.add(aoi.id)
+
+    def seconds_until_next(self) -> float:
+        if not self.queue:
+            return None
+        return max(0.0, (self.queue[0][0] - timezone.now()).total_seconds())
+
+    def run_due(self, limit: int = None) -> dict:
+        """
+        Pulses the AOIs whose next-due time has passed, earliest first.
+        """
+        from .models import AreaOfInterest
+
+        results = {'aois_processed': 0, 'new_images': 0, 'alerts_created': 0, 'exports_submitted': 0}
+        while self.queue and self.queue[0][0] <= timezone.now():
+            if limit is not None and results['aois_processed'] >= limit:
+                break
+
+            due_at, aoi_id = heapq.heappop(self.queue)
+            self.queued_ids.discard(aoi_id)
+
+            aoi = AreaOfInterest.objects.filter(id=aoi_id).first()
+            if aoi is None:
+                continue # AOI deleted since it was queued
+            if aoi.next_pulse_at and aoi.next_pulse_at > due_at:
+                # Rescheduled elsewhere (another scheduler or a manual edit)
+                heapq.heappush(self.queue, (aoi.next_pulse_at, aoi.id))
+                self.queued_ids.add(aoi.id)
+                continue
+
+            try:
+                self.pulse(aoi, results)
+            except Exception as e:
+                print(f"  [Pulse Failed] {aoi.name}: {e}")
+                aoi.next_pulse_at = timezone.now() + self.retry_delay
+                try:
+                    aoi.save(update_fields=['next_pulse_at'])
+                except Exception as save_error:
+                    print(f"  [Pulse Failed] Could not reschedule {aoi.name}: {save_error}")
+            heapq.heappush(self.queue, (aoi.next_pulse_at, aoi.id))
+            self.queued_ids.add(aoi.id)
+
+        return results
+
+    def pulse(self, aoi, results: dict):
+        """
+        Pulses a single AOI under its lease (through the PulsePipeline stages) and schedules the next pulse.
+        """
+        from .pipeline import PulsePipeline
+
+        now = timezone.now()
+        self.leases.ensure_leases()
+        if self.leases.claim_next(aoi_ids=[aoi.id]) is None:
+            # Another worker holds it; look again after a short delay
+            aoi.next_pulse_at = now + self.spacing
+            aoi.save(update_fields=['next_pulse_at'])
+            return
+
+        # Look back to the previous pulse (plus one revisit of margin) so no acquisition is missed
+        since = aoi.last_pulsed_at or (now - timedelta(days=15))
+        days = max(1, (now - since).days + SENTINEL2_REVISIT_DAYS)
+
+        completed = False
+        try:
+            pipeline = PulsePipeline(self.orchestrator, self.leases, days, self.max_cloud)
+            scenes_found = pipeline.pulse_aoi(aoi, results)
+            completed = scenes_found is not None
+        finally:
+            self.leases.release(aoi, completed=completed)
+
+        if completed:
+            results['aois_processed'] += 1
+            aoi.cloudy_pulses = 0 if scenes_found else aoi.cloudy_pulses + 1
+            aoi.last_pulsed_at = now
+
+        interval = self.policy.next_interval(aoi)
+        aoi.next_pulse_at = timezone.now() + interval
+        aoi.save(update_fields=['last_pulsed_at', 'next_pulse_at', 'cloudy_pulses'])
+        print(f"  [Scheduled] {aoi.name} next pulse in {interval.total_seconds() / 3600:.1f}h")
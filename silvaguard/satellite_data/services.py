@@ -1,7 +1,7 @@
 import ee
 from datetime import timedelta
 from typing import List, Dict, Any
-from .gee_utils import initialize_gee
+from .gee_utils import initialize_gee, aoi_region
 
 class Sentinel2Service:
     """
@@ -11,9 +11,14 @@ class Sentinel2Service:
     def __init__(self):
         initialize_gee()
 
-    def fetch_metadata(self, aoi_lat: float, aoi_lon: float, start_date, end_date, max_cloud_cover: float = 20.0) -> List[Dict[str, Any]]:
+    def fetch_metadata(self, aoi_lat: float, aoi_lon: float, start_date, end_date, max_cloud_cover: float = 20.0, limit: int = 10,
+                       raise_errors: bool = False) -> List[Dict[str, Any]]:
         """
-        Fetches metadata for available Sentinel-2 images over a specific area using GEE.
+        Fetches metadata for available Sentinel-2 images over a specific area using GEE
+        (the `limit` newest ones).
+
+        Errors are logged and give an empty list, unless raise_errors is set: callers that
+        record an empty result as final (backfill checkpoints) must not mistake a failure for it.
         """
         results = []
         
@@ -30,7 +35,7 @@ class Sentinel2Service:
                 .sort('system:time_start', False) # Newest first
 
             # 3. Get Metadata
-            images_info = s2.limit(10).getInfo()
+            images_info = s2.limit(limit).getInfo()
 
             if 'features' in images_info:
                 for img in images_info['features']:
@@ -53,6 +58,65 @@ class Sentinel2Service:
                     }
                     results.append(metadata)
 
+        except Exception as e:
+            print(f"Error fetching GEE data: {e}")
+            if raise_errors:
+                raise
+
+        return results
+
+    def fetch_group_metadata(self, aois, start_date, end_date, max_cloud_cover: float = 20.0) -> List[Dict[str, Any]]:
+        """
+        Fetches scene metadata once for a group of overlapping AOIs.
+
+        Uses the same 10 km search box per AOI as fetch_metadata over their union; each scene
+        is tagged server-side with the ids of the AOIs whose box it covers ('aoi_ids').
+        """
+        results = []
+
+        try:
+            boxes = ee.FeatureCollection([
+                ee.Feature(ee.Geometry.Point([aoi.longitude, aoi.latitude]).buffer(10000).bounds(), {'aoi_id': aoi.id})
+                for aoi in aois
+            ])
+
+            def tag(img):
+                return img.set('silvaguard_aoi_ids', boxes.filterBounds(img.geometry()).aggregate_array('aoi_id'))
+
+            s2 = ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED") \
+                .filterBounds(boxes.geometry()) \
+                .filterDate(start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')) \
+                .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', max_cloud_cover)) \
+                .sort('system:time_start', False) \
+                .limit(10 * len(aois)) \
+                .map(tag)
+
+            images_info = s2.getInfo()
+
+            import datetime
+            for img in images_info.get('features', []):
+                props = img['properties']
+                timestamp = props.get('system:time_start')
+                acquisition_date = datetime.datetime.fromtimestamp(timestamp / 1000.0, tz=datetime.timezone.utc) if timestamp else None
+
+                results.append({
+                    'image_id': img['id'],
+                    'acquisition_date': acquisition_date,
+                    'cloud_coverage': props.get('CLOUDY_PIXEL_PERCENTAGE', 0),
+                    'satellite_name': 'Sentinel-2',
+                    'platform': props.get('SPACECRAFT_NAME', 'Sentinel-2'),
+                    'processing_level': 'Level-2A',
+                    'gee_id': img['id'],
+                    'aoi_ids': set(props.get('silvaguard_aoi_ids') or []),
+                })
+
+            # Same cap as fetch_metadata: the 10 newest scenes of each AOI
+            taken = {aoi.id: 0 for aoi in aois}
+            for meta in results:
+                meta['aoi_ids'] = {pk for pk in meta['aoi_ids'] if pk in taken and taken[pk] < 10}
+                for pk in meta['aoi_ids']:
+                    taken[pk] += 1
+
         except Exception as e:
             print(f"Error fetching GEE data: {e}")
 
@@ -65,106 +129,370 @@ class SilvaGuardOrchestrator:
 
     def __init__(self):
         from .analysis import VegetationAnalyzer
+        from .batch import BatchExportService
+        from .chips import ChipStore
+        from .reports import AlertReportBuilder
+        from django.conf import settings
         self.s2_service = Sentinel2Service()
         self.analyzer = VegetationAnalyzer()
+        self.batch = BatchExportService(self.analyzer)
+        self.chips = ChipStore() if getattr(settings, 'SILVAGUARD_CHIP_STORE_ENABLED', True) else None
+        self.reports = AlertReportBuilder(self.chips)
+        self.warm_grid = getattr(settings, 'SILVAGUARD_GRID_WARM_FROM_PULSE', True)
+        self.warm_max_cells = getattr(settings, 'SILVAGUARD_GRID_WARM_MAX_CELLS', 500)
+        # Set per pulse by run_pulse; None runs every AOI on its own
+        self.planner = None
 
-    def run_pulse(self, days=7, max_cloud=20.0):
+    def run_pulse(self, days=7, max_cloud=20.0, worker_id=None, lease_seconds=None):
         """
         Executes a full monitoring cycle for all AOIs.
+
+        The cycle runs as the staged PulsePipeline (collect, analyze, tile, detect), each stage
+        with its own threads and batch size and its progress stored on every scene, so an
+        interrupted pulse resumes where it stopped. AOIs are claimed through database leases,
+        so any number of workers can run the pulse concurrently without processing an AOI twice.
         """
-        from .models import AreaOfInterest, SatelliteImage, ProcessedImage, VegetationAnalysis, DeforestationAlert
         from django.utils import timezone
-        
-        aois = AreaOfInterest.objects.all()
-        pulse_results = {'aois_processed': 0, 'new_images': 0, 'alerts_created': 0}
-
-        for aoi in aois:
-            print(f"--- Pulsing AOI: {aoi.name} ---")
-            pulse_results['aois_processed'] += 1
-            
-            # 1. Fetch Metadata
-            end_date = timezone.now()
-            start_date = end_date - timedelta(days=days)
-            metadata_list = self.s2_service.fetch_metadata(aoi.latitude, aoi.longitude, start_date, end_date, max_cloud)
-
-            for meta in metadata_list:
-                # 2. Register Image
-                sat_img, created = SatelliteImage.objects.get_or_create(
-                    image_id=meta['image_id'],
-                    defaults={
-                        'aoi': aoi,
-                        'acquisition_date': meta['acquisition_date'],
-                        'cloud_coverage': meta['cloud_coverage'],
-                        'satellite_name': meta['satellite_name'],
-                        'gee_id': meta['gee_id'],
-                        'metadata_json': {'platform': meta['platform'], 'processing_level': meta['processing_level']}
-                    }
-                )
+        from .leases import LeaseManager
+        from .pipeline import PulsePipeline
 
-                if created:
-                    pulse_results['new_images'] += 1
-                    print(f"  [New Image] {sat_img.image_id}")
-                
-                # 3. Process Image
-                proc_img, proc_created = ProcessedImage.objects.get_or_create(
-                    satellite_image=sat_img,
-                    defaults={
-                        'processed_file_path': "GEE_COMPUTED",
-                        'processed_metadata': {'method': 'GEE_SERVER_SIDE'}
-                    }
-                )
+        leases = LeaseManager(owner=worker_id, ttl_seconds=lease_seconds)
+        leases.ensure_leases()
+        pulse_started = timezone.now()
+        self.planner = self.plan_pulse()
+        pulse_results = PulsePipeline(self, leases, days, max_cloud).run(pulse_started)
 
-                # 4. Analyze Vegetation
-                analysis, anal_created = VegetationAnalysis.objects.get_or_create(
-                    processed_image=proc_img,
-                    defaults={
-                        'mean_ndvi': 0.0,
-                        'forest_cover_percentage': 0.0,
-                        'heatmap_file_path': 'GEE_PENDING'
-                    }
+        if self.planner is not None:
+            summary = self.planner.summary()
+            pulse_results['ee_requests_saved'] = summary['requests_saved']
+            if summary['groups']:
+                print(
+                    f"[Planner] {summary['grouped_aois']} overlapping AOIs in {summary['groups']} groups: "
+                    f"{summary['requests_saved']} Earth Engine requests saved "
+                    f"(metadata {summary['metadata_requests_saved']}, scene reductions {summary['scene_reductions_saved']}, "
+                    f"loss reductions {summary['loss_reductions_saved']}, tiles {summary['tile_requests_saved']})"
                 )
 
-                if anal_created or analysis.heatmap_file_path == 'GEE_PENDING':
-                    gee_result = self.analyzer.analyze_gee_image(sat_img.gee_id)
-                    tile_url = self.analyzer.generate_heatmap(sat_img.gee_id)
-                    
-                    analysis.mean_ndvi = gee_result['mean_ndvi']
-                    analysis.forest_cover_percentage = gee_result['forest_percentage']
-                    analysis.heatmap_file_path = tile_url
-                    analysis.save()
-                    print(f"  [Analyzed] Forest Cover: {analysis.forest_cover_percentage:.1f}%")
-
-            # 5. Detect Deforestation (Comparison Pulse)
-            analyses = VegetationAnalysis.objects.filter(
-                processed_image__satellite_image__aoi=aoi
-            ).order_by('processed_image__satellite_image__acquisition_date')
-
-            if analyses.count() >= 2:
-                latest = analyses.last()
-                previous = analyses[analyses.count() - 2]
-                
-                # Only check if alert doesn't exist yet for this pair
-                if not DeforestationAlert.objects.filter(analysis_before=previous, analysis_after=latest).exists():
-                    print(f"  [Checking Alerts] {previous.analysis_date.date()} vs {latest.analysis_date.date()}")
+        from .events import publish, prune, KIND_PULSE
+        publish(KIND_PULSE, dict(pulse_results, stage='pulse_finished'))
+        prune()
+        return pulse_results
+
+    def plan_pulse(self):
+        """
+        Builds the ScenePlanner sharing Earth Engine work between overlapping AOIs,
+        or None when SILVAGUARD_SHARED_PLANNING is off.
+        """
+        from django.conf import settings
+        from .models import AreaOfInterest
+        from .planning import ScenePlanner
+
+        if not getattr(settings, 'SILVAGUARD_SHARED_PLANNING', True):
+            return None
+        aois = AreaOfInterest.objects.only('id', 'name', 'latitude', 'longitude', 'radius_km', 'precision')
+        return ScenePlanner(self.analyzer, self.s2_service, list(aois), batch=self.batch)
+
+    def collect_metadata(self, aoi, days, max_cloud) -> list:
+        """
+        Metadata of the AOI's scenes under the cloud limit in the last `days` days.
+        """
+        from django.utils import timezone
+
+        end_date = timezone.now()
+        start_date = end_date - timedelta(days=days)
+        if self.planner is not None:
+            return self.planner.fetch_metadata(aoi, start_date, end_date, max_cloud)
+        return self.s2_service.fetch_metadata(aoi.latitude, aoi.longitude, start_date, end_date, max_cloud)
+
+    def detect_aoi(self, aoi, region, reduction, use_batch, pulse_results):
+        """
+        Compares the AOI's two latest analyzed scenes and creates an alert (or submits the loss
+        export task in batch mode) unless the pair was checked already.
+        """
+        from .models import VegetationAnalysis, DeforestationAlert
+
+        analyses = VegetationAnalysis.objects.filter(
+            processed_image__satellite_image__aoi=aoi
+        ).order_by('processed_image__satellite_image__acquisition_date')
+        if not use_batch:
+            # Scenes whose analysis failed carry placeholder zeros; export tasks compute from the scenes
+            analyses = analyses.exclude(heatmap_file_path='GEE_PENDING')
+
+        if analyses.count() >= 2:
+            latest = analyses.last()
+            previous = analyses[analyses.count() - 2]
+
+            # Only check if alert doesn't exist yet for this pair
+            alert_exists = DeforestationAlert.objects.filter(analysis_before=previous, analysis_after=latest).exists()
+            if not alert_exists and use_batch:
+                if self.batch.submit_loss(aoi, previous, latest, region, reduction):
+                    pulse_results['exports_submitted'] += 1
+                    print(f"  [Export Submitted] Loss {previous.analysis_date.date()} vs {latest.analysis_date.date()}")
+
+            elif not alert_exists:
+                print(f"  [Checking Alerts] {previous.analysis_date.date()} vs {latest.analysis_date.date()}")
+                comparison = None
+                if self.chips:
+                    comparison = self.chips.loss(
+                        previous.processed_image.satellite_image,
+                        latest.processed_image.satellite_image
+                    )
+                gee_before = previous.processed_image.satellite_image.gee_id
+                gee_after = latest.processed_image.satellite_image.gee_id
+                if comparison is None and self.planner is not None:
+                    comparison = self.planner.forest_loss(aoi, gee_before, gee_after, reduction)
+                if comparison is None:
                     comparison = self.analyzer.calculate_forest_loss(
-                        previous.processed_image.satellite_image.gee_id,
-                        latest.processed_image.satellite_image.gee_id
+                        gee_before,
+                        gee_after,
+                        region=region,
+                        reduction=reduction
                     )
-                    
-                    if comparison['loss_ha'] > 0.1: # Threshold for alert
-                        loss_tile = self.analyzer.get_loss_tile_url(
-                            previous.processed_image.satellite_image.gee_id,
-                            latest.processed_image.satellite_image.gee_id
-                        )
-                        alert = DeforestationAlert.objects.create(
-                            aoi=aoi,
-                            analysis_before=previous,
-                            analysis_after=latest,
-                            forest_loss_hectares=comparison['loss_ha'],
-                            loss_percentage=comparison['loss_percentage'],
-                            loss_map_path=loss_tile
-                        )
+                if comparison.get('error'):
+                    raise RuntimeError(f"Loss of {gee_before} vs {gee_after} failed: {comparison['error']}")
+
+                if comparison['loss_ha'] > 0.1: # Threshold for alert
+                    _, alert_created = self.create_alert(aoi, previous, latest, comparison)
+                    if alert_created:
                         pulse_results['alerts_created'] += 1
-                        print(f"  [ALERT] {alert.forest_loss_hectares:.2f} ha lost!")
 
-        return pulse_results
+    def create_alert(self, aoi, previous, latest, comparison: dict) -> tuple:
+        """
+        Creates the alert of a compared pair with its loss tile, loss mask (local comparisons)
+        and report bundle. The (before, after) pair is unique, so a concurrent worker cannot
+        duplicate the alert.
+
+        Returns:
+            tuple: (DeforestationAlert, created)
+        """
+        from .models import DeforestationAlert
+        from .masks import save_loss_mask
+
+        gee_before = previous.processed_image.satellite_image.gee_id
+        gee_after = latest.processed_image.satellite_image.gee_id
+        if self.planner is not None:
+            loss_tile = self.planner.loss_tile(gee_before, gee_after)
+        else:
+            loss_tile = self.analyzer.get_loss_tile_url(gee_before, gee_after)
+
+        alert, created = DeforestationAlert.objects.get_or_create(
+            analysis_before=previous,
+            analysis_after=latest,
+            defaults={
+                'aoi': aoi,
+                'forest_loss_hectares': comparison['loss_ha'],
+                'loss_percentage': comparison['loss_percentage'],
+                'reduction_scale': comparison['scale'],
+                'loss_map_path': loss_tile
+            }
+        )
+        if created:
+            save_loss_mask(alert, comparison)
+            self.reports.build(alert)
+            print(f"  [ALERT] {alert.forest_loss_hectares:.2f} ha lost ({previous.analysis_date.date()} vs {latest.analysis_date.date()})")
+        return alert, created
+
+    def register_scene(self, aoi, meta, pulse_results):
+        """
+        Stores a scene found by the pulse with its (pending) analysis row.
+
+        Returns:
+            tuple: (SatelliteImage, VegetationAnalysis); the analysis heatmap_file_path is
+            'GEE_PENDING' until the scene is analyzed.
+        """
+        from .models import SatelliteImage, ProcessedImage, VegetationAnalysis
+
+        # 2. Register Image
+        sat_img, created = SatelliteImage.objects.get_or_create(
+            aoi=aoi,
+            image_id=meta['image_id'],
+            defaults={
+                'acquisition_date': meta['acquisition_date'],
+                'cloud_coverage': meta['cloud_coverage'],
+                'satellite_name': meta['satellite_name'],
+                'gee_id': meta['gee_id'],
+                'metadata_json': {'platform': meta['platform'], 'processing_level': meta['processing_level']}
+            }
+        )
+
+        if created:
+            pulse_results['new_images'] += 1
+            print(f"  [New Image] {sat_img.image_id}")
+
+        # 3. Process Image
+        proc_img, proc_created = ProcessedImage.objects.get_or_create(
+            satellite_image=sat_img,
+            defaults={
+                'processed_file_path': "GEE_COMPUTED",
+                'processed_metadata': {'method': 'GEE_SERVER_SIDE'}
+            }
+        )
+
+        analysis, anal_created = VegetationAnalysis.objects.get_or_create(
+            processed_image=proc_img,
+            defaults={
+                'mean_ndvi': 0.0,
+                'forest_cover_percentage': 0.0,
+                'heatmap_file_path': 'GEE_PENDING'
+            }
+        )
+        return sat_img, analysis
+
+    def analyze_scene(self, aoi, sat_img, analysis, region, reduction, use_batch, pulse_results, tile=True):
+        """
+        Analyzes a registered scene (or submits its export task in batch mode).
+
+        Raises:
+            RuntimeError: if the Earth Engine reduction failed; the analysis is left pending.
+
+        Args:
+            tile: Request the heatmap tile too; otherwise heatmap_file_path is left empty for scene_tile.
+        """
+        # 4. Analyze Vegetation
+        if use_batch:
+            if self.batch.submit_analysis(aoi, analysis, sat_img.gee_id, region, reduction):
+                pulse_results['exports_submitted'] += 1
+                print(f"  [Export Submitted] Analysis of {sat_img.image_id}")
+            return
+
+        # The chip is downloaded anyway, so its pixels answer the statistics without a reduction
+        gee_result, index_stats = None, None
+        if self.chips and self.chips.fetch(sat_img, self.analyzer):
+            gee_result = self.chips.analyze(sat_img)
+        # Overlapping AOIs get their statistics from one reduction of the scene over all of them
+        if not (gee_result and gee_result['histogram']) and self.planner is not None:
+            shared = self.planner.scene_analysis(aoi, sat_img.gee_id, reduction)
+            if shared is not None:
+                gee_result, index_stats = shared
+        # An empty histogram means no Dynamic World pixels; the AOI's own reduction reports why
+        if not (gee_result and gee_result['histogram']):
+            gee_result = self.analyzer.analyze_gee_image(sat_img.gee_id, region, reduction=reduction)
+            index_stats = None
+        if gee_result.get('error'):
+            # Leave the analysis pending rather than storing the placeholder zeros
+            raise RuntimeError(f"Analysis of {sat_img.gee_id} failed: {gee_result['error']}")
+
+        analysis.mean_ndvi = gee_result['mean_ndvi']
+        analysis.forest_cover_percentage = gee_result['forest_percentage']
+        analysis.tree_histogram = gee_result['histogram'] or None
+        analysis.forest_threshold = gee_result['threshold']
+        analysis.reduction_scale = gee_result['scale']
+        analysis.heatmap_file_path = self.scene_tile(sat_img.gee_id) if tile else ''
+        analysis.save()
+        print(f"  [Analyzed] Forest Cover: {analysis.forest_cover_percentage:.1f}%")
+        self.finish_scene(sat_img, analysis, region, reduction, index_stats)
+
+    def finish_scene(self, sat_img, analysis, region, reduction, index_stats=None):
+        """
+        Stores the spectral indices and the chip of an analyzed scene. Steps already done are
+        skipped, so running it again completes a scene interrupted after its analysis was saved.
+
+        Raises:
+            RuntimeError: if the indices could not be computed.
+        """
+        # Keep the scene's pixels locally so later comparisons need no Earth Engine call.
+        # Best effort: comparisons without a chip fall back to Earth Engine.
+        if self.chips:
+            self.chips.fetch(sat_img, self.analyzer)
+
+        if index_stats is None and not analysis.index_stats.exists():
+            # Stored bands answer the indices locally, otherwise Earth Engine reduces them
+            if self.chips:
+                index_stats = self.chips.index_statistics(sat_img, self.analyzer.indices)
+            if index_stats is None:
+                index_stats = self.analyzer.compute_indices(sat_img.gee_id, region, reduction=reduction)
+            if not index_stats:
+                raise RuntimeError(f"Spectral indices of {sat_img.gee_id} failed")
+        if index_stats:
+            self.analyzer.save_indices(analysis, index_stats, analysis.reduction_scale)
+
+        # Same for the grid cells of the AOI, which ad-hoc area queries then answer without Earth Engine
+        if self.warm_grid:
+            import datetime
+            from .gridcache import GridCellCache
+            aoi = sat_img.aoi
+            try:
+                GridCellCache().warm(aoi.latitude, aoi.longitude, aoi.radius_km,
+                                     sat_img.acquisition_date.astimezone(datetime.timezone.utc).date(),
+                                     max_cells=self.warm_max_cells)
+            except Exception as e:
+                print(f"Grid cells of {sat_img.gee_id} not cached: {e}")
+
+    def scene_tile(self, gee_id) -> str:
+        """
+        Heatmap tile URL of a scene ('' if it could not be created).
+        """
+        if self.planner is not None:
+            return self.planner.heatmap(gee_id)
+        return self.analyzer.generate_heatmap(gee_id)
+
+    def backfill_alerts(self, aoi, start=None, end=None) -> dict:
+        """
+        Checks every consecutive pair of analyzed scenes of an AOI for forest loss and creates
+        the missing alerts. Pairs with both chips stored are compared locally (and keep their
+        loss mask); the others in a single Earth Engine call.
+
+        Args:
+            start, end: Optional datetimes; only pairs whose later scene was acquired in
+                [start, end) are checked (the pair reaching back before start included).
+        """
+        from .models import VegetationAnalysis, DeforestationAlert
+
+        analyses = list(
+            VegetationAnalysis.objects.filter(
+                processed_image__satellite_image__aoi=aoi,
+                processed_image__satellite_image__gee_id__isnull=False
+            ).select_related('processed_image__satellite_image')
+            .order_by('processed_image__satellite_image__acquisition_date')
+        )
+        results = {'pairs_checked': 0, 'alerts_created': 0, 'pairs_failed': 0}
+        if start is not None or end is not None:
+            inside = [
+                i for i, a in enumerate(analyses)
+                if i > 0
+                and (start is None or a.processed_image.satellite_image.acquisition_date >= start)
+                and (end is None or a.processed_image.satellite_image.acquisition_date < end)
+            ]
+            analyses = analyses[inside[0] - 1:inside[-1] + 1] if inside else []
+        if len(analyses) < 2:
+            return results
+
+        existing = set(
+            DeforestationAlert.objects.filter(aoi=aoi).values_list('analysis_before_id', 'analysis_after_id')
+        )
+        todo = [i for i in range(len(analyses) - 1) if (analyses[i].pk, analyses[i + 1].pk) not in existing]
+        if not todo:
+            return results
+
+        comparisons = {}
+        if self.chips:
+            for i in todo:
+                comparison = self.chips.loss(
+                    analyses[i].processed_image.satellite_image, analyses[i + 1].processed_image.satellite_image
+                )
+                if comparison is not None:
+                    comparisons[i] = comparison
+        if any(i not in comparisons for i in todo):
+            series = self.analyzer.calculate_loss_series(
+                [a.processed_image.satellite_image.gee_id for a in analyses],
+                region=aoi_region(aoi.latitude, aoi.longitude, aoi.radius_km),
+                reduction=self.analyzer.policy.params_for_aoi(aoi)
+            )
+            # calculate_loss_series returns nothing when the Earth Engine call failed
+            for i in todo:
+                if i not in comparisons and i < len(series):
+                    comparisons[i] = series[i]
+        results['pairs_failed'] = len(todo) - len(comparisons)
+
+        for i in todo:
+            comparison = comparisons.get(i)
+            if comparison is None:
+                continue
+            results['pairs_checked'] += 1
+            if comparison['loss_ha'] <= 0.1: # Threshold for alert
+                continue
+            _, alert_created = self.create_alert(aoi, analyses[i], analyses[i + 1], comparison)
+            if alert_created:
+                results['alerts_created'] += 1
+
+        return results
@@ -0,0 +1,52 @@
+from django.db.models.signals import post_save, post_delete
+from .models import AreaOfInterest, VegetationAnalysis, DeforestationAlert, LossMask
+from .versioning import bump
+
+# Model -> (datasets it feeds, fields whose changes do not affect any published dataset)
+TRACKED = {
+    AreaOfInterest: (('map-data', 'aois', 'alerts'), {'last_pulsed_at', 'next_pulse_at', 'cloudy_pulses'}),
+    VegetationAnalysis: (('map-data',), set()),
+    DeforestationAlert: (('map-data', 'alerts'), {'report_bundle'}),
+    LossMask: (('map-data',), set()),
+}
+
+
+def _changed(sender, update_fields=None, **kwargs):
+    keys, ignored = TRACKED[sender]
+    if update_fields and set(update_fields) <= ignored:
+        return
+    bump(*keys)
+
+
+def _alert_created(sender, instance, created, **kwargs):
+    if not created:
+        return
+    from django.urls import reverse
+    from .events import publish, KIND_ALERT
+
+    aoi = instance.aoi
+    publish(KIND_ALERT, {
+        'id': instance.id,
+        'aoi_id': aoi.id,
+        'aoi_name': aoi.name,
+        'lat': aoi.latitude,
+        'lon': aoi.longitude,
+        'loss_ha': instance.forest_loss_hectares,
+        'loss_pct': instance.loss_percentage,
+        'date': instance.detected_at.strftime('%Y-%m-%d'),
+        'url': reverse('alert_detail', args=[instance.id]),
+    }, aoi=aoi)
+
+    # Outbox rows share the alert's transaction; dispatch_notifications sends them later
+    from .notifications import enqueue_for_alert
+    try:
+        enqueue_for_alert(instance)
+    except Exception as e:
+        print(f"Failed to queue notifications for alert {instance.id}: {e}")
+
+
+def connect():
+    for model in TRACKED:
+        post_save.connect(_changed, sender=model, dispatch_uid=f'version-save-{model.__name__}')
+        post_delete.connect(_changed, sender=model, dispatch_uid=f'version-delete-{model.__name__}')
+    post_save.connect(_alert_created, sender=DeforestationAlert, dispatch_uid='event-alert-created')
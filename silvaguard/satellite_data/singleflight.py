@@ -0,0 +1,84 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.cache import cache
+
+# Cached in place of a None result
+EMPTY = 'singleflight:empty'
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls into one execution.
+
+    The first caller of a key starts the work on the pool and every caller of the same key
+    gets the same Future until it completes, so a burst of identical requests costs one call.
+    Callers wait on the Future with their own timeout; the work keeps running past it and
+    its result can be cached for the next caller.
+
+    Across processes, the leader also holds a cache lock (cache.add) for the key: a process
+    that finds the lock taken polls for the other process's result instead of computing it
+    again, and only computes itself if the lock goes away without a result. This needs a cache
+    shared by the processes (SILVAGUARD_CACHE=database); with the default per-process local
+    memory cache, each process coalesces only its own callers.
+
+    A None result is cached too, as EMPTY for empty_ttl seconds, so a miss is not recomputed
+    by every caller that follows.
+
+    Usage:
+        flight = SingleFlight(max_workers=4)
+        future, leader = flight.submit(key, compute, result_key=key, ttl=3600, empty_ttl=300)
+        value = future.result(timeout=10)
+    """
+
+    def __init__(self, max_workers: int = 4, lock_seconds: int = 300, poll_seconds: float = 0.2):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='singleflight')
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.lock_seconds = lock_seconds
+        self.poll_seconds = poll_seconds
+
+    def submit(self, key: str, function, result_key: str = None, ttl: int = None, empty_ttl: int = None):
+        """
+        Returns (future, leader): leader is False when the call joined work already in flight here.
+        With result_key, the result is stored in the cache under it for ttl seconds, and a None
+        result as EMPTY for empty_ttl seconds (not at all when empty_ttl is None).
+        """
+        with self.lock:
+            future = self.inflight.get(key)
+            if future is not None:
+                return future, False
+            future = self.pool.submit(self._run, key, function, result_key, ttl, empty_ttl)
+            self.inflight[key] = future
+        future.add_done_callback(lambda f: self._forget(key, f))
+        return future, True
+
+    def _forget(self, key, future):
+        with self.lock:
+            if self.inflight.get(key) is future:
+                del self.inflight[key]
+
+    def _run(self, key, function, result_key, ttl, empty_ttl):
+        if result_key is None:
+            return function()
+
+        lock_key = f"singleflight:{key}"
+        while not cache.add(lock_key, 1, self.lock_seconds):
+            # Another process is computing it: wait for its result
+            time.sleep(self.poll_seconds)
+            value = cache.get(result_key)
+            if value is not None:
+                return None if value == EMPTY else value
+        try:
+            value = function()
+            if value is not None:
+                cache.set(result_key, value, ttl)
+            elif empty_ttl:
+                cache.set(result_key, EMPTY, empty_ttl)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    def inflight_count(self) -> int:
+        with self.lock:
+            return len(self.inflight)
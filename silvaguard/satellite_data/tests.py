@@ -1,3 +1,1422 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import io
+import json
+import os
+import pstats
+import shutil
+import tempfile
+import threading
+import ee
+import numpy as np
+from concurrent.futures import Future, ThreadPoolExecutor
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import BaseCommand, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from . import geohash, imports
+from .adhoc import AreaStatsService
+from .analysis import VegetationAnalyzer
+from .backfill import BackfillRunner, format_duration, plan_job
+from .batch import BatchExportService, LocalTaskClient
+from .cassette import EECassette, RECORD, REPLAY
+from .chips import ChipStore
+from .events import EventBroadcaster
+from .gee_utils import haversine_m
+from .gridcache import GridCellCache
+from .indices import NUMPY_OPERATORS, SpectralIndexEngine
+from .leases import LeaseManager
+from .masks import PackedMask, cumulative, save_loss_mask
+from .planning import ScenePlanner, overlap_groups
+from .pagination import KeysetPaginator, page_size
+from .profiling import ProfilingMixin, trace_thread
+from .retention import HistoryCompactor
+from .reduction import ReductionPolicy, NATIVE_SCALE_M
+from .scheduling import CadencePolicy
+from .singleflight import SingleFlight, EMPTY
+from .versioning import batched_bumps, bump, current
+from .models import (AreaOfInterest, AOILease, BackfillChunk, BackfillJob, GridCellStat, MonthlyForestAggregate, SpectralIndexStat, SatelliteImage, ProcessedImage, VegetationAnalysis, DeforestationAlert, Notification,
+                     ExportTask, LossMask)
+from .notifications import NotificationDispatcher
 
-# Create your tests here.
+
+def create_analysis(aoi, days_ago: int, forest_cover: float = 70.0):
+    """
+    A scene of the AOI acquired days_ago days ago with its analysis.
+    """
+    image = SatelliteImage.objects.create(
+        aoi=aoi, acquisition_date=timezone.now() - datetime.timedelta(days=days_ago),
+        cloud_coverage=5.0, image_id=f'S2_TEST_{aoi.pk}_{days_ago}',
+    )
+    processed = ProcessedImage.objects.create(satellite_image=image, processed_file_path='test')
+    return VegetationAnalysis.objects.create(
+        processed_image=processed, mean_ndvi=0.6, forest_cover_percentage=forest_cover, heatmap_file_path='test',
+    )
+
+
+class CountingBackend(EmailBackend):
+    """
+    locmem backend that counts how often the dispatcher opens it.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.opened = 0
+
+    def open(self):
+        self.opened += 1
+        return super().open()
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    SILVAGUARD_ALERT_EMAILS=[],
+)
+class NotificationDispatcherTests(TestCase):
+
+    def setUp(self):
+        User = get_user_model()
+        User.objects.create_user('ana', 'ana@example.com', 'pw', notify_alerts=True)
+        User.objects.create_user('ben', 'ben@example.com', 'pw', notify_alerts=True)
+        User.objects.create_user('cy', 'cy@example.com', 'pw')
+        self.aoi = AreaOfInterest.objects.create(name='Test forest', latitude=-3.0, longitude=-60.0)
+        self.scenes = 0
+
+    def analysis(self):
+        self.scenes += 1
+        return create_analysis(self.aoi, self.scenes)
+
+    def alert(self, loss_ha):
+        return DeforestationAlert.objects.create(
+            aoi=self.aoi, analysis_before=self.analysis(), analysis_after=self.analysis(),
+            forest_loss_hectares=loss_ha, loss_percentage=2.0,
+        )
+
+    def test_alert_queues_opted_in_recipients(self):
+        alert = self.alert(1.5)
+        recipients = set(Notification.objects.filter(alert=alert).values_list('recipient', flat=True))
+        self.assertEqual(recipients, {'ana@example.com', 'ben@example.com'})
+
+    def test_digest_per_recipient(self):
+        self.alert(1.5)
+        self.alert(4.0)
+        self.alert(0.5)
+
+        results = NotificationDispatcher().drain()
+
+        self.assertEqual(results['sent'], 6)
+        self.assertEqual(results['digests'], 2)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['ana@example.com', 'ben@example.com'])
+        message = mail.outbox[0]
+        self.assertIn('3 new deforestation alerts', message.subject)
+        # Largest loss first
+        self.assertLess(message.body.index('4.00 ha'), message.body.index('1.50 ha'))
+        self.assertFalse(Notification.objects.filter(state=Notification.STATE_PENDING).exists())
+
+    def test_connection_reused_across_batches(self):
+        for loss_ha in (1.0, 2.0, 3.0):
+            self.alert(loss_ha)
+        connection = CountingBackend()
+
+        results = NotificationDispatcher(batch_size=2, connection=connection).drain()
+
+        self.assertEqual(results['batches'], 3)
+        self.assertEqual(results['sent'], 6)
+        self.assertEqual(connection.opened, 1)
+        self.assertEqual(len(mail.outbox), results['digests'])
+
+    def test_failed_recipient_is_retried(self):
+        self.alert(1.0)
+
+        class FailingBackend(CountingBackend):
+            def send_messages(self, messages):
+                if messages[0].to == ['ana@example.com']:
+                    raise OSError('mailbox unavailable')
+                return super().send_messages(messages)
+
+        results = NotificationDispatcher(connection=FailingBackend()).drain()
+
+        self.assertEqual((results['sent'], results['failed']), (1, 1))
+        failed = Notification.objects.get(recipient='ana@example.com')
+        self.assertEqual((failed.state, failed.attempts), (Notification.STATE_PENDING, 1))
+        self.assertEqual(failed.last_error, 'mailbox unavailable')
+
+
+class SpectralIndexEngineTests(TestCase):
+
+    def setUp(self):
+        self.engine = SpectralIndexEngine()
+        self.bands = {
+            'BLUE': np.array([[0.05]]), 'GREEN': np.array([[0.08]]), 'RED': np.array([[0.1]]),
+            'NIR': np.array([[0.5]]), 'SWIR1': np.array([[0.3]]), 'SWIR2': np.array([[0.2]]),
+        }
+
+    def test_known_index_values(self):
+        values = self.engine.evaluate_local(self.bands)
+
+        self.assertAlmostEqual(values['NDVI'][0, 0], 0.4 / 0.6)
+        self.assertAlmostEqual(values['EVI'][0, 0], 1.0 / 1.725)
+        self.assertAlmostEqual(values['SAVI'][0, 0], 0.6 / 1.1)
+        self.assertAlmostEqual(values['NBR'][0, 0], 0.3 / 0.7)
+
+    def test_undefined_pixels_are_nan(self):
+        values = SpectralIndexEngine(['NDVI']).evaluate_local({'NIR': np.zeros((1, 2)), 'RED': np.zeros((1, 2))})
+
+        self.assertTrue(np.isnan(values['NDVI']).all())
+
+    def test_unary_minus(self):
+        engine = SpectralIndexEngine(['NDVI'])
+        tree = engine._parse('-NIR + 1')
+        self.assertAlmostEqual(engine._walk(tree.body, {'NIR': np.array(0.25)}, float, NUMPY_OPERATORS), 0.75)
+
+    def test_missing_band(self):
+        with self.assertRaises(ValueError):
+            self.engine.evaluate_local({'NIR': np.ones((1, 1))})
+
+    def test_local_statistics_masked(self):
+        bands = {'NIR': np.array([[0.5, 0.5, 0.9]]), 'RED': np.array([[0.1, 0.3, 0.0]])}
+        mask = np.array([[True, True, False]])
+
+        stats = SpectralIndexEngine(['NDVI']).local_statistics(bands, mask)['NDVI']
+
+        self.assertAlmostEqual(stats['min'], 0.25)
+        self.assertAlmostEqual(stats['max'], 0.4 / 0.6)
+        self.assertAlmostEqual(stats['mean'], (0.25 + 0.4 / 0.6) / 2)
+
+    def test_local_statistics_empty(self):
+        bands = {'NIR': np.ones((1, 1)), 'RED': np.ones((1, 1))}
+
+        stats = SpectralIndexEngine(['NDVI']).local_statistics(bands, np.zeros((1, 1), dtype=bool))
+
+        self.assertEqual(stats['NDVI'], {'mean': None, 'min': None, 'max': None, 'stddev': None})
+
+
+class ChipStoreTests(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.store = ChipStore(root=self.root)
+        aoi = AreaOfInterest.objects.create(name='Chip forest', latitude=-3.0, longitude=-60.0, radius_km=1.0)
+        self.image = SatelliteImage.objects.create(
+            aoi=aoi, acquisition_date=timezone.now(), cloud_coverage=5.0, image_id='S2_CHIP',
+        )
+        self.grid = self.store.grid_for_aoi(aoi)
+        shape = (self.grid['height'], self.grid['width'])
+        self.store.store(self.image, np.zeros(shape, dtype=np.uint8), self.grid)
+        self.shape = shape
+
+    def test_analyze_from_chip(self):
+        self.store.store(self.image, np.full(self.shape, 127, dtype=np.uint8), self.grid)
+
+        result = self.store.analyze(self.image, threshold=0.4)
+
+        self.assertAlmostEqual(result['mean_ndvi'], 0.5)
+        self.assertAlmostEqual(result['forest_percentage'], 100.0)
+        self.assertEqual(self.store.analyze(self.image, threshold=0.6)['forest_percentage'], 0.0)
+        self.assertTrue(result['histogram'])
+
+    def test_reads_refresh_lru_at_eviction(self):
+        other = SatelliteImage.objects.create(
+            aoi=self.image.aoi, acquisition_date=timezone.now(), cloud_coverage=5.0, image_id='S2_CHIP_2',
+        )
+        self.store.store(other, np.zeros(self.shape, dtype=np.uint8), self.grid)
+        first, _ = self.store._paths(self.image)
+        second, _ = self.store._paths(other)
+        os.utime(first, (1000, 1000))
+        os.utime(second, (2000, 2000))
+
+        self.store.load(self.image)
+        self.assertEqual(os.stat(first).st_mtime, 1000) # Reads write nothing
+
+        self.store.max_bytes = os.path.getsize(first) + 1
+        self.store.evict()
+
+        self.assertTrue(self.store.has(self.image))
+        self.assertFalse(self.store.has(other))
+
+    def test_rethreshold_from_chip(self):
+        self.store.store(self.image, np.full(self.shape, 127, dtype=np.uint8), self.grid)
+        processed = ProcessedImage.objects.create(satellite_image=self.image, processed_file_path='test')
+        analysis = VegetationAnalysis.objects.create(
+            processed_image=processed, mean_ndvi=0.5, forest_cover_percentage=0.0, heatmap_file_path='test',
+        )
+
+        with self.settings(SILVAGUARD_CHIP_STORE_DIR=self.root, SILVAGUARD_CHIP_STORE_ENABLED=True):
+            call_command('rethreshold_history', threshold=0.4, stdout=io.StringIO())
+
+        analysis.refresh_from_db()
+        self.assertAlmostEqual(analysis.forest_cover_percentage, 100.0)
+        self.assertEqual(analysis.forest_threshold, 0.4)
+        self.assertTrue(analysis.tree_histogram)
+
+    def test_index_statistics_from_stored_bands(self):
+        nir = np.full(self.shape, 5000, dtype=np.uint16)
+        red = np.full(self.shape, 1000, dtype=np.uint16)
+        red[0, :] = 0 # Clouded row
+        self.store.store_bands_of(self.image, {'NIR': nir, 'RED': red})
+
+        stats = self.store.index_statistics(self.image, SpectralIndexEngine(['NDVI']))
+
+        self.assertAlmostEqual(stats['NDVI']['mean'], 0.4 / 0.6)
+        self.assertAlmostEqual(stats['NDVI']['stddev'], 0.0)
+
+    def test_without_bands(self):
+        self.assertIsNone(self.store.index_statistics(self.image, SpectralIndexEngine(['NDVI'])))
+
+    def test_discard_removes_bands(self):
+        band = np.ones(self.shape, dtype=np.uint16)
+        self.store.store_bands_of(self.image, {'NIR': band, 'RED': band})
+
+        self.store.discard(self.image.pk)
+
+        self.assertFalse(self.store.has_bands(self.image))
+
+
+class AOIImportTests(TestCase):
+
+    def test_csv_header_aliases(self):
+        stream = io.StringIO("Title,LAT,lng,Radius\nRiver bend,-3.5,-60.25,2\n")
+
+        records = list(imports.iter_csv(stream))
+
+        self.assertEqual(records, [(2, {
+            'name': 'River bend', 'latitude': '-3.5', 'longitude': '-60.25', 'radius_km': '2', 'precision': None,
+        })])
+
+    def test_csv_without_coordinates(self):
+        with self.assertRaises(ValueError):
+            list(imports.iter_csv(io.StringIO("name,radius\nA,1\n")))
+
+    def test_csv_error_is_value_error(self):
+        stream = io.StringIO("name,lat,lon\n" + "A" * 100 + ",1,2\n")
+        limit = csv.field_size_limit(10)
+        self.addCleanup(csv.field_size_limit, limit)
+
+        with self.assertRaisesRegex(ValueError, "after line 1"):
+            list(imports.iter_csv(stream))
+
+    def test_feature_collection_across_chunks(self):
+        features = [
+            {'type': 'Feature', 'properties': {'name': f'Plot {i}'},
+             'geometry': {'type': 'Point', 'coordinates': [-60.0 + i / 100.0, -3.0]}}
+            for i in range(20)
+        ]
+        document = json.dumps({'type': 'FeatureCollection', 'features': features})
+
+        with mock.patch.object(imports, 'READ_CHUNK', 37):
+            records = list(imports.iter_geojson(io.StringIO(document)))
+
+        self.assertEqual([number for number, _ in records], list(range(1, 21)))
+        self.assertEqual(records[-1][1]['name'], 'Plot 19')
+        self.assertAlmostEqual(records[-1][1]['longitude'], -59.81)
+
+    def test_antimeridian_polygon(self):
+        polygon = {'type': 'Polygon', 'coordinates': [[[179.9, -16.0], [-179.9, -16.0], [-179.9, -16.2],
+                                                        [179.9, -16.2], [179.9, -16.0]]]}
+
+        record = imports._feature_record({'type': 'Feature', 'properties': {}, 'geometry': polygon})
+
+        self.assertAlmostEqual(abs(record['longitude']), 180.0)
+        self.assertAlmostEqual(record['latitude'], -16.1)
+        self.assertLess(record['radius_km'], 20.0)
+
+    def test_non_string_precision(self):
+        importer = imports.AOIImporter()
+        record = {'latitude': 1.0, 'longitude': 2.0, 'precision': 5}
+
+        with self.assertRaisesRegex(ValueError, "precision '5'"):
+            importer.validate(1, record)
+
+    def test_near_duplicates_skipped(self):
+        AreaOfInterest.objects.create(name='Existing', latitude=-3.0, longitude=-60.0)
+        records = [
+            (1, {'name': 'Same place', 'latitude': -3.0003, 'longitude': -60.0}), # ~33 m away
+            (2, {'name': 'Elsewhere', 'latitude': -3.1, 'longitude': -60.0}),
+            (3, {'name': 'Repeat', 'latitude': -3.1, 'longitude': -60.0002}), # Near record 2
+            (4, ValueError("Malformed JSON")),
+        ]
+
+        report = imports.AOIImporter(duplicate_meters=100).run(records)
+
+        self.assertEqual((report['created'], report['duplicates'], report['invalid']), (1, 2, 1))
+        self.assertEqual([d['record'] for d in report['duplicate_samples']], [1, 3])
+        self.assertEqual(AreaOfInterest.objects.filter(name='Elsewhere').count(), 1)
+
+
+@override_settings(
+    SILVAGUARD_SCHEDULER_BASE_HOURS=120, SILVAGUARD_SCHEDULER_MIN_HOURS=24, SILVAGUARD_SCHEDULER_MAX_HOURS=720,
+    SILVAGUARD_SCHEDULER_ALERT_WINDOW_DAYS=30, SILVAGUARD_SCHEDULER_HOT_LOSS_PCT=1.0,
+)
+class CadencePolicyTests(TestCase):
+
+    def setUp(self):
+        self.aoi = AreaOfInterest.objects.create(name='Cadence forest', latitude=-3.0, longitude=-60.0)
+        self.scenes = 0
+
+    def alert(self, loss_pct):
+        self.scenes += 2
+        return DeforestationAlert.objects.create(
+            aoi=self.aoi, analysis_before=create_analysis(self.aoi, self.scenes),
+            analysis_after=create_analysis(self.aoi, self.scenes - 1),
+            forest_loss_hectares=1.0, loss_percentage=loss_pct,
+        )
+
+    def test_quiet(self):
+        self.assertEqual(CadencePolicy().next_interval(self.aoi), datetime.timedelta(hours=120))
+
+    def test_recent_alert(self):
+        self.alert(0.5)
+        self.assertEqual(CadencePolicy().next_interval(self.aoi), datetime.timedelta(hours=60))
+
+    def test_hot(self):
+        self.alert(0.6)
+        self.alert(0.6)
+        self.assertEqual(CadencePolicy().next_interval(self.aoi), datetime.timedelta(hours=30))
+
+    def test_hot_clamped_to_minimum(self):
+        self.alert(5.0)
+        with self.settings(SILVAGUARD_SCHEDULER_BASE_HOURS=72):
+            self.assertEqual(CadencePolicy().next_interval(self.aoi), datetime.timedelta(hours=24))
+
+    def test_cloudy_backoff(self):
+        self.aoi.cloudy_pulses = 2
+        self.assertEqual(CadencePolicy().next_interval(self.aoi), datetime.timedelta(hours=480))
+        self.aoi.cloudy_pulses = 10
+        self.assertEqual(CadencePolicy().next_interval(self.aoi), datetime.timedelta(hours=720))
+
+    @override_settings(SILVAGUARD_SCHEDULER_ALERT_WINDOW_DAYS=0.5)
+    def test_window_under_a_day(self):
+        # 0.05% in 12 hours is 3% per 30 days
+        self.alert(0.05)
+        self.assertEqual(CadencePolicy().next_interval(self.aoi), datetime.timedelta(hours=30))
+
+    @override_settings(SILVAGUARD_SCHEDULER_ALERT_WINDOW_DAYS=0)
+    def test_empty_window_rejected(self):
+        with self.assertRaises(ValueError):
+            CadencePolicy()
+
+
+@override_settings(SILVAGUARD_EXPORT_ASSET_ROOT='projects/test/assets', SILVAGUARD_EXPORT_MAX_ATTEMPTS=2)
+class BatchExportTests(TestCase):
+    """
+    submit -> poll -> ingest through LocalTaskClient; Earth Engine objects are mocked.
+    """
+
+    def setUp(self):
+        for patcher in (
+            mock.patch('satellite_data.analysis.initialize_gee'),
+            mock.patch('satellite_data.batch.ee'),
+            mock.patch.object(VegetationAnalyzer, 'analysis_statistics', return_value={}),
+            mock.patch.object(VegetationAnalyzer, 'loss_statistics', return_value={}),
+            mock.patch.object(VegetationAnalyzer, 'generate_heatmap', return_value='https://tiles/heatmap'),
+            mock.patch.object(VegetationAnalyzer, 'get_loss_tile_url', return_value='https://tiles/loss'),
+            mock.patch('satellite_data.reports.AlertReportBuilder.build'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = LocalTaskClient()
+        self.service = BatchExportService(VegetationAnalyzer(threshold=0.5), client=self.client)
+        self.aoi = AreaOfInterest.objects.create(name='Batch forest', latitude=-3.0, longitude=-60.0, radius_km=50.0)
+        self.before = create_analysis(self.aoi, 20)
+        self.after = create_analysis(self.aoi, 10)
+        self.after.heatmap_file_path = 'GEE_PENDING'
+        self.after.save()
+
+    def test_analysis_ingested(self):
+        task = self.service.submit_analysis(self.aoi, self.after, 'S2_A', None, {'scale': 30})
+        self.client.set_result(task.asset_id, [{'trees_mean': 0.7, 'trees_histogram': None, 'FOREST': 0.8}])
+
+        results = self.service.poll()
+
+        self.assertEqual((results['ingested'], results['failed']), (1, 0))
+        self.after.refresh_from_db()
+        self.assertAlmostEqual(self.after.forest_cover_percentage, 80.0)
+        self.assertEqual(self.after.heatmap_file_path, 'https://tiles/heatmap')
+        self.assertEqual(ExportTask.objects.get(pk=task.pk).state, ExportTask.STATE_INGESTED)
+        self.assertNotIn(task.asset_id, self.client.results)
+
+    def test_empty_table_fails_task(self):
+        task = self.service.submit_analysis(self.aoi, self.after, 'S2_A', None, {'scale': 30})
+        self.client.set_result(task.asset_id, [])
+
+        results = self.service.poll()
+
+        self.assertEqual((results['ingested'], results['failed']), (0, 1))
+        task.refresh_from_db()
+        self.assertEqual(task.state, ExportTask.STATE_FAILED)
+        self.after.refresh_from_db()
+        self.assertEqual(self.after.heatmap_file_path, 'GEE_PENDING')
+        # Submitted again until SILVAGUARD_EXPORT_MAX_ATTEMPTS tasks failed
+        retry = self.service.submit_analysis(self.aoi, self.after, 'S2_A', None, {'scale': 30})
+        self.assertIsNotNone(retry)
+        self.client.set_result(retry.asset_id, [])
+        self.service.poll()
+        self.assertIsNone(self.service.submit_analysis(self.aoi, self.after, 'S2_A', None, {'scale': 30}))
+
+    def test_loss_creates_alert(self):
+        task = self.service.submit_loss(self.aoi, self.before, self.after, None, {'scale': 30})
+        self.client.set_result(task.asset_id, [{'loss': 50000.0, 'forest': 1000000.0}])
+
+        results = self.service.poll()
+
+        self.assertEqual((results['ingested'], results['alerts_created']), (1, 1))
+        alert = DeforestationAlert.objects.get(analysis_before=self.before, analysis_after=self.after)
+        self.assertAlmostEqual(alert.forest_loss_hectares, 5.0)
+        self.assertAlmostEqual(alert.loss_percentage, 5.0)
+        self.assertEqual(alert.loss_map_path, 'https://tiles/loss')
+
+    def test_failed_task(self):
+        task = self.service.submit_loss(self.aoi, self.before, self.after, None, {'scale': 30})
+        self.client.set_result(task.asset_id, error='User memory limit exceeded')
+
+        results = self.service.poll()
+
+        self.assertEqual(results['failed'], 1)
+        task.refresh_from_db()
+        self.assertEqual((task.state, task.error), (ExportTask.STATE_FAILED, 'User memory limit exceeded'))
+        self.assertFalse(DeforestationAlert.objects.exists())
+
+
+class BackfillAlertsTests(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        for patcher in (
+            mock.patch('satellite_data.services.initialize_gee'),
+            mock.patch('satellite_data.services.aoi_region'),
+            mock.patch('satellite_data.analysis.initialize_gee'),
+            mock.patch.object(VegetationAnalyzer, 'get_loss_tile_url', return_value='https://tiles/loss'),
+            mock.patch('satellite_data.reports.AlertReportBuilder.build'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        settings = override_settings(SILVAGUARD_CHIP_STORE_ENABLED=True, SILVAGUARD_CHIP_STORE_DIR=self.root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        from .services import SilvaGuardOrchestrator
+        self.orchestrator = SilvaGuardOrchestrator()
+        self.aoi = AreaOfInterest.objects.create(name='Backfill forest', latitude=-3.0, longitude=-60.0, radius_km=0.5)
+        self.analyses = [create_analysis(self.aoi, days) for days in (30, 20, 10)]
+        for analysis in self.analyses:
+            analysis.processed_image.satellite_image.gee_id = f'S2_{analysis.pk}'
+            analysis.processed_image.satellite_image.save()
+
+    def store_chip(self, analysis, data):
+        chips = self.orchestrator.chips
+        grid = chips.grid_for_aoi(self.aoi)
+        chips.store(analysis.processed_image.satellite_image, data(np.full((grid['height'], grid['width']), 254, dtype=np.uint8)), grid)
+
+    def cleared(self, chip):
+        chip[:, :chip.shape[1] // 2] = 0
+        return chip
+
+    def test_local_pairs_keep_their_loss_mask(self):
+        self.store_chip(self.analyses[0], lambda chip: chip)
+        self.store_chip(self.analyses[1], self.cleared)
+        self.store_chip(self.analyses[2], self.cleared)
+
+        with mock.patch.object(VegetationAnalyzer, 'calculate_loss_series') as series:
+            results = self.orchestrator.backfill_alerts(self.aoi)
+
+        series.assert_not_called()
+        self.assertEqual(results, {'pairs_checked': 2, 'alerts_created': 1, 'pairs_failed': 0})
+        alert = DeforestationAlert.objects.get(aoi=self.aoi)
+        self.assertEqual((alert.analysis_before, alert.analysis_after), (self.analyses[0], self.analyses[1]))
+        self.assertEqual(alert.loss_map_path, 'https://tiles/loss')
+        self.assertGreater(LossMask.objects.get(alert=alert).pixel_count, 0)
+
+    def test_pairs_without_chips_use_earth_engine(self):
+        loss = {'loss_ha': 2.0, 'loss_percentage': 1.0, 'scale': 10}
+        with mock.patch.object(VegetationAnalyzer, 'calculate_loss_series', return_value=[loss, loss]):
+            results = self.orchestrator.backfill_alerts(self.aoi)
+            again = self.orchestrator.backfill_alerts(self.aoi)
+
+        self.assertEqual(results['alerts_created'], 2)
+        self.assertFalse(LossMask.objects.exists())
+        self.assertEqual(again, {'pairs_checked': 0, 'alerts_created': 0, 'pairs_failed': 0})
+
+    def test_failed_series(self):
+        with mock.patch.object(VegetationAnalyzer, 'calculate_loss_series', return_value=[]):
+            results = self.orchestrator.backfill_alerts(self.aoi)
+
+        self.assertEqual(results['pairs_failed'], 2)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    SILVAGUARD_CHIP_STORE_DIR=os.path.join(tempfile.gettempdir(), 'silvaguard-tests-no-chips'),
+)
+class MapDataQueryTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(get_user_model().objects.create_user('map', 'map@example.com', 'pw'))
+        cache.clear()
+        cache.set('global_mosaic_tile_url', 'https://tiles/mosaic')
+        self.days = 0
+
+    def add_aoi(self):
+        aoi = AreaOfInterest.objects.create(name=f'Zone {self.days}', latitude=-3.0, longitude=-60.0)
+        before = create_analysis(aoi, self.days + 2)
+        after = create_analysis(aoi, self.days + 1)
+        self.days += 2
+        alert = DeforestationAlert.objects.create(
+            aoi=aoi, analysis_before=before, analysis_after=after, forest_loss_hectares=1.0, loss_percentage=1.0,
+            loss_map_path='https://ee/loss',
+        )
+        return aoi, after, alert
+
+    def queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/satellite/api/map-data/')
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response.json()
+
+    def test_queries_do_not_grow(self):
+        self.add_aoi()
+        few, _ = self.queries()
+        for _ in range(3):
+            self.add_aoi()
+
+        many, data = self.queries()
+
+        self.assertEqual(few, many)
+        self.assertEqual(len(data['features']), 8)
+
+    def test_latest_analysis_and_mask(self):
+        aoi, after, alert = self.add_aoi()
+        _, _, other = self.add_aoi()
+        save_loss_mask(alert, {'change_mask': np.ones((2, 2), dtype=bool),
+                               'grid': {'crs': 'EPSG:4326', 'transform': [-60.0, 0.001, -3.0, 0.001]}})
+
+        _, data = self.queries()
+
+        properties = {(f['properties']['type'], f['properties']['id']): f['properties'] for f in data['features']}
+        self.assertEqual(properties[('AOI', aoi.id)]['tile_url'], after.heatmap_file_path)
+        self.assertIn(f'/{alert.id}/', properties[('Alert', alert.id)]['tile_url'])
+        self.assertEqual(properties[('Alert', other.id)]['tile_url'], 'https://ee/loss')
+
+
+class AlertDetailTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(get_user_model().objects.create_user('viewer', 'viewer@example.com', 'pw'))
+        aoi = AreaOfInterest.objects.create(name='Report forest', latitude=-3.0, longitude=-60.0)
+        self.alert = DeforestationAlert.objects.create(
+            aoi=aoi, analysis_before=create_analysis(aoi, 2), analysis_after=create_analysis(aoi, 1),
+            forest_loss_hectares=2.0, loss_percentage=1.0, loss_map_path='https://ee/loss',
+        )
+
+    def test_bundle_decides_loss_tile(self):
+        from .reports import AlertReportBuilder
+        bundle = AlertReportBuilder().summary(self.alert)
+        self.alert.report_bundle = bundle
+        self.alert.save(update_fields=['report_bundle'])
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f'/satellite/alerts/{self.alert.pk}/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['loss_url'], 'https://ee/loss')
+        self.assertFalse(any('lossmask' in q['sql'] for q in context.captured_queries))
+        self.assertIsInstance(response.context['report']['before']['acquisition_date'], datetime.datetime)
+        self.assertIsInstance(bundle['before']['acquisition_date'], str)
+
+    def test_new_mask_drops_bundle(self):
+        self.alert.report_bundle = {'version': 3}
+        self.alert.save(update_fields=['report_bundle'])
+
+        save_loss_mask(self.alert, {'change_mask': np.ones((2, 2), dtype=bool),
+                                    'grid': {'crs': 'EPSG:4326', 'transform': [-60.0, 0.001, -3.0, 0.001]}})
+
+        self.alert.refresh_from_db()
+        self.assertIsNone(self.alert.report_bundle)
+
+
+class RethresholdHistoryTests(TestCase):
+
+    def setUp(self):
+        aoi = AreaOfInterest.objects.create(name='Threshold forest', latitude=-3.0, longitude=-60.0)
+        self.before, self.after = create_analysis(aoi, 2), create_analysis(aoi, 1)
+        # Half of the pixels at 0.305, half at 0.705
+        for analysis in (self.before, self.after):
+            analysis.tree_histogram = [0.0] * 30 + [50.0] + [0.0] * 39 + [50.0] + [0.0] * 29
+            analysis.forest_threshold = 0.5
+            analysis.save()
+        self.alert = DeforestationAlert.objects.create(
+            aoi=aoi, analysis_before=self.before, analysis_after=self.after,
+            forest_loss_hectares=2.0, loss_percentage=1.0, report_bundle={'version': 4},
+        )
+
+    def test_tree_summary_from_stored_histogram(self):
+        summary = self.after.tree_summary()
+
+        self.assertAlmostEqual(summary['forest_percentage'], 50.0)
+        self.assertAlmostEqual(summary['p10'], 0.302)
+        self.assertAlmostEqual(summary['p50'], 0.31)
+        self.assertAlmostEqual(summary['p90'], 0.708)
+        self.assertAlmostEqual(self.after.tree_summary(0.2)['forest_percentage'], 100.0)
+        self.assertIsNone(create_analysis(self.alert.aoi, 3).tree_summary())
+
+    def test_rethreshold_invalidates_report_bundles(self):
+        call_command('rethreshold_history', threshold=0.2, dry_run=True, stdout=io.StringIO())
+        self.alert.refresh_from_db()
+        self.assertIsNotNone(self.alert.report_bundle)
+
+        out = io.StringIO()
+        call_command('rethreshold_history', threshold=0.2, stdout=out)
+
+        self.alert.refresh_from_db()
+        self.after.refresh_from_db()
+        self.assertIsNone(self.alert.report_bundle)
+        self.assertAlmostEqual(self.after.forest_cover_percentage, 100.0)
+        self.assertIn('1 alert reports invalidated', out.getvalue())
+
+
+class ExportDataCommandTests(TestCase):
+
+    def test_text_formats_go_to_command_stdout(self):
+        aoi = AreaOfInterest.objects.create(name='Export forest', latitude=-3.0, longitude=-60.0)
+        create_analysis(aoi, 1, forest_cover=64.0)
+        out = io.StringIO()
+
+        call_command('export_data', 'analyses', stdout=out)
+
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['image_id'], f'S2_TEST_{aoi.pk}_1')
+        self.assertEqual(float(rows[0]['forest_cover_percentage']), 64.0)
+
+    def test_parquet_requires_output(self):
+        from django.core.management.base import CommandError
+        with self.assertRaises(CommandError):
+            call_command('export_data', 'alerts', format='parquet', stdout=io.StringIO())
+
+
+class EECassetteTests(TestCase):
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        self.path = os.path.join(root, 'pulse.json.gz')
+        self.forest = {aoi: {'forest': aoi * 10} for aoi in range(1, 9)}
+
+        def compute_value(request):
+            return self.forest[request['aoi']]
+
+        def export_table(request_id, params):
+            return {'name': f"projects/test/operations/{request_id}"}
+
+        with mock.patch('ee.data.computeValue', side_effect=compute_value), \
+                mock.patch('ee.data.exportTable', side_effect=export_table), \
+                mock.patch('ee.data.getTaskStatus', return_value=[{'state': 'COMPLETED'}]):
+            with EECassette(self.path, RECORD) as cassette:
+                cassette.algorithms = {'algorithms/Image.load': {}}
+                for aoi in self.forest:
+                    ee.data.computeValue({'aoi': aoi, 'start': '2026-01-01', 'end': '2026-01-11T00:00:00'})
+                ee.data.exportTable('TASK_RECORDED', {'description': 'silvaguard_analysis_1'})
+                ee.data.getTaskStatus('TASK_RECORDED')
+
+    def replay(self, **kwargs):
+        patcher = mock.patch.object(EECassette, '_initialize_offline')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cassette = EECassette(self.path, REPLAY, latency_scale=0, **kwargs)
+        cassette.install()
+        self.addCleanup(cassette.uninstall)
+        return cassette
+
+    def test_replay_matches_shifted_dates_in_any_thread_order(self):
+        cassette = self.replay()
+        aois = [5, 2, 8, 1, 7, 3, 6, 4]
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            responses = list(pool.map(
+                lambda aoi: ee.data.computeValue({'aoi': aoi, 'start': '2026-02-01', 'end': '2026-02-11T00:00:00'}),
+                aois,
+            ))
+
+        self.assertEqual(responses, [self.forest[aoi] for aoi in aois])
+        self.assertEqual(cassette.summary()['fallbacks'], len(aois))
+
+    def test_replay_maps_task_ids(self):
+        cassette = self.replay()
+
+        ee.data.exportTable('TASK_REPLAYED', {'description': 'silvaguard_analysis_1'})
+
+        self.assertEqual(ee.data.getTaskStatus('TASK_REPLAYED'), [{'state': 'COMPLETED'}])
+        self.assertEqual(cassette.summary()['fallbacks'], 0)
+
+    def test_strict_replay_needs_exact_requests(self):
+        cassette = self.replay(strict=True)
+
+        self.assertEqual(ee.data.computeValue({'aoi': 3, 'start': '2026-01-01', 'end': '2026-01-11T00:00:00'}),
+                         self.forest[3])
+        with self.assertRaises(ee.EEException):
+            ee.data.computeValue({'aoi': 4, 'start': '2026-02-01', 'end': '2026-02-11T00:00:00'})
+        self.assertEqual(cassette.summary()['misses'], 1)
+
+
+class ReductionPolicyTests(TestCase):
+
+    def test_small_aoi_stays_at_native_scale(self):
+        aoi = AreaOfInterest(name='Small', latitude=-3.0, longitude=-60.0, radius_km=5.0, precision='balanced')
+
+        params = ReductionPolicy().params_for_aoi(aoi)
+
+        self.assertEqual(params, {'scale': NATIVE_SCALE_M, 'tileScale': 1, 'bestEffort': False, 'maxPixels': 1e12})
+
+    def test_scale_is_the_smallest_native_multiple_in_budget(self):
+        policy = ReductionPolicy()
+
+        self.assertEqual(policy.params_for_scene('balanced')['scale'], 40)
+        high = policy.params_for_scene('high')
+        self.assertEqual((high['scale'], high['tileScale']), (20, 2))
+        aoi = AreaOfInterest(name='Wide', latitude=-3.0, longitude=-60.0, radius_km=50.0, precision='fast')
+        self.assertEqual(policy.params_for_aoi(aoi)['scale'], 70)
+
+    def test_capped_scale_hands_over_to_best_effort(self):
+        policy = ReductionPolicy()
+
+        fast = policy.params_for_area(1e13, 'fast')
+        high = policy.params_for_area(1e13, 'high')
+
+        self.assertEqual(fast, {'scale': 1000, 'tileScale': 1, 'bestEffort': True, 'maxPixels': 1e9})
+        self.assertEqual((high['scale'], high['tileScale'], high['bestEffort']), (60, 16, True))
+
+    def test_default_precision_from_settings(self):
+        with self.settings(SILVAGUARD_REDUCTION_PRECISION='fast'):
+            policy = ReductionPolicy()
+
+        self.assertEqual(policy.params_for_scene(), policy.params_for_scene('fast'))
+        self.assertEqual(policy.params_for_area(1e10, 'unknown'), policy.params_for_area(1e10, 'balanced'))
+
+
+class LeaseManagerTests(TestCase):
+
+    def setUp(self):
+        self.aois = [AreaOfInterest.objects.create(name=f'Leased {i}', latitude=-3.0, longitude=-60.0 + i)
+                     for i in range(2)]
+        self.first, self.second = LeaseManager(owner='worker-1'), LeaseManager(owner='worker-2')
+        self.first.ensure_leases()
+
+    def test_workers_claim_different_aois(self):
+        with mock.patch.object(AOILease.objects, 'select_for_update', wraps=AOILease.objects.select_for_update) as lock:
+            claimed = [self.first.claim_next(), self.second.claim_next(), self.first.claim_next()]
+
+        self.assertEqual(claimed, [self.aois[0], self.aois[1], None])
+        lock.assert_called_with(skip_locked=True)
+        self.assertEqual(AOILease.objects.get(aoi=self.aois[1]).owner, 'worker-2')
+
+    def test_expired_lease_is_taken_over(self):
+        aoi = self.first.claim_next(aoi_ids=[self.aois[0].pk])
+        AOILease.objects.filter(aoi=aoi).update(expires_at=timezone.now() - datetime.timedelta(seconds=1))
+
+        self.assertEqual(self.second.claim_next(aoi_ids=[aoi.pk]), aoi)
+        self.assertFalse(self.first.heartbeat(aoi))
+        self.assertTrue(self.second.heartbeat(aoi))
+
+    def test_completed_aoi_is_not_claimed_again_in_the_same_pulse(self):
+        pulse_started = timezone.now()
+        aoi = self.first.claim_next(completed_before=pulse_started)
+        self.first.release(aoi)
+
+        lease = AOILease.objects.get(aoi=aoi)
+        self.assertEqual(lease.owner, '')
+        self.assertIsNotNone(lease.completed_at)
+        self.assertEqual(self.second.claim_next(completed_before=pulse_started), self.aois[1])
+        self.assertIsNone(self.second.claim_next(completed_before=pulse_started))
+
+
+class PackedMaskTests(TestCase):
+    GRID = {'crs': 'EPSG:4326', 'transform': [-60.0, 0.001, -3.0, 0.001]}
+
+    def mask(self, rows):
+        return PackedMask.from_array(np.array(rows, dtype=bool), self.GRID)
+
+    def test_pack_round_trip_pads_rows_to_bytes(self):
+        array = np.random.default_rng(7).random((3, 11)) > 0.5
+
+        packed = PackedMask.from_array(array, self.GRID)
+
+        self.assertEqual((packed.row_bytes, len(packed.tobytes())), (2, 6))
+        np.testing.assert_array_equal(packed.to_array(), array)
+        np.testing.assert_array_equal(packed.row_counts(), array.sum(axis=1))
+        self.assertEqual(packed.count(), int(array.sum()))
+        self.assertFalse(np.any(packed.rows[:, 1] & 0b00011111)) # Padding bits stay zero
+        self.assertEqual(PackedMask(packed.tobytes(), 11, 3, packed.transform).count(), packed.count())
+
+    def test_set_operations(self):
+        a = self.mask([[1, 1, 0, 0, 1, 0, 0, 0, 1]])
+        b = self.mask([[0, 1, 1, 0, 1, 0, 0, 0, 0]])
+
+        self.assertEqual((a | b).to_array().astype(int).tolist(), [[1, 1, 1, 0, 1, 0, 0, 0, 1]])
+        self.assertEqual((a & b).to_array().astype(int).tolist(), [[0, 1, 0, 0, 1, 0, 0, 0, 0]])
+        self.assertEqual((a - b).to_array().astype(int).tolist(), [[1, 0, 0, 0, 0, 0, 0, 0, 1]])
+        self.assertEqual((a - b).count(), 2)
+        self.assertAlmostEqual(a.area_m2(np.array([100.0])), 400.0)
+        with self.assertRaises(ValueError):
+            a | PackedMask.from_array(np.ones((1, 9), dtype=bool))
+
+    def test_cumulative_skips_other_grids(self):
+        first = self.mask([[1, 0, 0], [0, 0, 0]])
+        second = self.mask([[0, 0, 0], [0, 1, 1]])
+        elsewhere = PackedMask.from_array(np.ones((2, 3), dtype=bool))
+
+        union = cumulative([first, elsewhere, second])
+
+        self.assertEqual(union.to_array().astype(int).tolist(), [[1, 0, 0], [0, 1, 1]])
+        self.assertEqual(first.count(), 1)
+        self.assertIsNone(cumulative([]))
+
+    def test_cumulative_mask_endpoint(self):
+        self.client.force_login(get_user_model().objects.create_user('masks', 'masks@example.com', 'pw'))
+        aoi = AreaOfInterest.objects.create(name='Mask forest', latitude=-3.0, longitude=-60.0)
+        for days_ago, rows in ((4, [[1, 0, 0], [0, 0, 0]]), (2, [[0, 0, 0], [0, 1, 1]])):
+            alert = DeforestationAlert.objects.create(
+                aoi=aoi, analysis_before=create_analysis(aoi, days_ago + 1), analysis_after=create_analysis(aoi, days_ago),
+                forest_loss_hectares=1.0, loss_percentage=1.0,
+            )
+            save_loss_mask(alert, {'change_mask': np.array(rows, dtype=bool), 'grid': self.GRID})
+
+        response = self.client.get(f'/satellite/aois/{aoi.pk}/loss-mask.bin')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response['X-Mask-Width'], response['X-Mask-Height'], response['X-Mask-Row-Bytes']), ('3', '2', '1'))
+        restored = PackedMask(response.content, 3, 2, json.loads(response['X-Mask-Transform']))
+        self.assertEqual(restored.to_array().astype(int).tolist(), [[1, 0, 0], [0, 1, 1]])
+        self.assertEqual(self.client.get('/satellite/aois/0/loss-mask.bin').status_code, 404)
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        self.aois = [AreaOfInterest.objects.create(name=f'Paged {i}', latitude=-3.0, longitude=-60.0) for i in range(5)]
+        # Three rows share a timestamp, so the id has to break the tie
+        moment = timezone.now() - datetime.timedelta(days=1)
+        AreaOfInterest.objects.filter(pk__in=[aoi.pk for aoi in self.aois[1:4]]).update(created_at=moment)
+        self.expected = [aoi.pk for aoi in AreaOfInterest.objects.order_by('-created_at', '-id')]
+
+    def test_cursor_round_trip(self):
+        paginator = KeysetPaginator(AreaOfInterest.objects.all(), 'created_at')
+        aoi = AreaOfInterest.objects.get(pk=self.aois[2].pk)
+
+        cursor = paginator.encode_cursor(aoi)
+
+        self.assertNotIn('=', cursor)
+        self.assertEqual(paginator.decode_cursor(cursor), (aoi.created_at, aoi.pk))
+        for bad in ('not-a-cursor', 'WzFd', ''):
+            with self.assertRaises(ValueError):
+                paginator.decode_cursor(bad)
+
+    def test_pages_break_timestamp_ties_by_id(self):
+        paginator = KeysetPaginator(AreaOfInterest.objects.all(), 'created_at')
+        seen, cursor, pages = [], None, 0
+        while True:
+            items, cursor = paginator.page(cursor, limit=2)
+            seen.extend(aoi.pk for aoi in items)
+            pages += 1
+            if cursor is None:
+                break
+
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(pages, 3)
+
+    def test_api_pages_and_rejects_bad_input(self):
+        self.client.force_login(get_user_model().objects.create_user('pager', 'pager@example.com', 'pw'))
+
+        first = self.client.get('/satellite/api/aois/', {'limit': 3}).json()
+        second = self.client.get('/satellite/api/aois/', {'limit': 3, 'cursor': first['next_cursor']}).json()
+
+        self.assertEqual([row['id'] for row in first['data'] + second['data']], self.expected)
+        self.assertIsNone(second['next_cursor'])
+        self.assertEqual(self.client.get('/satellite/api/aois/', {'cursor': 'garbage'}).status_code, 400)
+        self.assertEqual(self.client.get('/satellite/api/aois/', {'limit': 0}).status_code, 400)
+        self.assertEqual(page_size('10000'), 500)
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(get_user_model().objects.create_user('poller', 'poller@example.com', 'pw'))
+        self.aoi = AreaOfInterest.objects.create(name='Polled forest', latitude=-3.0, longitude=-60.0)
+
+    def test_unchanged_poll_is_not_modified(self):
+        first = self.client.get('/satellite/api/aois/')
+        with CaptureQueriesContext(connection) as context:
+            second = self.client.get('/satellite/api/aois/', HTTP_IF_NONE_MATCH=first['ETag'])
+            cached = self.client.get('/satellite/api/aois/')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(cached.content, first.content)
+        # Both are answered from the version row, without reading the AOIs
+        self.assertFalse(any('satellite_data_areaofinterest' in q['sql'] for q in context.captured_queries))
+
+    def test_change_invalidates_etag(self):
+        first = self.client.get('/satellite/api/aois/')
+        AreaOfInterest.objects.create(name='New forest', latitude=-4.0, longitude=-61.0)
+
+        second = self.client.get('/satellite/api/aois/', HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(len(second.json()['data']), 2)
+
+    def test_ignored_fields_do_not_bump(self):
+        version = current('aois')[0]
+        self.aoi.last_pulsed_at = timezone.now()
+        self.aoi.save(update_fields=['last_pulsed_at'])
+        self.assertEqual(current('aois')[0], version)
+
+        self.aoi.name = 'Renamed forest'
+        self.aoi.save()
+        self.assertEqual(current('aois')[0], version + 1)
+
+    def test_batched_bumps_apply_once(self):
+        version = current('alerts')[0]
+        with batched_bumps():
+            for _ in range(3):
+                bump('alerts')
+            with batched_bumps():
+                bump('alerts')
+            self.assertEqual(current('alerts')[0], version)
+        self.assertEqual(current('alerts')[0], version + 1)
+
+        with self.assertRaises(RuntimeError):
+            with batched_bumps():
+                bump('alerts')
+                raise RuntimeError("rolled back")
+        self.assertEqual(current('alerts')[0], version + 1)
+
+
+class EventBroadcasterTests(TestCase):
+
+    def test_late_commits_inside_the_window_are_delivered_once(self):
+        committed = [5]
+
+        def events_after(last_id, limit=500):
+            return [{'id': pk, 'kind': 'alert', 'payload': {}} for pk in sorted(committed) if pk > last_id][:limit]
+
+        async def scenario():
+            broadcaster = EventBroadcaster(poll_seconds=0.01)
+            queue = broadcaster.subscribe()
+            await asyncio.sleep(0.05) # Start-up: 5 was committed before anyone listened
+
+            async def receive(ids, count):
+                committed.extend(ids)
+                broadcaster.notify()
+                return [(await asyncio.wait_for(queue.get(), 1))['id'] for _ in range(count)]
+
+            received = await receive([10, 12], 2)
+            received += await receive([11, 13], 2) # 11 commits after 12 went out
+            received += await receive([9, 14], 1) # 9 commits below 13 - LATE_WINDOW
+            await asyncio.sleep(0.05)
+            leftover = queue.qsize()
+            broadcaster.unsubscribe(queue)
+            await asyncio.wait_for(broadcaster.task, 1)
+            return received, leftover
+
+        with mock.patch('satellite_data.events._latest_id', return_value=5), \
+                mock.patch('satellite_data.events._events_after', side_effect=events_after), \
+                mock.patch('satellite_data.events.LATE_WINDOW', 4):
+            received, leftover = asyncio.run(scenario())
+
+        self.assertEqual(received, [10, 12, 11, 13, 14])
+        self.assertEqual(leftover, 0) # Nothing re-read from the window went out twice
+
+
+class HistoryCompactionTests(TestCase):
+
+    def setUp(self):
+        self.aoi = AreaOfInterest.objects.create(name='Old forest', latitude=-3.0, longitude=-60.0)
+        self.latest = create_analysis(self.aoi, 1)
+
+    def old_scene(self, day: int, forest_cover: float, ndvi: float, histogram: list):
+        """
+        An analyzed scene acquired on the given day of March 2025.
+        """
+        analysis = create_analysis(self.aoi, 500 + day, forest_cover=forest_cover)
+        analysis.tree_histogram = histogram
+        analysis.save()
+        SpectralIndexStat.objects.create(analysis=analysis, index='NDVI', mean=ndvi)
+        SatelliteImage.objects.filter(processed_version__vegetation_analysis=analysis).update(
+            acquisition_date=timezone.make_aware(datetime.datetime(2025, 3, day, 12))
+        )
+        return analysis
+
+    def test_merges_months_weighted_by_scene_count(self):
+        compactor = HistoryCompactor(days=30, keep_latest=1)
+        self.old_scene(5, 60.0, 0.5, [1.0, 2.0])
+        self.old_scene(20, 80.0, 0.7, [3.0, 4.0])
+
+        self.assertEqual(compactor.compact_aoi(self.aoi), {'rolled_up': 2, 'pruned': 0, 'kept': 0, 'months': 1})
+        self.old_scene(25, 40.0, 0.9, [5.0, 6.0])
+        compactor.compact_aoi(self.aoi)
+
+        aggregate = MonthlyForestAggregate.objects.get(aoi=self.aoi)
+        self.assertEqual(aggregate.month, datetime.date(2025, 3, 1))
+        self.assertEqual(aggregate.scene_count, 3)
+        self.assertAlmostEqual(aggregate.mean_forest_cover, 60.0)
+        self.assertEqual((aggregate.min_forest_cover, aggregate.max_forest_cover), (40.0, 80.0))
+        self.assertAlmostEqual(aggregate.mean_tree_probability, 0.6)
+        self.assertAlmostEqual(aggregate.index_means['NDVI'], 0.7)
+        self.assertEqual(aggregate.tree_histogram, [9.0, 12.0])
+        self.assertEqual(len(aggregate.image_ids), 3)
+        self.assertEqual(list(VegetationAnalysis.objects.all()), [self.latest])
+
+    def test_scene_counted_once_and_alert_evidence_kept(self):
+        compactor = HistoryCompactor(days=30, keep_latest=1)
+        evidence = self.old_scene(5, 60.0, 0.5, [1.0])
+        DeforestationAlert.objects.create(aoi=self.aoi, analysis_before=evidence, analysis_after=self.latest,
+                                          forest_loss_hectares=1.0, loss_percentage=1.0)
+        rolled = self.old_scene(20, 80.0, 0.7, [3.0])
+        image_id = rolled.processed_image.satellite_image.image_id
+
+        self.assertEqual(compactor.compact_aoi(self.aoi)['kept'], 1)
+        # The same provider scene registered again (e.g. by a backfill) is not counted twice
+        compactor.merge_month(self.aoi, datetime.date(2025, 3, 1), [{
+            'image_id': image_id, 'acquisition_date': timezone.now(), 'processed_version__vegetation_analysis__id': 0,
+            'processed_version__vegetation_analysis__forest_cover_percentage': 0.0,
+            'processed_version__vegetation_analysis__mean_ndvi': 0.0,
+            'processed_version__vegetation_analysis__tree_histogram': [100.0],
+            'processed_version__vegetation_analysis__forest_threshold': None,
+        }], {})
+
+        aggregate = MonthlyForestAggregate.objects.get(aoi=self.aoi)
+        self.assertEqual((aggregate.scene_count, aggregate.mean_forest_cover, aggregate.tree_histogram), (1, 80.0, [3.0]))
+        self.assertTrue(VegetationAnalysis.objects.filter(pk=evidence.pk).exists())
+
+
+class OverlapGroupingTests(TestCase):
+
+    def aoi(self, pk, latitude, longitude, radius_km=5.0):
+        return AreaOfInterest(id=pk, name=f'AOI {pk}', latitude=latitude, longitude=longitude, radius_km=radius_km)
+
+    def groups(self, aois):
+        return sorted(sorted(aoi.id for aoi in group) for group in overlap_groups(aois))
+
+    def test_overlap_is_transitive(self):
+        # 1-2 and 2-3 overlap (8.9 km apart, radii 5 km), 1-3 do not; 4 is alone
+        aois = [self.aoi(1, 0.0, 0.0), self.aoi(2, 0.0, 0.08), self.aoi(3, 0.0, 0.16), self.aoi(4, 0.0, 1.0)]
+
+        self.assertEqual(self.groups(aois), [[1, 2, 3], [4]])
+
+    def test_large_radius_reaches_across_the_latitude_sweep(self):
+        # 33 km north of AOI 1, reached through its own 40 km radius
+        aois = [self.aoi(1, 0.0, 0.0), self.aoi(2, 0.3, 0.0, radius_km=40.0), self.aoi(3, 0.5, 0.0)]
+
+        self.assertEqual(self.groups(aois), [[1, 2, 3]])
+        self.assertEqual(self.groups([self.aoi(1, 0.0, 0.0), self.aoi(3, 0.5, 0.0)]), [[1], [3]])
+
+    def test_antimeridian_neighbours_overlap(self):
+        self.assertEqual(self.groups([self.aoi(1, 10.0, 179.99), self.aoi(2, 10.0, -179.99)]), [[1, 2]])
+        self.assertEqual(overlap_groups([]), [])
+
+    def test_planner_requests_a_tile_once_per_scene(self):
+        analyzer = mock.Mock()
+        analyzer.generate_heatmap.return_value = 'https://ee/heatmap'
+        aois = [self.aoi(1, 0.0, 0.0), self.aoi(2, 0.0, 0.08)]
+        planner = ScenePlanner(analyzer, mock.Mock(), aois)
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            urls = list(pool.map(lambda _: planner.heatmap('S2_A'), range(8)))
+
+        self.assertEqual(urls, ['https://ee/heatmap'] * 8)
+        analyzer.generate_heatmap.assert_called_once_with('S2_A')
+        self.assertEqual(planner.group_of(aois[1]), aois)
+        summary = planner.summary()
+        self.assertEqual((summary['groups'], summary['tile_requests'], summary['tile_requests_saved']), (1, 1, 7))
+
+
+class GeohashCoverTests(TestCase):
+
+    def center(self, cell):
+        south, west, north, east = geohash.bounds(cell)
+        return (south + north) / 2, (west + east) / 2
+
+    def test_encode_and_bounds(self):
+        self.assertEqual(geohash.encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+
+        south, west, north, east = geohash.bounds('u4pruy')
+        self.assertTrue(south <= 57.64911 <= north and west <= 10.40744 <= east)
+        self.assertEqual(geohash.cell_size(6), (north - south, east - west))
+        self.assertEqual(geohash.encode(0.0, 180.0, 4), geohash.encode(0.0, -180.0, 4))
+
+    def test_circle_cover_holds_exactly_the_cells_centered_inside(self):
+        lat, lon, radius_km = -3.1, -60.02, 4.0
+
+        cells = geohash.cover_circle(lat, lon, radius_km, 6)
+
+        self.assertEqual(len(cells), len(set(cells)))
+        self.assertTrue(all(haversine_m(lat, lon, *self.center(cell)) <= 4000.0 for cell in cells))
+        # Every cell of a wider box centered within the radius is in the cover
+        height, width = geohash.cell_size(6)
+        around = {geohash.encode(lat + i * height, lon + j * width, 6) for i in range(-10, 11) for j in range(-10, 11)}
+        inside = {cell for cell in around if haversine_m(lat, lon, *self.center(cell)) <= 4000.0}
+        self.assertEqual(set(cells), inside)
+
+    def test_cover_edge_cases(self):
+        self.assertEqual(geohash.cover_circle(-3.1, -60.02, 0.01, 6), [geohash.encode(-3.1, -60.02, 6)])
+        across = geohash.cover_circle(0.0, 179.99, 3.0, 6)
+        self.assertTrue(any(self.center(cell)[1] < 0 for cell in across))
+        self.assertTrue(any(self.center(cell)[1] > 0 for cell in across))
+        with self.assertRaises(ValueError):
+            geohash.cover_circle(-3.1, -60.02, 50.0, 6, max_cells=100)
+
+    def test_polygon_cover(self):
+        ring = [[-60.1, -3.1], [-60.0, -3.1], [-60.0, -3.0], [-60.1, -3.0], [-60.1, -3.1]]
+
+        cells = geohash.cover_polygon(ring, 5)
+
+        self.assertTrue(cells)
+        for cell in cells:
+            lat, lon = self.center(cell)
+            self.assertTrue(-60.1 <= lon <= -60.0 and -3.1 <= lat <= -3.0)
+
+    def test_query_aggregates_cached_cells(self):
+        grid = GridCellCache(precision=6, scale=20, threshold=0.5)
+        cells = grid.cover_circle(-3.1, -60.02, 2.0)
+        date = datetime.date(2026, 6, 1)
+        histogram = [0.0] * 100
+        histogram[80] = 10.0
+        GridCellStat.objects.bulk_create([
+            GridCellStat(cell=cell, date=date, tree_histogram=histogram, mean_tree_probability=0.8, reduction_scale=20)
+            for cell in cells[1:]
+        ] + [GridCellStat(cell=cells[0], date=date, tree_histogram=[], reduction_scale=20)])
+
+        result = grid.query(cells, date, compute=False)
+
+        self.assertEqual((result['cells'], result['cells_cached'], result['cells_missing'], result['cells_empty']),
+                         (len(cells), len(cells), 0, 1))
+        self.assertAlmostEqual(result['forest_percentage'], 100.0)
+        self.assertAlmostEqual(result['mean_tree_probability'], 0.8)
+        self.assertEqual(grid.latest_date(cells, datetime.date(2026, 1, 1)), date)
+        self.assertIsNone(grid.latest_date(cells + [geohash.encode(10.0, 10.0, 6)], datetime.date(2026, 1, 1)))
+
+
+class SingleFlightTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.flight = SingleFlight(max_workers=4, poll_seconds=0.01)
+        self.addCleanup(self.flight.pool.shutdown)
+        self.release = threading.Event()
+        self.calls = []
+
+    def compute(self, value):
+        def function():
+            self.calls.append(value)
+            self.release.wait(5)
+            return value
+        return function
+
+    def wait_idle(self):
+        for _ in range(100):
+            if not self.flight.inflight_count():
+                return
+            threading.Event().wait(0.01)
+
+    def test_concurrent_calls_share_one_execution(self):
+        submitted = [self.flight.submit('area', self.compute(42)) for _ in range(5)]
+        self.release.set()
+
+        self.assertEqual([leader for _, leader in submitted], [True, False, False, False, False])
+        self.assertEqual({id(future) for future, _ in submitted}, {id(submitted[0][0])})
+        self.assertEqual(submitted[0][0].result(timeout=5), 42)
+        self.assertEqual(self.calls, [42])
+        self.wait_idle()
+        self.assertEqual(self.flight.inflight_count(), 0)
+        # Once done, the next call runs again
+        self.assertTrue(self.flight.submit('area', self.compute(43))[1])
+
+    def test_results_and_misses_are_cached(self):
+        self.release.set()
+
+        self.flight.submit('hit', self.compute(7), result_key='result:hit', ttl=60)[0].result(timeout=5)
+        self.flight.submit('miss', self.compute(None), result_key='result:miss', ttl=60, empty_ttl=60)[0].result(timeout=5)
+        self.flight.submit('uncached', self.compute(None), result_key='result:uncached', ttl=60)[0].result(timeout=5)
+
+        self.assertEqual(cache.get('result:hit'), 7)
+        self.assertEqual(cache.get('result:miss'), EMPTY)
+        self.assertIsNone(cache.get('result:uncached'))
+        self.assertIsNone(cache.get('singleflight:hit'))
+
+    def test_waits_for_another_process_holding_the_lock(self):
+        cache.add('singleflight:shared', 1)
+
+        future, leader = self.flight.submit('shared', self.compute(1), result_key='result:shared', ttl=60)
+        threading.Event().wait(0.05)
+        cache.set('result:shared', 99)
+
+        self.assertTrue(leader)
+        self.assertEqual(future.result(timeout=5), 99)
+        self.assertEqual(self.calls, [])
+
+    def test_area_stats_coalesce_rounded_circles(self):
+        service = AreaStatsService()
+        result = {'forest_percentage': 55.0}
+        with mock.patch.object(AreaStatsService, 'compute', side_effect=lambda *args: self.compute(result)()):
+            # The computation holds until all three requests are in
+            threading.Timer(0.2, self.release.set).start()
+            with ThreadPoolExecutor(max_workers=3) as pool:
+                answers = list(pool.map(lambda lat: service.stats(lat, -60.0, 2.0), [-3.00001, -3.00002, -3.0]))
+            cached = service.stats(-3.0, -60.0, 2.04)
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual([answer['result'] for answer in answers], [result] * 3)
+        self.assertEqual(sorted(answer['coalesced'] for answer in answers), [False, True, True])
+        self.assertEqual((cached['state'], cached['cached']), ('ready', True))
+        with self.assertRaises(ValueError):
+            service.stats(-3.0, -60.0, 0.0)
+
+
+class InlineExecutor:
+    """
+    ThreadPoolExecutor stand-in running work in the calling thread: the in-memory test
+    database locks whole tables between threads instead of waiting for them.
+    """
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def submit(self, function, *args):
+        future = Future()
+        try:
+            future.set_result(function(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+class BackfillRunnerTests(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('satellite_data.backfill.ThreadPoolExecutor', InlineExecutor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.aoi = AreaOfInterest.objects.create(name='Backfilled forest', latitude=-3.0, longitude=-60.0)
+        self.job, _ = plan_job(self.aoi, datetime.date(2026, 1, 1), datetime.date(2026, 3, 5), 30, 20.0)
+        self.failing = set()
+        self.analyzed = []
+
+    def runner(self):
+        runner = BackfillRunner(self.job, mock.Mock(), workers=2, progress=lambda message: None)
+
+        def analyze(chunk):
+            self.analyzed.append(chunk.start_date)
+            if chunk.start_date in self.failing:
+                raise RuntimeError("quota exceeded")
+            chunk.analysis_seconds = 1.0
+            chunk.state = BackfillChunk.STATE_ANALYZED
+
+        def loss(chunk):
+            if chunk.start_date in self.failing:
+                raise RuntimeError("loss failed")
+            chunk.loss_seconds = 1.0
+            chunk.state = BackfillChunk.STATE_DONE
+
+        runner.analyze_chunk, runner.loss_chunk = analyze, loss
+        return runner
+
+    def test_plan_splits_the_range_once(self):
+        chunks = list(self.job.chunks.order_by('start_date').values_list('start_date', 'end_date'))
+
+        self.assertEqual(chunks, [
+            (datetime.date(2026, 1, 1), datetime.date(2026, 1, 31)),
+            (datetime.date(2026, 1, 31), datetime.date(2026, 3, 2)),
+            (datetime.date(2026, 3, 2), datetime.date(2026, 3, 5)),
+        ])
+        job, created = plan_job(self.aoi, datetime.date(2026, 1, 1), datetime.date(2026, 3, 5), 30, 50.0)
+        self.assertEqual((job, created, job.chunks.count()), (self.job, False, 3))
+
+    def test_failed_chunks_retry_at_the_stage_they_failed_in(self):
+        self.failing = {datetime.date(2026, 1, 31)}
+        totals = self.runner().run()
+
+        chunk = self.job.chunks.get(start_date=datetime.date(2026, 1, 31))
+        self.assertEqual((chunk.state, chunk.attempts, chunk.last_error), (BackfillChunk.STATE_FAILED, 1, 'quota exceeded'))
+        # The loss stage waits for every chunk to be analyzed
+        self.assertEqual((totals['chunks_analyzed'], totals['chunks_done'], totals['chunks_failed']), (2, 0, 1))
+        self.assertEqual(BackfillJob.objects.get(pk=self.job.pk).state, BackfillJob.STATE_FAILED)
+
+        self.failing = set()
+        self.job.chunks.filter(start_date=datetime.date(2026, 3, 2)).update(
+            state=BackfillChunk.STATE_FAILED, analysis_seconds=1.0, attempts=1
+        )
+        self.analyzed = []
+        totals = self.runner().run()
+
+        self.assertEqual(self.analyzed, [datetime.date(2026, 1, 31)]) # The chunk that failed its loss stage skips analysis
+        self.assertEqual((totals['chunks_done'], totals['chunks_failed']), (3, 0))
+        self.assertEqual(self.job.chunks.get(start_date=datetime.date(2026, 1, 31)).attempts, 0)
+        self.assertEqual(BackfillJob.objects.get(pk=self.job.pk).state, BackfillJob.STATE_DONE)
+
+    def test_exhausted_chunks_are_not_retried(self):
+        self.job.chunks.filter(start_date=datetime.date(2026, 1, 1)).update(
+            state=BackfillChunk.STATE_FAILED, attempts=3
+        )
+
+        totals = self.runner().run()
+
+        self.assertEqual((totals['chunks_analyzed'], totals['chunks_failed']), (2, 1))
+        self.assertEqual(self.job.chunks.get(start_date=datetime.date(2026, 1, 1)).attempts, 3)
+
+    def test_eta_from_stage_throughput(self):
+        runner = self.runner()
+        self.assertIsNone(runner.eta_seconds())
+
+        done = self.job.chunks.order_by('start_date').first()
+        done.state = BackfillChunk.STATE_ANALYZED
+        done.save()
+        runner.finished_this_run = {'analysis': [done], 'loss': []}
+        runner.stage_started = {'analysis': 0.0}
+        runner.stage_seconds = {'analysis': 10.0}
+
+        # 0.1 chunks/s: 2 chunks left to analyze, 3 left for the loss stage at the borrowed rate
+        self.assertAlmostEqual(runner.eta_seconds(), 50.0)
+        self.assertEqual([format_duration(s) for s in (None, 42, 125, 7260)], ['unknown', '42s', '2m05s', '2h01m'])
+
+
+def profiled_worker_work():
+    return sum(range(1000))
+
+
+class ThreadedCommand(ProfilingMixin, BaseCommand):
+    def handle(self, *args, **options):
+        def work():
+            with trace_thread():
+                profiled_worker_work()
+
+        worker = threading.Thread(target=work)
+        worker.start()
+        worker.join()
+
+
+class ProfilingTests(TestCase):
+    def test_profile_merges_worker_threads(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        path = os.path.join(root, 'command.prof')
+
+        call_command(ThreadedCommand(stdout=io.StringIO()), profile=path)
+
+        functions = {name for _, _, name in pstats.Stats(path).stats}
+        self.assertIn('profiled_worker_work', functions)
+
+    def test_trace_thread_is_noop_without_options(self):
+        with trace_thread():
+            self.assertEqual(profiled_worker_work(), 499500)
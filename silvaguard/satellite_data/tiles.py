@@ -0,0 +1,241 @@
+import math
+import os
+import struct
+import threading
+import time
+import zlib
+import numpy as np
+from django.conf import settings
+from django.urls import reverse
+from .chips import QUANT_MAX, NODATA
+
+TILE_SIZE = 256
+
+# Cache hits refresh a tile's mtime (its LRU position) at most this often
+TOUCH_SECONDS = 3600
+# Writes check the cache size at most this often per process; eviction trims to 90% of the cap
+EVICT_INTERVAL_SECONDS = 60
+
+# Same colors as the Earth Engine layers (VegetationAnalyzer.generate_heatmap / get_loss_tile_url)
+EMERALD_RAMP = [(0x00, 0x00, 0x00), (0x2e, 0xcc, 0x71)] # Black to GFW Emerald, tree probability 0 -> 1
+CORAL = (0xff, 0x47, 0x57) # GFW Coral Red, loss pixels
+
+
+def encode_png(rgba: np.ndarray) -> bytes:
+    """
+    Encodes an (H, W, 4) uint8 array as a PNG (no filtering, zlib level 6).
+    """
+    height, width, _ = rgba.shape
+    raw = np.empty((height, width * 4 + 1), dtype=np.uint8)
+    raw[:, 0] = 0 # Filter type 'None' for every scanline
+    raw[:, 1:] = rgba.reshape(height, width * 4)
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0) # 8-bit RGBA
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)) + chunk(b'IEND', b'')
+
+
+def colorize_probability(values: np.ndarray) -> np.ndarray:
+    """
+    Quantized tree probability (uint8, QUANT_MAX = 1.0) on the emerald ramp; no-data is transparent.
+    """
+    t = (np.minimum(values, QUANT_MAX).astype(np.float32) / QUANT_MAX)[..., None]
+    low = np.array(EMERALD_RAMP[0], dtype=np.float32)
+    high = np.array(EMERALD_RAMP[1], dtype=np.float32)
+
+    rgba = np.zeros(values.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = np.round(low + (high - low) * t).astype(np.uint8)
+    rgba[..., 3] = np.where(values != NODATA, 255, 0)
+    return rgba
+
+
+def tile_lonlat(z: int, x: int, y: int):
+    """
+    Longitudes and latitudes of the pixel centers of an XYZ tile.
+    """
+    n = 2 ** z
+    offsets = (np.arange(TILE_SIZE) + 0.5) / TILE_SIZE
+    lons = (x + offsets) / n * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(math.pi * (1 - 2 * (y + offsets) / n))))
+    return lons, lats
+
+
+class TileRenderer:
+    """
+    Renders XYZ PNG tiles from locally stored rasters: tree probability chips
+    (ChipStore) and bit-packed loss masks (LossMask), by nearest-neighbour sampling.
+    """
+
+    def _sample_indices(self, transform: list, width: int, height: int, z: int, x: int, y: int):
+        """
+        Raster row/column for every tile pixel, plus a mask of the pixels inside the raster.
+        Returns None if the tile does not touch the raster.
+        """
+        west, dx, north, dy = transform
+        lons, lats = tile_lonlat(z, x, y)
+        cols = np.floor((lons - west) / dx).astype(np.int64)
+        rows = np.floor((north - lats) / dy).astype(np.int64)
+
+        col_ok = (cols >= 0) & (cols < width)
+        row_ok = (rows >= 0) & (rows < height)
+        if not col_ok.any() or not row_ok.any():
+            return None
+
+        inside = row_ok[:, None] & col_ok[None, :]
+        return np.clip(rows, 0, height - 1)[:, None], np.clip(cols, 0, width - 1)[None, :], inside
+
+    def empty(self) -> bytes:
+        return encode_png(np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8))
+
+    def render_probability(self, data: np.ndarray, grid: dict, z: int, x: int, y: int) -> bytes:
+        """
+        Tree probability chip (uint8, QUANT_MAX = 1.0) on the emerald ramp; no-data is transparent.
+        """
+        sample = self._sample_indices(grid['transform'], grid['width'], grid['height'], z, x, y)
+        if sample is None:
+            return self.empty()
+        rows, cols, inside = sample
+
+        values = np.where(inside, data[rows, cols], NODATA)
+        return encode_png(colorize_probability(values))
+
+    def render_mask(self, packed, z: int, x: int, y: int) -> bytes:
+        """
+        Loss mask in coral, everything else transparent. Bits are read from the packed rows directly.
+        """
+        sample = self._sample_indices(packed.transform, packed.width, packed.height, z, x, y)
+        if sample is None:
+            return self.empty()
+        rows, cols, inside = sample
+
+        bits = (packed.rows[rows, cols >> 3] >> (7 - (cols & 7))) & 1
+        on = inside & (bits == 1)
+
+        rgba = np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8)
+        rgba[on] = CORAL + (255,)
+        return encode_png(rgba)
+
+
+class TileCache:
+    """
+    File cache of rendered tiles under SILVAGUARD_TILE_CACHE_DIR/<layer>/<key>/<z>/<x>/<y>.png.
+
+    Least recently used tiles (by mtime, refreshed on hits) are evicted once the cache exceeds
+    SILVAGUARD_TILE_CACHE_MAX_BYTES. Heatmap tiles of an evicted chip are dropped with it.
+    """
+
+    _evict_lock = threading.Lock()
+    _last_evict = {}
+
+    def __init__(self, root=None, max_bytes: int = None):
+        self.root = str(root or getattr(settings, 'SILVAGUARD_TILE_CACHE_DIR', os.path.join(settings.BASE_DIR, 'tiles')))
+        self.max_bytes = max_bytes or getattr(settings, 'SILVAGUARD_TILE_CACHE_MAX_BYTES', 512 * 1024 ** 2)
+
+    def _path(self, layer: str, key, z: int, x: int, y: int) -> str:
+        return os.path.join(self.root, layer, str(key), str(z), str(x), f"{y}.png")
+
+    def get_or_render(self, layer: str, key, z: int, x: int, y: int, render) -> bytes:
+        """
+        Returns the cached tile, or calls render() and writes its result through the cache.
+        render() may return None (source raster unavailable), which is not cached.
+        """
+        path = self._path(layer, key, z, x, y)
+        try:
+            with open(path, 'rb') as f:
+                png = f.read()
+                stale = time.time() - os.fstat(f.fileno()).st_mtime > TOUCH_SECONDS
+            if stale:
+                os.utime(path) # Mark as recently used for eviction
+            return png
+        except FileNotFoundError:
+            pass
+
+        png = render()
+        if png is None:
+            return None
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(png)
+        os.replace(tmp_path, path)
+        self._maybe_evict()
+        return png
+
+    def _maybe_evict(self):
+        now = time.monotonic()
+        with self._evict_lock:
+            if now - self._last_evict.get(self.root, -EVICT_INTERVAL_SECONDS) < EVICT_INTERVAL_SECONDS:
+                return
+            self._last_evict[self.root] = now
+        self.evict()
+
+    def evict(self):
+        """
+        Deletes least recently used tiles until the cache fits in 90% of max_bytes.
+        """
+        tiles = []
+        total = 0
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if not name.endswith('.png'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                tiles.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+
+        target = self.max_bytes * 0.9
+        for _, size, path in sorted(tiles):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def invalidate(self, layer: str, key):
+        """
+        Drops every cached tile of one layer source (e.g. after its raster changed).
+        """
+        import shutil
+        shutil.rmtree(os.path.join(self.root, layer, str(key)), ignore_errors=True)
+
+
+def _url_template(name: str, pk: int) -> str:
+    # Leaflet-style {z}/{x}/{y} template from the named tile route
+    return reverse(name, args=[pk, 0, 0, 0]).replace('/0/0/0.png', '/{z}/{x}/{y}.png')
+
+
+def heatmap_url(analysis, chips=None) -> str:
+    """
+    Local tree probability tile URL for an analysis if its chip is stored, otherwise the Earth Engine URL.
+    """
+    from .chips import ChipStore
+
+    satellite_image = analysis.processed_image.satellite_image
+    if (chips or ChipStore()).has(satellite_image):
+        return _url_template('heatmap_tile', satellite_image.pk)
+    return analysis.heatmap_file_path
+
+
+def loss_url(alert, has_mask: bool = None) -> str:
+    """
+    Local loss tile URL for an alert if its mask is stored, otherwise the Earth Engine URL.
+    Pass has_mask when it is already known to skip the lookup.
+    """
+    from .models import LossMask
+
+    if has_mask is None:
+        has_mask = LossMask.objects.filter(alert_id=alert.pk).exists()
+    if has_mask:
+        return _url_template('loss_tile', alert.pk)
+    return alert.loss_map_path
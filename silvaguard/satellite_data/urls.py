@@ -1,10 +1,20 @@
 from django.urls import path
-from . import views
+from . import views, api_views
 
 urlpatterns = [
     path('aois/', views.aoi_list, name='aoi_list'),
     path('aois/add/', views.aoi_create, name='aoi_create'),
     path('alerts/<int:pk>/', views.alert_detail, name='alert_detail'),
+    path('alerts/<int:pk>/mask.bin', views.alert_loss_mask, name='alert_loss_mask'),
+    path('aois/<int:pk>/loss-mask.bin', views.aoi_cumulative_loss_mask, name='aoi_cumulative_loss_mask'),
+    path('tiles/heatmap/<int:pk>/<int:z>/<int:x>/<int:y>.png', views.heatmap_tile, name='heatmap_tile'),
+    path('tiles/loss/<int:pk>/<int:z>/<int:x>/<int:y>.png', views.loss_tile, name='loss_tile'),
     path('pulse/', views.guard_pulse_trigger, name='guard_pulse_trigger'),
     path('api/map-data/', views.api_get_map_data, name='api_map_data'),
+    path('api/aois/', api_views.get_aois, name='api_aois'),
+    path('api/aois/import/', api_views.import_aois, name='api_import_aois'),
+    path('api/area-stats/', api_views.area_stats, name='api_area_stats'),
+    path('api/alerts/', api_views.get_alerts, name='api_alerts'),
+    path('api/events/', api_views.alert_stream, name='api_alert_stream'),
+    path('api/export/<slug:dataset>.<slug:fmt>', api_views.export_data, name='api_export_data'),
 ]
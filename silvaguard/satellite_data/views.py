@@ -1,17 +1,33 @@
 from django.shortcuts import render, redirect
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse, Http404
 from django.contrib.auth.decorators import login_required
 from django.core.cache import cache
 from .models import AreaOfInterest, DeforestationAlert, VegetationAnalysis
 from .forms import AreaOfInterestForm
+from .versioning import versioned
 
 @login_required
+@versioned('map-data', extra=lambda: cache.get('global_mosaic_tile_url') or '')
 def api_get_map_data(request):
     """
     Returns GeoJSON data for AOIs and Alerts.
+    The number of queries does not grow with the number of AOIs or alerts.
     """
-    aois = AreaOfInterest.objects.all()
-    alerts = DeforestationAlert.objects.all()
+    from django.db.models import OuterRef, Subquery
+    from .chips import ChipStore
+    from .models import LossMask
+    from .tiles import heatmap_url, loss_url
+
+    latest = VegetationAnalysis.objects.filter(
+        processed_image__satellite_image__aoi=OuterRef('pk')
+    ).order_by('-analysis_date').values('pk')[:1]
+    aois = list(AreaOfInterest.objects.annotate(latest_analysis_id=Subquery(latest)).order_by('id'))
+    latest_analyses = VegetationAnalysis.objects.select_related('processed_image__satellite_image').in_bulk(
+        [aoi.latest_analysis_id for aoi in aois if aoi.latest_analysis_id]
+    )
+    alerts = DeforestationAlert.objects.select_related('aoi')
+    masked_alert_ids = set(LossMask.objects.values_list('alert_id', flat=True))
+    chips = ChipStore()
     
     features = []
     
@@ -21,7 +37,7 @@ def api_get_map_data(request):
     if not global_tile_url:
         from .analysis import VegetationAnalyzer
         analyzer = VegetationAnalyzer()
-        center_aoi = aois.first()
+        center_aoi = aois[0] if aois else None
         if center_aoi:
             # Regional focus
             global_tile_url = analyzer.get_mosaic_tile_url(center_aoi.latitude, center_aoi.longitude, 500) # Changed radius to 500km
@@ -34,12 +50,10 @@ def api_get_map_data(request):
     
     # Add AOIs as Polygons
     for aoi in aois:
-        # Get latest analysis for this AOI to show the layer
-        latest_analysis = VegetationAnalysis.objects.filter(
-            processed_image__satellite_image__aoi=aoi
-        ).order_by('-analysis_date').first()
-        
-        tile_url = latest_analysis.heatmap_file_path if latest_analysis else ""
+        # Latest analysis of this AOI to show the layer
+        latest_analysis = latest_analyses.get(aoi.latest_analysis_id)
+
+        tile_url = heatmap_url(latest_analysis, chips) if latest_analysis else ""
         
         features.append({
             "type": "Feature",
@@ -77,7 +91,7 @@ def api_get_map_data(request):
                 "loss_ha": alert.forest_loss_hectares,
                 "loss_pct": alert.loss_percentage,
                 "date": alert.detected_at.strftime("%Y-%m-%d"),
-                "tile_url": alert.loss_map_path, # GEE Loss Tile
+                "tile_url": loss_url(alert, alert.id in masked_alert_ids), # Local or GEE Loss Tile
                 "popup": f"⚠️ <strong>Deforestation Alert</strong><br>Loss: {alert.forest_loss_hectares:.1f} ha<br>Date: {alert.detected_at.strftime('%Y-%m-%d')}"
             }
         })
@@ -132,19 +146,111 @@ def alert_detail(request, pk):
     Detailed report for a specific Deforestation Alert.
     """
     from django.shortcuts import get_object_or_404
-    alert = get_object_or_404(DeforestationAlert, pk=pk)
-    
-    # Get before/after imagery for comparison
-    img_before = alert.analysis_before.processed_image.satellite_image
-    img_after = alert.analysis_after.processed_image.satellite_image
-    
-    # We'll pass tiles and metadata to the template
+    from django.utils.dateparse import parse_datetime
+    from .reports import AlertReportBuilder
+    from .tiles import heatmap_url, loss_url
+
+    # Everything the page shows comes from the precomputed bundle on the alert row
+    alert = get_object_or_404(
+        DeforestationAlert.objects.select_related('analysis_before__processed_image__satellite_image'), pk=pk
+    )
+    report = alert.report_bundle
+    if not report:
+        # Alerts created before report bundles existed get theirs on first view;
+        # if it cannot be built, the page shows the statistics without thumbnails
+        builder = AlertReportBuilder()
+        report = builder.build(alert) or builder.summary(alert)
+
+    # Parse into copies, so the bundle on the alert stays as stored
+    report = dict(report, **{
+        scene: dict(report[scene], **{
+            field: parse_datetime(report[scene][field]) for field in ('acquisition_date', 'analysis_date')
+        })
+        for scene in ('before', 'after')
+    })
+
+    # The heatmap tile depends on which chips are stored right now; bundles before
+    # version 3 do not record the loss mask, so loss_url looks it up
     context = {
         'alert': alert,
-        'img_before': img_before,
-        'img_after': img_after,
-        'aoi': alert.aoi,
+        'report': report,
+        'heatmap_url': heatmap_url(alert.analysis_before),
+        'loss_url': loss_url(alert, report['loss'].get('has_mask')),
     }
     
     return render(request, 'satellite_data/alert_detail.html', context)
-    return redirect('home')
+
+def _mask_response(packed, filename):
+    """
+    Serves the packed bits as-is; the georeference travels in X-Mask-* headers.
+    """
+    response = HttpResponse(packed.rows.data, content_type='application/octet-stream')
+    for header, value in packed.headers().items():
+        response[header] = value
+    response['Content-Disposition'] = f'inline; filename="{filename}"'
+    return response
+
+@login_required
+def alert_loss_mask(request, pk):
+    """
+    Raw bit-packed loss mask of an alert (see masks.PackedMask for the layout).
+    """
+    from .models import LossMask
+    loss_mask = LossMask.objects.filter(alert_id=pk).first()
+    if loss_mask is None:
+        raise Http404("No loss mask stored for this alert")
+    return _mask_response(loss_mask.packed(), f"alert-{pk}-mask.bin")
+
+@login_required
+def aoi_cumulative_loss_mask(request, pk):
+    """
+    Union of all stored loss masks of an AOI, computed on the packed bits.
+    """
+    from .models import LossMask
+    from .masks import cumulative
+    masks = LossMask.objects.filter(alert__aoi_id=pk).order_by('alert__detected_at')
+    packed = cumulative(m.packed() for m in masks.iterator())
+    if packed is None:
+        raise Http404("No loss masks stored for this AOI")
+    return _mask_response(packed, f"aoi-{pk}-cumulative-mask.bin")
+
+def _tile_response(png):
+    if png is None:
+        raise Http404("Tile source not stored locally")
+    response = HttpResponse(png, content_type='image/png')
+    response['Cache-Control'] = 'private, max-age=86400'
+    return response
+
+@login_required
+def heatmap_tile(request, pk, z, x, y):
+    """
+    Tree probability tile rendered from the stored chip of a SatelliteImage.
+    """
+    from .models import SatelliteImage
+    from .chips import ChipStore
+    from .tiles import TileRenderer, TileCache
+
+    def render():
+        satellite_image = SatelliteImage.objects.filter(pk=pk).select_related('aoi').first()
+        data, grid = ChipStore().load(satellite_image) if satellite_image else (None, None)
+        if data is None:
+            return None
+        return TileRenderer().render_probability(data, grid, z, x, y)
+
+    return _tile_response(TileCache().get_or_render('heatmap', pk, z, x, y, render))
+
+@login_required
+def loss_tile(request, pk, z, x, y):
+    """
+    Loss tile rendered from the stored bit-packed mask of a DeforestationAlert.
+    """
+    from .models import LossMask
+    from .tiles import TileRenderer, TileCache
+
+    def render():
+        loss_mask = LossMask.objects.filter(alert_id=pk).first()
+        if loss_mask is None:
+            return None
+        return TileRenderer().render_mask(loss_mask.packed(), z, x, y)
+
+    return _tile_response(TileCache().get_or_render('loss', pk, z, x, y, render))
@@ -94,6 +94,31 @@ DATABASES = {
         conn_max_age=600
     )
 }
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # Backfill chunks and pulse stages write from several threads: a writer waits up to `timeout`
+    # seconds for the lock instead of failing with "database is locked". Transactions that read
+    # before writing use satellite_data.db.write_transaction, which takes the lock up front.
+    DATABASES['default'].setdefault('OPTIONS', {}).update({'timeout': 20})
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/ref/settings/#caches
+# 'locmem' keeps a cache per process. 'database' shares one between processes, so concurrent
+# workers coalesce ad-hoc computations and reuse each other's results; it needs its table:
+# `python manage.py createcachetable`.
+SILVAGUARD_CACHE = os.environ.get('SILVAGUARD_CACHE', 'locmem')
+if SILVAGUARD_CACHE == 'database':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'silvaguard_cache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
 
 
 # Password validation
@@ -135,6 +160,10 @@ STATICFILES_DIRS = [
     BASE_DIR / 'silvaguard' / 'static',
 ]
 
+# Generated artifacts (alert report thumbnails)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', str(BASE_DIR / 'media'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -152,3 +181,131 @@ SESSION_COOKIE_AGE = 1209600 # 2 weeks
 CSRF_COOKIE_AGE = 1209600
 CSRF_USE_SESSIONS = False # Keep as False for compatibility in local dev
 
+
+# SilvaGuard Analysis
+# Global precision target for Earth Engine reductions ('high', 'balanced' or 'fast').
+# Individual AOIs can override it through AreaOfInterest.precision.
+SILVAGUARD_REDUCTION_PRECISION = os.environ.get('SILVAGUARD_REDUCTION_PRECISION', 'balanced')
+# Overlapping AOIs share scene metadata, reductions and tiles within a pulse (satellite_data.planning).
+SILVAGUARD_SHARED_PLANNING = os.environ.get('SILVAGUARD_SHARED_PLANNING', 'True') == 'True'
+
+# Grid-cell result cache for ad-hoc area queries (satellite_data.gridcache): geohash precision of
+# the cells (6 = ~1.2 x 0.6 km), scale in meters cells are reduced at, largest query and cells per request.
+# The pulse also caches the cells of each analyzed scene's AOI, for AOIs of at most
+# SILVAGUARD_GRID_WARM_MAX_CELLS cells (500 = one extra reduction per scene, ~10 km radius).
+SILVAGUARD_GRID_PRECISION = int(os.environ.get('SILVAGUARD_GRID_PRECISION', 6))
+SILVAGUARD_GRID_SCALE = 20
+SILVAGUARD_GRID_MAX_CELLS = 20000
+SILVAGUARD_GRID_CHUNK_CELLS = 500
+SILVAGUARD_GRID_WARM_FROM_PULSE = os.environ.get('SILVAGUARD_GRID_WARM_FROM_PULSE', 'True') == 'True'
+SILVAGUARD_GRID_WARM_MAX_CELLS = 500
+
+# Ad-hoc circle statistics (api/area-stats/): request latency budget, result cache lifetime and
+# that of "no scene" answers, center rounding of the cache key (3 decimals = ~110 m), largest
+# radius, scene search window and background computation threads.
+SILVAGUARD_ADHOC_BUDGET_SECONDS = float(os.environ.get('SILVAGUARD_ADHOC_BUDGET_SECONDS', 10))
+SILVAGUARD_ADHOC_CACHE_SECONDS = 3600
+SILVAGUARD_ADHOC_EMPTY_CACHE_SECONDS = 300
+SILVAGUARD_ADHOC_ROUND_DECIMALS = 3
+SILVAGUARD_ADHOC_MAX_RADIUS_KM = 25
+SILVAGUARD_ADHOC_WINDOW_DAYS = 30
+SILVAGUARD_ADHOC_WORKERS = 4
+
+# Earth Engine request quota of parallel jobs (satellite_data.quota): requests started per second
+# and requests in flight at once.
+SILVAGUARD_EE_MAX_QPS = float(os.environ.get('SILVAGUARD_EE_MAX_QPS', 10))
+SILVAGUARD_EE_MAX_CONCURRENT = int(os.environ.get('SILVAGUARD_EE_MAX_CONCURRENT', 8))
+
+# Historical backfill (manage.py backfill_aoi): scenes discovered per chunk and attempts per chunk stage.
+SILVAGUARD_BACKFILL_SCENES_PER_CHUNK = 100
+SILVAGUARD_BACKFILL_MAX_ATTEMPTS = 3
+
+# Dynamic World tree probability above which a pixel counts as forest. Stored tree probability
+# histograms let `manage.py rethreshold_history` recompute past forest cover after a change.
+SILVAGUARD_FOREST_THRESHOLD = float(os.environ.get('SILVAGUARD_FOREST_THRESHOLD', '0.5'))
+
+# Batch (export task) mode for very large AOIs. Disabled unless an asset folder is configured,
+# e.g. 'projects/my-project/assets/silvaguard'.
+SILVAGUARD_EXPORT_ASSET_ROOT = os.environ.get('SILVAGUARD_EXPORT_ASSET_ROOT', '')
+SILVAGUARD_BATCH_AREA_KM2 = float(os.environ.get('SILVAGUARD_BATCH_AREA_KM2', 2500))
+# Export tasks submitted for the same analysis or comparison before the pulse stops retrying it.
+SILVAGUARD_EXPORT_MAX_ATTEMPTS = 3
+# Dotted path of the export task client; 'satellite_data.batch.LocalTaskClient' runs without Earth Engine.
+SILVAGUARD_TASK_CLIENT = os.environ.get('SILVAGUARD_TASK_CLIENT', 'satellite_data.batch.EarthEngineTaskClient')
+
+# Distributed pulse: seconds a worker holds an AOI lease without heartbeating before others may take it over.
+SILVAGUARD_LEASE_SECONDS = int(os.environ.get('SILVAGUARD_LEASE_SECONDS', 600))
+# A pulse skips AOIs any worker completed within this many minutes, so workers started a few
+# minutes apart share one cycle instead of pulsing every AOI twice.
+SILVAGUARD_PULSE_MIN_INTERVAL_MINUTES = int(os.environ.get('SILVAGUARD_PULSE_MIN_INTERVAL_MINUTES', 60))
+
+# Staged pulse (satellite_data.pipeline): threads and batch size of each stage (collect and detect
+# batches count AOIs, analyze and tile batches count scenes), seconds a claimed batch stays reserved
+# for its worker, and failed attempts before a scene is marked failed.
+SILVAGUARD_PIPELINE_STAGES = {
+    'collect': {'workers': 2, 'batch_size': 1},
+    'analyze': {'workers': 4, 'batch_size': 4},
+    'tile': {'workers': 2, 'batch_size': 8},
+    'detect': {'workers': 2, 'batch_size': 1},
+}
+SILVAGUARD_PIPELINE_CLAIM_SECONDS = 600
+SILVAGUARD_PIPELINE_MAX_ATTEMPTS = 3
+
+# Adaptive scheduler (guard_scheduler): base cadence follows the Sentinel-2 revisit (5 days),
+# bounded by the min/max intervals. Alerts in the window shorten it, cloudy pulses lengthen it.
+SILVAGUARD_SCHEDULER_BASE_HOURS = int(os.environ.get('SILVAGUARD_SCHEDULER_BASE_HOURS', 120))
+SILVAGUARD_SCHEDULER_MIN_HOURS = int(os.environ.get('SILVAGUARD_SCHEDULER_MIN_HOURS', 24))
+SILVAGUARD_SCHEDULER_MAX_HOURS = int(os.environ.get('SILVAGUARD_SCHEDULER_MAX_HOURS', 720))
+SILVAGUARD_SCHEDULER_ALERT_WINDOW_DAYS = 30
+SILVAGUARD_SCHEDULER_HOT_LOSS_PCT = 1.0
+# Minutes before an AOI whose pulse raised an error is tried again
+SILVAGUARD_SCHEDULER_RETRY_MINUTES = 30
+
+# Local chip store of quantized Dynamic World tree probabilities (one memory-mapped .npy per scene)
+SILVAGUARD_CHIP_STORE_ENABLED = os.environ.get('SILVAGUARD_CHIP_STORE_ENABLED', 'True') == 'True'
+SILVAGUARD_CHIP_STORE_DIR = os.environ.get('SILVAGUARD_CHIP_STORE_DIR', str(BASE_DIR / 'chips'))
+SILVAGUARD_CHIP_STORE_MAX_BYTES = int(os.environ.get('SILVAGUARD_CHIP_STORE_MAX_BYTES', 2 * 1024 ** 3))
+SILVAGUARD_CHIP_MAX_DIMENSION = 4096
+# Also store the Sentinel-2 bands of the spectral indices with each chip, so index
+# statistics are computed locally instead of by an Earth Engine reduction (about 12x the chip size)
+SILVAGUARD_CHIP_STORE_BANDS = os.environ.get('SILVAGUARD_CHIP_STORE_BANDS', 'False') == 'True'
+
+# Server-Sent Events (api/events/): seconds between polls of the event table per server
+# process, seconds between keep-alive comments, and how long events are kept
+SILVAGUARD_SSE_POLL_SECONDS = float(os.environ.get('SILVAGUARD_SSE_POLL_SECONDS', '2'))
+SILVAGUARD_SSE_KEEPALIVE_SECONDS = 15
+SILVAGUARD_EVENT_RETENTION_HOURS = int(os.environ.get('SILVAGUARD_EVENT_RETENTION_HOURS', '24'))
+
+# Bulk AOI import (manage.py import_aois, api/aois/import/): AOIs per bulk insert, distance under which
+# two AOI centers count as duplicates, and the largest radius accepted
+SILVAGUARD_IMPORT_BATCH_SIZE = 1000
+SILVAGUARD_IMPORT_DUPLICATE_METERS = float(os.environ.get('SILVAGUARD_IMPORT_DUPLICATE_METERS', '100'))
+SILVAGUARD_IMPORT_MAX_RADIUS_KM = 200.0
+
+# History retention (manage.py compact_history): scenes older than this many days are rolled into
+# monthly per-AOI aggregates and deleted. Alert evidence and the newest analyses of each AOI are kept.
+SILVAGUARD_RETENTION_DAYS = int(os.environ.get('SILVAGUARD_RETENTION_DAYS', '365'))
+SILVAGUARD_RETENTION_KEEP_LATEST = 2
+
+# Rendered PNG tiles of stored chips and loss masks (served instead of Earth Engine map IDs),
+# least recently used tiles evicted past SILVAGUARD_TILE_CACHE_MAX_BYTES
+SILVAGUARD_TILE_CACHE_DIR = os.environ.get('SILVAGUARD_TILE_CACHE_DIR', str(BASE_DIR / 'tiles'))
+SILVAGUARD_TILE_CACHE_MAX_BYTES = int(os.environ.get('SILVAGUARD_TILE_CACHE_MAX_BYTES', 512 * 1024 ** 2))
+
+# Email. Defaults to the console backend; point EMAIL_HOST/EMAIL_PORT at a local SMTP stand-in
+# (e.g. `python -m aiosmtpd -n -l localhost:1025`) with
+# EMAIL_BACKEND=django.core.mail.backends.smtp.EmailBackend to try real delivery.
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', '25'))
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'False') == 'True'
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'SilvaGuard <alerts@silvaguard.local>')
+
+# Alert notifications (manage.py dispatch_notifications): outbox rows per batch, sends tried per
+# row before it is marked failed, extra recipients besides opted-in users, and the base URL of links
+SILVAGUARD_NOTIFICATION_BATCH_SIZE = 200
+SILVAGUARD_NOTIFICATION_MAX_ATTEMPTS = 5
+SILVAGUARD_ALERT_EMAILS = [email for email in os.environ.get('SILVAGUARD_ALERT_EMAILS', '').split(',') if email]
+SILVAGUARD_SITE_URL = os.environ.get('SILVAGUARD_SITE_URL', 'http://localhost:8000')
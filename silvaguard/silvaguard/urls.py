@@ -14,6 +14,8 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from django.views.generic.base import RedirectView
@@ -24,3 +26,6 @@ urlpatterns = [
     path('satellite/', include('satellite_data.urls')),
     path('', RedirectView.as_view(url='users/login', permanent=False)),  # Redirect root to login
 ]
+
+# Report thumbnails; served by the web server in production
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -2,4 +2,9 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from .models import CustomUser
 
-admin.site.register(CustomUser, UserAdmin)
+class CustomUserAdmin(UserAdmin):
+    fieldsets = UserAdmin.fieldsets + (
+        ('Notifications', {'fields': ('notify_alerts',)}),
+    )
+
+admin.site.register(CustomUser, CustomUserAdmin)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='notify_alerts',
+            field=models.BooleanField(default=True, help_text='Receive email digests of new deforestation alerts'),
+        ),
+    ]
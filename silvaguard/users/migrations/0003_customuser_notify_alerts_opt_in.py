@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_customuser_notify_alerts'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='notify_alerts',
+            field=models.BooleanField(default=False, help_text='Receive email digests of new deforestation alerts (opt-in)'),
+        ),
+    ]
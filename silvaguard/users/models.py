@@ -2,7 +2,7 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 class CustomUser(AbstractUser):
-    pass
+    notify_alerts = models.BooleanField(default=False, help_text="Receive email digests of new deforestation alerts (opt-in)")
 
     def __str__(self):
         return self.username